@@ -9,6 +9,7 @@ import json
 import time
 import sys
 import re
+from contextlib import nullcontext
 from typing import Dict, Optional
 
 sys.path.append("src")
@@ -20,8 +21,15 @@ from src.filters.ui.sidebar import (
     filter_user_friendly_context,
     create_enhanced_filter_manager
 )
-from src.filters.core.manager import get_json_filter_manager
+from src.filters.core.manager import get_json_filter_manager, get_json_filter_manager_stats
+from src.filters.core.count_index import count_filtered_records
 from src.visualization.plotly_charts import render_plotly_visualization
+from src.config.model_config import RESPONSE_STREAMING_CONFIG
+# Mesmo módulo usado pelas ferramentas do agente (utils.*, não src.utils.*): o span
+# ativo fica em uma ContextVar do módulo
+from utils.tracing import start_trace, span, export_trace, span_totals
+from utils.agent_stream import (BackgroundRun, is_run_active, wait_for_previous_run, CHART_TOOL,
+                                UPDATE_TOKEN, UPDATE_TOOL_STARTED, UPDATE_TOOL_COMPLETED, UPDATE_DONE)
 
 # Page configuration
 st.set_page_config(page_title="Agente IA Target v0.61", page_icon="🤖", layout="wide")
@@ -575,9 +583,13 @@ def _render_main_interface(agent, df):
 
 def _render_sidebar(df):
     """Renderiza sidebar com informações e filtros"""
+    from src.utils.data_loaders import get_dataset_summary, get_record_counter
+
+    # Resumo dos artefatos: vale também na ingestão em streaming (df = None)
+    summary = get_dataset_summary()
     st.markdown("## 📊 Informações do Dataset")
-    st.markdown(f"**Registros totais:** {len(df):,}")
-    st.markdown(f"**Período:** {df['Data'].min().strftime('%Y-%m-%d')} a {df['Data'].max().strftime('%Y-%m-%d')}")
+    st.markdown(f"**Registros totais:** {summary['rows']:,}")
+    st.markdown(f"**Período:** {summary['min_date'].strftime('%Y-%m-%d')} a {summary['max_date'].strftime('%Y-%m-%d')}")
 
     # Debug toggle
     debug_mode = st.toggle(
@@ -587,16 +599,83 @@ def _render_sidebar(df):
     )
     st.session_state.debug_mode = debug_mode
 
+    # Métricas de carga/memória do dataset compartilhado (dimensionamento de pods)
+    if debug_mode:
+        from src.utils.data_loaders import get_dataset_load_stats, get_duckdb_load_stats
+        with st.expander("🧠 Memória do Processo", expanded=False):
+            for registry_stats in get_dataset_load_stats().values():
+                st.markdown(f"**Carga do parquet:** {registry_stats['load_seconds']}s ({registry_stats['ingestion_mode']})")
+                st.markdown(f"**Arrow (bytes lidos):** {registry_stats['arrow_bytes'] / (1024 * 1024):,.1f} MB")
+                st.markdown(f"**RSS atual:** {registry_stats['rss_mb']} MB (pico: {registry_stats['peak_rss_mb']} MB)")
+                st.markdown(f"**Views servidas:** {registry_stats['views_served']}")
+                if registry_stats['encoding_cleanup_seconds'] is not None:
+                    st.markdown(f"**Limpeza de codificação:** {registry_stats['encoding_cleanup_seconds']}s")
+                    for col, seconds in registry_stats['encoding_cleanup_columns'].items():
+                        st.markdown(f"- `{col}`: {seconds}s")
+                if registry_stats['normalized_view']:
+                    view_stats = registry_stats['normalized_view']
+                    st.markdown(f"**View normalizada:** {view_stats['memory_mb']} MB "
+                                f"({view_stats['shared_code_columns']}/{view_stats['text_columns']} colunas sobre os códigos originais)")
+            for pool_stats in get_duckdb_load_stats().values():
+                st.markdown(f"**DuckDB:** {pool_stats['mode']}, {pool_stats['relation']} "
+                            f"(construção: {pool_stats['build_seconds']}s)")
+                st.markdown(f"**Cursores de sessão:** {pool_stats['cursors_served']}")
+                st.markdown(f"**Rollups mensais:** {pool_stats['rollups']}")
+            manager_stats = get_json_filter_manager_stats()
+            st.markdown(f"**Índices de filtros:** {manager_stats['builds']} construções "
+                        f"({manager_stats['build_seconds']}s), {manager_stats['hits']} reusos, "
+                        f"{manager_stats['indexed_values']:,} valores")
+
+        # Waterfall de latência do último turno (ver utils.tracing)
+        if st.session_state.get('last_trace'):
+            with st.expander("⏱️ Latência do Último Turno", expanded=False):
+                _render_trace_waterfall(st.session_state.last_trace)
+
     st.markdown("---")
 
+    # Contagem de registros filtrados: índice sobre o DataFrame ou COUNT no DuckDB (streaming)
+    count_source = df if df is not None else get_record_counter()
+
     # Enhanced Filter management with new JSON system
     if 'last_context' in st.session_state and st.session_state.last_context:
         user_context = filter_user_friendly_context(st.session_state.last_context)
-        create_enhanced_filter_manager(user_context, show_suggestions=True, df=df)
+        create_enhanced_filter_manager(user_context, show_suggestions=True, df=count_source)
 
         # Removido: exibição da contagem de filtros ativos para simplificar interface
     else:
-        create_enhanced_filter_manager({}, show_suggestions=False, df=df)
+        create_enhanced_filter_manager({}, show_suggestions=False, df=count_source)
+
+
+def _render_trace_waterfall(trace):
+    """Renderiza os spans de um turno como waterfall (uma barra por span, na ordem de início)"""
+    import plotly.graph_objects as go
+
+    spans = [record for record in trace['spans'] if record['duration_ms'] is not None]
+    st.markdown(f"**Turno:** {trace['duration_ms'] / 1000:.2f}s em {len(spans)} etapas")
+    if not spans:
+        return
+
+    depth = {}
+    for record in spans:
+        depth[record['id']] = depth.get(record['parent'], -1) + 1
+    labels = [f"{'· ' * depth[record['id']]}{record['name']} #{record['id']}" for record in spans]
+
+    fig = go.Figure(go.Bar(
+        y=labels,
+        x=[record['duration_ms'] for record in spans],
+        base=[record['start_ms'] for record in spans],
+        orientation='h',
+        marker_color=['#d62728' if record.get('error') else '#1f77b4' for record in spans],
+        hovertemplate="%{y}<br>início: %{base:.0f} ms<br>duração: %{x:.1f} ms<extra></extra>",
+    ))
+    fig.update_layout(
+        height=max(200, 22 * len(spans) + 60),
+        margin=dict(l=0, r=0, t=10, b=30),
+        yaxis=dict(autorange='reversed', tickfont=dict(size=10)),
+        xaxis_title="ms desde o início do turno",
+        showlegend=False,
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
 
 def _render_chat_interface(agent):
@@ -712,6 +791,23 @@ def _render_debug_info(debug_info, message_context=None):
                 st.markdown(f"**Query {i}:**")
                 st.code(format_sql_query(query), language="sql")
 
+        # Execuções por query (cada query deve rodar uma única vez no DuckDB)
+        if debug_info.get("query_executions"):
+            executions = debug_info["query_executions"]
+            repeated = sum(1 for count in executions.values() if count > 1)
+            st.markdown(f"**Execuções DuckDB:** {sum(executions.values())} para {len(executions)} queries distintas (repetidas: {repeated})")
+
+        # Lotes de queries independentes executados em paralelo no mesmo passo
+        if debug_info.get("parallel_queries"):
+            batches = debug_info["parallel_queries"]
+            saved_ms = sum(batch['saved_ms'] for batch in batches)
+            st.markdown(f"**Queries paralelas:** {sum(batch['queries'] for batch in batches)} em {len(batches)} lote(s), {saved_ms:,.1f} ms economizados")
+
+        # Queries respondidas por rollups mensais (sem varrer a tabela base)
+        if debug_info.get("rollup_rewrites"):
+            for rewrite in debug_info["rollup_rewrites"]:
+                st.markdown(f"**Rollup:** `{rewrite['rollup']}` ({rewrite['rollup_rows']:,} linhas)")
+
 
         # Show JSON Filter Structure from processed response
         st.markdown("### 🎯 Filtros JSON Detectados")
@@ -729,6 +825,11 @@ def _render_debug_info(debug_info, message_context=None):
         if "response_time" in debug_info:
             st.markdown(f"### ⏱️ Tempo de Resposta: {debug_info['response_time']:.2f}s")
 
+        # Tempo total por etapa do turno (spans com o mesmo nome somados)
+        if debug_info.get("trace"):
+            for name, total in span_totals(debug_info["trace"]["spans"]).items():
+                st.markdown(f"- `{name}`: {total:,.1f} ms")
+
 
 def _split_title_and_content(response_content: str) -> tuple:
     """
@@ -1100,8 +1201,8 @@ def _extract_and_replace_tables(response_content: str, has_visualization: bool)
 
 def _get_filtered_record_count(df, filter_context):
     """
-    Conta registros filtrados aplicando os filtros ativos ao DataFrame usando pandas
-    Versão simplificada e robusta que evita problemas de tipos SQL
+    Conta registros filtrados aplicando os filtros ativos ao dataset
+    Delegado ao índice de contagem compartilhado (sem cópias do DataFrame)
 
     Args:
         df: DataFrame com todos os dados
@@ -1111,93 +1212,7 @@ def _get_filtered_record_count(df, filter_context):
         int: Contagem de registros filtrados ou None se houver erro
     """
     try:
-        # Começar com todos os registros
-        filtered_df = df.copy()
-
-        # Aplicar filtros temporais
-        if 'Data_>=' in filter_context and filter_context['Data_>=']:
-            filtered_df = filtered_df[filtered_df['Data'] >= filter_context['Data_>=']]
-        if 'Data_<' in filter_context and filter_context['Data_<']:
-            filtered_df = filtered_df[filtered_df['Data'] < filter_context['Data_<']]
-        if 'Data' in filter_context and filter_context['Data']:
-            filtered_df = filtered_df[filtered_df['Data'] == filter_context['Data']]
-
-        # Aplicar filtros de região
-        if 'UF_Cliente' in filter_context and filter_context['UF_Cliente']:
-            uf_values = filter_context['UF_Cliente']
-            if isinstance(uf_values, list):
-                filtered_df = filtered_df[filtered_df['UF_Cliente'].str.upper().isin([str(v).upper() for v in uf_values])]
-            else:
-                filtered_df = filtered_df[filtered_df['UF_Cliente'].str.upper() == str(uf_values).upper()]
-
-        if 'Municipio_Cliente' in filter_context and filter_context['Municipio_Cliente']:
-            mun_values = filter_context['Municipio_Cliente']
-            if isinstance(mun_values, list):
-                filtered_df = filtered_df[filtered_df['Municipio_Cliente'].str.upper().isin([str(v).upper() for v in mun_values])]
-            else:
-                filtered_df = filtered_df[filtered_df['Municipio_Cliente'].str.upper() == str(mun_values).upper()]
-
-        # Aplicar filtros de cliente
-        if 'Cod_Cliente' in filter_context and filter_context['Cod_Cliente']:
-            cod_values = filter_context['Cod_Cliente']
-            if isinstance(cod_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Cliente'].isin(cod_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Cliente'] == cod_values]
-
-        if 'Cod_Segmento_Cliente' in filter_context and filter_context['Cod_Segmento_Cliente']:
-            seg_values = filter_context['Cod_Segmento_Cliente']
-            if isinstance(seg_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Segmento_Cliente'].isin(seg_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Segmento_Cliente'] == seg_values]
-
-        # Aplicar filtros de produto
-        if 'Cod_Familia_Produto' in filter_context and filter_context['Cod_Familia_Produto']:
-            fam_values = filter_context['Cod_Familia_Produto']
-            if isinstance(fam_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Familia_Produto'].isin(fam_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Familia_Produto'] == fam_values]
-
-        if 'Cod_Grupo_Produto' in filter_context and filter_context['Cod_Grupo_Produto']:
-            grp_values = filter_context['Cod_Grupo_Produto']
-            if isinstance(grp_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Grupo_Produto'].isin(grp_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Grupo_Produto'] == grp_values]
-
-        if 'Cod_Linha_Produto' in filter_context and filter_context['Cod_Linha_Produto']:
-            lin_values = filter_context['Cod_Linha_Produto']
-            if isinstance(lin_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Linha_Produto'].isin(lin_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Linha_Produto'] == lin_values]
-
-        if 'Des_Linha_Produto' in filter_context and filter_context['Des_Linha_Produto']:
-            des_values = filter_context['Des_Linha_Produto']
-            if isinstance(des_values, list):
-                filtered_df = filtered_df[filtered_df['Des_Linha_Produto'].str.upper().isin([str(v).upper() for v in des_values])]
-            else:
-                filtered_df = filtered_df[filtered_df['Des_Linha_Produto'].str.upper() == str(des_values).upper()]
-
-        # Aplicar filtros de representante
-        if 'Cod_Vendedor' in filter_context and filter_context['Cod_Vendedor']:
-            vend_values = filter_context['Cod_Vendedor']
-            if isinstance(vend_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Vendedor'].isin(vend_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Vendedor'] == vend_values]
-
-        if 'Cod_Regiao_Vendedor' in filter_context and filter_context['Cod_Regiao_Vendedor']:
-            reg_values = filter_context['Cod_Regiao_Vendedor']
-            if isinstance(reg_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Regiao_Vendedor'].isin(reg_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Regiao_Vendedor'] == reg_values]
-
-        # Retornar contagem
-        return len(filtered_df)
+        return count_filtered_records(df, filter_context)
 
     except Exception as e:
         # Em caso de erro, retornar None silenciosamente
@@ -1223,6 +1238,11 @@ def _handle_user_input(prompt, agent):
     # Reset do flag de rerun para permitir nova atualização
     st.session_state.rerun_triggered = False
 
+    # Run de um turno interrompido (ex: nova pergunta durante o streaming) ainda usa o agente
+    if is_run_active(agent):
+        with st.spinner("⏳ Finalizando a resposta anterior..."):
+            wait_for_previous_run(agent)
+
     # CORREÇÃO: Sincronizar contexto antes de processar
     context_restored = _sincronizar_contexto_agente(agent)
     if context_restored and st.session_state.get('debug_mode', False):
@@ -1235,10 +1255,14 @@ def _handle_user_input(prompt, agent):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Process agent response
-    with st.chat_message("assistant"):
-        with st.spinner("🤖 Analisando..."):
+    # Process agent response (um trace por turno: ver utils.tracing)
+    # Com streaming, a resposta parcial e o progresso das ferramentas substituem o spinner
+    streaming = RESPONSE_STREAMING_CONFIG["enabled"]
+    with st.chat_message("assistant"), start_trace("chat_turn", prompt_chars=len(prompt),
+                                                   streaming=streaming) as turn_trace:
+        with nullcontext() if streaming else st.spinner("🤖 Analisando..."):
             start_time = time.time()
+            stream_areas = None
 
             # CORREÇÃO: Pré-processamento desabilitado para evitar falsos positivos
             # O sistema usa extração via SQL (sql_filter_extractor.py) que é mais precisa
@@ -1286,7 +1310,12 @@ def _handle_user_input(prompt, agent):
                     agent.clear_execution_state()
 
                 # Get agent response
-                response = agent.run(prompt)
+                if streaming:
+                    response, stream_areas = _run_agent_streaming(
+                        agent, prompt, RESPONSE_STREAMING_CONFIG["poll_seconds"])
+                else:
+                    with span("agent.run"):
+                        response = agent.run(prompt)
                 response_time = time.time() - start_time
 
                 # Process response content
@@ -1322,9 +1351,10 @@ def _handle_user_input(prompt, agent):
                             sql_queries = debug_info.get('sql_queries', [])
                             if sql_queries:
                                 # Extrair filtros das queries SQL
-                                updated_context_temp, filter_changes = processar_filtros_apenas_sql(
-                                    sql_queries, {}, df_dataset
-                                )
+                                with span("filters.extract", queries=len(sql_queries)):
+                                    updated_context_temp, filter_changes = processar_filtros_apenas_sql(
+                                        sql_queries, {}, df_dataset
+                                    )
                                 # Salvar resultado para uso posterior
                                 debug_info['extracted_filters'] = updated_context_temp
                                 debug_info['filter_changes'] = filter_changes
@@ -1365,9 +1395,10 @@ def _handle_user_input(prompt, agent):
 
                             # APLICAR SUBSTITUIÇÃO INTELIGENTE ao invés de merge simples
                             from src.filters.core.replacer import apply_smart_filter_replacement
-                            updated_context, filter_changes = apply_smart_filter_replacement(
-                                context, extracted_context
-                            )
+                            with span("filters.replace"):
+                                updated_context, filter_changes = apply_smart_filter_replacement(
+                                    context, extracted_context
+                                )
                         else:
                             # Fallback: nenhum filtro foi extraído
                             updated_context = context
@@ -1459,7 +1490,8 @@ def _handle_user_input(prompt, agent):
                                     if len(df_result) <= max_rows:
                                         # Passar a query SQL para permitir mapeamento de aliases
                                         last_query = getattr(tool, 'last_query', None)
-                                        visualization_data = _prepare_visualization_data(df_result, is_likely_temporal, prompt, last_query=last_query)
+                                        with span("visualization.prepare", rows=len(df_result)):
+                                            visualization_data = _prepare_visualization_data(df_result, is_likely_temporal, prompt, last_query=last_query)
 
                                         if visualization_data:
                                             # Log em modo debug
@@ -1475,6 +1507,12 @@ def _handle_user_input(prompt, agent):
                                             st.warning(f"Muitas linhas para visualização: {len(df_result)} > {max_rows}")
                                 break
 
+                # Gráfico já exibido durante o streaming: é o mesmo que a Fase 2 priorizaria
+                # e permanece no lugar (renderizar de novo duplicaria o elemento)
+                streamed_chart = stream_areas['visualization'] if stream_areas else None
+                if streamed_chart is not None:
+                    visualization_data = streamed_chart
+
                 # SUBSTITUIÇÃO AUTOMÁTICA DE TABELAS POR GRÁFICOS
                 # Remove tabelas markdown quando há visualização disponível
                 # VALIDAÇÃO COMPLETA antes de remover placeholder
@@ -1488,30 +1526,45 @@ def _handle_user_input(prompt, agent):
 
                     # Renderizar: Título → Contexto → Gráfico → Insights/Próximos Passos
                     # CORREÇÃO: Escapar símbolos de moeda antes de renderizar
-                    if title_part:
-                        st.markdown(escape_currency_for_markdown(title_part))
-                    if context_part:
-                        st.markdown(escape_currency_for_markdown(context_part))
+                    with _stream_area(stream_areas, 'head'):
+                        if title_part:
+                            st.markdown(escape_currency_for_markdown(title_part))
+                        if context_part:
+                            st.markdown(escape_currency_for_markdown(context_part))
 
                     # Tentar renderizar gráfico e capturar erro
-                    success, error_msg = render_plotly_visualization(visualization_data)
-                    if not success:
-                        # Se falhou, exibir mensagem em debug mode
-                        if st.session_state.get('debug_mode', False):
-                            st.error(f"Falha na renderização do gráfico: {error_msg}")
-                        # Exibir mensagem amigável ao usuário
-                        st.info("📊 Visualização não disponível para este conjunto de dados")
+                    if streamed_chart is None:
+                        with _stream_area(stream_areas, 'chart'):
+                            with span("visualization.render"):
+                                success, error_msg = render_plotly_visualization(visualization_data)
+                            if not success:
+                                # Se falhou, exibir mensagem em debug mode
+                                if st.session_state.get('debug_mode', False):
+                                    st.error(f"Falha na renderização do gráfico: {error_msg}")
+                                # Exibir mensagem amigável ao usuário
+                                st.info("📊 Visualização não disponível para este conjunto de dados")
 
-                    if insights_part:
-                        st.markdown(escape_currency_for_markdown(insights_part))
+                    with _stream_area(stream_areas, 'tail'):
+                        if insights_part:
+                            st.markdown(escape_currency_for_markdown(insights_part))
                 else:
                     # Sem visualização: renderizar conteúdo normalmente
                     # CORREÇÃO: Escapar símbolos de moeda antes de renderizar
-                    st.markdown(escape_currency_for_markdown(response_content))
+                    with _stream_area(stream_areas, 'head'):
+                        st.markdown(escape_currency_for_markdown(response_content))
 
                 # Display response time
                 st.markdown(f"⏱️ *Tempo de resposta: {response_time:.2f}s*")
 
+                # Trace do turno (até aqui: a renderização do debug não entra na medida)
+                if debug_info.get("parallel_queries"):
+                    turn_trace.attributes['parallel_saved_ms'] = round(
+                        sum(batch['saved_ms'] for batch in debug_info["parallel_queries"]), 3)
+                turn_trace.duration_ms = round(turn_trace.elapsed_ms(), 3)
+                debug_info["trace"] = turn_trace.to_dict()
+                st.session_state.last_trace = debug_info["trace"]
+                export_trace(turn_trace)
+
                 # Store message with all metadata
                 assistant_message = {
                     "role": "assistant",
@@ -1551,15 +1604,87 @@ def _handle_user_input(prompt, agent):
             except Exception as e:
                 error_msg = f" **Erro:** {str(e)}"
                 st.error(error_msg)
+                turn_trace.attributes['error'] = type(e).__name__
+                turn_trace.duration_ms = round(turn_trace.elapsed_ms(), 3)
+                export_trace(turn_trace)
                 st.session_state.messages.append({
                     "role": "assistant",
                     "content": error_msg,
                     "context": {},
-                    "debug_info": {"error": str(e), "response_time": time.time() - start_time}
+                    "debug_info": {"error": str(e), "response_time": time.time() - start_time,
+                                   "trace": turn_trace.to_dict()}
                 })
 
 
 
+def _run_agent_streaming(agent, prompt: str, poll_seconds: float):
+    """
+    Executa o agente em segundo plano exibindo a resposta parcial no chat.
+
+    Enquanto o run avança, o texto gerado aparece incrementalmente, cada ferramenta
+    mostra seu progresso ("Executando SQL…") com o tempo decorrido e o gráfico de
+    create_chart_from_last_query é exibido assim que a ferramenta termina, antes
+    dos insights.
+
+    Args:
+        agent: Agente do chat
+        prompt: Pergunta do usuário
+        poll_seconds: Intervalo de atualização do indicador de progresso
+
+    Returns:
+        tuple: (RunOutput, áreas) - áreas contém os placeholders 'head' (título/
+        contexto), 'chart' e 'tail' (insights) para a renderização final, na mesma
+        ordem Título → Contexto → Gráfico → Insights, e 'visualization' (gráfico já
+        exibido durante o run ou None)
+    """
+    status_area = st.empty()
+    areas = {'head': st.empty(), 'chart': st.empty(), 'tail': st.empty(), 'visualization': None}
+
+    run = BackgroundRun(agent, prompt).start()
+    partial = ""
+    current_tool = None
+    status_area.caption("🤖 Analisando...")
+    try:
+        for update in run.updates(poll_seconds):
+            if update is None or update.kind == UPDATE_TOOL_STARTED:
+                if update is not None:
+                    current_tool = update.text
+                status_area.caption(f"🤖 {current_tool or 'Analisando...'} ({run.elapsed_seconds():.0f}s)")
+            elif update.kind == UPDATE_TOKEN:
+                partial += update.text
+                areas['head'].markdown(escape_currency_for_markdown(partial) + "▌")
+            elif update.kind == UPDATE_TOOL_COMPLETED:
+                current_tool = None
+                if update.tool_name == CHART_TOOL and areas['visualization'] is None:
+                    _render_streamed_chart(update.visualization, areas)
+            elif update.kind == UPDATE_DONE:
+                status_area.empty()
+                return update.response, areas
+    except BaseException:
+        # Resposta parcial não fica na tela junto da mensagem de erro
+        status_area.empty()
+        areas['head'].empty()
+        raise
+
+
+def _render_streamed_chart(visualization, areas):
+    """Exibe no placeholder do gráfico a visualização criada pelo agente durante o run (vinda do StreamUpdate)"""
+    if not visualization or not _is_visualization_renderable(visualization):
+        return
+    with areas['chart'].container():
+        with span("visualization.render", streamed=True):
+            success, _ = render_plotly_visualization(visualization)
+    if success:
+        areas['visualization'] = visualization
+    else:
+        areas['chart'].empty()
+
+
+def _stream_area(stream_areas, name):
+    """Container do placeholder de streaming (ou o fluxo normal da mensagem sem streaming)"""
+    return stream_areas[name].container() if stream_areas else nullcontext()
+
+
 def _is_temporal_analysis(df_result, user_prompt):
     """
     Detecta se a análise é temporal baseado nos dados e na pergunta do usuário.
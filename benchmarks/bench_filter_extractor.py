@@ -0,0 +1,77 @@
+"""
+Benchmark - Extração de filtros do SQL (SQLFilterExtractor)
+
+Reproduz um log de SQL do agente (uma query por linha, em ordem de sessão/turno)
+como processar_filtros_apenas_sql faz a cada turno e compara:
+- sem cache: cache de extrações limpo antes de cada query (apenas padrões pré-compilados)
+- com LRU: cache de extrações compartilhado, como em produção
+Os dois modos devem produzir exatamente os mesmos filtros.
+
+Uso:
+    python benchmarks/bench_filter_extractor.py
+    python benchmarks/bench_filter_extractor.py --corpus benchmarks/corpus/agent_queries.jsonl --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from filters.core.extractor import SQLFilterExtractor, clear_extraction_cache, get_extraction_cache_stats
+
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'corpus', 'agent_queries.jsonl')
+
+
+def carregar_turnos(path: str) -> list:
+    """Lê o log de queries (JSONL com 'session', 'turn' e 'sql') agrupando as queries por turno"""
+    turnos = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                registro = json.loads(line)
+                turnos[(registro.get('session'), registro.get('turn'))].append(registro['sql'])
+    return list(turnos.values())
+
+
+def executar(turnos: list, repeat: int, usar_cache: bool) -> tuple:
+    """Extrai os filtros de todos os turnos `repeat` vezes e retorna (segundos, resultados)"""
+    extractor = SQLFilterExtractor()
+    clear_extraction_cache()
+    resultados = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for queries in turnos:
+            if not usar_cache:
+                clear_extraction_cache()
+            resultados.append(extractor.extract_filters_from_multiple_queries(queries))
+    return time.perf_counter() - start, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', type=str, default=DEFAULT_CORPUS, help='Log JSONL de SQL do agente')
+    parser.add_argument('--repeat', type=int, default=20, help='Repetições do log completo')
+    args = parser.parse_args()
+
+    turnos = carregar_turnos(args.corpus)
+    total = sum(len(queries) for queries in turnos) * args.repeat
+
+    t_frio, resultados_frio = executar(turnos, args.repeat, usar_cache=False)
+    t_quente, resultados_quente = executar(turnos, args.repeat, usar_cache=True)
+    stats = get_extraction_cache_stats()
+
+    print(f"Turnos: {len(turnos)} | extrações: {total}")
+    print(f"{'modo':<12}{'total (ms)':>12}{'custo/query (µs)':>20}")
+    print(f"{'sem cache':<12}{t_frio * 1000:>12.1f}{t_frio / total * 1e6:>20.1f}")
+    print(f"{'com LRU':<12}{t_quente * 1000:>12.1f}{t_quente / total * 1e6:>20.1f}")
+    print(f"Speedup: {t_frio / t_quente:.1f}x | cache: {stats}")
+    print(f"Resultados idênticos: {'OK' if resultados_frio == resultados_quente else 'DIVERGÊNCIA'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark - Fingerprint semântico de SQL vs chave por texto (espaços colapsados)
+
+Reproduz um log de SQL do agente (uma query por linha, em ordem de sessão/turno)
+e compara a taxa de acerto do cache de resultados com cada estratégia de chave.
+Com --verify, executa as queries sobre um dataset sintético e confirma que
+queries com o mesmo fingerprint retornam exatamente o mesmo resultado.
+
+Uso:
+    python benchmarks/bench_query_fingerprint.py
+    python benchmarks/bench_query_fingerprint.py --corpus benchmarks/corpus/agent_queries.jsonl --verify
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.query_fingerprint import fingerprint_sql, get_fingerprint_stats
+
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'corpus', 'agent_queries.jsonl')
+
+
+def chave_texto(query: str) -> str:
+    """Chave anterior do SQLResultCache: apenas espaços colapsados"""
+    return hashlib.md5(" ".join(query.split()).encode()).hexdigest()
+
+
+def carregar_corpus(path: str) -> list:
+    """Lê o log de queries (JSONL com campo 'sql')"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line)['sql'] for line in f if line.strip()]
+
+
+def simular_cache(keys: list, max_size: int) -> int:
+    """Simula um cache LRU e retorna o número de acertos"""
+    cache = OrderedDict()
+    hits = 0
+    for key in keys:
+        if key in cache:
+            cache.move_to_end(key)
+            hits += 1
+            continue
+        cache[key] = True
+        if len(cache) > max_size:
+            cache.popitem(last=False)
+    return hits
+
+
+def criar_dataset_sintetico(conn, rows: int):
+    """Tabela dados_comerciais sintética com o mesmo schema do dataset real"""
+    conn.execute(f"""
+        CREATE TABLE dados_comerciais AS
+        SELECT
+            DATE '2023-01-01' + (i % 900)::INTEGER AS Data,
+            ['SC', 'PR', 'RS', 'SP'][1 + (i % 4)::INTEGER] AS UF_Cliente,
+            ['Joinville', 'Curitiba', 'Porto Alegre', 'Blumenau', 'Itajaí'][1 + (i % 5)::INTEGER] AS Municipio_Cliente,
+            ['Linha A', 'Linha B', 'Linha C'][1 + (i % 3)::INTEGER] AS Des_Linha_Produto,
+            (i % 37)::VARCHAR AS Cod_Cliente,
+            (i % 11)::VARCHAR AS Cod_Vendedor,
+            (i % 4)::VARCHAR AS Cod_Regiao_Vendedor,
+            (i % 6)::VARCHAR AS Cod_Segmento_Cliente,
+            (i % 9)::VARCHAR AS Cod_Familia_Produto,
+            (i % 7)::VARCHAR AS Cod_Linha_Produto,
+            ((i * 7919) % 1000) / 10.0 AS Valor_Vendido,
+            (i % 13)::DOUBLE AS Qtd_Vendida,
+            ((i * 31) % 500) / 100.0 AS Peso_Vendido
+        FROM range({rows}) r(i)
+    """)
+
+
+def verificar_equivalencia(queries: list, rows: int) -> int:
+    """Executa as queries e conta grupos de mesmo fingerprint com resultados divergentes"""
+    conn = duckdb.connect()
+    criar_dataset_sintetico(conn, rows)
+
+    resultados = {}
+    divergencias = 0
+    for query in queries:
+        try:
+            rows_result = conn.execute(query).fetchall()
+        except duckdb.Error:
+            continue
+        key = fingerprint_sql(query)
+        if key in resultados and resultados[key][1] != rows_result:
+            divergencias += 1
+            print(f"  DIVERGÊNCIA:\n    {resultados[key][0]}\n    {query}")
+        resultados.setdefault(key, (query, rows_result))
+    return divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', type=str, default=DEFAULT_CORPUS, help='Log JSONL de SQL do agente')
+    parser.add_argument('--cache-size', type=int, default=50, help='Entradas do cache LRU simulado')
+    parser.add_argument('--verify', action='store_true', help='Validar equivalência executando as queries')
+    parser.add_argument('--rows', type=int, default=50_000, help='Linhas do dataset sintético (--verify)')
+    args = parser.parse_args()
+
+    queries = carregar_corpus(args.corpus)
+
+    start = time.perf_counter()
+    text_keys = [chave_texto(q) for q in queries]
+    t_text = time.perf_counter() - start
+
+    fingerprint_sql.cache_clear()
+    start = time.perf_counter()
+    semantic_keys = [fingerprint_sql(q) for q in queries]
+    t_semantic = time.perf_counter() - start
+
+    hits_text = simular_cache(text_keys, args.cache_size)
+    hits_semantic = simular_cache(semantic_keys, args.cache_size)
+    total = len(queries)
+
+    print(f"Queries: {total} | chaves distintas: texto={len(set(text_keys))} fingerprint={len(set(semantic_keys))}")
+    print(f"{'estratégia':<14}{'acertos':>10}{'hit rate':>12}{'custo/query (ms)':>20}")
+    print(f"{'texto':<14}{hits_text:>10}{hits_text / total:>11.1%}{t_text / total * 1000:>20.3f}")
+    print(f"{'fingerprint':<14}{hits_semantic:>10}{hits_semantic / total:>11.1%}{t_semantic / total * 1000:>20.3f}")
+    print(f"Ganho de hit rate: {(hits_semantic - hits_text) / total:+.1%} | {get_fingerprint_stats()}")
+
+    if args.verify:
+        divergencias = verificar_equivalencia(queries, args.rows)
+        print(f"Verificação de equivalência: {'OK' if divergencias == 0 else f'{divergencias} divergência(s)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Benchmark - Replay de turnos do agente com modelo determinístico (sem rede)
+
+Reproduz turnos gravados (pergunta + sequência de chamadas de ferramentas:
+run_query, create_chart_from_last_query) pelo PrincipalAgent com as ferramentas
+reais (DebugDuckDbTools sobre o banco compartilhado, VisualizationTools) contra
+um parquet sintético de tamanho configurável. O modelo é substituído por
+ReplayModel, que devolve as chamadas gravadas uma a uma e depois uma resposta
+fixa, então o tempo medido é só o do pipeline local. Um passo gravado como lista
+de chamadas é devolvido em uma única resposta (queries paralelas, ver
+utils.parallel_queries).
+
+Cada turno roda dentro de um trace (utils.tracing), com as mesmas etapas de
+pós-processamento de app._handle_user_input (extração e substituição de filtros).
+Relata p50/p95 por etapa e o pico de RSS; --output grava o resultado em JSON e
+--baseline compara o p95 com uma execução anterior.
+
+Uso:
+    python benchmarks/bench_replay_turns.py --rows 1000000
+    python benchmarks/bench_replay_turns.py --parquet data/raw/DadosComercial_resumido_v02.parquet --repeat 3
+    python benchmarks/bench_replay_turns.py --output release.json --baseline anterior.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Mesmos caminhos do app: src/ (imports utils.*) e a raiz (imports src.* dentro das ferramentas)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from agno.db.in_memory import InMemoryDb
+from agno.models.base import Model
+from agno.models.response import ModelResponse
+from agno.tools.duckdb import DuckDbTools
+
+from config.model_config import DATA_CONFIG
+from text_normalizer import TextNormalizer, load_alias_mapping
+from chatbot_agents import PrincipalAgent
+from tools.visualization_tools import VisualizationTools
+from filters.core.manager import processar_filtros_apenas_sql
+from filters.core.replacer import apply_smart_filter_replacement
+from utils.dataset_registry import DatasetRegistry, get_process_memory_mb
+from utils.duckdb_pool import DuckDBPool
+from utils.parallel_queries import ParallelToolCallsMixin
+from utils.tracing import start_trace, span, trace_tool_call
+from synthetic_dataset import escrever_parquet
+
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'corpus', 'agent_turns.jsonl')
+FINAL_ANSWER = "## Análise\n\nResposta gerada pelo modelo de replay."
+
+
+@dataclass
+class ReplayModel(ParallelToolCallsMixin, Model):
+    """Modelo determinístico: devolve os passos gravados do turno (uma ou mais chamadas), um por vez"""
+
+    id: str = "replay"
+    name: str = "ReplayModel"
+    provider: str = "Replay"
+    pending: List[Dict[str, Any]] = field(default_factory=list)
+    calls: int = 0
+
+    def load_turn(self, tool_calls: List[Dict[str, Any]]):
+        self.pending = list(tool_calls)
+
+    def invoke(self, *args, **kwargs) -> ModelResponse:
+        with span("llm.invoke", model=self.id):
+            self.calls += 1
+            if not self.pending:
+                return ModelResponse(role="assistant", content=FINAL_ANSWER)
+            step = self.pending.pop(0)
+            calls = step if isinstance(step, list) else [step]
+            return ModelResponse(role="assistant", tool_calls=[{
+                'id': f"call_{self.calls}_{i}",
+                'type': 'function',
+                'function': {'name': call['name'], 'arguments': json.dumps(call['arguments'], ensure_ascii=False)},
+            } for i, call in enumerate(calls)])
+
+    def invoke_stream(self, *args, **kwargs):
+        yield self.invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs) -> ModelResponse:
+        return self.invoke(*args, **kwargs)
+
+    async def ainvoke_stream(self, *args, **kwargs):
+        yield self.invoke(*args, **kwargs)
+
+    def _parse_provider_response(self, response, **kwargs):
+        return response
+
+    def _parse_provider_response_delta(self, response):
+        return response
+
+
+def carregar_sessoes(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Lê os turnos gravados (JSONL com 'session', 'turn', 'prompt' e 'tool_calls') agrupados por sessão"""
+    sessoes = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                registro = json.loads(line)
+                sessoes[registro['session']].append(registro)
+    for turnos in sessoes.values():
+        turnos.sort(key=lambda t: t['turn'])
+    return dict(sessoes)
+
+
+def preparar_ambiente(data_path: str, workdir: str) -> Dict[str, Any]:
+    """Carrega o dataset compartilhado e o banco DuckDB como no startup do app, medindo cada etapa"""
+    DATA_CONFIG['artifact_cache_dir'] = os.path.join(workdir, 'artifacts')
+    startup = {}
+
+    start = time.perf_counter()
+    registry = DatasetRegistry(data_path)
+    df = None if registry.streaming else registry.get_view()
+    startup['parquet_ms'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    artifacts = registry.get_artifacts()
+    df_normalized = registry.get_normalized_view()
+    startup['artifacts_ms'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    pool = DuckDBPool(data_path, os.path.join(workdir, 'dados.duckdb'), streaming=registry.streaming)
+    pool.initialize()
+    startup['duckdb_ms'] = (time.perf_counter() - start) * 1000
+
+    return {'df': df, 'summary': registry.get_summary(), 'artifacts': artifacts,
+            'df_normalized': df_normalized, 'pool': pool, 'startup': startup}
+
+
+def criar_agente(ambiente: Dict[str, Any], model: ReplayModel) -> PrincipalAgent:
+    """PrincipalAgent com as ferramentas reais de dados e o modelo de replay (sem knowledge/OpenAI)"""
+    normalizer = TextNormalizer()
+    ambiente['artifacts'].apply_dataset_context(normalizer)
+    agent = PrincipalAgent(
+        normalizer=normalizer,
+        alias_mapping=load_alias_mapping(),
+        df_normalized=ambiente['df_normalized'],
+        text_columns=ambiente['artifacts'].text_columns,
+        session_user_id="bench",
+        db=InMemoryDb(),
+        model=model,
+        tools=[DuckDbTools(connection=ambiente['pool'].cursor()), VisualizationTools()],
+        tool_hooks=[trace_tool_call],
+        markdown=True,
+    )
+    for tool in agent.tools:
+        if isinstance(tool, VisualizationTools):
+            tool.debug_info_ref = agent
+    return agent
+
+
+def executar_turno(agent: PrincipalAgent, model: ReplayModel, turno: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa um turno como app._handle_user_input (sem Streamlit) e retorna o trace"""
+    model.load_turn(turno['tool_calls'])
+    with start_trace("chat_turn", session=turno['session'], turn=turno['turn']) as trace:
+        with span("agent.run"):
+            agent.run(turno['prompt'])
+
+        debug_info = dict(agent.debug_info)
+        sql_queries = debug_info.get('sql_queries', [])
+        if sql_queries:
+            with span("filters.extract", queries=len(sql_queries)):
+                extracted, _ = processar_filtros_apenas_sql(sql_queries, {}, agent.df_normalized)
+            with span("filters.replace"):
+                context, _ = apply_smart_filter_replacement(agent.persistent_context.copy(), extracted)
+            agent.update_persistent_context(context)
+        agent.debug_info.clear()
+    return trace.to_dict()
+
+
+def resumir(traces: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """p50/p95 (ms) por etapa: tempo somado de cada nome de span por turno"""
+    por_etapa = defaultdict(list)
+    for trace in traces:
+        por_turno = defaultdict(float)
+        for record in trace['spans']:
+            por_turno[record['name']] += record['duration_ms'] or 0.0
+        por_turno['turn'] = trace['duration_ms']
+        for name, total in por_turno.items():
+            por_etapa[name].append(total)
+
+    return {
+        name: {
+            'turns': len(values),
+            'p50_ms': round(float(np.percentile(values, 50)), 3),
+            'p95_ms': round(float(np.percentile(values, 95)), 3),
+        }
+        for name, values in sorted(por_etapa.items())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Linhas do dataset sintético')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do dataset sintético')
+    parser.add_argument('--parquet', type=str, default=None, help='Usar um parquet existente em vez do sintético')
+    parser.add_argument('--corpus', type=str, default=DEFAULT_CORPUS, help='Turnos gravados (JSONL)')
+    parser.add_argument('--repeat', type=int, default=1, help='Repetições do corpus completo')
+    parser.add_argument('--workdir', type=str, default=None, help='Diretório de trabalho (padrão: temporário)')
+    parser.add_argument('--output', type=str, default=None, help='Gravar o resultado em JSON')
+    parser.add_argument('--baseline', type=str, default=None, help='Resultado JSON anterior para comparar o p95')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_replay_')
+    data_path = args.parquet
+    if data_path is None:
+        data_path = os.path.join(workdir, 'dados_sinteticos.parquet')
+        seconds = escrever_parquet(data_path, args.rows, args.seed)
+        print(f"Dataset sintético: {args.rows:,} linhas em {seconds:.1f}s ({data_path})")
+
+    ambiente = preparar_ambiente(data_path, workdir)
+    sessoes = carregar_sessoes(args.corpus)
+
+    traces = []
+    for _ in range(args.repeat):
+        for turnos in sessoes.values():
+            model = ReplayModel()
+            agent = criar_agente(ambiente, model)
+            for turno in turnos:
+                traces.append(executar_turno(agent, model, turno))
+
+    etapas = resumir(traces)
+    memoria = get_process_memory_mb()
+    # Tempo de parede economizado pelos lotes de queries paralelas (ver utils.parallel_queries)
+    lotes = [record['attributes'] for trace in traces for record in trace['spans']
+             if record['name'] == 'duckdb.parallel_batch']
+    resultado = {
+        'rows': ambiente['summary']['rows'],
+        'ingestion': ambiente['summary']['ingestion_mode'],
+        'turns': len(traces),
+        'startup_ms': {k: round(v, 1) for k, v in ambiente['startup'].items()},
+        'stages': etapas,
+        'peak_rss_mb': memoria['peak_rss_mb'],
+        'parallel_batches': len(lotes),
+        'parallel_saved_ms': round(sum(lote.get('saved_ms', 0.0) for lote in lotes), 3),
+    }
+
+    print(f"Linhas: {resultado['rows']:,} | turnos: {resultado['turns']} | sessões: {len(sessoes)} x {args.repeat}")
+    print("Startup: " + ", ".join(f"{k} {v:,.0f}" for k, v in resultado['startup_ms'].items()))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['stages']
+
+    header = f"{'etapa':<34}{'turnos':>8}{'p50 (ms)':>12}{'p95 (ms)':>12}"
+    print(header + (f"{'Δp95':>10}" if baseline else ""))
+    for name, stats in etapas.items():
+        linha = f"{name:<34}{stats['turns']:>8}{stats['p50_ms']:>12.2f}{stats['p95_ms']:>12.2f}"
+        if baseline and name in baseline and baseline[name]['p95_ms'] > 0:
+            linha += f"{(stats['p95_ms'] / baseline[name]['p95_ms'] - 1) * 100:>+9.0f}%"
+        print(linha)
+    print(f"Pico de RSS: {resultado['peak_rss_mb']} MB")
+    if lotes:
+        print(f"Queries paralelas: {len(lotes)} lote(s), {resultado['parallel_saved_ms']:,.1f} ms economizados")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"Resultado gravado em {args.output}")
+
+    ambiente['pool'].close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark - Escala do pipeline de dados de 1M a 50M linhas
+
+Para cada tamanho, gera (ou reaproveita) o parquet sintético de
+synthetic_dataset.py e mede, em um processo separado por escala (para o pico
+de RSS não se misturar):
+  - carga do parquet no DatasetRegistry e construção dos artefatos/visão normalizada
+    (no modo streaming, uma passada em lotes sem materializar o DataFrame)
+  - construção do banco DuckDB compartilhado (tabela, rollups, dicionário de strings)
+  - latência do log de queries do agente via DebugDuckDbTools.run_query
+    (reescritas + rollups, sem cache de resultados) e direto no DuckDB
+  - RSS após a carga e pico de RSS
+
+A tabela final mostra também o fator de crescimento em relação à menor escala.
+
+Uso:
+    python benchmarks/bench_scaling.py
+    python benchmarks/bench_scaling.py --scales 1m,5m --repeat 5 --output escala.json
+    python benchmarks/bench_scaling.py --scales 5m --ingestion streaming
+    python benchmarks/bench_scaling.py --scales 50m --row-group-size 500000 --workdir /data/bench
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic_dataset import SCALE_PRESETS, DEFAULT_ROW_GROUP_SIZE, escrever_parquet, parse_rows
+
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'corpus', 'agent_queries.jsonl')
+
+
+def carregar_queries(path: str) -> list:
+    """Lê o log de queries (JSONL com campo 'sql')"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line)['sql'] for line in f if line.strip()]
+
+
+def _percentis(values: list) -> dict:
+    if not values:
+        return {'p50_ms': None, 'p95_ms': None}
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p95_ms': round(float(np.percentile(values, 95)), 2),
+    }
+
+
+def medir_escala(data_path: str, workdir: str, corpus: str, repeat: int, ingestion: str = 'auto') -> dict:
+    """Executado no processo filho: carga, banco e queries sobre um parquet"""
+    import duckdb
+    from config.model_config import DATA_CONFIG
+    from utils.dataset_registry import DatasetRegistry, get_process_memory_mb
+    from utils.duckdb_pool import DuckDBPool
+    from tools.debug_duckdb_tools import DebugDuckDbTools
+
+    # Artefatos e banco sempre reconstruídos: mede o startup a frio em todas as escalas
+    DATA_CONFIG['artifact_cache_dir'] = os.path.join(workdir, 'artifacts')
+    shutil.rmtree(DATA_CONFIG['artifact_cache_dir'], ignore_errors=True)
+    resultado = {'rss_inicial_mb': get_process_memory_mb()['rss_mb']}
+
+    # No modo streaming não há DataFrame: a "carga" é só a leitura dos metadados
+    start = time.perf_counter()
+    registry = DatasetRegistry(data_path, ingestion_mode=ingestion)
+    if not registry.streaming:
+        registry.get_view()
+    resultado['ingestion'] = registry.ingestion_mode
+    resultado['load_s'] = round(time.perf_counter() - start, 2)
+    resultado['rss_load_mb'] = get_process_memory_mb()['rss_mb']
+
+    start = time.perf_counter()
+    registry.get_artifacts()
+    registry.get_normalized_view()
+    rows = registry.get_summary()['rows']
+    resultado['artifacts_s'] = round(time.perf_counter() - start, 2)
+    resultado['artifacts_from_cache'] = registry.get_stats().get('artifacts_from_cache')
+
+    db_path = os.path.join(workdir, 'dados.duckdb')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    start = time.perf_counter()
+    pool = DuckDBPool(data_path, db_path, streaming=registry.streaming)
+    pool.initialize()
+    resultado['duckdb_s'] = round(time.perf_counter() - start, 2)
+    resultado['duckdb_mb'] = round(os.path.getsize(db_path) / (1024 * 1024), 1) if os.path.exists(db_path) else None
+    resultado['rss_pool_mb'] = get_process_memory_mb()['rss_mb']
+
+    queries = carregar_queries(corpus)
+    tool = DebugDuckDbTools(connection=pool.cursor())
+    raw = pool.cursor()
+    latencias_tool, latencias_raw, erros = [], [], 0
+    for query in queries:
+        tempos_tool, tempos_raw = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            resposta = tool.run_query(query)
+            tempos_tool.append((time.perf_counter() - start) * 1000)
+            try:
+                start = time.perf_counter()
+                raw.execute(query).fetch_arrow_table()
+                tempos_raw.append((time.perf_counter() - start) * 1000)
+            except duckdb.Error:
+                pass
+        if isinstance(resposta, str) and resposta.startswith('Error'):
+            erros += 1
+        latencias_tool.append(float(np.median(tempos_tool)))
+        if tempos_raw:
+            latencias_raw.append(float(np.median(tempos_raw)))
+
+    resultado.update({
+        'rows': rows,
+        'queries': len(queries),
+        'query_errors': erros,
+        'run_query': _percentis(latencias_tool),
+        'duckdb_direto': _percentis(latencias_raw),
+        'peak_rss_mb': get_process_memory_mb()['peak_rss_mb'],
+    })
+    pool.close()
+    return resultado
+
+
+def executar_escala(data_path: str, workdir: str, args) -> dict:
+    """Roda medir_escala em um processo novo e lê o JSON da última linha da saída"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', data_path,
+           '--workdir', workdir, '--corpus', args.corpus, '--repeat', str(args.repeat),
+           '--ingestion', args.ingestion]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': (proc.stderr.strip().splitlines() or ['falha'])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def imprimir(resultados: dict):
+    colunas = [
+        ('carga (s)', lambda r: r['load_s']),
+        ('artefatos (s)', lambda r: r['artifacts_s']),
+        ('duckdb (s)', lambda r: r['duckdb_s']),
+        ('RSS carga', lambda r: r['rss_load_mb']),
+        ('RSS pico', lambda r: r['peak_rss_mb']),
+        ('query p50', lambda r: r['run_query']['p50_ms']),
+        ('query p95', lambda r: r['run_query']['p95_ms']),
+        ('direto p95', lambda r: r['duckdb_direto']['p95_ms']),
+    ]
+    print(f"{'escala':<8}{'linhas':>13}" + "".join(f"{nome:>15}" for nome, _ in colunas))
+    base = None
+    for escala, r in resultados.items():
+        if 'error' in r:
+            print(f"{escala:<8}  erro: {r['error']}")
+            continue
+        print(f"{escala:<8}{r['rows']:>13,}" + "".join(f"{fn(r) or 0:>15,.1f}" for _, fn in colunas)
+              + f"  {r['ingestion']}")
+        if base is None:
+            base = r
+        elif base['rows']:
+            fator = r['rows'] / base['rows']
+            crescimento = [(fn(r) or 0) / fn(base) if fn(base) else 0 for _, fn in colunas]
+            print(f"{'':<8}{f'x{fator:.0f}':>13}" + "".join(f"{f'x{c:.1f}':>15}" for c in crescimento))
+    print("(tempos de query em ms, RSS em MB; 'direto' = SQL original sem reescritas/rollups)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=str, default=','.join(SCALE_PRESETS),
+                        help=f"Escalas separadas por vírgula (presets {', '.join(SCALE_PRESETS)} ou número de linhas)")
+    parser.add_argument('--seed', type=int, default=42, help='Semente do dataset sintético')
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE, help='Linhas por row group')
+    parser.add_argument('--corpus', type=str, default=DEFAULT_CORPUS, help='Log de queries (JSONL)')
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções de cada query (mediana)')
+    parser.add_argument('--workdir', type=str, default=None, help='Diretório dos parquets (reaproveitados entre execuções)')
+    parser.add_argument('--output', type=str, default=None, help='Gravar o resultado em JSON')
+    parser.add_argument('--ingestion', type=str, default='auto', choices=['auto', 'memory', 'streaming'],
+                        help='Modo de ingestão (auto = streaming a partir de DATA_CONFIG["streaming_min_rows"])')
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(medir_escala(args.worker, args.workdir, args.corpus, args.repeat, args.ingestion)))
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_scaling_')
+    resultados = {}
+    for escala in [s.strip() for s in args.scales.split(',') if s.strip()]:
+        rows = parse_rows(escala)
+        escala_dir = os.path.join(workdir, f"{rows}_{args.seed}_{args.row_group_size}")
+        data_path = os.path.join(escala_dir, 'dados_sinteticos.parquet')
+        if not os.path.exists(data_path):
+            seconds = escrever_parquet(data_path, rows, args.seed, args.row_group_size)
+            print(f"[{escala}] parquet gerado em {seconds:.1f}s ({os.path.getsize(data_path) / 1024 ** 2:,.0f} MB)")
+        print(f"[{escala}] medindo...", flush=True)
+        resultados[escala] = executar_escala(data_path, escala_dir, args)
+
+    print()
+    imprimir(resultados)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"Resultado gravado em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
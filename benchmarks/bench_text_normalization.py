@@ -0,0 +1,78 @@
+"""
+Benchmark - Normalização de texto: apply(normalize_text) vs normalização por dicionário
+
+Uso:
+    python benchmarks/bench_text_normalization.py --rows 1000000
+    python benchmarks/bench_text_normalization.py --parquet data/raw/DadosComercial_resumido_v02.parquet
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from text_normalizer import TextNormalizer
+
+
+MUNICIPIOS = [
+    'São Paulo', 'Joinville', 'Florianópolis', 'Itajaí', 'Chapecó', 'Curitiba',
+    'Blumenau', 'Criciúma', 'São José', 'Balneário Camboriú', 'Jaraguá do Sul',
+]
+LINHAS = ['Linha Premium', 'LINHA BÁSICA', 'Linha  Econômica', 'Acessórios']
+
+
+def gerar_dataframe(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Gera DataFrame sintético com colunas de texto de baixa cardinalidade"""
+    rng = np.random.default_rng(seed)
+    municipios = [f"{m} {i}" if i else m for i in range(40) for m in MUNICIPIOS]
+    return pd.DataFrame({
+        'Municipio_Cliente': rng.choice(np.array(municipios, dtype=object), rows),
+        'UF_Cliente': rng.choice(np.array(['SC', 'PR', 'SP', 'RS', None], dtype=object), rows),
+        'Des_Linha_Produto': rng.choice(np.array(LINHAS, dtype=object), rows),
+    })
+
+
+def medir(func, *args):
+    """Executa função retornando (resultado, segundos)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Linhas do dataset sintético')
+    parser.add_argument('--parquet', type=str, default=None, help='Usar parquet real em vez de dados sintéticos')
+    args = parser.parse_args()
+
+    normalizer = TextNormalizer()
+    if args.parquet:
+        df = pd.read_parquet(args.parquet)
+        text_columns = normalizer.identify_text_columns(df)
+    else:
+        df = gerar_dataframe(args.rows)
+        text_columns = list(df.columns)
+
+    print(f"Linhas: {len(df):,} | Colunas de texto: {', '.join(text_columns)}")
+    print(f"{'coluna':<22}{'únicos':>10}{'apply (s)':>12}{'dicionário (s)':>16}{'speedup':>10}  igual")
+
+    total_old = total_new = 0.0
+    for col in text_columns:
+        series = df[col]
+        old, t_old = medir(series.apply, normalizer.normalize_text)
+        new, t_new = medir(normalizer.normalize_column, series)
+        identical = old.astype(object).tolist() == new.astype(object).tolist()
+        total_old += t_old
+        total_new += t_new
+        print(f"{col:<22}{series.nunique():>10,}{t_old:>12.3f}{t_new:>16.3f}{t_old / max(t_new, 1e-9):>9.1f}x  {identical}")
+
+    print(f"{'TOTAL':<32}{total_old:>12.3f}{total_new:>16.3f}{total_old / max(total_new, 1e-9):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Dataset sintético com o schema do parquet comercial (dados_comerciais)
+
+Gera um parquet de tamanho configurável para os benchmarks, sem depender do
+arquivo real: as colunas de COLUMN_HIERARCHY com hierarquias coerentes
+(município → UF, produto → família → grupo → linha, vendedor → região), Data
+diária de 2023-01 a 2025-06 (ordenada) e as métricas. Clientes e produtos seguem
+uma distribuição de Zipf (poucos concentram a maior parte das vendas, como no
+dataset real), o que importa para seletividade de filtros e tamanho de rollups.
+
+A geração é feita em lotes gravados com ParquetWriter, então 50M linhas não
+precisam caber em memória; o tamanho do row group é configurável. O resultado é
+determinístico para a mesma semente e o mesmo tamanho de row group.
+
+Uso:
+    python benchmarks/synthetic_dataset.py --rows 1000000 --output /tmp/dados_sinteticos.parquet
+    python benchmarks/synthetic_dataset.py --rows 50m --row-group-size 1000000 --output /tmp/dados_50m.parquet
+"""
+
+import argparse
+import os
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+START_DATE = pd.Timestamp('2023-01-01')
+END_DATE = pd.Timestamp('2025-06-30')
+
+MUNICIPIOS_UF = [
+    ('Joinville', 'SC'), ('Florianópolis', 'SC'), ('Blumenau', 'SC'), ('Itajaí', 'SC'), ('Chapecó', 'SC'),
+    ('Criciúma', 'SC'), ('Balneário Camboriú', 'SC'), ('Jaraguá do Sul', 'SC'), ('São José', 'SC'),
+    ('Curitiba', 'PR'), ('Londrina', 'PR'), ('Maringá', 'PR'), ('Cascavel', 'PR'),
+    ('Porto Alegre', 'RS'), ('Caxias do Sul', 'RS'), ('Pelotas', 'RS'),
+    ('São Paulo', 'SP'), ('Campinas', 'SP'), ('Santos', 'SP'), ('Ribeirão Preto', 'SP'),
+    ('Belo Horizonte', 'MG'), ('Uberlândia', 'MG'), ('Rio de Janeiro', 'RJ'), ('Goiânia', 'GO'),
+]
+LINHAS_PRODUTO = ['LINHA PREMIUM', 'LINHA BÁSICA', 'LINHA ECONÔMICA', 'ACESSÓRIOS', 'REPOSIÇÃO', 'INDUSTRIAL']
+
+# Cardinalidades das dimensões (proporcionais ao dataset real)
+N_CLIENTES = 20_000
+N_SEGMENTOS = 8
+N_PRODUTOS = 2_000
+N_FAMILIAS = 120
+N_GRUPOS = 30
+N_VENDEDORES = 300
+N_REGIOES_VENDEDOR = 12
+
+# Expoente da distribuição de Zipf para clientes e produtos (0 = uniforme)
+ZIPF_EXPONENT = 0.9
+
+# Tamanhos usados nos testes de escala
+SCALE_PRESETS = {
+    '1m': 1_000_000,
+    '5m': 5_000_000,
+    '50m': 50_000_000,
+}
+
+DEFAULT_ROW_GROUP_SIZE = 1_000_000
+# Linhas geradas por lote (arredondado para múltiplo do row group)
+GENERATION_BATCH_ROWS = 2_000_000
+
+
+def parse_rows(value: str) -> int:
+    """Converte '5m' (preset) ou '1000000' no número de linhas"""
+    value = str(value).strip().lower().replace('_', '')
+    if value in SCALE_PRESETS:
+        return SCALE_PRESETS[value]
+    return int(value)
+
+
+def _zipf_cdf(n: int, exponent: float, rng: np.random.Generator) -> tuple:
+    """CDF de Zipf sobre n entidades e a permutação rank → entidade (o mais frequente não é sempre o menor código)"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    return cdf, rng.permutation(n)
+
+
+class _Dimensoes:
+    """Atributos fixos por entidade (cada cliente tem um município e um segmento), iguais em todos os lotes"""
+
+    def __init__(self, seed: int, zipf_exponent: float):
+        rng = np.random.default_rng(seed)
+        self.municipios = np.array([m for m, _ in MUNICIPIOS_UF], dtype=object)
+        self.ufs = np.array([uf for _, uf in MUNICIPIOS_UF], dtype=object)
+        self.linhas = np.array(LINHAS_PRODUTO, dtype=object)
+        self.cliente_municipio = rng.integers(0, len(MUNICIPIOS_UF), N_CLIENTES)
+        self.cliente_segmento = rng.integers(1, N_SEGMENTOS + 1, N_CLIENTES)
+        self.produto_familia = rng.integers(0, N_FAMILIAS, N_PRODUTOS)
+        self.familia_grupo = rng.integers(0, N_GRUPOS, N_FAMILIAS)
+        self.grupo_linha = rng.integers(0, len(LINHAS_PRODUTO), N_GRUPOS)
+        self.vendedor_regiao = rng.integers(1, N_REGIOES_VENDEDOR + 1, N_VENDEDORES)
+        self.preco_produto = np.round(rng.lognormal(3.5, 1.0, N_PRODUTOS), 2)
+        self.peso_produto = np.round(rng.uniform(0.1, 25.0, N_PRODUTOS), 3)
+        self.cliente_cdf, self.cliente_rank = _zipf_cdf(N_CLIENTES, zipf_exponent, rng)
+        self.produto_cdf, self.produto_rank = _zipf_cdf(N_PRODUTOS, zipf_exponent, rng)
+
+
+def _gerar_lote(dims: _Dimensoes, rng: np.random.Generator, rows: int, first_day: int, last_day: int) -> pd.DataFrame:
+    """Gera um lote de vendas com datas ordenadas no intervalo [first_day, last_day]"""
+    cliente = dims.cliente_rank[np.searchsorted(dims.cliente_cdf, rng.random(rows))]
+    produto = dims.produto_rank[np.searchsorted(dims.produto_cdf, rng.random(rows))]
+    vendedor = rng.integers(0, N_VENDEDORES, rows)
+    familia = dims.produto_familia[produto]
+    grupo = dims.familia_grupo[familia]
+    linha = dims.grupo_linha[grupo]
+    quantidade = rng.integers(1, 50, rows)
+
+    return pd.DataFrame({
+        'Data': START_DATE + pd.to_timedelta(np.sort(rng.integers(first_day, last_day + 1, rows)), unit='D'),
+        'Cod_Cliente': cliente + 10_000,
+        'Cod_Segmento_Cliente': dims.cliente_segmento[cliente],
+        'Municipio_Cliente': dims.municipios[dims.cliente_municipio[cliente]],
+        'UF_Cliente': dims.ufs[dims.cliente_municipio[cliente]],
+        'Cod_Produto': produto + 100_000,
+        'Cod_Familia_Produto': familia + 1_000,
+        'Cod_Grupo_Produto': grupo + 100,
+        'Cod_Linha_Produto': linha + 1,
+        'Des_Linha_Produto': dims.linhas[linha],
+        'Cod_Vendedor': vendedor + 500,
+        'Cod_Regiao_Vendedor': dims.vendedor_regiao[vendedor],
+        'Qtd_Vendida': quantidade,
+        'Valor_Vendido': np.round(quantidade * dims.preco_produto[produto], 2),
+        'Peso_Vendido': np.round(quantidade * dims.peso_produto[produto], 3),
+    })
+
+
+def _lotes(rows: int, seed: int, batch_rows: int, zipf_exponent: float):
+    """Itera os lotes em ordem de data; cada lote cobre uma fatia proporcional do período"""
+    dims = _Dimensoes(seed, zipf_exponent)
+    n_days = (END_DATE - START_DATE).days + 1
+    for index, start in enumerate(range(0, rows, batch_rows)):
+        end = min(start + batch_rows, rows)
+        first_day = start * n_days // rows
+        last_day = max(first_day, (end * n_days - 1) // rows)
+        rng = np.random.default_rng([seed, index])
+        yield _gerar_lote(dims, rng, end - start, first_day, last_day)
+
+
+def gerar_dataset(rows: int, seed: int = 42, zipf_exponent: float = ZIPF_EXPONENT) -> pd.DataFrame:
+    """
+    Gera o DataFrame sintético em memória.
+
+    Args:
+        rows: Número de registros
+        seed: Semente do gerador
+        zipf_exponent: Expoente de Zipf de clientes e produtos
+
+    Returns:
+        DataFrame com as colunas de dados_comerciais
+    """
+    return pd.concat(list(_lotes(rows, seed, GENERATION_BATCH_ROWS, zipf_exponent)), ignore_index=True)
+
+
+def escrever_parquet(path: str, rows: int, seed: int = 42,
+                     row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                     zipf_exponent: float = ZIPF_EXPONENT) -> float:
+    """
+    Gera o dataset em lotes e grava em parquet (memória limitada a um lote).
+
+    Args:
+        path: Arquivo de saída
+        rows: Número de registros
+        seed: Semente do gerador
+        row_group_size: Linhas por row group
+        zipf_exponent: Expoente de Zipf de clientes e produtos
+
+    Returns:
+        Tempo de geração + escrita em segundos
+    """
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    batch_rows = max(row_group_size, GENERATION_BATCH_ROWS // row_group_size * row_group_size)
+
+    writer: Optional[pq.ParquetWriter] = None
+    try:
+        for lote in _lotes(rows, seed, batch_rows, zipf_exponent):
+            table = pa.Table.from_pandas(lote, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table, row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=parse_rows, default=1_000_000,
+                        help=f"Linhas do dataset sintético (número ou {', '.join(SCALE_PRESETS)})")
+    parser.add_argument('--seed', type=int, default=42, help='Semente do gerador')
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE, help='Linhas por row group')
+    parser.add_argument('--zipf', type=float, default=ZIPF_EXPONENT, help='Expoente de Zipf de clientes e produtos')
+    parser.add_argument('--output', type=str, required=True, help='Arquivo parquet de saída')
+    args = parser.parse_args()
+
+    seconds = escrever_parquet(args.output, args.rows, args.seed, args.row_group_size, args.zipf)
+    size_mb = os.path.getsize(args.output) / (1024 * 1024)
+    row_groups = pq.ParquetFile(args.output).metadata.num_row_groups
+    print(f"{args.output}: {args.rows:,} linhas, {row_groups} row groups, {size_mb:,.1f} MB em {seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,10 +25,30 @@ from prompts.chatbot_prompt import create_chatbot_prompt
 from tools.optimized_python_tools import OptimizedPythonTools
 from tools.debug_duckdb_tools import DebugDuckDbTools
 from tools.visualization_tools import VisualizationTools
+from utils.dataset_registry import get_dataset_registry
+from utils.duckdb_pool import get_duckdb_pool
+from utils.parallel_queries import ParallelToolCallsMixin
+from utils.tracing import span, trace_tool_call
 
 load_dotenv()
 
 
+class TracedOpenAIChat(ParallelToolCallsMixin, OpenAIChat):
+    """
+    OpenAIChat com um span por chamada ao modelo (round-trips do turno, ver utils.tracing)
+    e queries independentes de um mesmo passo executadas em paralelo (ver utils.parallel_queries)
+    """
+
+    def invoke(self, *args, **kwargs):
+        with span("llm.invoke", model=self.id):
+            return super().invoke(*args, **kwargs)
+
+    def invoke_stream(self, *args, **kwargs):
+        # Sem nest: o span não fica como pai do que o consumidor abre entre os chunks
+        with span("llm.invoke_stream", nest=False, model=self.id):
+            yield from super().invoke_stream(*args, **kwargs)
+
+
 class PrincipalAgent(Agent):
     """
     Agente principal com funcionalidades otimizadas e hierarquia de colunas
@@ -56,7 +76,8 @@ class PrincipalAgent(Agent):
         self.visualization_tool_ref = None  # Referência para VisualizationTools
         for i, tool in enumerate(self.tools):
             if isinstance(tool, DuckDbTools):
-                self.tools[i] = DebugDuckDbTools(debug_info_ref=self)
+                # Manter o cursor do banco compartilhado recebido em create_agent
+                self.tools[i] = DebugDuckDbTools(debug_info_ref=self, connection=tool._connection, shared_cache=True)
             elif isinstance(tool, PythonTools):
                 optimized_tool = OptimizedPythonTools(debug_info_ref=self, run_code=True, pip_install=False)
                 self.tools[i] = optimized_tool
@@ -306,17 +327,27 @@ def create_agent(session_user_id=None, debug_mode=False, conversation_memory="")
     """
     os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
-    # Carregar dados do parquet
+    # Obter view do dataset compartilhado (parquet lido uma única vez por processo);
+    # na ingestão em streaming não há DataFrame: tudo vem dos artefatos e do DuckDB
     data_path = DATA_CONFIG["data_path"]
-    df = pd.read_parquet(data_path)
+    registry = get_dataset_registry(data_path)
+    df = None if registry.streaming else registry.get_view()
+
+    # Artefatos derivados (colunas de texto, normalização, estatísticas) vêm do
+    # cache persistente: só são recomputados quando o parquet ou o normalizador mudam
+    artifacts = registry.get_artifacts()
+    metadata = artifacts.metadata
 
-    # Aplicar normalização de texto aos dados
     normalizer = TextNormalizer()
-    normalizer.set_dataset_context(df)  # Configurar contexto para detecção inteligente de "último mês"
-    text_columns = normalizer.identify_text_columns(df)
+    artifacts.apply_dataset_context(normalizer)  # Configurar contexto para detecção inteligente de "último mês"
+    text_columns = artifacts.text_columns
 
-    # Criar versão normalizada do DataFrame para buscas
-    df_normalized = normalizer.normalize_dataframe(df, text_columns)
+    # Versão normalizada para buscas: lookup código -> texto normalizado sobre o
+    # dicionário do dataset original (compartilhada, sem um segundo DataFrame)
+    df_normalized = registry.get_normalized_view()
+    summary = registry.get_summary()
+    max_date = summary['max_date']
+    min_date = summary['min_date']
 
     # Carregar mapeamento de aliases
     alias_mapping = load_alias_mapping()
@@ -328,20 +359,20 @@ def create_agent(session_user_id=None, debug_mode=False, conversation_memory="")
     dataset_info = f"""
 Dataset: DadosComercial_resumido_v02.parquet
 Localização: {data_path}
-Número de linhas: {len(df)}
-Número de colunas: {len(df.columns)}
-Colunas disponíveis: {", ".join(df.columns.tolist())}
-Última Data: {df['Data'].max()}
-Primeira Data: {df['Data'].min()}
-Último mês: {df['Data'].max().strftime('%Y-%m')}
+Número de linhas: {summary['rows']}
+Número de colunas: {len(summary['columns'])}
+Colunas disponíveis: {", ".join(summary['columns'])}
+Última Data: {max_date}
+Primeira Data: {min_date}
+Último mês: {max_date.strftime('%Y-%m')}
 
 CONTEXTO TEMPORAL IMPORTANTE:
-- Data máxima no dataset: {df['Data'].max().strftime('%Y-%m-%d')} (ESTA É A DATA DE "HOJE" PARA O CONTEXTO DAS ANÁLISES)
-- Quando mencionado "último mês", "mês anterior", "mês passado" ou "período mais recente", refere-se ao mês {df['Data'].max().strftime('%Y-%m')}
-- Para períodos relativos como "últimos X meses/anos", calcule SEMPRE a partir da data máxima {df['Data'].max().strftime('%Y-%m-%d')}, NÃO da data atual real
+- Data máxima no dataset: {max_date.strftime('%Y-%m-%d')} (ESTA É A DATA DE "HOJE" PARA O CONTEXTO DAS ANÁLISES)
+- Quando mencionado "último mês", "mês anterior", "mês passado" ou "período mais recente", refere-se ao mês {max_date.strftime('%Y-%m')}
+- Para períodos relativos como "últimos X meses/anos", calcule SEMPRE a partir da data máxima {max_date.strftime('%Y-%m-%d')}, NÃO da data atual real
 - Exemplos de interpretação correta:
-  * "últimos 3 meses" = desde {(df['Data'].max() - pd.DateOffset(months=3)).strftime('%Y-%m-%d')} até {df['Data'].max().strftime('%Y-%m-%d')}
-  * "últimos 6 meses" = desde {(df['Data'].max() - pd.DateOffset(months=6)).strftime('%Y-%m-%d')} até {df['Data'].max().strftime('%Y-%m-%d')}
+  * "últimos 3 meses" = desde {(max_date - pd.DateOffset(months=3)).strftime('%Y-%m-%d')} até {max_date.strftime('%Y-%m-%d')}
+  * "últimos 6 meses" = desde {(max_date - pd.DateOffset(months=6)).strftime('%Y-%m-%d')} até {max_date.strftime('%Y-%m-%d')}
 - Use este contexto automaticamente para interpretar TODAS as consultas temporais relativas
 
 IMPORTANTE: Os dados passaram por normalização de texto para garantir consistência:
@@ -350,16 +381,16 @@ IMPORTANTE: Os dados passaram por normalização de texto para garantir consist
 - Aliases disponíveis para consultas: {", ".join(alias_mapping.keys()) if alias_mapping else "Nenhum"}
 
 Primeiras 5 linhas do dataset original:
-{df.head().to_string()}
+{metadata['head']}
 
 Primeiras 5 linhas com normalização aplicada (colunas de texto):
-{df_normalized[text_columns].head().to_string() if text_columns else "Nenhuma coluna de texto para normalizar"}
+{metadata['head_normalized'] if text_columns else "Nenhuma coluna de texto para normalizar"}
 
 Informações estatísticas:
-{df.describe().to_string()}
+{metadata['describe']}
 
 Tipos de dados:
-{df.dtypes.to_string()}
+{metadata['dtypes']}
 """
 
     knowledge.add_content(text_content=dataset_info)
@@ -375,7 +406,7 @@ Tipos de dados:
         session_user_id=session_user_id,
         conversation_memory=conversation_memory,
         db=db,
-        model=OpenAIChat(
+        model=TracedOpenAIChat(
             id=SELECTED_MODEL,
             reasoning_effort="low",
             max_completion_tokens=8000,  # Garantir tokens suficientes para resposta completa
@@ -384,12 +415,13 @@ Tipos de dados:
             ReasoningTools(add_instructions=True),
             CalculatorTools(),
             PythonTools(),
-            DuckDbTools(),
+            DuckDbTools(connection=get_duckdb_pool(data_path).cursor()),
             VisualizationTools(),  # ⬅️ NOVA TOOL para gráficos integrados
         ],
+        tool_hooks=[trace_tool_call],  # Um span por chamada de ferramenta
         knowledge=knowledge,
         enable_agentic_memory=True,
-        instructions=create_chatbot_prompt(data_path, df, text_columns, alias_mapping),
+        instructions=create_chatbot_prompt(data_path, summary, text_columns, alias_mapping),
         debug_mode=debug_mode,
         markdown=True,
     )
@@ -408,10 +440,12 @@ Tipos de dados:
 
 def _initialize_database_optimized(agent, data_path):
     """
-    Inicializa o banco DuckDB de forma otimizada, evitando criação redundante de tabelas
+    Conecta o agente ao banco DuckDB compartilhado do processo.
+
+    A tabela dados_comerciais é criada uma única vez por get_duckdb_pool; aqui
+    apenas verificamos o cursor da sessão e marcamos o cache de metadados.
     """
     try:
-        # ABORDAGEM MAIS ROBUSTA: Usar DuckDbTools diretamente para garantir persistência
         duckdb_tool = None
         for tool in agent.tools:
             if hasattr(tool, 'run_query') and hasattr(tool, 'connection'):
@@ -419,41 +453,26 @@ def _initialize_database_optimized(agent, data_path):
                 break
 
         if duckdb_tool is None:
-            # Fallback: usar o run normal do agente
-            result = agent.run(f"CREATE OR REPLACE TABLE dados_comerciais AS SELECT * FROM read_parquet('{data_path}');")
-        else:
-            # Usar DuckDbTools diretamente para garantir que a tabela seja criada na conexão correta
-            result = duckdb_tool.run_query(f"CREATE OR REPLACE TABLE dados_comerciais AS SELECT * FROM read_parquet('{data_path}')")
+            raise Exception("DuckDB tool not found in agent tools")
 
-            # Verificar imediatamente se a tabela foi criada
-            verification = duckdb_tool.run_query("SELECT COUNT(*) as count FROM dados_comerciais LIMIT 1")
+        # Verificação barata: usa apenas o catálogo, sem varrer os dados
+        duckdb_tool.connection.execute("SELECT 1 FROM dados_comerciais LIMIT 0")
 
-            if 'count' in verification.lower():
-                # Sucesso - marcar cache
-                if hasattr(duckdb_tool, 'metadata_cache'):
-                    duckdb_tool.metadata_cache['tables_exist'].add('dados_comerciais')
-                    duckdb_tool.metadata_cache['initialization_done'] = True
-                    duckdb_tool.metadata_cache['table_verified'] = True
-            else:
-                raise Exception(f"Table verification failed: {verification}")
+        if hasattr(duckdb_tool, 'metadata_cache'):
+            duckdb_tool.metadata_cache['tables_exist'].add('dados_comerciais')
+            duckdb_tool.metadata_cache['initialization_done'] = True
+            duckdb_tool.metadata_cache['table_verified'] = True
 
     except Exception as e:
-        # Log do erro e tentar abordagem de fallback
         if hasattr(agent, 'debug_info') and agent.debug_info is not None:
             if 'initialization_warnings' not in agent.debug_info:
                 agent.debug_info['initialization_warnings'] = []
             agent.debug_info['initialization_warnings'].append({
                 'type': 'table_creation_error',
                 'message': str(e),
-                'status': 'Trying fallback approach'
+                'status': 'Shared DuckDB table unavailable'
             })
 
-        # FALLBACK: Tentar abordagem mais simples
-        try:
-            agent.run(f"CREATE TABLE dados_comerciais AS SELECT * FROM read_parquet('{data_path}')")
-        except:
-            pass  # Se falhar, pelo menos tentamos
-
 
 # Para compatibilidade com uso direto do arquivo
 if __name__ == "__main__":
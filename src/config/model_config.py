@@ -16,5 +16,37 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # Configurações de dados
 DATA_CONFIG = {
     "data_path": "data/raw/DadosComercial_resumido_v02.parquet",
-    "alias_mapping_path": "data/mappings/alias.yaml"
-}
\ No newline at end of file
+    "alias_mapping_path": "data/mappings/alias.yaml",
+    # Cache persistente de artefatos derivados (normalização, metadados)
+    "artifact_cache_dir": "data/cache/artifacts",
+    # Banco DuckDB persistido compartilhado (somente-leitura) entre sessões
+    "duckdb_path": "data/cache/dados_comerciais.duckdb",
+    # Carga compacta: dimensões como categóricas e inteiros no menor tipo
+    "compact_dtypes": True,
+    # Ingestão: "memory" (DataFrame em memória), "streaming" (lotes + DuckDB sobre o
+    # parquet, para datasets maiores que a RAM) ou "auto" (streaming a partir de streaming_min_rows)
+    "ingestion_mode": os.getenv("INGESTION_MODE", "auto"),
+    "streaming_min_rows": 20_000_000,
+    "streaming_batch_rows": 500_000,
+}
+
+# Tracing de latência por turno (ver utils.tracing)
+TRACING_CONFIG = {
+    # Arquivo JSON-lines com um trace por turno (vazio = não exportar)
+    "export_path": os.getenv("TRACE_EXPORT_PATH", "data/cache/traces/turns.jsonl"),
+}
+
+# Respostas parciais no chat enquanto o agente executa (ver utils.agent_stream)
+RESPONSE_STREAMING_CONFIG = {
+    # STREAM_RESPONSES=false volta ao agent.run síncrono com spinner
+    "enabled": os.getenv("STREAM_RESPONSES", "true").lower() != "false",
+    # Intervalo de atualização do indicador de progresso enquanto não chegam eventos
+    "poll_seconds": 0.1,
+}
+
+# Queries independentes emitidas pelo modelo em um mesmo passo (ver utils.parallel_queries)
+PARALLEL_QUERY_CONFIG = {
+    "enabled": os.getenv("PARALLEL_QUERIES", "true").lower() != "false",
+    # Queries simultâneas no processo (também o número de cursores por ferramenta)
+    "max_workers": 4,
+}
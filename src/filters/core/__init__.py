@@ -3,7 +3,14 @@ Core - Lógica central do sistema de filtros
 """
 
 from .extractor import SQLFilterExtractor, extract_filters_from_sql
-from .manager import JSONFilterManager, get_json_filter_manager, processar_filtros_apenas_sql
+from .manager import (
+    JSONFilterManager,
+    get_json_filter_manager,
+    get_json_filter_manager_stats,
+    processar_filtros_apenas_sql
+)
+from .count_index import FilterCountIndex, count_filtered_records, get_filter_count_index
+from .value_index import ValueIndex
 from .replacer import (
     SmartFilterReplacer,
     apply_smart_filter_replacement,
@@ -16,7 +23,12 @@ __all__ = [
     'extract_filters_from_sql',
     'JSONFilterManager',
     'get_json_filter_manager',
+    'get_json_filter_manager_stats',
     'processar_filtros_apenas_sql',
+    'FilterCountIndex',
+    'count_filtered_records',
+    'get_filter_count_index',
+    'ValueIndex',
     'SmartFilterReplacer',
     'apply_smart_filter_replacement',
     'validate_filter_consistency',
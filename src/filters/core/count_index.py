@@ -0,0 +1,398 @@
+"""
+Filter Count Index - Contagem de registros filtrados sem cópias do DataFrame
+Índices de códigos por coluna + busca binária na coluna Data + cache LRU
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .dataset_fingerprint import dataset_fingerprint
+
+
+# Colunas cujo valor é comparado em maiúsculas (mesma semântica do filtro pandas anterior)
+UPPER_CASE_COLUMNS = ('UF_Cliente', 'Municipio_Cliente', 'Des_Linha_Produto')
+
+# Colunas comparadas por igualdade exata
+EXACT_COLUMNS = (
+    'Cod_Cliente', 'Cod_Segmento_Cliente', 'Cod_Familia_Produto', 'Cod_Grupo_Produto',
+    'Cod_Linha_Produto', 'Cod_Vendedor', 'Cod_Regiao_Vendedor',
+)
+
+DATE_KEYS = ('Data_>=', 'Data_<', 'Data')
+FILTER_COLUMNS = UPPER_CASE_COLUMNS + EXACT_COLUMNS
+
+
+def _freeze(value: Any) -> Any:
+    """Converte valor de filtro em chave hashable independente da ordem das listas"""
+    if isinstance(value, (list, tuple, set)):
+        return ('list', tuple(sorted({repr(v) for v in value})))
+    return ('scalar', repr(value))
+
+
+def normalize_filter_context(filter_context: Dict) -> Tuple:
+    """
+    Gera a chave de cache de um contexto de filtros.
+
+    Considera apenas filtros ativos (valor truthy) que afetam a contagem.
+
+    Args:
+        filter_context: Dicionário com filtros ativos
+
+    Returns:
+        Tupla ordenada e hashable
+    """
+    return tuple(sorted(
+        (key, _freeze(filter_context[key]))
+        for key in DATE_KEYS + FILTER_COLUMNS
+        if key in filter_context and filter_context[key]
+    ))
+
+
+class FilterCountIndex:
+    """
+    Índice de contagem para um dataset.
+
+    As linhas são permutadas pela ordem da coluna Data, de modo que filtros de
+    período viram um intervalo [início, fim) obtido por busca binária. Para cada
+    coluna filtrável guardamos, na mesma ordem, os códigos de pd.factorize no
+    menor dtype inteiro possível; um filtro vira uma tabela booleana sobre os
+    valores únicos, aplicada aos códigos apenas dentro do intervalo de datas.
+    Os índices por coluna são construídos sob demanda, uma única vez.
+    """
+
+    def __init__(self, df: pd.DataFrame, cache_size: int = 256):
+        """
+        Constrói o índice temporal (colunas de filtro são indexadas sob demanda).
+
+        Args:
+            df: DataFrame com os dados (não é copiado)
+            cache_size: Número máximo de contagens em cache
+        """
+        self.total_rows = len(df)
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: OrderedDict = OrderedDict()
+        self._columns: Dict[str, Tuple[np.ndarray, pd.Index, Optional[pd.Index]]] = {}
+        self._source_columns = {col: df[col] for col in FILTER_COLUMNS if col in df.columns}
+        self.stats = {'hits': 0, 'misses': 0, 'columns_indexed': 0, 'last_count_ms': None, 'build_ms': None}
+
+        start_time = time.perf_counter()
+        self._order = None
+        self._dates = None
+        self._valid_dates = 0
+        self._dates_sorted = False
+        if 'Data' in df.columns:
+            dates = df['Data']
+            if pd.api.types.is_datetime64_any_dtype(dates.dtype):
+                values = dates.to_numpy()
+                self._order = np.argsort(values, kind='stable')
+                self._dates = values[self._order]
+                # NaT fica no final da ordenação e nunca satisfaz comparações
+                self._valid_dates = int(len(values) - np.isnat(values).sum())
+                self._dates_sorted = True
+            else:
+                self._dates = dates.to_numpy()
+        self.stats['build_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+
+    def _column_index(self, col: str) -> Tuple[np.ndarray, pd.Index, Optional[pd.Index]]:
+        """Retorna (códigos na ordem de Data, valores únicos, únicos em maiúsculas)"""
+        if col not in self._columns:
+            source = self._source_columns[col]
+            if isinstance(source.dtype, pd.CategoricalDtype):
+                # Schema compacto: os códigos categóricos já são a fatoração
+                codes, uniques = source.cat.codes.to_numpy(), source.cat.categories
+            else:
+                codes, uniques = pd.factorize(source, use_na_sentinel=True)
+            codes = codes[self._order] if self._order is not None else codes
+            # Menor dtype que comporta os códigos (-1 = nulo)
+            codes = codes.astype(np.min_scalar_type(-max(len(uniques), 1)), copy=False)
+            uniques = pd.Index(uniques)
+            upper = None
+            if col in UPPER_CASE_COLUMNS:
+                upper = pd.Index(pd.Series(uniques, dtype=object).str.upper())
+            self._columns[col] = (codes, uniques, upper)
+            self.stats['columns_indexed'] = len(self._columns)
+            del self._source_columns[col]
+        return self._columns[col]
+
+    def _date_range(self, filter_context: Dict) -> Tuple[int, int, Optional[np.ndarray]]:
+        """Converte filtros de data em intervalo [início, fim) e máscara residual"""
+        start, end = 0, self.total_rows
+        mask = None
+
+        if not any(filter_context.get(key) for key in DATE_KEYS):
+            return start, end, mask
+        if self._dates is None:
+            raise KeyError('Data')
+
+        if self._dates_sorted:
+            end = self._valid_dates
+            valid = self._dates[:end]
+            if filter_context.get('Data_>='):
+                start = max(start, int(np.searchsorted(valid, np.datetime64(pd.Timestamp(filter_context['Data_>='])), 'left')))
+            if filter_context.get('Data_<'):
+                end = min(end, int(np.searchsorted(valid, np.datetime64(pd.Timestamp(filter_context['Data_<'])), 'left')))
+            if filter_context.get('Data'):
+                value = np.datetime64(pd.Timestamp(filter_context['Data']))
+                start = max(start, int(np.searchsorted(valid, value, 'left')))
+                end = min(end, int(np.searchsorted(valid, value, 'right')))
+            return start, max(start, end), mask
+
+        # Coluna Data não temporal: comparações elemento a elemento (sem ordenação)
+        dates = pd.Series(self._dates)
+        if filter_context.get('Data_>='):
+            mask = (dates >= filter_context['Data_>=']).to_numpy()
+        if filter_context.get('Data_<'):
+            step = (dates < filter_context['Data_<']).to_numpy()
+            mask = step if mask is None else mask & step
+        if filter_context.get('Data'):
+            step = (dates == filter_context['Data']).to_numpy()
+            mask = step if mask is None else mask & step
+        return start, end, mask
+
+    def _value_lookup(self, col: str, value: Any) -> np.ndarray:
+        """Tabela booleana sobre os valores únicos (+1 posição para nulos) que satisfazem o filtro"""
+        codes, uniques, upper = self._column_index(col)
+        if upper is not None:
+            if isinstance(value, list):
+                matches = upper.isin([str(v).upper() for v in value])
+            else:
+                matches = upper == str(value).upper()
+        else:
+            if isinstance(value, list):
+                matches = uniques.isin(value)
+            else:
+                matches = uniques == value
+        # Última posição corresponde ao código -1 (nulo), que nunca satisfaz o filtro
+        return np.append(np.asarray(matches, dtype=bool), False)
+
+    def _compute(self, filter_context: Dict) -> int:
+        start, end, mask = self._date_range(filter_context)
+        if mask is not None:
+            mask = mask[start:end]
+
+        for col in FILTER_COLUMNS:
+            value = filter_context.get(col)
+            if not value:
+                continue
+            if col not in self._columns and col not in self._source_columns:
+                raise KeyError(col)
+
+            lookup = self._value_lookup(col, value)
+            if not lookup.any():
+                return 0
+            step = lookup[self._columns[col][0][start:end]]
+            mask = step if mask is None else mask & step
+
+        return int(end - start) if mask is None else int(np.count_nonzero(mask))
+
+    def count(self, filter_context: Dict) -> int:
+        """
+        Conta registros que satisfazem o contexto de filtros.
+
+        Args:
+            filter_context: Dicionário com filtros ativos
+
+        Returns:
+            Número de registros filtrados
+        """
+        start_time = time.perf_counter()
+        key = normalize_filter_context(filter_context or {})
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._cache[key]
+
+            result = self._compute(filter_context or {})
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self.stats['misses'] += 1
+            self.stats['last_count_ms'] = round((time.perf_counter() - start_time) * 1000, 3)
+
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do índice"""
+        stats = dict(self.stats)
+        stats['total_rows'] = self.total_rows
+        stats['cached_contexts'] = len(self._cache)
+        return stats
+
+
+def build_count_query(filter_context: Dict, table: str = 'dados_comerciais') -> Tuple[str, List[Any]]:
+    """
+    Traduz o contexto de filtros em COUNT(*) parametrizado (mesma semântica do índice).
+
+    Args:
+        filter_context: Dicionário com filtros ativos
+        table: Tabela ou view consultada
+
+    Returns:
+        tuple: (sql, parâmetros)
+    """
+    conditions, params = [], []
+    for key, operator in (('Data_>=', '>='), ('Data_<', '<'), ('Data', '=')):
+        if filter_context.get(key):
+            conditions.append(f'"Data" {operator} ?')
+            params.append(pd.Timestamp(filter_context[key]).to_pydatetime())
+
+    for col in FILTER_COLUMNS:
+        value = filter_context.get(col)
+        if not value:
+            continue
+        values = value if isinstance(value, list) else [value]
+        placeholders = ', '.join('?' for _ in values)
+        if col in UPPER_CASE_COLUMNS:
+            conditions.append(f'UPPER("{col}") IN ({placeholders})')
+            params.extend(str(v).upper() for v in values)
+        else:
+            conditions.append(f'"{col}" IN ({placeholders})')
+            params.extend(values)
+
+    sql = f"SELECT COUNT(*) FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql, params
+
+
+def filter_period(filter_context: Dict) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """
+    Período [início, fim) coberto pelos filtros de data do contexto.
+
+    Args:
+        filter_context: Dicionário com filtros ativos
+
+    Returns:
+        tuple: (início, fim); None = sem limite
+    """
+    low = pd.Timestamp(filter_context['Data_>=']) if filter_context.get('Data_>=') else None
+    high = pd.Timestamp(filter_context['Data_<']) if filter_context.get('Data_<') else None
+    if filter_context.get('Data'):
+        day = pd.Timestamp(filter_context['Data'])
+        low = day if low is None else max(low, day)
+        high = day + pd.Timedelta(days=1) if high is None else min(high, day + pd.Timedelta(days=1))
+    return low, high
+
+
+class SQLFilterCounter:
+    """
+    Contagem de registros filtrados no DuckDB, para a ingestão em streaming
+    (sem DataFrame em memória para o FilterCountIndex). Mesma interface e
+    cache LRU por contexto de filtros do índice.
+    """
+
+    def __init__(self, connection, table: str = 'dados_comerciais', cache_size: int = 256):
+        """
+        Args:
+            connection: Cursor DuckDB (uso exclusivo deste contador)
+            table: Tabela ou view consultada
+            cache_size: Número máximo de contagens em cache
+        """
+        self.connection = connection
+        self.table = table
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: OrderedDict = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'last_count_ms': None}
+
+    def count(self, filter_context: Dict) -> int:
+        """Conta registros que satisfazem o contexto de filtros"""
+        start_time = time.perf_counter()
+        key = normalize_filter_context(filter_context or {})
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._cache[key][0]
+
+            sql, params = build_count_query(filter_context or {}, self.table)
+            result = int(self.connection.execute(sql, params).fetchone()[0])
+            self._cache[key] = (result, filter_period(filter_context or {}))
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self.stats['misses'] += 1
+            self.stats['last_count_ms'] = round((time.perf_counter() - start_time) * 1000, 3)
+
+        return result
+
+    def invalidate_date_range(self, start: pd.Timestamp, end: pd.Timestamp) -> int:
+        """
+        Descarta as contagens cujo período pode incluir datas em [start, end)
+        (linhas acrescentadas à tabela, ver utils.incremental_refresh).
+
+        Returns:
+            Número de contagens descartadas
+        """
+        with self._lock:
+            stale = [key for key, (_, (low, high)) in self._cache.items()
+                     if (low is None or low < end) and (high is None or high > start)]
+            for key in stale:
+                del self._cache[key]
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do contador"""
+        stats = dict(self.stats)
+        stats['cached_contexts'] = len(self._cache)
+        return stats
+
+
+# Índices globais por dataset (poucos datasets distintos por processo)
+_indexes: "OrderedDict[Tuple, FilterCountIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+_MAX_INDEXES = 4
+
+
+def get_filter_count_index(df: pd.DataFrame) -> FilterCountIndex:
+    """
+    Singleton por dataset para obter o índice de contagem.
+
+    Args:
+        df: DataFrame com os dados
+
+    Returns:
+        FilterCountIndex compartilhado
+    """
+    key = dataset_fingerprint(df, ('Data',) + FILTER_COLUMNS)
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+
+        index = FilterCountIndex(df)
+        _indexes[key] = index
+        if len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+        return index
+
+
+def count_filtered_records(df: pd.DataFrame, filter_context: Dict) -> int:
+    """
+    Conta registros filtrados usando o índice compartilhado do dataset.
+
+    Args:
+        df: DataFrame com todos os dados (ou SQLFilterCounter na ingestão em streaming)
+        filter_context: Dicionário com filtros ativos do contexto
+
+    Returns:
+        Contagem de registros filtrados
+    """
+    if not isinstance(df, pd.DataFrame):
+        # SQLFilterCounter (pode vir de outro caminho de import: src.filters vs filters)
+        return df.count(filter_context)
+    return get_filter_count_index(df).count(filter_context)
+
+
+def reset_filter_count_indexes():
+    """Reset dos índices globais (útil para testes)"""
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,37 @@
+"""
+Dataset Fingerprint - Identidade de um dataset para caches por processo
+Índices de contagem e gerenciadores de filtros são compartilhados entre sessões
+que usam o mesmo dataset; a identidade vem dos buffers das colunas relevantes.
+"""
+
+from typing import Any, Iterable, Tuple
+
+
+def dataset_fingerprint(df: Any, columns: Iterable[str]) -> Tuple:
+    """
+    Identifica o dataset pelos buffers das colunas informadas.
+
+    Views rasas (df.copy(deep=False)) compartilham buffers e portanto o
+    fingerprint; colunas reatribuídas geram um novo. NormalizedView expõe o
+    próprio fingerprint (distinto do DataFrame original).
+
+    Args:
+        df: DataFrame ou view com as colunas
+        columns: Colunas consideradas (as ausentes são ignoradas)
+
+    Returns:
+        Tupla hashable (linhas, ((coluna, ponteiro), ...))
+    """
+    fingerprint = getattr(df, 'fingerprint', None)
+    if fingerprint is not None:
+        return fingerprint
+
+    pointers = []
+    for col in columns:
+        if col in df.columns:
+            values = df[col].values
+            # Categóricos: identificados pelo array de códigos
+            values = getattr(values, 'codes', values)
+            interface = getattr(values, '__array_interface__', None)
+            pointers.append((col, interface['data'][0] if interface else id(values)))
+    return (len(df), tuple(pointers))
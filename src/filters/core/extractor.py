@@ -5,12 +5,61 @@ mapeando para estrutura JSON esperada pelo sistema de filtros.
 """
 
 import re
+import threading
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 import copy
 
 
+# Padrões compilados uma única vez por processo
+_WHITESPACE_RE = re.compile(r'\s+')
+_WHERE_RE = re.compile(
+    r'\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bHAVING\b|\bLIMIT\b|$)',
+    re.IGNORECASE
+)
+_IN_VALUES_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+_OPERATOR_SUFFIX_RE = re.compile(r'_[><=!]+$')
+
+# Padrões para extrair diferentes tipos de condições (ordem importa)
+_CONDITION_PATTERNS = [(re.compile(pattern, re.IGNORECASE), condition_type) for pattern, condition_type in [
+    # Igualdade com LOWER(): LOWER(coluna) = 'valor'
+    (r"LOWER\((\w+)\)\s*=\s*'([^']*)'", 'equality_lower'),
+
+    # Igualdade simples: coluna = 'valor'
+    (r"(?<!LOWER\()(\w+)\s*=\s*'([^']*)'", 'equality'),
+
+    # Igualdade com aspas duplas
+    (r"(?:LOWER\()?(\w+)\)?\s*=\s*\"([^\"]*)\"", 'equality'),
+
+    # NOVO: Igualdade com números (sem aspas): coluna = 123 ou coluna = 123.45
+    # IMPORTANTE: Este pattern deve vir ANTES dos patterns de comparação para capturar igualdade primeiro
+    (r"(?<!LOWER\()(\w+)\s*=\s*(\d+(?:\.\d+)?)\b", 'equality_numeric'),
+
+    # LIKE com LOWER(): LOWER(coluna) LIKE 'valor'
+    (r"LOWER\((\w+)\)\s+LIKE\s+'([^']*)'", 'like_lower'),
+
+    # LIKE simples: coluna LIKE 'valor'
+    (r"(?<!LOWER\()(\w+)\s+LIKE\s+'([^']*)'", 'like'),
+
+    # Comparações com datas: coluna >= DATE '2024-01-01' ou coluna >= '2024-01-01'
+    (r"(\w+)\s*([><=!]+)\s*(?:DATE\s*)?'([^']*)'", 'comparison'),
+
+    # IN: coluna IN (valores)
+    (r"(?:LOWER\()?(\w+)\)?\s+IN\s*\(([^)]+)\)", 'in_values'),
+
+    # BETWEEN: coluna BETWEEN valor1 AND valor2
+    (r"(\w+)\s+BETWEEN\s+([^\s]+)\s+AND\s+([^\s]+)", 'between')
+]]
+
+# Cache LRU de extrações por query normalizada (compartilhado entre extratores)
+_EXTRACTION_CACHE_SIZE = 512
+_extraction_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_extraction_cache_lock = threading.Lock()
+_extraction_stats = {'hits': 0, 'misses': 0}
+
+
 class SQLFilterExtractor:
     """
     Extrator que analisa queries SQL para gerar filtros em formato JSON
@@ -21,7 +70,7 @@ class SQLFilterExtractor:
         Inicializa o extrator com dataset para validação opcional
 
         Args:
-            df_dataset: DataFrame com dados para validação de valores
+            df_dataset: DataFrame ou NormalizedView com dados para validação de valores
         """
         self.df_dataset = df_dataset
 
@@ -77,16 +126,30 @@ class SQLFilterExtractor:
         """
         try:
             # Normalizar query
-            normalized_query = re.sub(r'\s+', ' ', sql_query.strip())
+            normalized_query = _WHITESPACE_RE.sub(' ', sql_query.strip())
+
+            # A extração depende apenas do texto normalizado: reaproveitar resultados
+            with _extraction_cache_lock:
+                cached = _extraction_cache.get(normalized_query)
+                if cached is not None:
+                    _extraction_cache.move_to_end(normalized_query)
+                    _extraction_stats['hits'] += 1
+                    return copy.deepcopy(cached)
+                _extraction_stats['misses'] += 1
 
             # Extrair cláusula WHERE
             where_context = self._extract_where_conditions(normalized_query)
 
             if not where_context:
-                return self._get_empty_filter_structure()
+                json_filters = self._get_empty_filter_structure()
+            else:
+                # Mapear para estrutura JSON
+                json_filters = self._map_sql_to_json(where_context)
 
-            # Mapear para estrutura JSON
-            json_filters = self._map_sql_to_json(where_context)
+            with _extraction_cache_lock:
+                _extraction_cache[normalized_query] = copy.deepcopy(json_filters)
+                if len(_extraction_cache) > _EXTRACTION_CACHE_SIZE:
+                    _extraction_cache.popitem(last=False)
 
             return json_filters
 
@@ -104,10 +167,7 @@ class SQLFilterExtractor:
             Dict com condições extraídas
         """
         # Encontrar cláusula WHERE
-        where_match = re.search(
-            r'\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bHAVING\b|\bLIMIT\b|$)',
-            sql_query, re.IGNORECASE
-        )
+        where_match = _WHERE_RE.search(sql_query)
 
         if not where_match:
             return {}
@@ -115,39 +175,8 @@ class SQLFilterExtractor:
         where_clause = where_match.group(1).strip()
         conditions = {}
 
-        # Padrões para extrair diferentes tipos de condições
-        patterns = [
-            # Igualdade com LOWER(): LOWER(coluna) = 'valor'
-            (r"LOWER\((\w+)\)\s*=\s*'([^']*)'", 'equality_lower'),
-
-            # Igualdade simples: coluna = 'valor'
-            (r"(?<!LOWER\()(\w+)\s*=\s*'([^']*)'", 'equality'),
-
-            # Igualdade com aspas duplas
-            (r"(?:LOWER\()?(\w+)\)?\s*=\s*\"([^\"]*)\"", 'equality'),
-
-            # NOVO: Igualdade com números (sem aspas): coluna = 123 ou coluna = 123.45
-            # IMPORTANTE: Este pattern deve vir ANTES dos patterns de comparação para capturar igualdade primeiro
-            (r"(?<!LOWER\()(\w+)\s*=\s*(\d+(?:\.\d+)?)\b", 'equality_numeric'),
-
-            # LIKE com LOWER(): LOWER(coluna) LIKE 'valor'
-            (r"LOWER\((\w+)\)\s+LIKE\s+'([^']*)'", 'like_lower'),
-
-            # LIKE simples: coluna LIKE 'valor'
-            (r"(?<!LOWER\()(\w+)\s+LIKE\s+'([^']*)'", 'like'),
-
-            # Comparações com datas: coluna >= DATE '2024-01-01' ou coluna >= '2024-01-01'
-            (r"(\w+)\s*([><=!]+)\s*(?:DATE\s*)?'([^']*)'", 'comparison'),
-
-            # IN: coluna IN (valores)
-            (r"(?:LOWER\()?(\w+)\)?\s+IN\s*\(([^)]+)\)", 'in_values'),
-
-            # BETWEEN: coluna BETWEEN valor1 AND valor2
-            (r"(\w+)\s+BETWEEN\s+([^\s]+)\s+AND\s+([^\s]+)", 'between')
-        ]
-
-        for pattern, condition_type in patterns:
-            matches = re.finditer(pattern, where_clause, re.IGNORECASE)
+        for pattern, condition_type in _CONDITION_PATTERNS:
+            matches = pattern.finditer(where_clause)
 
             for match in matches:
                 if condition_type in ['equality', 'equality_lower', 'equality_numeric', 'like', 'like_lower']:
@@ -183,7 +212,7 @@ class SQLFilterExtractor:
                     values_str = match.group(2)
 
                     # Extrair valores individuais
-                    values = re.findall(r"'([^']*)'|\"([^\"]*)\"", values_str)
+                    values = _IN_VALUES_RE.findall(values_str)
                     if values:
                         clean_values = [v[0] or v[1] for v in values]
                         # Para campos UF, converter para maiúsculo
@@ -230,7 +259,7 @@ class SQLFilterExtractor:
         # Processar outras condições
         for sql_column, value in other_conditions.items():
             # Remover sufixos de operador para mapear coluna
-            base_column = re.sub(r'_[><=!]+$', '', sql_column)
+            base_column = _OPERATOR_SUFFIX_RE.sub('', sql_column)
 
             if base_column in self.column_mapping:
                 category = self.column_mapping[base_column]
@@ -606,4 +635,19 @@ def extract_filters_from_debug_info(debug_info: Dict, df_dataset: Optional[pd.Da
         return {}
 
     extractor = SQLFilterExtractor(df_dataset)
-    return extractor.extract_filters_from_multiple_queries(sql_queries)
\ No newline at end of file
+    return extractor.extract_filters_from_multiple_queries(sql_queries)
+
+
+def get_extraction_cache_stats() -> Dict[str, Any]:
+    """Retorna acertos/erros e tamanho do cache de extrações"""
+    with _extraction_cache_lock:
+        stats = dict(_extraction_stats)
+        stats['entries'] = len(_extraction_cache)
+    return stats
+
+
+def clear_extraction_cache():
+    """Limpa o cache de extrações (útil para testes e benchmarks)"""
+    with _extraction_cache_lock:
+        _extraction_cache.clear()
+        _extraction_stats.update({'hits': 0, 'misses': 0})
@@ -5,8 +5,28 @@ focando exclusivamente na extração das cláusulas WHERE do SQL.
 """
 
 import pandas as pd
-from typing import Dict, List, Set, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, List, Set, Optional, Tuple
 import copy
+import sys
+import os
+import threading
+import time
+
+# Adicionar src ao path para importar utils
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from utils.normalized_view import truncated_columns, unique_values
+from .value_index import ValueIndex
+from .dataset_fingerprint import dataset_fingerprint
+from .extractor import SQLFilterExtractor
+
+
+# Colunas com valores válidos indexados a partir do dataset
+COLUNAS_VALIDACAO = [
+    "UF_Cliente", "Municipio_Cliente", "Cod_Cliente", "Cod_Segmento_Cliente",
+    "Cod_Linha_Produto", "Des_Linha_Produto", "Cod_Familia_Produto",
+    "Cod_Grupo_Produto", "Cod_Vendedor", "Cod_Regiao_Vendedor"
+]
 
 
 class JSONFilterManager:
@@ -19,9 +39,18 @@ class JSONFilterManager:
         Inicializa o gerenciador com o dataset para validação
 
         Args:
-            df_dataset: DataFrame com dados para validação de valores
+            df_dataset: DataFrame ou NormalizedView com dados para validação de valores
         """
         self.df_dataset = df_dataset
+        # Extrator sem estado por query: compartilhado por todas as sessões do dataset
+        self.extrator = SQLFilterExtractor(df_dataset)
+        self.limpar_filtros_persistentes()
+
+        # Gerar listas de valores válidos diretamente do dataset
+        self._gerar_valores_validos()
+
+    def limpar_filtros_persistentes(self):
+        """Restaura os filtros persistentes vazios (os índices de valores são mantidos)"""
         self.filtros_persistentes = {
             "periodo": {"Data": None},
             "regiao": {"UF_Cliente": [], "Municipio_Cliente": []},
@@ -35,24 +64,18 @@ class JSONFilterManager:
             "representante": {"Cod_Vendedor": [], "Cod_Regiao_Vendedor": []}
         }
 
-        # Gerar listas de valores válidos diretamente do dataset
-        self._gerar_valores_validos()
-
     def _gerar_valores_validos(self):
-        """Gera listas de valores válidos diretamente do dataset"""
+        """Gera listas de valores válidos e seus índices diretamente do dataset"""
         self.valores_validos = {}
+        self.indices_valores = {}
 
-        # Lista de colunas possíveis para validação
-        colunas_validacao = [
-            "UF_Cliente", "Municipio_Cliente", "Cod_Cliente", "Cod_Segmento_Cliente",
-            "Cod_Linha_Produto", "Des_Linha_Produto", "Cod_Familia_Produto",
-            "Cod_Grupo_Produto", "Cod_Vendedor", "Cod_Regiao_Vendedor"
-        ]
-
-        # Apenas adicionar colunas que existem no dataset
-        for coluna in colunas_validacao:
-            if coluna in self.df_dataset.columns:
-                self.valores_validos[coluna] = self.df_dataset[coluna].dropna().unique().tolist()
+        # Apenas adicionar colunas que existem no dataset; colunas com valores
+        # únicos incompletos (dicionário truncado) seguem a estratégia permissiva
+        truncadas = set(truncated_columns(self.df_dataset))
+        for coluna in COLUNAS_VALIDACAO:
+            if coluna in self.df_dataset.columns and coluna not in truncadas:
+                self.valores_validos[coluna] = unique_values(self.df_dataset, coluna)
+                self.indices_valores[coluna] = ValueIndex(self.valores_validos[coluna])
 
     def validar_valores(self, campo: str, valores: List[str], categoria: str) -> List[str]:
         """
@@ -78,22 +101,21 @@ class JSONFilterManager:
             return valores
 
         # Para campos com validação no dataset
-        if campo in self.valores_validos:
+        if campo in self.indices_valores:
+            indice = self.indices_valores[campo]
             # Converter valores para string para comparação consistente
             valores_str = [str(v) for v in valores]
-            validos_str = [str(v) for v in self.valores_validos[campo]]
 
             # Validação exata primeiro
-            valores_exatos = [v for v in valores_str if v in validos_str]
+            valores_exatos = [v for v in valores_str if v in indice.exact]
 
-            # Se não encontrou exatos, tentar validação fuzzy (parcial)
+            # Se não encontrou exatos, tentar sem acento/caixa, parcial e aproximada
             if not valores_exatos and valores_str:
                 valores_fuzzy = []
                 for valor in valores_str:
-                    # Busca parcial case-insensitive
-                    matches = [v for v in validos_str if valor.upper() in v.upper() or v.upper() in valor.upper()]
-                    if matches:
-                        valores_fuzzy.extend(matches[:1])  # Apenas primeiro match
+                    match = indice.match(valor)
+                    if match is not None:
+                        valores_fuzzy.append(match)  # Apenas primeiro match
 
                 if valores_fuzzy:
                     return valores_fuzzy
@@ -228,32 +250,66 @@ class JSONFilterManager:
         return contexto_filtrado
 
 
-# Instância global para uso em toda a aplicação
-_global_json_filter_manager: Optional[JSONFilterManager] = None
+# Gerenciadores globais por dataset (poucos datasets distintos por processo)
+_managers: "OrderedDict[Tuple, JSONFilterManager]" = OrderedDict()
+_managers_lock = threading.Lock()
+_MAX_MANAGERS = 4
+_manager_stats: Dict[str, Any] = {'builds': 0, 'hits': 0, 'build_seconds': 0.0}
 
 
 def get_json_filter_manager(df_dataset: pd.DataFrame) -> JSONFilterManager:
     """
-    Singleton para obter instância global do JSONFilterManager
+    Singleton por dataset para obter o JSONFilterManager (thread-safe).
+
+    Listas e índices de valores válidos são construídos uma única vez por
+    fingerprint do dataset e reaproveitados por todas as sessões.
 
     Args:
-        df_dataset: DataFrame com dados
+        df_dataset: DataFrame ou NormalizedView com dados
 
     Returns:
-        Instância do JSONFilterManager
+        Instância compartilhada do JSONFilterManager
     """
-    global _global_json_filter_manager
+    key = dataset_fingerprint(df_dataset, COLUNAS_VALIDACAO)
+    with _managers_lock:
+        if key in _managers:
+            _managers.move_to_end(key)
+            _manager_stats['hits'] += 1
+            return _managers[key]
+
+        start_time = time.perf_counter()
+        manager = JSONFilterManager(df_dataset)
+        _manager_stats['builds'] += 1
+        _manager_stats['build_seconds'] += time.perf_counter() - start_time
+        _managers[key] = manager
+        if len(_managers) > _MAX_MANAGERS:
+            _managers.popitem(last=False)
+        return manager
+
+
+def get_json_filter_manager_stats() -> Dict[str, Any]:
+    """Retorna métricas de construção/reuso dos gerenciadores e tamanho dos índices"""
+    with _managers_lock:
+        stats = dict(_manager_stats)
+        stats['build_seconds'] = round(stats['build_seconds'], 4)
+        stats['managers'] = len(_managers)
+        stats['indexed_values'] = sum(len(indice) for manager in _managers.values()
+                                      for indice in manager.indices_valores.values())
+    return stats
 
-    if _global_json_filter_manager is None:
-        _global_json_filter_manager = JSONFilterManager(df_dataset)
 
-    return _global_json_filter_manager
+def reset_json_filter_manager():
+    """Limpa os filtros persistentes dos gerenciadores sem reconstruir os índices"""
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.limpar_filtros_persistentes()
 
 
-def reset_json_filter_manager():
-    """Reset da instância global (útil para testes)"""
-    global _global_json_filter_manager
-    _global_json_filter_manager = None
+def clear_json_filter_managers():
+    """Descarta todos os gerenciadores e métricas (útil para testes)"""
+    with _managers_lock:
+        _managers.clear()
+        _manager_stats.update({'builds': 0, 'hits': 0, 'build_seconds': 0.0})
 
 
 def processar_filtros_apenas_sql(sql_queries: List[str], contexto_atual: Dict,
@@ -269,7 +325,6 @@ def processar_filtros_apenas_sql(sql_queries: List[str], contexto_atual: Dict,
     Returns:
         Tuple[Dict, List[str]]: (contexto_atualizado, lista_de_mudanças)
     """
-    from .extractor import SQLFilterExtractor
     from .replacer import apply_smart_filter_replacement
 
     mudancas = []
@@ -280,7 +335,8 @@ def processar_filtros_apenas_sql(sql_queries: List[str], contexto_atual: Dict,
         return contexto_atualizado, mudancas
 
     # ÚNICA ESTRATÉGIA: Extrair filtros das queries SQL
-    extractor = SQLFilterExtractor(df_dataset)
+    # Extrator do gerenciador compartilhado: nenhuma varredura do dataset por mensagem
+    extractor = get_json_filter_manager(df_dataset).extrator if df_dataset is not None else SQLFilterExtractor()
     sql_filters = extractor.extract_filters_from_multiple_queries(sql_queries)
 
     if sql_filters and any(sql_filters.values()):
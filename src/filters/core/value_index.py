@@ -0,0 +1,162 @@
+"""
+Índice de valores válidos para validação de filtros
+Substitui as varreduras lineares de JSONFilterManager.validar_valores por
+estruturas construídas uma vez por dataset:
+- conjunto para match exato
+- mapa de chave normalizada (sem acento/caixa) para match insensível
+- índice de trigramas para busca parcial (substring) e aproximada (erros de digitação)
+"""
+
+import sys
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Adicionar src ao path para importar o normalizador
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from text_normalizer import TextNormalizer
+
+
+# Similaridade mínima (Jaccard de trigramas) para aceitar um match aproximado
+MIN_SIMILARITY = 0.5
+
+
+def _trigrams(text: str) -> set:
+    """Trigramas de uma string (vazio para strings com menos de 3 caracteres)"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _build_postings(keys: List[str], padded: bool = False) -> Dict[str, np.ndarray]:
+    """Listas invertidas trigrama -> posições (ordenadas) dos valores que o contêm"""
+    postings: Dict[str, List[int]] = {}
+    for position, key in enumerate(keys):
+        text = f"  {key} " if padded else key
+        for gram in _trigrams(text):
+            postings.setdefault(gram, []).append(position)
+    return {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+
+
+class ValueIndex:
+    """
+    Índice dos valores válidos de uma coluna.
+
+    Mantém a ordem original dos valores: entre vários matches, o de menor
+    posição vence, como na varredura linear que o índice substitui.
+    """
+
+    def __init__(self, values: Iterable[Any], normalizer: Optional[TextNormalizer] = None):
+        """
+        Args:
+            values: Valores válidos da coluna (na ordem de aparição no dataset)
+            normalizer: Normalizador para as chaves sem acento/caixa (None = nova instância)
+        """
+        normalizer = normalizer or TextNormalizer()
+        self.values: List[str] = [str(v) for v in values]
+        self.exact = frozenset(self.values)
+
+        self._upper = [v.upper() for v in self.values]
+        self._keys = normalizer.normalize_unique_values(self.values)
+        self._normalizer = normalizer
+
+        # Primeira posição de cada valor em maiúsculas e de cada chave normalizada
+        self._upper_positions: Dict[str, int] = {}
+        for position, upper in enumerate(self._upper):
+            self._upper_positions.setdefault(upper, position)
+        self._key_positions: Dict[str, int] = {}
+        for position, key in enumerate(self._keys):
+            self._key_positions.setdefault(key, position)
+
+        self._max_len = max((len(u) for u in self._upper), default=0)
+        self._upper_postings = _build_postings(self._upper)
+        self._key_postings = _build_postings(self._keys, padded=True)
+        self._key_gram_counts = np.array([len(_trigrams(f"  {key} ")) for key in self._keys], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __contains__(self, value: Any) -> bool:
+        return str(value) in self.exact
+
+    def match_key(self, value: str) -> Optional[str]:
+        """Valor do dataset com a mesma chave normalizada (ignora acentos, caixa e espaços)"""
+        position = self._key_positions.get(self._normalizer.normalize_text(value))
+        return self.values[position] if position is not None else None
+
+    def match_substring(self, value: str) -> Optional[str]:
+        """
+        Primeiro valor (na ordem do dataset) que contém `value` ou está contido
+        nele, ignorando caixa.
+
+        Mesmo resultado de [v for v in values if value.upper() in v.upper()
+        or v.upper() in value.upper()][0], sem percorrer todos os valores.
+        """
+        query = value.upper()
+        best = self._first_containing(query)
+        if '' in self._upper_positions:
+            best = min(best, self._upper_positions['']) if best is not None else self._upper_positions['']
+
+        # Valores contidos na consulta: procurar cada substring da consulta
+        for length in range(1, min(len(query), self._max_len) + 1):
+            for start in range(len(query) - length + 1):
+                position = self._upper_positions.get(query[start:start + length])
+                if position is not None and (best is None or position < best):
+                    best = position
+
+        return self.values[best] if best is not None else None
+
+    def _first_containing(self, query: str) -> Optional[int]:
+        """Menor posição de um valor que contém query (None se nenhum)"""
+        grams = _trigrams(query)
+        if not grams:
+            # Consultas curtas não têm trigramas: varredura com parada no primeiro match
+            return next((position for position, upper in enumerate(self._upper) if query in upper), None)
+
+        # Todo valor que contém query contém todos os seus trigramas: basta verificar,
+        # em ordem, os candidatos da lista invertida mais curta
+        shortest = None
+        for gram in grams:
+            postings = self._upper_postings.get(gram)
+            if postings is None:
+                return None
+            if shortest is None or len(postings) < len(shortest):
+                shortest = postings
+        return next((int(p) for p in shortest if query in self._upper[p]), None)
+
+    def match_approximate(self, value: str, min_similarity: float = MIN_SIMILARITY) -> Optional[str]:
+        """
+        Valor mais parecido pela similaridade de trigramas das chaves normalizadas.
+
+        Args:
+            value: Valor informado (pode ter erros de digitação)
+            min_similarity: Jaccard mínimo entre os trigramas
+
+        Returns:
+            Valor do dataset ou None se nenhum atinge a similaridade mínima
+        """
+        grams = _trigrams(f"  {self._normalizer.normalize_text(value)} ")
+        postings = [self._key_postings[gram] for gram in grams if gram in self._key_postings]
+        if not postings:
+            return None
+
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.values))
+        scores = shared / (len(grams) + self._key_gram_counts - shared)
+        # argmax devolve a primeira posição em caso de empate
+        best = int(np.argmax(scores))
+        return self.values[best] if scores[best] >= min_similarity else None
+
+    def match(self, value: str) -> Optional[str]:
+        """Melhor valor do dataset para `value`: chave normalizada, substring e aproximado, nesta ordem"""
+        for matcher in (self.match_key, self.match_substring, self.match_approximate):
+            result = matcher(value)
+            if result is not None:
+                return result
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna tamanho do índice"""
+        return {
+            'values': len(self.values),
+            'keys': len(self._key_positions),
+            'trigrams': len(self._upper_postings) + len(self._key_postings),
+        }
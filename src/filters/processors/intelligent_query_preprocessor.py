@@ -20,9 +20,15 @@ implementar pré-processamento com validação mais rigorosa.
 """
 
 import re
+import sys
+import os
 from typing import Dict, List, Tuple, Optional
 import pandas as pd
 
+# Adicionar src ao path para importar utils
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from utils.normalized_view import unique_values
+
 
 class IntelligentQueryPreprocessor:
     """
@@ -35,7 +41,7 @@ class IntelligentQueryPreprocessor:
         Inicializa o pré-processador
 
         Args:
-            df_dataset: Dataset para validação de valores
+            df_dataset: Dataset (DataFrame ou NormalizedView) para validação de valores
         """
         self.df_dataset = df_dataset
 
@@ -62,7 +68,7 @@ class IntelligentQueryPreprocessor:
     def _get_known_cities(self) -> List[str]:
         """Extrai cidades conhecidas do dataset"""
         if 'Municipio_Cliente' in self.df_dataset.columns:
-            cities = self.df_dataset['Municipio_Cliente'].dropna().unique().tolist()
+            cities = unique_values(self.df_dataset, 'Municipio_Cliente')
             return [city.strip().upper() for city in cities if isinstance(city, str)]
         return []
 
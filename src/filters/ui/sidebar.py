@@ -10,11 +10,15 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import pandas as pd
 
+from ..core.count_index import count_filtered_records
+
 
 def _get_filtered_record_count(df: pd.DataFrame, filter_context: Dict) -> Optional[int]:
     """
-    Conta registros filtrados aplicando os filtros ativos ao DataFrame usando pandas
-    Versão simplificada e robusta que evita problemas de tipos SQL
+    Conta registros filtrados aplicando os filtros ativos ao dataset
+
+    Usa o índice de contagem compartilhado (filters.core.count_index): sem cópias
+    do DataFrame, com busca binária na coluna Data e cache por contexto de filtros.
 
     Args:
         df: DataFrame com todos os dados
@@ -24,93 +28,7 @@ def _get_filtered_record_count(df: pd.DataFrame, filter_context: Dict) -> Option
         int: Contagem de registros filtrados ou None se houver erro
     """
     try:
-        # Começar com todos os registros
-        filtered_df = df.copy()
-
-        # Aplicar filtros temporais
-        if 'Data_>=' in filter_context and filter_context['Data_>=']:
-            filtered_df = filtered_df[filtered_df['Data'] >= filter_context['Data_>=']]
-        if 'Data_<' in filter_context and filter_context['Data_<']:
-            filtered_df = filtered_df[filtered_df['Data'] < filter_context['Data_<']]
-        if 'Data' in filter_context and filter_context['Data']:
-            filtered_df = filtered_df[filtered_df['Data'] == filter_context['Data']]
-
-        # Aplicar filtros de região
-        if 'UF_Cliente' in filter_context and filter_context['UF_Cliente']:
-            uf_values = filter_context['UF_Cliente']
-            if isinstance(uf_values, list):
-                filtered_df = filtered_df[filtered_df['UF_Cliente'].str.upper().isin([str(v).upper() for v in uf_values])]
-            else:
-                filtered_df = filtered_df[filtered_df['UF_Cliente'].str.upper() == str(uf_values).upper()]
-
-        if 'Municipio_Cliente' in filter_context and filter_context['Municipio_Cliente']:
-            mun_values = filter_context['Municipio_Cliente']
-            if isinstance(mun_values, list):
-                filtered_df = filtered_df[filtered_df['Municipio_Cliente'].str.upper().isin([str(v).upper() for v in mun_values])]
-            else:
-                filtered_df = filtered_df[filtered_df['Municipio_Cliente'].str.upper() == str(mun_values).upper()]
-
-        # Aplicar filtros de cliente
-        if 'Cod_Cliente' in filter_context and filter_context['Cod_Cliente']:
-            cod_values = filter_context['Cod_Cliente']
-            if isinstance(cod_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Cliente'].isin(cod_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Cliente'] == cod_values]
-
-        if 'Cod_Segmento_Cliente' in filter_context and filter_context['Cod_Segmento_Cliente']:
-            seg_values = filter_context['Cod_Segmento_Cliente']
-            if isinstance(seg_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Segmento_Cliente'].isin(seg_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Segmento_Cliente'] == seg_values]
-
-        # Aplicar filtros de produto
-        if 'Cod_Familia_Produto' in filter_context and filter_context['Cod_Familia_Produto']:
-            fam_values = filter_context['Cod_Familia_Produto']
-            if isinstance(fam_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Familia_Produto'].isin(fam_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Familia_Produto'] == fam_values]
-
-        if 'Cod_Grupo_Produto' in filter_context and filter_context['Cod_Grupo_Produto']:
-            grp_values = filter_context['Cod_Grupo_Produto']
-            if isinstance(grp_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Grupo_Produto'].isin(grp_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Grupo_Produto'] == grp_values]
-
-        if 'Cod_Linha_Produto' in filter_context and filter_context['Cod_Linha_Produto']:
-            lin_values = filter_context['Cod_Linha_Produto']
-            if isinstance(lin_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Linha_Produto'].isin(lin_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Linha_Produto'] == lin_values]
-
-        if 'Des_Linha_Produto' in filter_context and filter_context['Des_Linha_Produto']:
-            des_values = filter_context['Des_Linha_Produto']
-            if isinstance(des_values, list):
-                filtered_df = filtered_df[filtered_df['Des_Linha_Produto'].str.upper().isin([str(v).upper() for v in des_values])]
-            else:
-                filtered_df = filtered_df[filtered_df['Des_Linha_Produto'].str.upper() == str(des_values).upper()]
-
-        # Aplicar filtros de representante
-        if 'Cod_Vendedor' in filter_context and filter_context['Cod_Vendedor']:
-            vend_values = filter_context['Cod_Vendedor']
-            if isinstance(vend_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Vendedor'].isin(vend_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Vendedor'] == vend_values]
-
-        if 'Cod_Regiao_Vendedor' in filter_context and filter_context['Cod_Regiao_Vendedor']:
-            reg_values = filter_context['Cod_Regiao_Vendedor']
-            if isinstance(reg_values, list):
-                filtered_df = filtered_df[filtered_df['Cod_Regiao_Vendedor'].isin(reg_values)]
-            else:
-                filtered_df = filtered_df[filtered_df['Cod_Regiao_Vendedor'] == reg_values]
-
-        # Retornar contagem
-        return len(filtered_df)
+        return count_filtered_records(df, filter_context)
 
     except Exception as e:
         # Em caso de erro, retornar None silenciosamente
@@ -8,13 +8,13 @@ import pandas as pd
 from dateutil.relativedelta import relativedelta
 
 
-def create_chatbot_prompt(data_path, df, text_columns, alias_mapping):
+def create_chatbot_prompt(data_path, dataset_summary, text_columns, alias_mapping):
     """
     Cria o prompt template OTIMIZADO do chatbot
     
     Args:
         data_path (str): Caminho para o arquivo de dados
-        df (pd.DataFrame): DataFrame com os dados carregados
+        dataset_summary (dict): Resumo do dataset (DatasetRegistry.get_summary: rows, columns, max_date)
         text_columns (list): Lista de colunas de texto normalizadas
         alias_mapping (dict): Mapeamento de aliases
     
@@ -350,10 +350,10 @@ create_chart_from_last_query(
 **ATENÇÃO CRÍTICA**: Use datas do dataset, NÃO data atual do sistema.
 
 ### 📅 Interpretação Temporal
-- **"HOJE"** = {df['Data'].max().strftime('%Y-%m-%d')} (última data do dataset)
-- **"Último mês"** = {df['Data'].max().strftime('%Y-%m')}
-- **"Últimos 3 meses"** = desde {(df['Data'].max() - relativedelta(months=3)).strftime('%Y-%m-%d')}
-- **"Último ano"** = desde {(df['Data'].max() - relativedelta(years=1)).strftime('%Y-%m-%d')}
+- **"HOJE"** = {dataset_summary['max_date'].strftime('%Y-%m-%d')} (última data do dataset)
+- **"Último mês"** = {dataset_summary['max_date'].strftime('%Y-%m')}
+- **"Últimos 3 meses"** = desde {(dataset_summary['max_date'] - relativedelta(months=3)).strftime('%Y-%m-%d')}
+- **"Último ano"** = desde {(dataset_summary['max_date'] - relativedelta(years=1)).strftime('%Y-%m-%d')}
 
 ### ⛔ NUNCA FAÇA
 - ❌ Usar CURRENT_DATE ou NOW() para consultas relativas
@@ -461,9 +461,9 @@ Se query falhar por "tabela não encontrada":
 
 **Metadados do Dataset**:
 - Arquivo: `{data_path}`
-- Registros: `{len(df):,}`
-- Colunas: `{len(df.columns)}`
-- Colunas disponíveis: `{", ".join(df.columns.tolist())}`
+- Registros: `{dataset_summary['rows']:,}`
+- Colunas: `{len(dataset_summary['columns'])}`
+- Colunas disponíveis: `{", ".join(dataset_summary['columns'])}`
 - Colunas normalizadas: `{", ".join(text_columns)}`
 
 **Padrão SQL Obrigatório**:
@@ -5,12 +5,18 @@ Aplica transformações padrão para resolver problemas de capitalização e for
 
 import re
 import unicodedata
+import numpy as np
 import pandas as pd
 from typing import Union, List, Dict, Any, Tuple, Optional
 import yaml
 import calendar
 from datetime import datetime, timedelta
 
+# Versão da lógica de normalização: incrementar sempre que normalize_text mudar,
+# para invalidar artefatos normalizados persistidos em disco (utils.artifact_cache)
+NORMALIZER_VERSION = "1"
+
+
 class TextNormalizer:
     """Classe para normalização consistente de texto em datasets e consultas."""
     
@@ -27,30 +33,42 @@ class TextNormalizer:
             df: DataFrame com coluna 'Data' para extrair contexto temporal
         """
         if df is not None and 'Data' in df.columns:
-            max_date = df['Data'].max()
-            min_date = df['Data'].min()
-
-            # Imports para cálculos de contexto
-            from dateutil.relativedelta import relativedelta
-
-            self.dataset_context = {
-                'last_month': max_date.strftime('%Y-%m'),
-                'max_date': max_date,
-                'min_date': min_date,
-                'max_date_str': max_date.strftime('%Y-%m-%d'),
-                'min_date_str': min_date.strftime('%Y-%m-%d'),
-                'total_months': (max_date.year - min_date.year) * 12 + (max_date.month - min_date.month) + 1,
-
-                # Pré-computar exemplos comuns de períodos relativos
-                'temporal_examples': {
-                    'last_3_months_start': (max_date.replace(day=1) - relativedelta(months=2)).strftime('%Y-%m-%d'),
-                    'last_3_months_end': (max_date.replace(day=1) + relativedelta(months=1)).strftime('%Y-%m-%d'),
-                    'last_6_months_start': (max_date.replace(day=1) - relativedelta(months=5)).strftime('%Y-%m-%d'),
-                    'last_6_months_end': (max_date.replace(day=1) + relativedelta(months=1)).strftime('%Y-%m-%d'),
-                    'last_12_months_start': (max_date.replace(day=1) - relativedelta(months=11)).strftime('%Y-%m-%d'),
-                    'last_12_months_end': (max_date.replace(day=1) + relativedelta(months=1)).strftime('%Y-%m-%d'),
-                }
+            self.set_dataset_context_from_dates(df['Data'].min(), df['Data'].max())
+
+    def set_dataset_context_from_dates(self, min_date, max_date):
+        """
+        Configura o contexto temporal a partir das datas mínima e máxima do dataset.
+
+        Permite restaurar o contexto sem varrer o DataFrame (ex: metadados em cache).
+
+        Args:
+            min_date: Primeira data do dataset (Timestamp ou string ISO)
+            max_date: Última data do dataset (Timestamp ou string ISO)
+        """
+        min_date = pd.Timestamp(min_date)
+        max_date = pd.Timestamp(max_date)
+
+        # Imports para cálculos de contexto
+        from dateutil.relativedelta import relativedelta
+
+        self.dataset_context = {
+            'last_month': max_date.strftime('%Y-%m'),
+            'max_date': max_date,
+            'min_date': min_date,
+            'max_date_str': max_date.strftime('%Y-%m-%d'),
+            'min_date_str': min_date.strftime('%Y-%m-%d'),
+            'total_months': (max_date.year - min_date.year) * 12 + (max_date.month - min_date.month) + 1,
+
+            # Pré-computar exemplos comuns de períodos relativos
+            'temporal_examples': {
+                'last_3_months_start': (max_date.replace(day=1) - relativedelta(months=2)).strftime('%Y-%m-%d'),
+                'last_3_months_end': (max_date.replace(day=1) + relativedelta(months=1)).strftime('%Y-%m-%d'),
+                'last_6_months_start': (max_date.replace(day=1) - relativedelta(months=5)).strftime('%Y-%m-%d'),
+                'last_6_months_end': (max_date.replace(day=1) + relativedelta(months=1)).strftime('%Y-%m-%d'),
+                'last_12_months_start': (max_date.replace(day=1) - relativedelta(months=11)).strftime('%Y-%m-%d'),
+                'last_12_months_end': (max_date.replace(day=1) + relativedelta(months=1)).strftime('%Y-%m-%d'),
             }
+        }
 
     def generate_temporal_context_reminder(self, query_type='general'):
         """
@@ -122,17 +140,95 @@ EXEMPLOS PRÉ-COMPUTADOS:
         
         return text
     
+    def normalize_unique_values(self, values) -> List[str]:
+        """
+        Normaliza uma lista de valores únicos (dicionário de uma coluna).
+
+        Args:
+            values: Iterável com valores distintos
+
+        Returns:
+            Lista com o valor normalizado de cada entrada, na mesma ordem
+        """
+        return [self.normalize_text(value) for value in values]
+
+    def normalize_codes(self, codes: np.ndarray, uniques) -> np.ndarray:
+        """
+        Normaliza um array codificado por dicionário (codes + valores únicos).
+
+        Apenas os valores únicos passam por normalize_text; o resultado é
+        propagado para todas as linhas por indexação vetorizada dos códigos.
+        Códigos -1 (nulos) resultam em string vazia, como em normalize_text.
+
+        Args:
+            codes: Array de inteiros com o índice de cada linha em `uniques`
+            uniques: Valores únicos referenciados pelos códigos
+
+        Returns:
+            Array numpy (object) com os valores normalizados por linha
+        """
+        lookup = np.empty(len(uniques) + 1, dtype=object)
+        lookup[:len(uniques)] = self.normalize_unique_values(uniques)
+        lookup[len(uniques)] = ""  # posição -1 → nulo
+        return lookup[codes]
+
     def normalize_column(self, series: pd.Series) -> pd.Series:
         """
         Normaliza uma coluna inteira do pandas DataFrame.
-        
+
+        Equivale a series.apply(normalize_text), mas normaliza apenas o
+        dicionário de valores únicos (categorias ou pd.factorize) e propaga
+        o resultado pelos códigos. Colunas categóricas continuam categóricas.
+
         Args:
             series: Serie do pandas a ser normalizada
-            
+
         Returns:
             Serie normalizada
         """
-        return series.apply(self.normalize_text)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories
+            normalized = self.normalize_unique_values(categories)
+            if series.isna().any():
+                normalized.append("")
+            # Normalização pode unir categorias distintas ("SÃO PAULO" e "sao paulo")
+            new_categories, remap = np.unique(np.array(normalized, dtype=object), return_inverse=True)
+            new_codes = remap[series.cat.codes.to_numpy()]
+            return pd.Series(
+                pd.Categorical.from_codes(new_codes, categories=new_categories),
+                index=series.index,
+                name=series.name,
+            )
+
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        return pd.Series(self.normalize_codes(codes, uniques), index=series.index, name=series.name)
+
+    def normalize_arrow_array(self, array):
+        """
+        Normaliza um array Arrow de strings (ou dictionary-encoded).
+
+        O array é codificado por dicionário, apenas o dicionário é normalizado
+        e o resultado é reconstruído com pyarrow.compute.take.
+
+        Args:
+            array: pyarrow.Array ou pyarrow.ChunkedArray
+
+        Returns:
+            pyarrow.Array de strings normalizadas (nulos → "")
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if isinstance(array, pa.ChunkedArray):
+            array = array.combine_chunks()
+        if not pa.types.is_dictionary(array.type):
+            array = pc.dictionary_encode(array)
+
+        normalized_dictionary = pa.array(
+            self.normalize_unique_values(array.dictionary.to_pylist()), type=pa.string()
+        )
+        result = pc.take(normalized_dictionary, array.indices)
+        return pc.fill_null(result, "")
     
     def identify_text_columns(self, df: pd.DataFrame) -> List[str]:
         """
@@ -173,7 +269,9 @@ EXEMPLOS PRÉ-COMPUTADOS:
         Returns:
             DataFrame com colunas de texto normalizadas
         """
-        df_normalized = df.copy()
+        # Cópia rasa: apenas as colunas de texto são substituídas, as demais
+        # compartilham os buffers do DataFrame original
+        df_normalized = df.copy(deep=False)
         
         # Determinar quais colunas normalizar
         if specific_columns is not None:
@@ -3,12 +3,45 @@ Ferramenta DuckDB Otimizada com normalização automática de strings e captura
 """
 
 from agno.tools.duckdb import DuckDbTools
+from agno.utils.log import log_debug, log_info
+import contextvars
+import duckdb
+import pyarrow as pa
 import sys
 import os
+import time
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 # from parsers.sql_context_parser import extract_where_clause_context  # Removido - agora usando sistema JSON
 import pandas as pd
 import re
+from typing import List, Optional, Tuple
+
+from config.model_config import PARALLEL_QUERY_CONFIG
+from utils.parallel_queries import CursorPool, get_query_executor, is_read_only
+from utils.sql_cache import (get_cached_query, cache_query_result, get_data_epoch, get_table_versions,
+                             is_query_cached)
+from utils.rollup_cubes import RollupRouter
+from utils.string_predicates import StringPredicateRewriter
+from utils.tracing import span
+
+# Funções cujo resultado muda entre execuções: queries com elas não são cacheadas
+VOLATILE_SQL_PATTERN = re.compile(
+    r"\b(random|uuid|gen_random_uuid|now|current_date|current_time|current_timestamp|today|setseed|nextval)\b",
+    re.IGNORECASE
+)
+
+# Comparações de strings normalizadas com LOWER(): coluna = 'valor', coluna LIKE 'valor'
+# Captura: nome da coluna, operador, valor entre aspas
+STRING_COMPARISON_PATTERNS = [
+    # Igualdade: WHERE coluna = 'valor'
+    re.compile(r"(\w+)\s*(=)\s*'([^']*)'", re.IGNORECASE),
+    # LIKE: WHERE coluna LIKE 'valor'
+    re.compile(r"(\w+)\s+(LIKE)\s+'([^']*)'", re.IGNORECASE),
+    # Igualdade com aspas duplas: WHERE coluna = "valor"
+    re.compile(r"(\w+)\s*(=)\s*\"([^\"]*)\"", re.IGNORECASE),
+    # LIKE com aspas duplas: WHERE coluna LIKE "valor"
+    re.compile(r"(\w+)\s+(LIKE)\s+\"([^\"]*)\"", re.IGNORECASE),
+]
 
 
 class DebugDuckDbTools(DuckDbTools):
@@ -17,11 +50,23 @@ class DebugDuckDbTools(DuckDbTools):
     de strings e captura contexto das queries SQL com cache inteligente
     """
 
-    def __init__(self, debug_info_ref=None, *args, **kwargs):
+    def __init__(self, debug_info_ref=None, *args, shared_cache=False, **kwargs):
+        """
+        Args:
+            debug_info_ref: Objeto com atributo debug_info (PrincipalAgent)
+            shared_cache: Usar o cache de resultados compartilhado entre sessões
+                (apenas para cursores do banco compartilhado, ver utils.duckdb_pool)
+        """
         super().__init__(*args, **kwargs)
         self.debug_info_ref = debug_info_ref
+        self.shared_cache = shared_cache
         self.last_result_df = None  # Armazenar último DataFrame resultado
         self.last_query = None  # Armazenar última query SQL executada (para mapeamento de aliases)
+        self._rollup_router = None  # Criado no primeiro run_query (lê o catálogo de rollups)
+        self._string_rewriter = None  # Criado no primeiro run_query (lê o dicionário de valores)
+        self._cursor_pool = None  # Cursores para queries paralelas (ver utils.parallel_queries)
+        self._prefetched = {}  # SQL físico -> (texto, tabela Arrow) já executado em paralelo
+        self._prefetched_epoch = None  # Época dos dados em que o lote foi executado
 
         # Cache inteligente de metadados para evitar queries redundantes
         self.metadata_cache = {
@@ -29,55 +74,38 @@ class DebugDuckDbTools(DuckDbTools):
             'table_schemas': {},    # Schema de tabelas já consultadas
             'basic_stats': {},      # Estatísticas básicas já calculadas
             'initialization_done': False,  # Se a inicialização foi concluída
-            'recent_queries': {},   # Cache de queries recentes para evitar duplicação
-            'last_query_hash': None  # Hash da última query executada
         }
 
-    def _normalize_query_strings(self, query: str) -> str:
-        """Aplica normalização LOWER() automaticamente a todas as comparações de strings na query"""
-
-        # Pattern para detectar comparações de strings: coluna = 'valor', coluna LIKE 'valor', etc.
-        # Captura: operador de comparação, nome da coluna, operador, valor entre aspas
-        patterns = [
-            # Igualdade: WHERE coluna = 'valor'
-            (r"(\w+)\s*(=)\s*'([^']*)'", r"LOWER(\1) \2 '\3'"),
-            # LIKE: WHERE coluna LIKE 'valor'
-            (r"(\w+)\s+(LIKE)\s+'([^']*)'", r"LOWER(\1) \2 '\3'"),
-            # Igualdade com aspas duplas: WHERE coluna = "valor"
-            (r"(\w+)\s*(=)\s*\"([^\"]*)\"", r"LOWER(\1) \2 '\3'"),
-            # LIKE com aspas duplas: WHERE coluna LIKE "valor"
-            (r"(\w+)\s+(LIKE)\s+\"([^\"]*)\"", r"LOWER(\1) \2 '\3'"),
-        ]
+    def _normalize_query_strings(self, query: str, record: bool = True) -> str:
+        """
+        Aplica normalização LOWER() automaticamente a todas as comparações de strings na query
 
-        normalized_query = query
+        Cada padrão é aplicado em uma única passada (re.sub com os padrões
+        pré-compilados em STRING_COMPARISON_PATTERNS). O texto resultante é o que
+        aparece em sql_queries e alimenta a extração de filtros; na execução,
+        LOWER(coluna) é trocado pelos valores originais (ver _execute_with_rollup).
+        record=False não registra as normalizações no debug_info (pré-execução paralela).
+        """
         applied_normalizations = []
 
-        for pattern, replacement in patterns:
-            # Encontrar todas as correspondências
-            matches = re.finditer(pattern, normalized_query, re.IGNORECASE)
+        def normalize(match: re.Match) -> str:
+            column, operator, value = match.group(1), match.group(2), match.group(3)
+            # Converter o valor para lowercase também
+            normalized_value = value.lower()
+            applied_normalizations.append({
+                "column": column,
+                "operator": operator,
+                "original_value": value,
+                "normalized_value": normalized_value
+            })
+            return f"LOWER({column}) {operator} '{normalized_value}'"
 
-            for match in matches:
-                column = match.group(1)
-                operator = match.group(2)
-                value = match.group(3)
-
-                # Converter o valor para lowercase também
-                normalized_value = value.lower()
-
-                # Aplicar a substituição com LOWER() na coluna e valor normalizado
-                old_text = match.group(0)
-                new_text = f"LOWER({column}) {operator} '{normalized_value}'"
-
-                normalized_query = normalized_query.replace(old_text, new_text)
-                applied_normalizations.append({
-                    "column": column,
-                    "operator": operator,
-                    "original_value": value,
-                    "normalized_value": normalized_value
-                })
+        normalized_query = query
+        for pattern in STRING_COMPARISON_PATTERNS:
+            normalized_query = pattern.sub(normalize, normalized_query)
 
         # Log das normalizações aplicadas para debug
-        if applied_normalizations and self.debug_info_ref and hasattr(self.debug_info_ref, "debug_info"):
+        if record and applied_normalizations and self.debug_info_ref and hasattr(self.debug_info_ref, "debug_info"):
             if "string_normalizations" not in self.debug_info_ref.debug_info:
                 self.debug_info_ref.debug_info["string_normalizations"] = []
             self.debug_info_ref.debug_info["string_normalizations"].extend(applied_normalizations)
@@ -161,49 +189,48 @@ class DebugDuckDbTools(DuckDbTools):
                 })
             return cached_result
 
-        # VERIFICAR QUERY DUPLICADA recentemente
-        query_hash = hash(query.strip().lower())
-        if query_hash == self.metadata_cache['last_query_hash']:
-            # Query idêntica executada recentemente
-            if query_hash in self.metadata_cache['recent_queries']:
-                if self.debug_info_ref and hasattr(self.debug_info_ref, "debug_info"):
-                    if "duplicate_queries_avoided" not in self.debug_info_ref.debug_info:
-                        self.debug_info_ref.debug_info["duplicate_queries_avoided"] = []
-                    self.debug_info_ref.debug_info["duplicate_queries_avoided"].append(query.strip())
-                return self.metadata_cache['recent_queries'][query_hash]
-
         # APLICAR NORMALIZAÇÃO AUTOMÁTICA de todas as strings na query
         normalized_query = self._normalize_query_strings(query)
 
-        # Executar a query normalizada
-        result = super().run_query(normalized_query)
+        # CACHE COMPARTILHADO entre sessões (chave: SQL normalizado + versão das tabelas);
+        # a época dos dados é lida antes da execução (resultado anterior a um refresh não é gravado)
+        epoch = get_data_epoch()
+        cache_params = self._shared_cache_params(normalized_query)
+        result_table = self._cached_result(normalized_query, cache_params)
 
-        # CACHE o resultado se for metadados
-        self._cache_query_result(query, result)
+        if result_table is not None:
+            result_table = self._apply_output_names(normalized_query, result_table)
+            result = self._format_arrow_result(result_table)
+            if self.debug_info_ref and hasattr(self.debug_info_ref, "debug_info"):
+                if "cached_queries" not in self.debug_info_ref.debug_info:
+                    self.debug_info_ref.debug_info["cached_queries"] = []
+                self.debug_info_ref.debug_info["cached_queries"].append({
+                    "query": normalized_query.strip(),
+                    "cache_hit": True,
+                    "optimization": "Shared result cache hit - query avoided"
+                })
+        else:
+            # Executar a query normalizada UMA única vez (texto e DataFrame do mesmo resultado),
+            # no menor rollup mensal que a responde quando possível
+            result, result_table = self._execute_with_rollup(normalized_query)
+            self._count_execution(normalized_query)
 
-        # CACHE da query recente para evitar duplicação
-        self.metadata_cache['recent_queries'][query_hash] = result
-        self.metadata_cache['last_query_hash'] = query_hash
+            if result_table is not None and cache_params is not None:
+                cache_query_result(self._format_sql(normalized_query), result_table,
+                                   cache_params, tables=cache_params.keys(), epoch=epoch)
 
-        # Limitar cache de queries recentes para evitar vazamento de memória
-        if len(self.metadata_cache['recent_queries']) > 10:
-            # Remover a query mais antiga
-            oldest_hash = min(self.metadata_cache['recent_queries'].keys())
-            del self.metadata_cache['recent_queries'][oldest_hash]
+        # CACHE o resultado se for metadados
+        self._cache_query_result(query, result)
 
-        # CAPTURAR DADOS DO RESULTADO para visualização
-        try:
-            # Tentar executar novamente a query para capturar DataFrame
-            if hasattr(self, 'connection') and self.connection:
-                df_result = self.connection.execute(normalized_query).df()
-                if not df_result.empty:
-                    self.last_result_df = df_result
-                    # Salvar query que gerou este DataFrame (para mapeamento de aliases)
-                    self.last_query = normalized_query
-        except Exception as e:
-            # Se falhar, tentar extrair dados do resultado textual
+        # CAPTURAR DADOS DO RESULTADO para visualização (sem reexecutar a query)
+        if result_table is not None:
+            if result_table.num_rows > 0:
+                self.last_result_df = self._arrow_to_dataframe(result_table)
+                # Salvar query que gerou este DataFrame (para mapeamento de aliases)
+                self.last_query = normalized_query
+        else:
+            # Erro ou comando sem resultado: tentar extrair dados do resultado textual
             self.last_result_df = self._parse_result_to_dataframe(result)
-            # Ainda assim salvar a query
             if self.last_result_df is not None:
                 self.last_query = normalized_query
 
@@ -232,6 +259,300 @@ class DebugDuckDbTools(DuckDbTools):
 
         return result
 
+    def run_side_query(self, query: str) -> Optional[pa.Table]:
+        """
+        Executa uma query auxiliar (ex: total do universo de um ranking, ver
+        utils.universe_total) pelo mesmo caminho de run_query: cache compartilhado,
+        predicados de string e rollups.
+
+        Não altera last_result_df, last_query nem sql_queries (a query não foi
+        pedida pelo agente e não deve virar gráfico nem filtro).
+
+        Args:
+            query: SQL já normalizado (ex: derivado de last_query)
+
+        Returns:
+            Tabela Arrow do resultado ou None em caso de erro
+        """
+        epoch = get_data_epoch()
+        cache_params = self._shared_cache_params(query)
+        result_table = self._cached_result(query, cache_params)
+        if result_table is not None:
+            return result_table
+
+        _, result_table = self._execute_with_rollup(query)
+        self._count_execution(query)
+        if result_table is not None and cache_params is not None:
+            cache_query_result(self._format_sql(query), result_table, cache_params,
+                               tables=cache_params.keys(), epoch=epoch)
+        return result_table
+
+    def _cached_result(self, query: str, cache_params: Optional[dict]) -> Optional[pa.Table]:
+        """Resultado do cache compartilhado (None sem cache ou sem entrada)"""
+        if cache_params is None:
+            return None
+        with span("duckdb.cache_lookup") as record:
+            result_table = get_cached_query(self._format_sql(query), cache_params)
+            if record is not None:
+                record['attributes']['hit'] = result_table is not None
+        return result_table
+
+    @staticmethod
+    def _format_sql(query: str) -> str:
+        """Mesma formatação de DuckDbTools: remove crases e mantém só o primeiro statement"""
+        return query.replace("`", "").split(";")[0]
+
+    def _shared_cache_params(self, query: str) -> Optional[dict]:
+        """
+        Parâmetros de cache (versão de cada tabela lida) ou None se a query não é cacheável.
+
+        Apenas SELECT/WITH determinísticos sobre tabelas versionadas são cacheados;
+        quando uma tabela é reconstruída (bump_table_version) as entradas que a leram
+        são descartadas e a nova versão passa a compor a chave.
+        """
+        if not self.shared_cache:
+            return None
+
+        formatted_sql = self._format_sql(query).strip()
+        # Mesmo critério da pré-execução paralela (utils.parallel_queries)
+        if not is_read_only(formatted_sql) or VOLATILE_SQL_PATTERN.search(formatted_sql):
+            return None
+
+        query_lower = formatted_sql.lower()
+
+        tables = {
+            table: version for table, version in get_table_versions().items()
+            if re.search(rf"\b{re.escape(table.lower())}\b", query_lower)
+        }
+        return tables or None
+
+    def _apply_output_names(self, query: str, table: pa.Table) -> pa.Table:
+        """
+        Reaplica os nomes de coluna desta query a um resultado vindo do cache.
+
+        O fingerprint ignora aliases e caixa, então a entrada pode ter sido gerada
+        por uma query equivalente com outros nomes de saída. Os nomes são obtidos
+        apenas fazendo o bind da query (sem executá-la).
+        """
+        try:
+            names = self.connection.sql(self._format_sql(query)).columns
+        except Exception:
+            return table
+        if len(names) == table.num_columns and list(names) != table.column_names:
+            return table.rename_columns(names)
+        return table
+
+    def _execute_with_rollup(self, query: str) -> Tuple[str, Optional[pa.Table]]:
+        """
+        Executa a query em um rollup mensal (ver utils.rollup_cubes) ou na tabela base.
+
+        Antes do roteamento, comparações sobre LOWER(coluna) viram IN sobre os
+        valores originais (ver utils.string_predicates). O resultado de uma query
+        reescrita recebe os nomes de coluna da query original, então texto e
+        DataFrame são os mesmos que a execução da query original produziria.
+        """
+        physical_query, string_rewrite, rewrite = self._physical_query(query)
+        if rewrite is None and string_rewrite is None:
+            return self._execute_query(query)
+
+        result, result_table = self._execute_query(physical_query)
+        if result_table is None:
+            # Falha inesperada na reescrita: a query original sempre responde
+            return self._execute_query(query)
+
+        if self.debug_info_ref is not None and hasattr(self.debug_info_ref, "debug_info"):
+            if string_rewrite is not None:
+                self.debug_info_ref.debug_info.setdefault("string_predicate_rewrites", []).append({
+                    "query": query.strip(),
+                    "predicates": string_rewrite['predicates'],
+                })
+            if rewrite is not None:
+                self.debug_info_ref.debug_info.setdefault("rollup_rewrites", []).append({
+                    "query": query.strip(),
+                    "rollup": rewrite['rollup'],
+                    "rollup_rows": rewrite['rollup_rows'],
+                })
+        result_table = self._apply_output_names(query, result_table)
+        return self._format_arrow_result(result_table), result_table
+
+    def _physical_query(self, query: str) -> Tuple[str, Optional[dict], Optional[dict]]:
+        """
+        SQL efetivamente executado para a query normalizada.
+
+        Returns:
+            tuple: (SQL físico, reescrita de predicados de string ou None, reescrita de rollup ou None)
+        """
+        if self._rollup_router is None:
+            self._rollup_router = RollupRouter(self.connection)
+            self._string_rewriter = StringPredicateRewriter(self.connection)
+
+        with span("duckdb.rewrite") as record:
+            physical_query = self._format_sql(query)
+            string_rewrite = self._string_rewriter.rewrite(physical_query)
+            if string_rewrite is not None:
+                physical_query = string_rewrite['sql']
+
+            rewrite = self._rollup_router.rewrite(physical_query)
+            if record is not None:
+                record['attributes'].update(string_predicates=string_rewrite is not None,
+                                            rollup=rewrite['rollup'] if rewrite is not None else None)
+        if rewrite is not None:
+            return rewrite['sql'], string_rewrite, rewrite
+        return (physical_query if string_rewrite is not None else query), string_rewrite, None
+
+    def prefetch_queries(self, queries: List[str]) -> bool:
+        """
+        Executa em paralelo, em cursores do pool, as queries de um lote de chamadas run_query.
+
+        Apenas a execução no DuckDB é antecipada: cada run_query seguinte, na ordem
+        do modelo, faz normalização, cache e captura do resultado normalmente e só
+        consome o resultado pronto (ver utils.parallel_queries). Queries de
+        metadados já conhecidas e resultados já cacheados ficam de fora; um lote
+        com qualquer comando (CREATE, INSERT...) não é antecipado, pois um SELECT
+        poderia rodar antes do comando que o precede. Erros não são guardados:
+        a query roda de novo na conexão da sessão (ex: tabela temporária, que
+        os cursores do pool não enxergam).
+
+        Args:
+            queries: Argumento query de cada chamada run_query, na ordem do modelo
+
+        Returns:
+            bool: True se ao menos duas queries foram pré-executadas
+        """
+        self.discard_prefetched()
+        physical_queries = []
+        for query in queries:
+            if self._is_redundant_metadata_query(query)[0]:
+                continue
+            normalized_query = self._normalize_query_strings(query, record=False)
+            if not is_read_only(self._format_sql(normalized_query)):
+                return False
+            cache_params = self._shared_cache_params(normalized_query)
+            if cache_params is not None and is_query_cached(self._format_sql(normalized_query), cache_params):
+                continue
+            physical_query = self._format_sql(self._physical_query(normalized_query)[0])
+            if physical_query not in physical_queries:
+                physical_queries.append(physical_query)
+        if len(physical_queries) < 2:
+            return False
+
+        if self._cursor_pool is None:
+            self._cursor_pool = CursorPool(self.connection, PARALLEL_QUERY_CONFIG["max_workers"])
+        executor = get_query_executor()
+        epoch = get_data_epoch()
+
+        with span("duckdb.parallel_batch", queries=len(physical_queries)) as record:
+            started = time.perf_counter()
+            # Cada worker herda o contexto (trace do turno): seus spans ficam sob este lote
+            futures = [executor.submit(contextvars.copy_context().run, self._prefetch_one, physical_query)
+                       for physical_query in physical_queries]
+            try:
+                results = [future.result() for future in futures]
+            except Exception as e:
+                # Ex: falha inesperada em um worker; run_query executa normalmente
+                log_debug(f"Parallel prefetch failed: {e}")
+                return False
+            wall_ms = (time.perf_counter() - started) * 1000
+
+            serial_ms = sum(elapsed_ms for _, _, elapsed_ms in results)
+            batch = {
+                'queries': len(physical_queries),
+                'wall_ms': round(wall_ms, 3),
+                'serial_ms': round(serial_ms, 3),
+                'saved_ms': round(max(serial_ms - wall_ms, 0.0), 3),
+            }
+            if record is not None:
+                record['attributes'].update(batch)
+
+        self._prefetched = {physical_query: (result, result_table)
+                            for physical_query, (result, result_table, _) in zip(physical_queries, results)
+                            if result_table is not None}
+        self._prefetched_epoch = epoch
+        if self.debug_info_ref is not None and hasattr(self.debug_info_ref, "debug_info"):
+            self.debug_info_ref.debug_info.setdefault("parallel_queries", []).append(batch)
+        return True
+
+    def _prefetch_one(self, formatted_sql: str) -> Tuple[str, Optional[pa.Table], float]:
+        """Executa uma query do lote em um cursor exclusivo (thread do pool)"""
+        started = time.perf_counter()
+        with self._cursor_pool.acquire() as cursor:
+            result, result_table = self._run_sql(formatted_sql, cursor)
+        return result, result_table, (time.perf_counter() - started) * 1000
+
+    def discard_prefetched(self):
+        """Descarta resultados pré-executados ainda não consumidos por run_query"""
+        self._prefetched = {}
+
+    def _execute_query(self, query: str) -> Tuple[str, Optional[pa.Table]]:
+        """
+        Executa a query uma única vez e retorna o texto para o agente e a tabela Arrow.
+
+        O texto segue exatamente o formato de DuckDbTools.run_query (cabeçalho com
+        colunas separadas por vírgula e uma linha por registro). Se a query foi
+        pré-executada no lote paralelo do passo, o resultado pronto é usado.
+
+        Returns:
+            tuple: (resultado textual, tabela Arrow ou None para erros/comandos sem resultado)
+        """
+        formatted_sql = self._format_sql(query)
+        prefetched = self._prefetched.pop(formatted_sql, None)
+        # Resultado pré-executado antes de um refresh dos dados: executar de novo
+        if prefetched is not None and self._prefetched_epoch == get_data_epoch():
+            return prefetched
+        return self._run_sql(formatted_sql, self.connection)
+
+    def _run_sql(self, formatted_sql: str, connection: duckdb.DuckDBPyConnection) -> Tuple[str, Optional[pa.Table]]:
+        """Execução no DuckDB de _execute_query, na conexão informada"""
+        try:
+            log_info(f"Running: {formatted_sql}")
+
+            with span("duckdb.execute") as record:
+                query_result = connection.sql(formatted_sql)
+                if query_result is None:
+                    return "No output", None
+
+                to_arrow = getattr(query_result, 'to_arrow_table', None) or query_result.fetch_arrow_table
+                result_table = to_arrow()
+                if record is not None:
+                    record['attributes']['rows'] = result_table.num_rows
+            result_output = self._format_arrow_result(result_table)
+
+            log_debug(f"Query result: {result_output}")
+            return result_output, result_table
+        except Exception as e:
+            return str(e), None
+
+    @staticmethod
+    def _format_arrow_result(table: pa.Table) -> str:
+        """Renderiza a tabela Arrow no formato textual de DuckDbTools.run_query"""
+        columns = [table.column(i).to_pylist() for i in range(table.num_columns)]
+        result_rows = []
+        for row in zip(*columns):
+            if len(row) == 1:
+                result_rows.append(str(row[0]))
+            else:
+                result_rows.append(",".join(str(x) for x in row))
+
+        return ",".join(table.column_names) + "\n" + "\n".join(result_rows)
+
+    @staticmethod
+    def _arrow_to_dataframe(table: pa.Table) -> pd.DataFrame:
+        """
+        Converte o resultado Arrow em DataFrame com os mesmos dtypes de .df() do DuckDB.
+
+        Decimais (ex: SUM de inteiros, HUGEINT) viram float64 e datas viram datetime64.
+        """
+        decimal_fields = [i for i, field in enumerate(table.schema) if pa.types.is_decimal(field.type)]
+        for i in decimal_fields:
+            table = table.set_column(i, table.schema.field(i).name, table.column(i).cast(pa.float64()))
+        return table.to_pandas(date_as_object=False)
+
+    def _count_execution(self, query: str):
+        """Conta execuções por query no debug_info (cada query deve executar uma única vez)"""
+        if self.debug_info_ref is not None and hasattr(self.debug_info_ref, "debug_info"):
+            executions = self.debug_info_ref.debug_info.setdefault("query_executions", {})
+            executions[query.strip()] = executions.get(query.strip(), 0) + 1
+
     def _parse_result_to_dataframe(self, result_text):
         """Converte resultado textual em DataFrame quando possível"""
         try:
@@ -15,6 +15,8 @@ import os
 # Importar funções de detecção de IDs categóricos
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from utils.formatters import detect_categorical_id, format_categorical_id_label
+from utils.tracing import span
+from utils.universe_total import plan_universe_total
 
 # FASE 3: Lazy import - carregar apenas quando necessário
 _numeric_analyzer_loaded = False
@@ -1117,134 +1119,65 @@ class VisualizationTools(Toolkit):
     def _calcular_total_universo(self) -> Optional[float]:
         """
         Calcula o total do universo completo filtrado para queries Top N.
-        
-        Detecta se a última query tinha LIMIT (Top N) e executa uma query
-        auxiliar SEM o LIMIT para calcular o total correto do universo.
-        
+
+        A query do total (mesma agregação e mesmo WHERE, sem GROUP BY/ORDER BY/LIMIT)
+        é montada pela AST do DuckDB (ver utils.universe_total). Ranking não
+        truncado com SUM/COUNT: o total é a soma da própria coluna do resultado,
+        sem nova query. Caso contrário a query do total passa pelo caminho da
+        ferramenta DuckDB (cache compartilhado, rollups), então rankings com o
+        mesmo filtro e a mesma agregação reutilizam o mesmo total.
+
         Returns:
             Total do universo completo ou None se não for aplicável
         """
         if self.duckdb_tool_ref is None or not hasattr(self.duckdb_tool_ref, 'last_query'):
             return None
-            
+
         last_query = self.duckdb_tool_ref.last_query
         if not last_query:
             return None
-            
+
         # Detectar se é uma query Top N (tem LIMIT)
-        query_upper = last_query.upper()
-        if 'LIMIT' not in query_upper:
+        if 'LIMIT' not in last_query.upper():
             return None  # Não é Top N, não precisa de correção
-            
-        try:
-            # Extrair a coluna de valor que está sendo agregada
-            # Padrão típico: SELECT col1, SUM(col2) as alias FROM ... WHERE ... ORDER BY ... LIMIT N
-            
-            # 1. Remover LIMIT e ORDER BY
-            query_sem_limit = self._remover_limit_orderby(last_query)
-            
-            # 2. Extrair a coluna agregada (SUM, COUNT, AVG, etc.)
-            coluna_agregada = self._extrair_coluna_agregada(last_query)
-            
-            if not coluna_agregada:
-                return None
-                
-            # 3. Construir query auxiliar para calcular total do universo
-            # Manter WHERE, mas remover GROUP BY, ORDER BY e LIMIT
-            query_total = self._construir_query_total(query_sem_limit, coluna_agregada)
-            
-            if not query_total:
-                return None
-                
-            # 4. Executar query auxiliar
-            result_df = self.duckdb_tool_ref.connection.execute(query_total).df()
-            
-            if result_df.empty or len(result_df.columns) == 0:
+
+        with span("visualization.total_universo") as record:
+            try:
+                plan = plan_universe_total(self.duckdb_tool_ref.connection, last_query)
+                if plan is None:
+                    return None
+
+                # Ranking não truncado: o resultado já contém todos os grupos
+                df = self.duckdb_tool_ref.last_result_df
+                if plan['additive'] and df is not None and len(df) < plan['limit'] \
+                        and plan['column_index'] < len(df.columns):
+                    if record is not None:
+                        record['attributes']['source'] = 'ranking'
+                    return float(pd.to_numeric(df.iloc[:, plan['column_index']]).sum())
+
+                if record is not None:
+                    record['attributes']['source'] = 'query'
+                if hasattr(self.duckdb_tool_ref, 'run_side_query'):
+                    result_table = self.duckdb_tool_ref.run_side_query(plan['sql'])
+                    if result_table is None or result_table.num_rows == 0:
+                        return None
+                    total = result_table.column(0)[0].as_py()
+                else:
+                    row = self.duckdb_tool_ref.connection.execute(plan['sql']).fetchone()
+                    total = row[0] if row else None
+
+                return float(total) if total is not None else None
+
+            except Exception as e:
+                # Em caso de erro, retornar None (usará comportamento legado)
+                if self.debug_info_ref and hasattr(self.debug_info_ref, 'debug_info'):
+                    if 'total_universo_errors' not in self.debug_info_ref.debug_info:
+                        self.debug_info_ref.debug_info['total_universo_errors'] = []
+                    self.debug_info_ref.debug_info['total_universo_errors'].append({
+                        'error': str(e),
+                        'query': last_query
+                    })
                 return None
-                
-            # Pegar o primeiro valor (total)
-            total = float(result_df.iloc[0, 0])
-            
-            return total
-            
-        except Exception as e:
-            # Em caso de erro, retornar None (usará comportamento legado)
-            if self.debug_info_ref and hasattr(self.debug_info_ref, 'debug_info'):
-                if 'total_universo_errors' not in self.debug_info_ref.debug_info:
-                    self.debug_info_ref.debug_info['total_universo_errors'] = []
-                self.debug_info_ref.debug_info['total_universo_errors'].append({
-                    'error': str(e),
-                    'query': last_query
-                })
-            return None
-    
-    def _remover_limit_orderby(self, query: str) -> str:
-        """Remove LIMIT e ORDER BY da query"""
-        import re
-        
-        # Remover ORDER BY ... LIMIT N (case insensitive)
-        query_limpo = re.sub(r'\s+ORDER\s+BY\s+[^;]+LIMIT\s+\d+', '', query, flags=re.IGNORECASE)
-        
-        # Se ainda houver LIMIT sozinho, remover
-        query_limpo = re.sub(r'\s+LIMIT\s+\d+', '', query_limpo, flags=re.IGNORECASE)
-        
-        # Se ainda houver ORDER BY sozinho, remover
-        query_limpo = re.sub(r'\s+ORDER\s+BY\s+[^;]+', '', query_limpo, flags=re.IGNORECASE)
-        
-        return query_limpo
-    
-    def _extrair_coluna_agregada(self, query: str) -> Optional[str]:
-        """Extrai a coluna que está sendo agregada (SUM, COUNT, etc.)"""
-        import re
-        
-        # Procurar por padrões de agregação
-        patterns = [
-            r'SUM\s*\(\s*([^\)]+)\s*\)',
-            r'COUNT\s*\(\s*([^\)]+)\s*\)',
-            r'AVG\s*\(\s*([^\)]+)\s*\)',
-            r'MAX\s*\(\s*([^\)]+)\s*\)',
-            r'MIN\s*\(\s*([^\)]+)\s*\)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                coluna = match.group(1).strip()
-                # Retornar a função agregada completa
-                funcao_match = re.search(r'(SUM|COUNT|AVG|MAX|MIN)\s*\([^\)]+\)', query, re.IGNORECASE)
-                if funcao_match:
-                    return funcao_match.group(0)
-        
-        return None
-    
-    def _construir_query_total(self, query_base: str, coluna_agregada: str) -> Optional[str]:
-        """Constrói query para calcular total do universo"""
-        import re
-        
-        # Extrair FROM ... WHERE ... (sem GROUP BY)
-        # Padrão: SELECT ... FROM table WHERE conditions GROUP BY ...
-        
-        # 1. Encontrar FROM
-        match_from = re.search(r'\bFROM\b', query_base, re.IGNORECASE)
-        if not match_from:
-            return None
-            
-        inicio_from = match_from.start()
-        
-        # 2. Encontrar GROUP BY (se existir)
-        match_group = re.search(r'\bGROUP\s+BY\b', query_base, re.IGNORECASE)
-        
-        if match_group:
-            # Pegar até o GROUP BY
-            from_where_clause = query_base[inicio_from:match_group.start()].strip()
-        else:
-            # Pegar até o final
-            from_where_clause = query_base[inicio_from:].strip()
-        
-        # 3. Construir query final
-        query_total = f"SELECT {coluna_agregada} as total {from_where_clause}"
-        
-        return query_total.strip()
 
     def _detect_categorical_ids(self, labels: List[str]) -> bool:
         """
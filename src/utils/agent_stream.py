@@ -0,0 +1,245 @@
+"""
+Agent Stream - Execução do agente em segundo plano com respostas parciais
+Em vez de bloquear a interface em um agent.run() síncrono até a resposta,
+o gráfico e os insights estarem prontos, o run em streaming do Agno
+(stream=True, stream_events=True) roda em uma thread e seus eventos chegam à
+interface por uma fila, traduzidos em StreamUpdate:
+- "token": trecho novo do texto gerado pelo modelo
+- "tool_started" / "tool_completed": progresso das ferramentas ("Executando SQL…");
+  o "tool_completed" de create_chart_from_last_query leva a visualização criada,
+  lida na thread do run (a interface não lê agent.debug_info durante o run)
+- "done": RunOutput final (mesmo objeto retornado por agent.run sem streaming)
+- "error": exceção do run, relançada na thread da interface
+
+A thread herda o contexto (contextvars) de quem a inicia, então os spans das
+ferramentas e do modelo continuam no trace do turno (ver utils.tracing).
+
+Um agente executa um run por vez: se a interface for interrompida (ex: nova
+pergunta do usuário no Streamlit), o run anterior continua na thread e o próximo
+só começa quando ele termina (wait_for_previous_run / BackgroundRun.start).
+"""
+
+import contextvars
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+from agno.run.agent import RunEvent, RunOutput
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.tracing import span
+
+
+UPDATE_TOKEN = "token"
+UPDATE_TOOL_STARTED = "tool_started"
+UPDATE_TOOL_COMPLETED = "tool_completed"
+UPDATE_DONE = "done"
+UPDATE_ERROR = "error"
+
+# Ferramenta cuja conclusão traz a visualização criada (StreamUpdate.visualization)
+CHART_TOOL = "create_chart_from_last_query"
+
+# Texto de progresso exibido enquanto cada ferramenta executa
+TOOL_LABELS = {
+    'run_query': "Executando SQL…",
+    'create_chart_from_last_query': "Gerando gráfico…",
+    'describe_table': "Consultando estrutura da tabela…",
+    'show_tables': "Consultando tabelas…",
+    'run_python_code': "Executando cálculo…",
+    'think': "Raciocinando…",
+    'analyze': "Analisando resultados…",
+}
+
+
+@dataclass
+class StreamUpdate:
+    """Atualização parcial de um run em streaming"""
+    kind: str
+    text: str = ""
+    tool_name: Optional[str] = None
+    duration_ms: Optional[float] = None
+    response: Any = None
+    error: Optional[BaseException] = None
+    visualization: Optional[Dict[str, Any]] = None
+
+
+def tool_label(tool_name: Optional[str]) -> str:
+    """Texto de progresso de uma ferramenta"""
+    return TOOL_LABELS.get(tool_name or "", f"Executando {tool_name}…")
+
+
+_run_locks_guard = threading.Lock()
+
+
+def _run_lock(agent) -> threading.Lock:
+    """Lock do agente mantido durante todo o run (agentes Agno não são hashable: fica no próprio agente)"""
+    with _run_locks_guard:
+        lock = getattr(agent, '_background_run_lock', None)
+        if lock is None:
+            lock = threading.Lock()
+            agent._background_run_lock = lock
+        return lock
+
+
+def is_run_active(agent) -> bool:
+    """Indica se há um run em segundo plano do agente ainda em execução"""
+    return _run_lock(agent).locked()
+
+
+def wait_for_previous_run(agent, timeout: Optional[float] = None) -> bool:
+    """
+    Aguarda o término do run em segundo plano do agente, se houver.
+
+    Deve ser chamado antes de alterar o estado do agente para um novo turno
+    (ex: clear_execution_state), que o run anterior ainda pode estar usando.
+
+    Args:
+        agent: Agente do chat
+        timeout: Espera máxima em segundos (None = sem limite)
+
+    Returns:
+        True se não há run em execução ao final da espera
+    """
+    lock = _run_lock(agent)
+    if not lock.acquire(timeout=-1 if timeout is None else timeout):
+        return False
+    lock.release()
+    return True
+
+
+def iter_run_updates(agent, prompt: str, **kwargs) -> Iterator[StreamUpdate]:
+    """
+    Executa agent.run em streaming e traduz os eventos do Agno em StreamUpdate.
+
+    Args:
+        agent: Agente (PrincipalAgent ou qualquer agno Agent)
+        prompt: Pergunta do usuário
+        **kwargs: Repassados a agent.run
+
+    Yields:
+        StreamUpdate na ordem dos eventos; o último é UPDATE_DONE com o RunOutput
+    """
+    final = None
+    for event in agent.run(prompt, stream=True, stream_events=True, yield_run_output=True, **kwargs):
+        if isinstance(event, RunOutput):
+            final = event
+            continue
+
+        event_type = getattr(event, 'event', None)
+        if event_type == RunEvent.run_content.value:
+            if isinstance(event.content, str) and event.content:
+                yield StreamUpdate(UPDATE_TOKEN, text=event.content)
+        elif event_type in (RunEvent.tool_call_started.value, RunEvent.tool_call_completed.value):
+            tool = event.tool
+            tool_name = getattr(tool, 'tool_name', None)
+            if event_type == RunEvent.tool_call_started.value:
+                yield StreamUpdate(UPDATE_TOOL_STARTED, text=tool_label(tool_name), tool_name=tool_name)
+            else:
+                metrics = getattr(tool, 'metrics', None)
+                duration = getattr(metrics, 'duration', None)
+                visualization = None
+                if tool_name == CHART_TOOL:
+                    # Lido aqui, na thread do run, logo após a ferramenta gravar a visualização
+                    visualizations = (getattr(agent, 'debug_info', None) or {}).get('visualization_metadata')
+                    visualization = visualizations[0] if visualizations else None
+                yield StreamUpdate(UPDATE_TOOL_COMPLETED, tool_name=tool_name, visualization=visualization,
+                                   duration_ms=round(duration * 1000, 3) if duration is not None else None)
+        elif event_type == RunEvent.run_error.value:
+            raise RuntimeError(str(getattr(event, 'content', None) or "Erro na execução do agente"))
+
+    yield StreamUpdate(UPDATE_DONE, response=final)
+
+
+class BackgroundRun:
+    """
+    Run do agente em uma thread, entregando StreamUpdate por uma fila.
+
+    A thread da interface consome updates() e renderiza cada atualização;
+    entre eventos, updates() devolve None a cada poll_seconds para que a
+    interface possa atualizar indicadores (ex: tempo decorrido).
+
+    O lock do agente é adquirido em start() e liberado pela thread ao final do
+    run, mesmo que ninguém consuma updates().
+    """
+
+    def __init__(self, agent, prompt: str, **kwargs):
+        self.agent = agent
+        self.prompt = prompt
+        self.kwargs = kwargs
+        self._queue: "queue.Queue[StreamUpdate]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at: Optional[float] = None
+        self.stats = {'first_token_ms': None, 'first_tool_ms': None, 'tokens': 0, 'tools': 0}
+
+    def start(self) -> 'BackgroundRun':
+        """
+        Inicia o run (o contexto atual, com o trace do turno, é copiado para a thread).
+
+        Bloqueia enquanto um run anterior do mesmo agente estiver em execução.
+        """
+        lock = _run_lock(self.agent)
+        lock.acquire()
+        context = contextvars.copy_context()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=context.run, args=(self._work, lock), name="agent-run", daemon=True)
+        try:
+            self._thread.start()
+        except BaseException:
+            lock.release()
+            raise
+        return self
+
+    def _work(self, lock: threading.Lock):
+        try:
+            with span("agent.run", streaming=True) as record:
+                for update in iter_run_updates(self.agent, self.prompt, **self.kwargs):
+                    self._record(update)
+                    self._queue.put(update)
+                if record is not None:
+                    record['attributes'].update(self.stats)
+        except BaseException as e:
+            self._queue.put(StreamUpdate(UPDATE_ERROR, text=str(e), error=e))
+        finally:
+            lock.release()
+
+    def _record(self, update: StreamUpdate):
+        elapsed_ms = round((time.perf_counter() - self.started_at) * 1000, 3)
+        if update.kind == UPDATE_TOKEN:
+            self.stats['tokens'] += 1
+            if self.stats['first_token_ms'] is None:
+                self.stats['first_token_ms'] = elapsed_ms
+        elif update.kind == UPDATE_TOOL_STARTED:
+            self.stats['tools'] += 1
+            if self.stats['first_tool_ms'] is None:
+                self.stats['first_tool_ms'] = elapsed_ms
+
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.started_at if self.started_at is not None else 0.0
+
+    def updates(self, poll_seconds: float = 0.1) -> Iterator[Optional[StreamUpdate]]:
+        """
+        Atualizações do run até UPDATE_DONE (exceções do run são relançadas aqui).
+
+        Args:
+            poll_seconds: Intervalo máximo sem atualização antes de devolver None
+
+        Yields:
+            StreamUpdate, ou None quando nada chegou no intervalo
+        """
+        while True:
+            try:
+                update = self._queue.get(timeout=poll_seconds)
+            except queue.Empty:
+                yield None
+                continue
+            if update.kind == UPDATE_ERROR:
+                self._thread.join()
+                raise update.error
+            yield update
+            if update.kind == UPDATE_DONE:
+                self._thread.join()
+                return
@@ -0,0 +1,440 @@
+"""
+Artifact Cache - Cache persistente dos artefatos derivados do dataset
+Evita recomputar normalização, estatísticas e metadados a cada cold start
+
+Os artefatos são endereçados pelo conteúdo: a chave combina o hash SHA-256 do
+parquet de origem com NORMALIZER_VERSION e o schema de carga (compacto ou não,
+que muda dtypes e plano de limpeza). Cada entrada é um diretório com:
+- normalized.arrow: colunas de texto normalizadas (Arrow IPC, dictionary-encoded,
+  lido via memory-map)
+- metadata.json: metadados derivados (colunas de texto, datas, describe, dtypes,
+  plano de limpeza de codificação...)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.model_config import DATA_CONFIG
+from text_normalizer import TextNormalizer, NORMALIZER_VERSION
+from utils.normalized_view import NormalizedView
+
+
+NORMALIZED_FILE = "normalized.arrow"
+METADATA_FILE = "metadata.json"
+# Versão do conteúdo dos artefatos (incrementar ao adicionar novos metadados)
+ARTIFACTS_VERSION = "3"
+
+# Ações do plano de limpeza de codificação por coluna object
+ENCODING_NONE = "none"      # apenas strings válidas, sem nulos
+ENCODING_FILLNA = "fillna"  # strings válidas com nulos: nulos viram ""
+ENCODING_CLEAN = "clean"    # bytes, valores não-string ou surrogates: limpeza completa
+# Colunas categóricas são limpas pelas categorias (os códigos só mudam com nulos)
+
+
+# Hashes já calculados no processo por (caminho, tamanho, mtime): artefatos,
+# banco DuckDB e varredura streaming leem o mesmo parquet no cold start
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+_file_hashes_lock = threading.Lock()
+
+
+def compute_file_hash(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    """
+    Calcula hash SHA-256 do conteúdo de um arquivo em blocos.
+
+    O resultado é memorizado por (caminho, tamanho, mtime): chamadas seguintes
+    para o arquivo inalterado não releem o conteúdo.
+
+    Args:
+        path: Caminho do arquivo
+        chunk_size: Tamanho do bloco de leitura em bytes
+
+    Returns:
+        Hash hexadecimal
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_hashes_lock:
+        cached = _file_hashes.get(memo_key)
+    if cached is not None:
+        return cached
+
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    with _file_hashes_lock:
+        _file_hashes[memo_key] = digest
+    return digest
+
+
+def clean_value(val: Any) -> str:
+    """Limpeza de codificação de um valor (bytes decodificados, caracteres inválidos removidos)"""
+    if isinstance(val, bytes):
+        try:
+            return val.decode("utf-8", errors="replace")
+        except Exception:
+            return str(val)
+    return str(val).encode("utf-8", errors="ignore").decode("utf-8")
+
+
+def clean_text_column(values: Any) -> np.ndarray:
+    """
+    Limpeza de codificação vetorizada de uma coluna object.
+
+    Mesma semântica da limpeza valor a valor: nulos viram "", bytes são
+    decodificados em UTF-8 (com substituição) e demais valores viram str sem
+    caracteres não codificáveis. A limpeza é aplicada uma vez por valor único
+    e expandida pelos códigos de factorize.
+
+    Colunas categóricas continuam categóricas: a limpeza é feita nas
+    categorias (unindo as que ficarem iguais) e nulos viram a categoria "".
+
+    Args:
+        values: Series, array ou pd.Categorical da coluna
+
+    Returns:
+        Array object com as strings limpas (pd.Categorical para entrada categórica)
+    """
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        categorical = values.array if isinstance(values, pd.Series) else values
+        cleaned = np.array([clean_value(val) for val in categorical.categories] + [""], dtype=object)
+        new_categories, remap = np.unique(cleaned, return_inverse=True)
+        # Código -1 (nulo) aponta para o "" acrescentado ao final
+        return pd.Categorical.from_codes(remap[categorical.codes], categories=new_categories)
+
+    values = np.asarray(values, dtype=object)
+    null_mask = pd.isna(values)
+    inferred = pd.api.types.infer_dtype(values, skipna=True)
+
+    if inferred not in ('string', 'bytes', 'empty'):
+        # Tipos misturados: factorize igualaria 1, 1.0 e True (str diferentes)
+        return np.array(["" if is_null else clean_value(val) for val, is_null in zip(values, null_mask)],
+                        dtype=object)
+
+    codes, uniques = pd.factorize(values)
+    cleaned_uniques = np.array([clean_value(val) for val in uniques] + [""], dtype=object)
+    # Código -1 (nulo) aponta para o "" acrescentado ao final
+    return cleaned_uniques[codes]
+
+
+def plan_encoding_cleanup(df: pd.DataFrame) -> Dict[str, str]:
+    """
+    Define a limpeza de codificação necessária para cada coluna object.
+
+    Strings vindas do parquet via Arrow já são UTF-8 válido, então na prática
+    a limpeza se resume a preencher nulos; a limpeza completa só é aplicada
+    às colunas em que algum valor único mudaria.
+
+    Colunas categóricas de texto (schema compacto) são avaliadas pelas categorias.
+
+    Args:
+        df: DataFrame original
+
+    Returns:
+        Dict coluna -> ação (ENCODING_NONE, ENCODING_FILLNA ou ENCODING_CLEAN)
+    """
+    plan = {}
+    for col in df.select_dtypes(include=["object", "category"]).columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.categories.to_numpy(dtype=object)
+            if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'bytes', 'empty'):
+                continue
+            has_nulls = bool((series.cat.codes.to_numpy() == -1).any())
+        else:
+            values = series.to_numpy(dtype=object)
+            has_nulls = bool(pd.isna(values).any())
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+
+        if inferred == 'empty':
+            plan[col] = ENCODING_FILLNA if has_nulls else ENCODING_NONE
+        elif inferred != 'string':
+            plan[col] = ENCODING_CLEAN
+        elif any(clean_value(val) != val for val in pd.unique(values[~pd.isna(values)])):
+            plan[col] = ENCODING_CLEAN
+        else:
+            plan[col] = ENCODING_FILLNA if has_nulls else ENCODING_NONE
+    return plan
+
+
+class DatasetArtifacts:
+    """
+    Artefatos derivados do dataset: colunas normalizadas + metadados.
+    """
+
+    def __init__(self, normalized_columns: pd.DataFrame, metadata: Dict[str, Any],
+                 from_cache: bool = False):
+        """
+        Args:
+            normalized_columns: DataFrame apenas com as colunas de texto normalizadas
+            metadata: Metadados derivados (ver build_artifacts)
+            from_cache: Se os artefatos foram lidos do disco
+        """
+        self.normalized_columns = normalized_columns
+        self.metadata = metadata
+        self.from_cache = from_cache
+
+    @property
+    def text_columns(self) -> List[str]:
+        """Colunas de texto identificadas no dataset"""
+        return self.metadata['text_columns']
+
+    def apply_dataset_context(self, normalizer: TextNormalizer):
+        """Configura o contexto temporal do normalizador sem varrer o dataset"""
+        if self.metadata.get('min_date') and self.metadata.get('max_date'):
+            normalizer.set_dataset_context_from_dates(self.metadata['min_date'], self.metadata['max_date'])
+
+    def build_normalized_view(self, df: pd.DataFrame) -> NormalizedView:
+        """
+        Monta a view normalizada a partir do original sem materializar um segundo DataFrame.
+
+        Colunas categóricas passam a ser apenas uma tabela código original ->
+        texto normalizado sobre os códigos do próprio df.
+
+        Args:
+            df: DataFrame original (mesma ordem de linhas usada no build)
+
+        Returns:
+            NormalizedView sobre df
+        """
+        return NormalizedView(df, self.normalized_columns)
+
+    def release_columns(self):
+        """Descarta as colunas normalizadas após montar a view (evita uma segunda cópia residente)"""
+        self.normalized_columns = self.normalized_columns.iloc[:, :0]
+
+    @property
+    def encoding_plan(self) -> Dict[str, str]:
+        """Plano de limpeza de codificação por coluna object (ver plan_encoding_cleanup)"""
+        return self.metadata.get('encoding_plan', {})
+
+    def build_clean_frame(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, float], Dict[str, str]]:
+        """
+        Aplica o plano de limpeza de codificação sem varrer colunas que não precisam.
+
+        Args:
+            df: DataFrame original
+
+        Returns:
+            tuple: (cópia rasa de df com colunas limpas, segundos por coluna,
+            erros por coluna - colunas com erro mantêm os valores originais)
+        """
+        df_clean = df.copy(deep=False)
+        timings = {}
+        errors = {}
+        for col, action in self.encoding_plan.items():
+            if action == ENCODING_NONE or col not in df_clean.columns:
+                continue
+            start_time = time.perf_counter()
+            try:
+                series = df[col]
+                if action == ENCODING_FILLNA and not isinstance(series.dtype, pd.CategoricalDtype):
+                    values = series.to_numpy(dtype=object)
+                    df_clean[col] = np.where(pd.isna(values), "", values)
+                else:
+                    df_clean[col] = clean_text_column(series)
+            except Exception as e:
+                errors[col] = str(e)
+            timings[col] = round(time.perf_counter() - start_time, 4)
+        return df_clean, timings, errors
+
+
+def build_artifacts(df: pd.DataFrame, source_hash: str,
+                    normalizer: Optional[TextNormalizer] = None) -> DatasetArtifacts:
+    """
+    Computa os artefatos derivados a partir do DataFrame original.
+
+    Args:
+        df: DataFrame original
+        source_hash: Hash do parquet de origem
+        normalizer: Normalizador (None = nova instância)
+
+    Returns:
+        DatasetArtifacts recém-construídos
+    """
+    normalizer = normalizer or TextNormalizer()
+    start_time = time.perf_counter()
+
+    text_columns = normalizer.identify_text_columns(df)
+
+    # Armazenar como categórico: dicionário normalizado + códigos compactos
+    normalized_columns = pd.DataFrame(index=df.index)
+    for col in text_columns:
+        series = df[col]
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype('category')
+        normalized_columns[col] = normalizer.normalize_column(series)
+
+    has_date = 'Data' in df.columns and len(df) > 0
+    metadata = {
+        'source_hash': source_hash,
+        'normalizer_version': NORMALIZER_VERSION,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'rows': len(df),
+        'columns': df.columns.tolist(),
+        'text_columns': text_columns,
+        'min_date': df['Data'].min().isoformat() if has_date else None,
+        'max_date': df['Data'].max().isoformat() if has_date else None,
+        'head': df.head().to_string(),
+        'head_normalized': normalized_columns.head().to_string() if text_columns else "",
+        'describe': df.describe().to_string(),
+        'dtypes': df.dtypes.to_string(),
+        'encoding_plan': plan_encoding_cleanup(df),
+    }
+    metadata['build_seconds'] = round(time.perf_counter() - start_time, 3)
+
+    return DatasetArtifacts(normalized_columns, metadata)
+
+
+class ArtifactCache:
+    """
+    Cache em disco de DatasetArtifacts endereçado por conteúdo.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Args:
+            cache_dir: Diretório raiz do cache (None = DATA_CONFIG["artifact_cache_dir"])
+        """
+        self.cache_dir = cache_dir or DATA_CONFIG.get("artifact_cache_dir", "data/cache/artifacts")
+
+    @staticmethod
+    def make_key(source_hash: str, compact: Optional[bool] = None) -> str:
+        """
+        Gera a chave da entrada a partir do hash do parquet, das versões do
+        normalizador e dos artefatos e do schema de carga.
+
+        Args:
+            source_hash: Hash do parquet de origem
+            compact: Schema compacto do DataFrame (None = DATA_CONFIG["compact_dtypes"])
+        """
+        if compact is None:
+            compact = DATA_CONFIG.get("compact_dtypes", True)
+        return f"{source_hash[:32]}_n{NORMALIZER_VERSION}_a{ARTIFACTS_VERSION}_c{int(bool(compact))}"
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str, index: Optional[pd.Index] = None) -> Optional[DatasetArtifacts]:
+        """
+        Lê artefatos do disco (memory-map do arquivo Arrow).
+
+        Args:
+            key: Chave da entrada
+            index: Índice a aplicar nas colunas normalizadas (mesmo do DataFrame original)
+
+        Returns:
+            DatasetArtifacts ou None se a entrada não existe ou está inválida
+            (inclusive com número de linhas diferente de index)
+        """
+        entry_dir = self._entry_dir(key)
+        metadata_path = os.path.join(entry_dir, METADATA_FILE)
+        normalized_path = os.path.join(entry_dir, NORMALIZED_FILE)
+
+        if not (os.path.exists(metadata_path) and os.path.exists(normalized_path)):
+            return None
+
+        try:
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+
+            with pa.memory_map(normalized_path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            normalized_columns = table.to_pandas()
+
+            if index is not None:
+                if len(index) != len(normalized_columns):
+                    # Artefatos de outro conteúdo: será reconstruída
+                    return None
+                normalized_columns.index = index
+
+            return DatasetArtifacts(normalized_columns, metadata, from_cache=True)
+        except (OSError, ValueError, KeyError, pa.ArrowException):
+            # Entrada corrompida: será reconstruída
+            return None
+
+    def save(self, key: str, artifacts: DatasetArtifacts):
+        """
+        Persiste artefatos de forma atômica (diretório temporário + rename).
+
+        Args:
+            key: Chave da entrada
+            artifacts: Artefatos a persistir
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        table = pa.Table.from_pandas(artifacts.normalized_columns, preserve_index=False)
+        with pa.OSFile(os.path.join(tmp_dir, NORMALIZED_FILE), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        with open(os.path.join(tmp_dir, METADATA_FILE), 'w', encoding='utf-8') as f:
+            json.dump(artifacts.metadata, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+
+    def load_or_build(self, data_path: str, df: pd.DataFrame,
+                      normalizer: Optional[TextNormalizer] = None,
+                      compact: Optional[bool] = None) -> DatasetArtifacts:
+        """
+        Retorna artefatos do cache ou os constrói e persiste.
+
+        Args:
+            data_path: Caminho do parquet de origem (usado para o hash)
+            df: DataFrame original já carregado
+            normalizer: Normalizador opcional
+            compact: Se df foi carregado no schema compacto (None = DATA_CONFIG["compact_dtypes"])
+
+        Returns:
+            DatasetArtifacts
+        """
+        start_time = time.perf_counter()
+        source_hash = compute_file_hash(data_path)
+        key = self.make_key(source_hash, compact)
+
+        artifacts = self.load(key, index=df.index)
+        if artifacts is None:
+            artifacts = build_artifacts(df, source_hash, normalizer)
+            try:
+                self.save(key, artifacts)
+            except OSError:
+                # Diretório sem permissão de escrita: seguir apenas em memória
+                pass
+
+        artifacts.metadata['ready_seconds'] = round(time.perf_counter() - start_time, 3)
+        return artifacts
+
+
+def load_or_build_artifacts(data_path: str, df: pd.DataFrame,
+                            normalizer: Optional[TextNormalizer] = None,
+                            compact: Optional[bool] = None) -> DatasetArtifacts:
+    """
+    Wrapper para obter artefatos usando o diretório de cache padrão.
+
+    Args:
+        data_path: Caminho do parquet
+        df: DataFrame original
+        normalizer: Normalizador opcional
+        compact: Se df foi carregado no schema compacto (None = DATA_CONFIG["compact_dtypes"])
+
+    Returns:
+        DatasetArtifacts
+    """
+    return ArtifactCache().load_or_build(data_path, df, normalizer, compact)
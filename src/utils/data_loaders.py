@@ -7,53 +7,52 @@ import pandas as pd
 import uuid
 import sys
 import os
+import weakref
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from config.model_config import DATA_CONFIG
 from chatbot_agents import create_agent
+from utils.dataset_registry import get_dataset_registry, get_dataset_registry_stats
+from utils.duckdb_pool import get_duckdb_pool, get_duckdb_pool_stats
+from utils.incremental_refresh import refresh_with_delta
+from filters.core.count_index import SQLFilterCounter
 
 
-@st.cache_data
+# Agentes das sessões do processo (id -> agente), atualizados por refresh_dataset_with_delta
+_live_agents: "weakref.WeakValueDictionary[int, object]" = weakref.WeakValueDictionary()
+
+
+@st.cache_resource
 def load_parquet_data():
-    """Carrega arquivo Parquet com tratamento robusto de codificação"""
+    """
+    Carrega arquivo Parquet com tratamento robusto de codificação
+
+    Usa st.cache_resource (objeto compartilhado entre sessões, sem cópia por
+    sessão) e parte da view do DatasetRegistry, que é o mesmo dataset usado
+    pelos agentes. Os tempos de limpeza por coluna ficam nas estatísticas do
+    registro (get_dataset_load_stats).
+    """
     data_path = DATA_CONFIG["data_path"]
 
-    # Method 1: Try direct pandas loading
     try:
         with st.spinner("🔄 Carregando dados..."):
-            df = pd.read_parquet(data_path)
-
-            # Process string columns for encoding issues
-            string_cols = df.select_dtypes(include=["object"]).columns
-            for col in string_cols:
-                try:
-                    # Convert to string and clean encoding
-                    original_values = df[col].fillna("")
-                    cleaned_values = []
-
-                    for val in original_values:
-                        if isinstance(val, bytes):
-                            # Handle bytes
-                            try:
-                                cleaned_val = val.decode("utf-8", errors="replace")
-                            except:
-                                cleaned_val = str(val)
-                        else:
-                            # Handle strings with potential encoding issues
-                            cleaned_val = (
-                                str(val)
-                                .encode("utf-8", errors="ignore")
-                                .decode("utf-8")
-                            )
-                        cleaned_values.append(cleaned_val)
-
-                    df[col] = cleaned_values
-
-                except Exception as col_error:
-                    # If column processing fails, keep original
-                    st.warning(
-                        f"⚠️ Mantendo coluna {col} original devido a: {col_error}"
-                    )
-                    continue
+            registry = get_dataset_registry(data_path)
+
+            # Limpeza de codificação vetorizada, planejada uma vez no build dos
+            # artefatos (utils.artifact_cache) e aplicada só às colunas que precisam.
+            # Na ingestão em streaming não há DataFrame (df = None): a interface usa
+            # get_dataset_summary e get_record_counter
+            if registry.streaming:
+                registry.get_artifacts()
+                df = None
+            else:
+                df = registry.get_clean_view()
+
+            # Preparar o banco DuckDB compartilhado fora do caminho crítico das sessões
+            get_duckdb_pool(data_path).initialize()
+
+            for col, col_error in registry.stats['encoding_cleanup_errors'].items():
+                # If column processing fails, keep original
+                st.warning(f"⚠️ Mantendo coluna {col} original devido a: {col_error}")
 
             return df, None
 
@@ -61,6 +60,72 @@ def load_parquet_data():
         return None, f"Erro ao carregar dados: {str(e)}"
 
 
+def get_dataset_summary():
+    """Resumo do dataset (linhas, colunas, período) a partir dos artefatos, nos dois modos de ingestão"""
+    return get_dataset_registry(DATA_CONFIG["data_path"]).get_summary()
+
+
+@st.cache_resource
+def get_record_counter():
+    """
+    Contador de registros filtrados no DuckDB (ingestão em streaming), compartilhado
+    entre sessões com um cursor próprio.
+    """
+    return SQLFilterCounter(get_duckdb_pool(DATA_CONFIG["data_path"]).cursor())
+
+
+def register_live_agent(agent):
+    """Registra o agente de uma sessão para receber o dataset atualizado por um delta"""
+    _live_agents[id(agent)] = agent
+
+
+def refresh_dataset_with_delta(delta_path):
+    """
+    Aplica um parquet com linhas novas (ex: um mês novo) ao dataset do processo.
+
+    Além do refresh incremental (utils.incremental_refresh), atualiza o que já foi
+    carregado: load_parquet_data é recalculado na próxima chamada (a contagem de
+    registros filtrados da interface passa a incluir o delta) e os agentes vivos
+    passam a validar filtros contra a view normalizada estendida.
+
+    Args:
+        delta_path: Parquet com as linhas novas (mesmas colunas do dataset)
+
+    Returns:
+        Dict de refresh_with_delta com 'agents_updated'
+    """
+    data_path = DATA_CONFIG["data_path"]
+    registry = get_dataset_registry(data_path)
+    agents = list(_live_agents.values())
+    counters = [get_record_counter()] if registry.streaming else []
+
+    result = refresh_with_delta(delta_path, data_path,
+                                normalizers=[agent.normalizer for agent in agents], counters=counters)
+
+    # Frame anterior ao delta guardado pelo st.cache_resource
+    load_parquet_data.clear()
+    df_normalized = registry.get_normalized_view()
+    for agent in agents:
+        agent.df_normalized = df_normalized
+    result['agents_updated'] = len(agents)
+    return result
+
+
+def get_dataset_load_stats():
+    """
+    Retorna métricas de carga e memória dos datasets compartilhados do processo.
+
+    Exposto aqui para que app.py acesse o mesmo registro usado pelos agentes
+    (importado como utils.*, não src.utils.*).
+    """
+    return get_dataset_registry_stats()
+
+
+def get_duckdb_load_stats():
+    """Retorna métricas do banco DuckDB compartilhado do processo (ver get_dataset_load_stats)"""
+    return get_duckdb_pool_stats()
+
+
 def initialize_agent():
     """
     Inicializa o agente DuckDB configurado com memória temporária baseada em sessão
@@ -105,6 +170,7 @@ def initialize_agent():
 
         # Marcar o agente com timestamp
         agent._creation_time = current_time
+        register_live_agent(agent)
 
         # SEMPRE restaurar contexto do session_state se disponível
         if st.session_state.get('last_context'):
@@ -5,7 +5,11 @@ FASE 3: Reduz cópias desnecessárias e melhora performance
 
 import pandas as pd
 import numpy as np
-from typing import List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Union
+
+
+# Inteiros candidatos no downcast, do menor para o maior
+INTEGER_DOWNCAST_TYPES = ('int8', 'int16', 'int32')
 
 
 class DataFrameOptimizer:
@@ -60,6 +64,110 @@ class DataFrameOptimizer:
         
         return df
     
+    @staticmethod
+    def infer_compact_schema(table, dimension_columns: Iterable[str] = (),
+                             max_category_ratio: float = 0.5) -> Dict[str, str]:
+        """
+        Define o schema compacto de uma tabela Arrow antes da conversão para pandas.
+
+        - dimensões (e demais colunas de texto com menos de max_category_ratio
+          de valores únicos) → 'category' (dicionário Arrow / pd.Categorical)
+        - inteiros → menor tipo inteiro que comporta o mínimo e o máximo
+
+        Floats não são reduzidos: somas em float32 no pandas acumulam em float32
+        e alterariam totais mesmo quando cada valor é representável.
+
+        Args:
+            table: pyarrow.Table (colunas de texto podem já vir como dicionário)
+            dimension_columns: Colunas sempre categóricas quando forem texto
+            max_category_ratio: Razão únicos/linhas máxima para categorizar texto livre
+
+        Returns:
+            Dict coluna -> tipo compacto ('category', 'int8', 'int16', 'int32')
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        dimension_columns = set(dimension_columns)
+        schema = {}
+        for field in table.schema:
+            column = table.column(field.name)
+            field_type = field.type
+
+            if pa.types.is_dictionary(field_type):
+                schema[field.name] = 'category'
+            elif pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+                if field.name in dimension_columns:
+                    schema[field.name] = 'category'
+                elif table.num_rows and pc.count_distinct(column).as_py() / table.num_rows < max_category_ratio:
+                    schema[field.name] = 'category'
+            elif pa.types.is_integer(field_type) and pa.types.is_signed_integer(field_type) and field_type.bit_width > 8:
+                bounds = pc.min_max(column)
+                col_min, col_max = bounds['min'].as_py(), bounds['max'].as_py()
+                if col_min is None:
+                    continue
+                for candidate in INTEGER_DOWNCAST_TYPES:
+                    info = np.iinfo(candidate)
+                    if np.dtype(candidate).itemsize * 8 >= field_type.bit_width:
+                        break
+                    if info.min <= col_min and col_max <= info.max:
+                        schema[field.name] = candidate
+                        break
+        return schema
+
+    @staticmethod
+    def apply_arrow_schema(table, schema: Dict[str, str]):
+        """
+        Aplica o schema compacto a uma tabela Arrow (antes de to_pandas).
+
+        Colunas 'category' viram dictionary-encoded, de modo que to_pandas gera
+        pd.Categorical sem materializar uma string Python por linha.
+
+        Args:
+            table: pyarrow.Table
+            schema: Schema de infer_compact_schema
+
+        Returns:
+            Nova pyarrow.Table com os tipos compactos
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        for name, target in schema.items():
+            index = table.schema.get_field_index(name)
+            if index < 0:
+                continue
+            column = table.column(index)
+            if target == 'category':
+                if not pa.types.is_dictionary(column.type):
+                    column = pc.dictionary_encode(column)
+            else:
+                column = column.cast(pa.from_numpy_dtype(np.dtype(target)))
+            table = table.set_column(index, name, column)
+        return table
+
+    @staticmethod
+    def apply_schema(df: pd.DataFrame, schema: Dict[str, str], inplace: bool = False) -> pd.DataFrame:
+        """
+        Aplica o schema compacto a um DataFrame já em pandas.
+
+        Args:
+            df: DataFrame para compactar
+            schema: Dict coluna -> tipo compacto (ver infer_compact_schema)
+            inplace: Se True, modifica o DataFrame original
+
+        Returns:
+            DataFrame compactado
+        """
+        if not inplace:
+            df = df.copy(deep=False)
+
+        for col, target in schema.items():
+            if col in df.columns and df[col].dtype != target:
+                df[col] = df[col].astype(target)
+
+        return df
+
     @staticmethod
     def efficient_sort(df: pd.DataFrame, by: Union[str, List[str]], 
                       ascending: bool = True, limit: Optional[int] = None) -> pd.DataFrame:
@@ -0,0 +1,481 @@
+"""
+Dataset Registry - Dataset compartilhado entre sessões
+Carrega o parquet UMA vez por processo e entrega views somente-leitura
+para cada PrincipalAgent e para a interface Streamlit
+
+Datasets maiores que a RAM usam a ingestão em streaming (utils.streaming_ingest):
+o DataFrame não é materializado, os artefatos vêm de uma passada em lotes e as
+consultas vão ao DuckDB sobre o próprio parquet
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.model_config import DATA_CONFIG
+from config.agent_config import COLUMN_HIERARCHY
+from utils.dataframe_optimizer import DataFrameOptimizer
+from utils.normalized_view import NormalizedView
+
+
+# Dimensões sempre carregadas como categóricas (dicionário lido direto do parquet)
+DIMENSION_COLUMNS = [col for hierarchy in COLUMN_HIERARCHY.values() for col in hierarchy]
+
+
+def get_process_memory_mb() -> Dict[str, Optional[float]]:
+    """
+    Retorna memória residente (RSS) atual e pico do processo em MB.
+
+    Usa /proc/self/statm quando disponível (Linux) e resource.getrusage
+    para o pico, evitando dependência de psutil.
+
+    Returns:
+        Dict com 'rss_mb' e 'peak_rss_mb' (None quando indisponível)
+    """
+    rss_mb = None
+    peak_rss_mb = None
+
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        rss_mb = resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta em KB, macOS em bytes
+        peak_rss_mb = max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+    except (ImportError, OSError):
+        pass
+
+    return {
+        'rss_mb': round(rss_mb, 1) if rss_mb is not None else None,
+        'peak_rss_mb': round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+    }
+
+
+class DatasetRegistry:
+    """
+    Registro process-wide do dataset comercial.
+
+    O parquet é lido uma única vez como tabela Arrow e convertido para pandas
+    liberando os buffers Arrow durante a conversão (self_destruct), de modo que
+    apenas uma cópia dos dados fica residente. Cada sessão recebe uma view
+    rasa (sem cópia de dados) cujos arrays numéricos são somente-leitura.
+
+    Com compact=True o frame segue um schema compacto: dimensões e textos de
+    baixa cardinalidade viram pd.Categorical (lidos como dicionário do parquet,
+    sem uma string Python por linha) e inteiros usam o menor tipo possível.
+
+    No modo streaming não há DataFrame: get_view/get_clean_view levantam
+    RuntimeError e os consumidores usam get_summary, get_normalized_view
+    (DictionaryView) e o DuckDB.
+    """
+
+    def __init__(self, data_path: str, compact: Optional[bool] = None,
+                 ingestion_mode: Optional[str] = None):
+        """
+        Inicializa o registro (sem carregar dados).
+
+        Args:
+            data_path: Caminho do arquivo parquet
+            compact: Aplicar o schema compacto (None = DATA_CONFIG["compact_dtypes"])
+            ingestion_mode: "memory", "streaming" ou "auto" (None = DATA_CONFIG["ingestion_mode"])
+        """
+        self.data_path = data_path
+        # Import tardio: streaming_ingest usa DIMENSION_COLUMNS deste módulo
+        from utils.streaming_ingest import resolve_ingestion_mode
+
+        self.compact = DATA_CONFIG.get("compact_dtypes", True) if compact is None else compact
+        self.ingestion_mode = resolve_ingestion_mode(data_path, ingestion_mode)
+        self._lock = threading.Lock()
+        self._df: Optional[pd.DataFrame] = None
+        self._artifacts = None
+        self._normalized_view: Optional[NormalizedView] = None
+        self._df_clean: Optional[pd.DataFrame] = None
+        self.stats: Dict[str, Any] = {
+            'loaded': False,
+            'load_seconds': None,
+            'rows': 0,
+            'columns': 0,
+            'arrow_bytes': 0,
+            'rss_before_load_mb': None,
+            'rss_after_load_mb': None,
+            'views_served': 0,
+            'schema': {},
+            'artifacts_from_cache': None,
+            'artifacts_seconds': None,
+            'encoding_cleanup_seconds': None,
+            'encoding_cleanup_columns': {},
+            'encoding_cleanup_errors': {},
+            'normalized_view': {},
+            'ingestion_mode': self.ingestion_mode,
+        }
+
+    @property
+    def is_loaded(self) -> bool:
+        """Indica se o dataset já foi carregado neste processo"""
+        return self._df is not None
+
+    @property
+    def streaming(self) -> bool:
+        """Indica se o dataset usa a ingestão em streaming (sem DataFrame em memória)"""
+        from utils.streaming_ingest import INGESTION_STREAMING
+
+        return self.ingestion_mode == INGESTION_STREAMING
+
+    def load(self) -> pd.DataFrame:
+        """
+        Carrega o dataset se ainda não foi carregado (thread-safe).
+
+        Returns:
+            DataFrame base compartilhado (não deve ser modificado)
+        """
+        if self._df is not None:
+            return self._df
+        if self.streaming:
+            raise RuntimeError(f"Dataset {self.data_path} em modo streaming: não há DataFrame em memória")
+
+        with self._lock:
+            # Outra sessão pode ter carregado enquanto aguardávamos o lock
+            if self._df is not None:
+                return self._df
+
+            rss_before = get_process_memory_mb()['rss_mb']
+            start_time = time.perf_counter()
+
+            table = self._read_table()
+            arrow_bytes = table.nbytes
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            del table
+
+            self._mark_read_only(df)
+
+            self.stats.update({
+                'loaded': True,
+                'load_seconds': round(time.perf_counter() - start_time, 3),
+                'rows': len(df),
+                'columns': len(df.columns),
+                'arrow_bytes': int(arrow_bytes),
+                'rss_before_load_mb': rss_before,
+                'rss_after_load_mb': get_process_memory_mb()['rss_mb'],
+            })
+            self._df = df
+
+        return self._df
+
+    def _read_table(self):
+        """Lê o parquet como tabela Arrow, já no schema compacto quando habilitado"""
+        if not self.compact:
+            return pq.read_table(self.data_path)
+
+        parquet_schema = pq.read_schema(self.data_path)
+        dictionary_columns = [col for col in DIMENSION_COLUMNS if col in parquet_schema.names
+                              and pa.types.is_string(parquet_schema.field(col).type)]
+        table = pq.read_table(self.data_path, read_dictionary=dictionary_columns)
+
+        schema = DataFrameOptimizer.infer_compact_schema(table, DIMENSION_COLUMNS)
+        self.stats['schema'] = schema
+        return DataFrameOptimizer.apply_arrow_schema(table, schema)
+
+    def get_view(self) -> pd.DataFrame:
+        """
+        Retorna uma view rasa do dataset compartilhado.
+
+        A view não copia dados: reatribuir colunas afeta apenas a view, mas
+        escritas in-place em colunas numéricas levantam ValueError.
+
+        Returns:
+            DataFrame que compartilha os buffers do dataset base
+        """
+        df = self.load()
+        self.stats['views_served'] += 1
+        return df.copy(deep=False)
+
+    def get_artifacts(self):
+        """
+        Retorna os artefatos derivados do dataset (thread-safe).
+
+        Na primeira chamada do processo, lê do cache em disco (memory-map) ou
+        constrói e persiste via utils.artifact_cache.
+
+        Returns:
+            DatasetArtifacts compartilhado
+        """
+        if self._artifacts is not None:
+            return self._artifacts
+        if self.streaming:
+            return self._scan_artifacts()
+
+        df = self.load()
+        with self._lock:
+            if self._artifacts is None:
+                from utils.artifact_cache import load_or_build_artifacts
+
+                artifacts = load_or_build_artifacts(self.data_path, df, compact=self.compact)
+                self._normalized_view = artifacts.build_normalized_view(df)
+                self.stats['normalized_view'] = self._normalized_view.get_stats()
+
+                # Limpeza de codificação segundo o plano calculado no build dos artefatos
+                self._df_clean, timings, errors = artifacts.build_clean_frame(df)
+                self._mark_read_only(self._df_clean)
+                self.stats['encoding_cleanup_seconds'] = round(sum(timings.values()), 3)
+                self.stats['encoding_cleanup_columns'] = timings
+                self.stats['encoding_cleanup_errors'] = errors
+
+                # As colunas normalizadas agora vivem apenas em _normalized_view
+                artifacts.release_columns()
+                self.stats['artifacts_from_cache'] = artifacts.from_cache
+                self.stats['artifacts_seconds'] = artifacts.metadata.get('ready_seconds')
+                self._artifacts = artifacts
+
+        return self._artifacts
+
+    def _scan_artifacts(self):
+        """Artefatos do modo streaming: uma passada em lotes pelo parquet (ou o cache em disco)"""
+        from utils.streaming_ingest import load_or_scan_artifacts
+
+        with self._lock:
+            if self._artifacts is None:
+                rss_before = get_process_memory_mb()['rss_mb']
+                artifacts = load_or_scan_artifacts(self.data_path)
+                self._normalized_view = artifacts.build_normalized_view()
+                metadata = artifacts.metadata
+                self.stats.update({
+                    'loaded': True,
+                    'load_seconds': metadata.get('ready_seconds'),
+                    'rows': metadata['rows'],
+                    'columns': len(metadata['columns']),
+                    'rss_before_load_mb': rss_before,
+                    'rss_after_load_mb': get_process_memory_mb()['rss_mb'],
+                    'normalized_view': self._normalized_view.get_stats(),
+                    'artifacts_from_cache': artifacts.from_cache,
+                    'artifacts_seconds': metadata.get('ready_seconds'),
+                })
+                self._artifacts = artifacts
+        return self._artifacts
+
+    def get_summary(self) -> Dict[str, Any]:
+        """
+        Resumo do dataset a partir dos metadados dos artefatos (nos dois modos de ingestão).
+
+        Returns:
+            Dict com 'rows', 'columns', 'min_date', 'max_date' (Timestamps) e 'ingestion_mode'
+        """
+        metadata = self.get_artifacts().metadata
+        return {
+            'rows': metadata['rows'],
+            'columns': list(metadata['columns']),
+            'min_date': pd.Timestamp(metadata['min_date']) if metadata.get('min_date') else None,
+            'max_date': pd.Timestamp(metadata['max_date']) if metadata.get('max_date') else None,
+            'ingestion_mode': self.ingestion_mode,
+        }
+
+    def get_normalized_view(self) -> NormalizedView:
+        """
+        Retorna a view normalizada do dataset (lookup sobre o dicionário original).
+
+        Returns:
+            NormalizedView compartilhada entre sessões (somente-leitura);
+            DictionaryView no modo streaming
+        """
+        self.get_artifacts()
+        return self._normalized_view
+
+    def get_clean_view(self) -> pd.DataFrame:
+        """
+        Retorna uma view rasa do dataset com a limpeza de codificação aplicada
+        (nulos de texto como "", bytes decodificados), usada pela interface.
+
+        Returns:
+            DataFrame limpo que compartilha buffers entre sessões
+        """
+        self.get_artifacts()
+        if self.streaming:
+            raise RuntimeError(f"Dataset {self.data_path} em modo streaming: não há DataFrame em memória")
+        self.stats['views_served'] += 1
+        return self._df_clean.copy(deep=False)
+
+    def append_rows(self, delta: pa.Table, normalizer=None) -> Dict[str, Any]:
+        """
+        Acrescenta linhas novas ao dataset compartilhado sem recarregar o parquet.
+
+        Só as linhas novas são lidas e só os valores de texto ainda sem tradução
+        são normalizados (NormalizedView.extended / DictionaryView.extended).
+        No modo em memória o frame passa a ser base + linhas novas (categorias
+        novas entram depois das existentes, mantendo os códigos) e a limpeza de
+        codificação é refeita segundo o plano. Views servidas antes continuam
+        válidas sobre o dataset anterior.
+
+        Os artefatos em disco não são alterados: continuam correspondendo ao
+        parquet base.
+
+        Args:
+            delta: Linhas novas (mesmas colunas do dataset)
+            normalizer: TextNormalizer usado nos valores novos (None = nova instância)
+
+        Returns:
+            Dict com linhas acrescentadas, total de linhas e novas datas mínima/máxima
+        """
+        from text_normalizer import TextNormalizer
+        from utils.artifact_cache import plan_encoding_cleanup, ENCODING_NONE, ENCODING_FILLNA, ENCODING_CLEAN
+
+        normalizer = normalizer or TextNormalizer()
+        artifacts = self.get_artifacts()
+        start_time = time.perf_counter()
+
+        with self._lock:
+            metadata = dict(artifacts.metadata)
+            rows = metadata['rows'] + delta.num_rows
+            metadata['rows'] = rows
+            metadata['source_hash'] = f"{metadata['source_hash']}+{delta.num_rows}"
+
+            if 'Data' in delta.column_names and delta.num_rows:
+                dates = delta.column('Data').to_pandas()
+                candidates = [d for d in (metadata.get('min_date'), metadata.get('max_date'),
+                                          dates.min(), dates.max()) if d is not None and not pd.isna(d)]
+                metadata['min_date'] = min(pd.Timestamp(d) for d in candidates).isoformat()
+                metadata['max_date'] = max(pd.Timestamp(d) for d in candidates).isoformat()
+
+            if self.streaming:
+                values = {}
+                for col in set(artifacts.text_columns) | set(metadata.get('dimension_values', {})):
+                    if col in delta.column_names:
+                        # unique do Arrow inclui o nulo (None) quando a coluna tem nulos
+                        values[col] = delta.column(col).unique().to_pylist()
+                self._normalized_view = self._normalized_view.extended(
+                    values, normalizer.normalize_unique_values, rows, metadata['source_hash'])
+                metadata['dimension_values'] = {col: self._normalized_view.unique(col)
+                                                for col in metadata.get('dimension_values', {})}
+            else:
+                df = self._concat_rows(self._df, delta)
+                self._mark_read_only(df)
+                self._normalized_view = self._normalized_view.extended(df, normalizer.normalize_unique_values)
+
+                # Plano de limpeza: a ação mais completa entre o dataset atual e as linhas novas
+                order = [ENCODING_NONE, ENCODING_FILLNA, ENCODING_CLEAN]
+                plan = dict(metadata.get('encoding_plan', {}))
+                for col, action in plan_encoding_cleanup(df.iloc[len(self._df):]).items():
+                    if order.index(action) > order.index(plan.get(col, ENCODING_NONE)):
+                        plan[col] = action
+                metadata['encoding_plan'] = plan
+                metadata['dtypes'] = df.dtypes.to_string()
+                artifacts.metadata = metadata  # build_clean_frame lê o plano dos metadados
+                self._df_clean, _, errors = artifacts.build_clean_frame(df)
+                self._mark_read_only(self._df_clean)
+                self.stats['encoding_cleanup_errors'] = errors
+                self._df = df
+
+            artifacts.metadata = metadata
+            self.stats['rows'] = rows
+            self.stats['normalized_view'] = self._normalized_view.get_stats()
+            self.stats['rows_appended'] = self.stats.get('rows_appended', 0) + delta.num_rows
+
+        return {
+            'rows_appended': delta.num_rows,
+            'rows': rows,
+            'min_date': metadata.get('min_date'),
+            'max_date': metadata.get('max_date'),
+            'seconds': round(time.perf_counter() - start_time, 3),
+        }
+
+    def _concat_rows(self, df: pd.DataFrame, delta: pa.Table) -> pd.DataFrame:
+        """Frame base + linhas novas no schema do frame base"""
+        delta_df = delta.to_pandas()
+        base = df.copy(deep=False)
+        for col in base.columns:
+            if col not in delta_df.columns:
+                continue
+            series = base[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Categorias novas no final: os códigos do frame base continuam válidos
+                new_categories = pd.Index(delta_df[col].dropna().unique()).difference(series.cat.categories)
+                if len(new_categories):
+                    series = series.cat.add_categories(new_categories)
+                    base[col] = series
+                delta_df[col] = pd.Categorical(delta_df[col], dtype=series.dtype)
+            elif pd.api.types.is_integer_dtype(series.dtype) and pd.api.types.is_integer_dtype(delta_df[col].dtype):
+                # Manter o inteiro compacto quando os valores novos cabem nele
+                limits = np.iinfo(series.dtype)
+                if len(delta_df) == 0 or (delta_df[col].min() >= limits.min and delta_df[col].max() <= limits.max):
+                    delta_df[col] = delta_df[col].astype(series.dtype)
+        return pd.concat([base, delta_df[base.columns]], ignore_index=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de carga e memória atual do processo"""
+        stats = dict(self.stats)
+        stats.update(get_process_memory_mb())
+        stats['data_path'] = self.data_path
+        return stats
+
+    @staticmethod
+    def _mark_read_only(df: pd.DataFrame):
+        """Marca os arrays numpy das colunas como somente-leitura"""
+        for col in df.columns:
+            values = df[col].values
+            if hasattr(values, 'flags'):
+                try:
+                    values.flags.writeable = False
+                except ValueError:
+                    # Array que não é dono dos dados (ex: view de outro buffer)
+                    pass
+
+
+# Registros globais por caminho de arquivo
+_registries: Dict[str, DatasetRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_dataset_registry(data_path: Optional[str] = None) -> DatasetRegistry:
+    """
+    Singleton para obter o registro do dataset de um caminho.
+
+    Args:
+        data_path: Caminho do parquet (None = DATA_CONFIG["data_path"])
+
+    Returns:
+        Instância compartilhada de DatasetRegistry
+    """
+    if data_path is None:
+        data_path = DATA_CONFIG["data_path"]
+
+    key = os.path.abspath(data_path)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = DatasetRegistry(data_path)
+        return _registries[key]
+
+
+def get_shared_dataframe(data_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Atalho para obter uma view somente-leitura do dataset compartilhado.
+
+    Args:
+        data_path: Caminho do parquet (None = caminho padrão)
+
+    Returns:
+        View do DataFrame compartilhado
+    """
+    return get_dataset_registry(data_path).get_view()
+
+
+def get_dataset_registry_stats() -> Dict[str, Dict[str, Any]]:
+    """Retorna estatísticas de todos os registros carregados no processo"""
+    with _registries_lock:
+        return {path: registry.get_stats() for path, registry in _registries.items()}
+
+
+def reset_dataset_registry():
+    """Reset dos registros globais (útil para testes)"""
+    with _registries_lock:
+        _registries.clear()
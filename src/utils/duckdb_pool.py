@@ -0,0 +1,494 @@
+"""
+DuckDB Pool - Banco DuckDB compartilhado entre sessões
+A tabela dados_comerciais é criada UMA vez por processo (ou lida de um arquivo
+.duckdb persistido) e cada sessão recebe um cursor próprio sobre o mesmo banco
+
+Na ingestão em streaming dados_comerciais é uma view sobre read_parquet: o
+DuckDB lê o parquet no lugar, com projeção e filtros empurrados para o scan
+(row groups descartados pelas estatísticas), e só os rollups e o dicionário de
+strings ficam materializados no banco
+"""
+
+import os
+import shutil
+import sys
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.model_config import DATA_CONFIG
+from utils.sql_cache import bump_data_epoch, bump_table_version
+from utils.rollup_cubes import build_rollups, refresh_rollups, CATALOG_TABLE
+from utils.string_predicates import build_string_dictionary, extend_string_dictionary, DICTIONARY_TABLE
+from utils.streaming_ingest import INGESTION_STREAMING, resolve_ingestion_mode
+
+
+TABLE_NAME = "dados_comerciais"
+INFO_TABLE = "_dataset_info"
+# Versão do conteúdo do arquivo .duckdb (incrementar ao adicionar tabelas derivadas)
+DATABASE_FORMAT_VERSION = "3"
+
+
+def _format_version(streaming: bool) -> str:
+    """Versão gravada no arquivo: trocar o modo de ingestão também força a reconstrução"""
+    return f"{DATABASE_FORMAT_VERSION}-view" if streaming else DATABASE_FORMAT_VERSION
+
+
+def create_base_relation(conn: duckdb.DuckDBPyConnection, data_path: str, streaming: bool = False):
+    """
+    Cria dados_comerciais na conexão: tabela materializada ou view sobre o parquet.
+
+    Args:
+        conn: Conexão DuckDB
+        data_path: Caminho do parquet
+        streaming: Criar uma view (leitura no lugar) em vez de copiar os dados
+    """
+    if streaming:
+        # Views não aceitam parâmetros preparados: caminho absoluto como literal
+        path = os.path.abspath(data_path).replace("'", "''")
+        conn.execute(f"CREATE VIEW {TABLE_NAME} AS SELECT * FROM read_parquet('{path}')")
+    else:
+        conn.execute(f"CREATE TABLE {TABLE_NAME} AS SELECT * FROM read_parquet(?)", [data_path])
+
+
+def append_base_relation(conn: duckdb.DuckDBPyConnection, data_paths: List[str], streaming: bool = False):
+    """
+    Acrescenta a dados_comerciais as linhas do último parquet de data_paths.
+
+    Args:
+        conn: Conexão DuckDB (escrita)
+        data_paths: Parquet base seguido dos parquets de linhas novas, na ordem de chegada
+        streaming: dados_comerciais é uma view (recriada sobre todos os arquivos)
+    """
+    if streaming:
+        paths = ", ".join("'" + os.path.abspath(path).replace("'", "''") + "'" for path in data_paths)
+        conn.execute(f"CREATE OR REPLACE VIEW {TABLE_NAME} AS "
+                     f"SELECT * FROM read_parquet([{paths}], union_by_name = true)")
+    else:
+        conn.execute(f"INSERT INTO {TABLE_NAME} BY NAME SELECT * FROM read_parquet(?)", [data_paths[-1]])
+
+
+def build_database_file(data_path: str, db_path: str, source_hash: Optional[str] = None,
+                        streaming: bool = False) -> float:
+    """
+    Constrói o arquivo .duckdb com a tabela dados_comerciais, os rollups
+    mensais e o dicionário de valores de texto (etapa de deploy).
+
+    O arquivo é escrito em um caminho temporário e renomeado ao final, para que
+    processos concorrentes nunca abram um banco parcialmente construído.
+
+    Args:
+        data_path: Caminho do parquet de origem
+        db_path: Caminho do arquivo .duckdb de destino
+        source_hash: Hash do parquet (None = calcular)
+        streaming: dados_comerciais como view sobre o parquet (sem cópia dos dados)
+
+    Returns:
+        Tempo de construção em segundos
+    """
+    from utils.artifact_cache import compute_file_hash
+
+    start_time = time.perf_counter()
+    source_hash = source_hash or compute_file_hash(data_path)
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    tmp_path = f"{db_path}.tmp-{os.getpid()}"
+    for path in (tmp_path, f"{tmp_path}.wal"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    conn = duckdb.connect(tmp_path)
+    try:
+        create_base_relation(conn, data_path, streaming)
+        build_rollups(conn)
+        build_string_dictionary(conn)
+        conn.execute(f"CREATE TABLE {INFO_TABLE} AS SELECT ? AS source_hash, ? AS format_version",
+                     [source_hash, _format_version(streaming)])
+        conn.execute("CHECKPOINT")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return time.perf_counter() - start_time
+
+
+def _read_source_hash(db_path: str, streaming: bool = False) -> Optional[str]:
+    """
+    Lê o hash do parquet com o qual o arquivo .duckdb foi construído.
+
+    Arquivos de uma versão de formato anterior (ou do outro modo de ingestão)
+    retornam None (devem ser reconstruídos).
+    """
+    try:
+        conn = duckdb.connect(db_path, read_only=True)
+        try:
+            row = conn.execute(f"SELECT source_hash, format_version FROM {INFO_TABLE}").fetchone()
+            return row[0] if row and row[1] == _format_version(streaming) else None
+        finally:
+            conn.close()
+    except duckdb.Error:
+        return None
+
+
+def _remove_database_file(path: str):
+    """Remove um arquivo .duckdb e o WAL dele, se existirem"""
+    for file_path in (path, f"{path}.wal"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+class PoolCursor:
+    """
+    Cursor de sessão que acompanha o banco atual do pool.
+
+    Um delta aplicado ao arquivo persistido gera um novo arquivo, que passa a ser
+    o banco do pool (ver DuckDBPool.append_delta). Na chamada seguinte o cursor
+    passa a usar um cursor do banco novo; queries em andamento terminam no banco
+    anterior, que continua aberto até nenhum cursor de sessão usá-lo. Demais
+    atributos são os do cursor DuckDB.
+    """
+
+    def __init__(self, pool: 'DuckDBPool'):
+        self._pool = pool
+        self._generation = -1
+        self._cursor: Optional[duckdb.DuckDBPyConnection] = None
+        pool._session_cursors.add(self)
+
+    def _current(self) -> duckdb.DuckDBPyConnection:
+        if self._cursor is None or self._generation != self._pool.generation:
+            previous = self._cursor
+            self._generation, self._cursor = self._pool._new_cursor()
+            if previous is not None:
+                # Cursor migrou para o banco novo: o anterior pode ser liberado
+                previous.close()
+                self._pool.release_retired()
+        return self._cursor
+
+    def cursor(self) -> 'PoolCursor':
+        """Novo cursor independente, que também acompanha o banco do pool"""
+        return PoolCursor(self._pool)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._current(), name)
+
+
+class DuckDBPool:
+    """
+    Conexão DuckDB process-wide com a tabela dados_comerciais.
+
+    Modo preferencial: arquivo .duckdb persistido (DATA_CONFIG["duckdb_path"]),
+    reconstruído apenas quando o hash do parquet muda, aberto em read_only -
+    cursores herdam o modo somente-leitura e a memória fica no buffer manager
+    compartilhado. Se o arquivo não puder ser criado, a tabela é materializada
+    em um banco em memória único do processo.
+
+    Com streaming=True dados_comerciais é uma view sobre o parquet nos dois modos.
+
+    generation muda quando o banco é trocado (delta no modo persistido); os
+    cursores servidos (PoolCursor) passam a usar o banco novo e o anterior é
+    fechado (e sua cópia removida) quando o último deles migra.
+    """
+
+    def __init__(self, data_path: str, db_path: Optional[str] = None, streaming: bool = False):
+        """
+        Inicializa o pool (sem abrir conexão).
+
+        Args:
+            data_path: Caminho do parquet de origem
+            db_path: Caminho do arquivo .duckdb (None = apenas em memória)
+            streaming: Consultar o parquet no lugar (view) em vez de materializar a tabela
+        """
+        self.data_path = data_path
+        self.db_path = db_path
+        self.streaming = streaming
+        self._lock = threading.Lock()
+        self._connection: Optional[duckdb.DuckDBPyConnection] = None
+        # Bancos substituídos por um delta (generation -> conexão, cópia do delta ou
+        # None para o arquivo base): abertos até os cursores de sessão migrarem
+        self._retired: Dict[int, Tuple[duckdb.DuckDBPyConnection, Optional[str]]] = {}
+        self._session_cursors: "weakref.WeakSet[PoolCursor]" = weakref.WeakSet()
+        self._active_path = db_path
+        self.generation = 0
+        self.table_version = 0
+        self.delta_paths: List[str] = []
+        self.stats: Dict[str, Any] = {
+            'mode': None,
+            'build_seconds': None,
+            'rebuilt': False,
+            'cursors_served': 0,
+            'fallback_reason': None,
+            'rollups': 0,
+            'string_dictionary_columns': 0,
+            'relation': 'view' if streaming else 'table',
+            'deltas_applied': 0,
+            'last_delta_seconds': None,
+            'last_delta_copy_mb': None,
+            'retired_open': 0,
+        }
+
+    @property
+    def is_ready(self) -> bool:
+        """Indica se a tabela já está disponível neste processo"""
+        return self._connection is not None
+
+    def _open_persisted(self) -> duckdb.DuckDBPyConnection:
+        """Abre (construindo se necessário) o arquivo .duckdb em modo somente-leitura"""
+        from utils.artifact_cache import compute_file_hash
+
+        source_hash = compute_file_hash(self.data_path)
+        if not os.path.exists(self.db_path) or _read_source_hash(self.db_path, self.streaming) != source_hash:
+            self.stats['build_seconds'] = round(
+                build_database_file(self.data_path, self.db_path, source_hash, self.streaming), 3)
+            self.stats['rebuilt'] = True
+
+        self.stats['mode'] = 'persisted_read_only'
+        return duckdb.connect(self.db_path, read_only=True)
+
+    def _open_in_memory(self) -> duckdb.DuckDBPyConnection:
+        """Materializa a tabela em um banco em memória único do processo"""
+        start_time = time.perf_counter()
+        conn = duckdb.connect()
+        create_base_relation(conn, self.data_path, self.streaming)
+        build_rollups(conn)
+        build_string_dictionary(conn)
+        self.stats['build_seconds'] = round(time.perf_counter() - start_time, 3)
+        self.stats['mode'] = 'shared_in_memory'
+        return conn
+
+    def initialize(self) -> duckdb.DuckDBPyConnection:
+        """
+        Abre o banco compartilhado se ainda não foi aberto (thread-safe).
+
+        Returns:
+            Conexão raiz do processo (não usar diretamente em sessões)
+        """
+        if self._connection is not None:
+            return self._connection
+
+        with self._lock:
+            if self._connection is not None:
+                return self._connection
+
+            connection = None
+            if self.db_path:
+                try:
+                    connection = self._open_persisted()
+                except (OSError, duckdb.Error) as e:
+                    # Sem permissão de escrita ou arquivo bloqueado: cair para memória
+                    self.stats['fallback_reason'] = str(e)
+
+            if connection is None:
+                connection = self._open_in_memory()
+
+            try:
+                self.stats['rollups'] = connection.execute(f"SELECT COUNT(*) FROM {CATALOG_TABLE}").fetchone()[0]
+            except duckdb.Error:
+                self.stats['rollups'] = 0
+            try:
+                self.stats['string_dictionary_columns'] = connection.execute(
+                    f"SELECT COUNT(DISTINCT column_name) FROM {DICTIONARY_TABLE}").fetchone()[0]
+            except duckdb.Error:
+                self.stats['string_dictionary_columns'] = 0
+
+            # Nova versão da tabela: resultados cacheados da versão anterior são descartados
+            self.table_version = bump_table_version(TABLE_NAME)
+            self._connection = connection
+
+        return self._connection
+
+    def cursor(self) -> PoolCursor:
+        """
+        Retorna um cursor novo sobre o banco compartilhado.
+
+        Cursores compartilham catálogo e dados, mas têm estado de transação
+        próprio, podendo ser usados em threads diferentes.
+
+        Returns:
+            PoolCursor (mesma interface de um cursor DuckDB)
+        """
+        self.initialize()
+        with self._lock:
+            self.stats['cursors_served'] += 1
+        return PoolCursor(self)
+
+    def _new_cursor(self) -> Tuple[int, duckdb.DuckDBPyConnection]:
+        """Cursor do banco atual e a generation dele (lidos juntos, sob o lock)"""
+        self.initialize()
+        with self._lock:
+            return self.generation, self._connection.cursor()
+
+    def release_retired(self) -> int:
+        """
+        Fecha os bancos substituídos que nenhum cursor de sessão usa mais e
+        remove as cópias de delta correspondentes (o arquivo base é mantido).
+
+        Returns:
+            Número de bancos liberados
+        """
+        with self._lock:
+            in_use = {cursor._generation for cursor in list(self._session_cursors)}
+            released = [generation for generation in self._retired if generation not in in_use]
+            for generation in released:
+                connection, delta_file = self._retired.pop(generation)
+                connection.close()
+                if delta_file is not None:
+                    _remove_database_file(delta_file)
+            self.stats['retired_open'] = len(self._retired)
+            return len(released)
+
+    def append_delta(self, delta_path: str, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Acrescenta as linhas de um parquet ao banco sem reconstruí-lo.
+
+        Apenas os meses em [start, end) são reagregados nos rollups e só os
+        valores de texto novos entram no dicionário de strings. Sem start/end
+        (delta sem coluna Data) os rollups são reconstruídos.
+
+        No banco em memória as linhas entram no próprio banco. O arquivo persistido
+        está aberto somente-leitura: o delta é aplicado a uma cópia, que passa a ser
+        o banco do pool (nova generation). Cursores servidos continuam funcionando
+        e migram para a cópia na chamada seguinte; o arquivo original continua
+        correspondendo ao parquet base.
+
+        A cópia custa uma leitura e escrita do arquivo ativo inteiro por delta
+        (last_delta_copy_mb): com a tabela materializada é o tamanho do dataset;
+        na ingestão em streaming o arquivo guarda só rollups e dicionário. Em
+        disco ficam no máximo o arquivo base, a cópia ativa e as cópias ainda
+        usadas por cursores que não migraram (release_retired).
+
+        Args:
+            delta_path: Parquet com as linhas novas (mesmas colunas de dados_comerciais)
+            start: Início do primeiro mês afetado
+            end: Início do mês seguinte ao último afetado
+
+        Returns:
+            Dict com rollups atualizados, valores novos no dicionário e tempo
+        """
+        self.initialize()
+        start_time = time.perf_counter()
+
+        with self._lock:
+            persisted = self.stats['mode'] == 'persisted_read_only'
+            if persisted:
+                delta_file = f"{self.db_path}.delta-{os.getpid()}-{self.generation + 1}"
+                shutil.copyfile(self._active_path, delta_file)
+                self.stats['last_delta_copy_mb'] = round(os.path.getsize(delta_file) / (1024 * 1024), 1)
+                conn = duckdb.connect(delta_file)
+            else:
+                conn = self._connection
+
+            try:
+                append_base_relation(conn, [self.data_path, *self.delta_paths, delta_path], self.streaming)
+                if start is not None and end is not None:
+                    rollups = refresh_rollups(conn, start, end)['rollups']
+                else:
+                    rollups = build_rollups(conn)['rollups']
+                dictionary_values = extend_string_dictionary(conn, delta_path)
+                if persisted:
+                    conn.execute("CHECKPOINT")
+            except BaseException:
+                if persisted:
+                    conn.close()
+                    _remove_database_file(delta_file)
+                raise
+
+            if persisted:
+                conn.close()
+                previous_file = self._active_path if self._active_path != self.db_path else None
+                self._retired[self.generation] = (self._connection, previous_file)
+                self._connection = duckdb.connect(delta_file, read_only=True)
+                self._active_path = delta_file
+                self.generation += 1
+            self.delta_paths.append(delta_path)
+            # Queries iniciadas antes do delta não gravam resultados no cache
+            bump_data_epoch()
+
+            self.stats['deltas_applied'] += 1
+            self.stats['last_delta_seconds'] = round(time.perf_counter() - start_time, 3)
+
+        # Banco anterior sem cursores de sessão (ou todos já migrados): liberado agora
+        self.release_retired()
+        return {'rollups': rollups, 'dictionary_values': dictionary_values,
+                'seconds': self.stats['last_delta_seconds']}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do banco compartilhado"""
+        stats = dict(self.stats)
+        stats['ready'] = self.is_ready
+        stats['table_version'] = self.table_version
+        stats['generation'] = self.generation
+        stats['db_path'] = self.db_path
+        stats['data_path'] = self.data_path
+        return stats
+
+    def close(self):
+        """Fecha a conexão raiz e os bancos substituídos (cursores abertos deixam de funcionar)"""
+        with self._lock:
+            delta_files = [delta_file for _, delta_file in self._retired.values()]
+            if self._active_path != self.db_path:
+                delta_files.append(self._active_path)
+            for connection in [*(connection for connection, _ in self._retired.values()), self._connection]:
+                if connection is not None:
+                    connection.close()
+            self._connection = None
+            self._retired = {}
+            for delta_file in delta_files:
+                if delta_file is not None:
+                    _remove_database_file(delta_file)
+            self._active_path = self.db_path
+
+
+# Pools globais por caminho de parquet
+_pools: Dict[str, DuckDBPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_duckdb_pool(data_path: Optional[str] = None) -> DuckDBPool:
+    """
+    Singleton para obter o banco compartilhado de um parquet.
+
+    Args:
+        data_path: Caminho do parquet (None = DATA_CONFIG["data_path"])
+
+    Returns:
+        Instância compartilhada de DuckDBPool
+    """
+    if data_path is None:
+        data_path = DATA_CONFIG["data_path"]
+
+    key = os.path.abspath(data_path)
+    with _pools_lock:
+        if key not in _pools:
+            db_path = DATA_CONFIG.get("duckdb_path") if key == os.path.abspath(DATA_CONFIG["data_path"]) else None
+            streaming = resolve_ingestion_mode(data_path) == INGESTION_STREAMING
+            _pools[key] = DuckDBPool(data_path, db_path, streaming)
+        return _pools[key]
+
+
+def get_duckdb_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Retorna estatísticas de todos os bancos compartilhados do processo"""
+    with _pools_lock:
+        return {path: pool.get_stats() for path, pool in _pools.items()}
+
+
+def reset_duckdb_pool():
+    """Fecha e descarta os bancos compartilhados (útil para testes)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+if __name__ == "__main__":
+    # Construção do arquivo .duckdb na etapa de deploy:
+    #   python src/utils/duckdb_pool.py
+    data_path = DATA_CONFIG["data_path"]
+    db_path = DATA_CONFIG["duckdb_path"]
+    seconds = build_database_file(data_path, db_path)
+    print(f"{db_path} construído a partir de {data_path} em {seconds:.1f}s")
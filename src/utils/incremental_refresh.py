@@ -0,0 +1,224 @@
+"""
+Incremental Refresh - Acréscimo de meses novos sem reconstruir o dataset
+Quando os dados comerciais recebem um mês novo, em vez de reiniciar o processo
+(reler o parquet, renormalizar, recriar dados_comerciais, os rollups e todos os
+caches derivados), um parquet "delta" só com as linhas novas é aplicado ao
+estado compartilhado do processo:
+- DuckDB: linhas acrescentadas a dados_comerciais, rollups reagregados apenas nos
+  meses do delta e valores novos no dicionário de strings (DuckDBPool.append_delta)
+- Dataset: frame/view normalizada estendidos normalizando só os valores novos
+  (DatasetRegistry.append_rows)
+- TextNormalizer: contexto temporal ("último mês", data máxima) recalculado
+- Caches: só os resultados cujo período de Data pode incluir os meses do delta
+  são descartados; a versão da tabela não muda, então o restante continua válido.
+  O descarte acontece antes de as linhas novas ficarem visíveis: nenhuma leitura
+  do cache devolve um resultado anterior ao delta depois dele, e queries que
+  leram os dados antigos durante a aplicação não gravam no cache (época dos dados)
+
+O período de uma query cacheada vem das comparações de Data com constantes no
+WHERE do SELECT principal (>=, >, <, <=, =, BETWEEN, YEAR(Data) = ano). Qualquer
+construção fora disso (OR, subquery, CTE, JOIN...) conta como período aberto e
+a entrada é descartada.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import duckdb
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.dataset_registry import get_dataset_registry
+from utils.duckdb_pool import get_duckdb_pool, TABLE_NAME
+from utils.query_fingerprint import MIRRORED_COMPARISONS
+from utils.rollup_cubes import RollupRouter, DATE_COLUMN
+from utils.sql_cache import bump_table_version, invalidate_table_entries
+from utils.string_predicates import clear_string_rewrites
+from utils.tracing import span
+
+
+Period = Tuple[Optional[datetime], Optional[datetime]]
+
+_OPEN_PERIOD: Period = (None, None)
+_ONE_DAY = pd.Timedelta(days=1)
+
+
+def delta_months(delta_path: str) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Meses cobertos pelas linhas do delta.
+
+    Args:
+        delta_path: Parquet com as linhas novas
+
+    Returns:
+        (início do primeiro mês, início do mês seguinte ao último) ou None sem
+        coluna Data / sem linhas
+    """
+    if DATE_COLUMN not in pq.read_schema(delta_path).names:
+        return None
+    dates = pq.read_table(delta_path, columns=[DATE_COLUMN]).column(DATE_COLUMN).to_pandas().dropna()
+    if dates.empty:
+        return None
+    start = pd.Timestamp(dates.min()).to_period('M').to_timestamp()
+    end = (pd.Timestamp(dates.max()).to_period('M') + 1).to_timestamp()
+    return start, end
+
+
+def query_period(conn: duckdb.DuckDBPyConnection, query: str) -> Period:
+    """
+    Período [início, fim) de Data lido por uma query sobre dados_comerciais.
+
+    Args:
+        conn: Conexão usada apenas para o parser (json_serialize_sql)
+        query: SQL da entrada do cache
+
+    Returns:
+        (início, fim); None = sem limite daquele lado
+    """
+    try:
+        document = json.loads(conn.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0])
+    except duckdb.Error:
+        return _OPEN_PERIOD
+    statements = document.get('statements') or []
+    if document.get('error') or len(statements) != 1:
+        return _OPEN_PERIOD
+
+    node = statements[0]['node']
+    from_table = node.get('from_table') or {}
+    if node.get('type') != 'SELECT_NODE' or from_table.get('type') != 'BASE_TABLE' \
+            or str(from_table.get('table_name')).lower() != TABLE_NAME:
+        return _OPEN_PERIOD
+    # Subqueries/CTEs podem ler outros meses que os do filtro principal
+    if json.dumps(node).count('"SELECT_NODE"') > 1:
+        return _OPEN_PERIOD
+
+    low, high = _OPEN_PERIOD
+    for condition in _conjuncts(node.get('where_clause')):
+        cond_low, cond_high = _condition_period(condition)
+        if cond_low is not None:
+            low = cond_low if low is None else max(low, cond_low)
+        if cond_high is not None:
+            high = cond_high if high is None else min(high, cond_high)
+    return low, high
+
+
+def _conjuncts(expr: Any) -> List[Dict[str, Any]]:
+    """Termos de um AND (o próprio predicado se não for AND)"""
+    if not isinstance(expr, dict):
+        return []
+    if expr.get('type') == 'CONJUNCTION_AND':
+        return [term for child in expr.get('children') or [] for term in _conjuncts(child)]
+    return [expr]
+
+
+def _condition_period(expr: Dict[str, Any]) -> Period:
+    """Limites impostos a Data por um termo do WHERE (limites abertos quando não reconhecido)"""
+    expr_type = expr.get('type')
+    if expr_type == 'COMPARE_BETWEEN' and RollupRouter._is_date(expr.get('input')):
+        lower = RollupRouter._date_constant(expr.get('lower'))
+        upper = RollupRouter._date_constant(expr.get('upper'))
+        return lower, (upper + _ONE_DAY if upper is not None else None)
+
+    if expr.get('class') != 'COMPARISON':
+        return _OPEN_PERIOD
+    left, right = expr.get('left'), expr.get('right')
+    if RollupRouter._is_date(right) and not RollupRouter._is_date(left):
+        left, right = right, left
+        expr_type = MIRRORED_COMPARISONS.get(expr_type, expr_type)
+
+    if RollupRouter._is_date(left):
+        value = RollupRouter._date_constant(right)
+        if value is None:
+            return _OPEN_PERIOD
+        # Limites inclusivos sobem um dia: Data pode ter hora dentro do dia informado
+        return {
+            'COMPARE_GREATERTHANOREQUALTO': (value, None),
+            'COMPARE_GREATERTHAN': (value, None),
+            'COMPARE_LESSTHAN': (None, value),
+            'COMPARE_LESSTHANOREQUALTO': (None, value + _ONE_DAY),
+            'COMPARE_EQUAL': (value, value + _ONE_DAY),
+        }.get(expr_type, _OPEN_PERIOD)
+
+    # YEAR(Data) = 2024
+    if expr_type == 'COMPARE_EQUAL' and isinstance(left, dict) and left.get('class') == 'FUNCTION' \
+            and str(left.get('function_name')).lower() == 'year' and len(left.get('children') or []) == 1 \
+            and RollupRouter._is_date(left['children'][0]) and isinstance(right, dict) \
+            and right.get('class') == 'CONSTANT':
+        try:
+            year = int(right['value'].get('value'))
+        except (TypeError, ValueError):
+            return _OPEN_PERIOD
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    return _OPEN_PERIOD
+
+
+def _overlaps(period: Period, start: datetime, end: datetime) -> bool:
+    low, high = period
+    return (low is None or low < end) and (high is None or high > start)
+
+
+def refresh_with_delta(delta_path: str, data_path: Optional[str] = None,
+                       normalizers: Iterable[Any] = (), counters: Iterable[Any] = ()) -> Dict[str, Any]:
+    """
+    Aplica um parquet com linhas novas ao dataset compartilhado do processo.
+
+    Args:
+        delta_path: Parquet com as linhas novas (mesmas colunas do dataset)
+        data_path: Parquet base (None = DATA_CONFIG["data_path"])
+        normalizers: TextNormalizers em uso (ex: dos agentes das sessões) cujo
+            contexto temporal deve refletir as novas datas; agentes criados depois
+            já recebem o contexto novo pelos artefatos
+        counters: SQLFilterCounters cujas contagens dos meses afetados devem ser descartadas
+
+    Returns:
+        Dict com meses afetados, resultado de cada etapa e entradas de cache descartadas
+    """
+    registry = get_dataset_registry(data_path)
+    pool = get_duckdb_pool(data_path)
+    months = delta_months(delta_path)
+    start, end = (months[0].to_pydatetime(), months[1].to_pydatetime()) if months else (None, None)
+
+    # Descarte antes do append: depois dele o cache serviria os meses afetados com
+    # os valores anteriores. Queries que leem os dados antigos durante o append não
+    # gravam no cache (append_delta incrementa a época dos dados ao final)
+    with span("refresh.caches"):
+        if months is None:
+            # Sem datas não há como delimitar o que mudou: nova versão da tabela
+            bump_table_version(TABLE_NAME)
+            invalidated = None
+        else:
+            parser = duckdb.connect()
+            try:
+                invalidated = invalidate_table_entries(
+                    TABLE_NAME, keep=lambda query: not _overlaps(query_period(parser, query), start, end))
+            finally:
+                parser.close()
+
+    with span("refresh.duckdb", delta=os.path.basename(delta_path)):
+        database = pool.append_delta(delta_path, start, end)
+
+    with span("refresh.dataset"):
+        dataset = registry.append_rows(pq.read_table(delta_path))
+
+    with span("refresh.derived"):
+        # Reescritas de LOWER() guardam listas de valores do dicionário anterior
+        clear_string_rewrites()
+        counts_invalidated = sum(counter.invalidate_date_range(pd.Timestamp(start), pd.Timestamp(end))
+                                 if months else counter.invalidate_date_range(pd.Timestamp.min, pd.Timestamp.max)
+                                 for counter in counters)
+
+    artifacts = registry.get_artifacts()
+    for normalizer in normalizers:
+        artifacts.apply_dataset_context(normalizer)
+
+    return {
+        'months': [str(m.date()) for m in pd.date_range(start, end, freq='MS', inclusive='left')] if months else [],
+        'database': database,
+        'dataset': dataset,
+        'cache_entries_invalidated': invalidated,
+        'counts_invalidated': counts_invalidated,
+    }
@@ -0,0 +1,431 @@
+"""
+Normalized View - Texto normalizado como lookup sobre o dicionário original
+Substitui o segundo DataFrame normalizado (cópia com colunas de texto reescritas)
+por, para cada coluna de texto, códigos por linha + tabela código -> texto normalizado
+
+Colunas categóricas usam os próprios códigos do dataset original (nenhum array
+por linha é alocado); colunas object usam os códigos compactos dos artefatos.
+As operações usadas pelos filtros (valores únicos, pertinência, mapeamento de
+volta para os valores originais) trabalham apenas sobre o dicionário.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class NormalizedView:
+    """
+    View normalizada somente-leitura do dataset compartilhado.
+
+    Para cada coluna de texto guarda `codes` (índice de cada linha no
+    dicionário, -1 = nulo) e `lookup` (texto normalizado de cada código, com
+    uma posição extra no final para o nulo, de forma que lookup[codes] seja
+    a coluna normalizada). Colunas que não são de texto são lidas do original.
+    """
+
+    def __init__(self, df: pd.DataFrame, normalized_columns: pd.DataFrame):
+        """
+        Args:
+            df: DataFrame original (mesma ordem de linhas usada no build dos artefatos)
+            normalized_columns: Colunas de texto normalizadas (categóricas) dos artefatos
+        """
+        self._source = df
+        self._codes: Dict[str, np.ndarray] = {}
+        self._lookup: Dict[str, np.ndarray] = {}
+        self._shared: Dict[str, bool] = {}
+        self._unique_cache: Dict[str, List[Any]] = {}
+        self._set_cache: Dict[str, frozenset] = {}
+
+        for col in normalized_columns.columns:
+            normalized = normalized_columns[col]
+            if not isinstance(normalized.dtype, pd.CategoricalDtype):
+                normalized = normalized.astype('category')
+            self._add_column(col, df[col], normalized.array)
+
+    def _add_column(self, col: str, source: pd.Series, normalized: pd.Categorical):
+        """Registra uma coluna de texto a partir do original e da versão normalizada"""
+        normalized_codes = np.asarray(normalized.codes)
+        normalized_values = np.empty(len(normalized.categories) + 1, dtype=object)
+        normalized_values[:-1] = normalized.categories.to_numpy(dtype=object)
+        normalized_values[-1] = None
+
+        if isinstance(source.dtype, pd.CategoricalDtype):
+            # Código original -> código normalizado (posição extra = nulo; -1 = não observado)
+            source_codes = source.array.codes
+            mapping = np.full(len(source.cat.categories) + 1, -1, dtype=np.int64)
+            mapping[source_codes] = normalized_codes
+            lookup = normalized_values[mapping]
+            lookup[mapping == -1] = None
+            self._codes[col] = source_codes
+            self._shared[col] = True
+        else:
+            # Sem dicionário no original: reaproveitar os códigos compactos dos artefatos
+            lookup = normalized_values
+            self._codes[col] = normalized_codes
+            self._shared[col] = False
+
+        self._lookup[col] = lookup
+
+    @property
+    def columns(self) -> pd.Index:
+        """Colunas do dataset (mesmas do original)"""
+        return self._source.columns
+
+    @property
+    def text_columns(self) -> List[str]:
+        """Colunas de texto normalizadas"""
+        return list(self._lookup.keys())
+
+    @property
+    def truncated_columns(self) -> List[str]:
+        """Colunas com valores únicos incompletos (nenhuma: a view cobre todas as linhas)"""
+        return []
+
+    @property
+    def fingerprint(self) -> Tuple:
+        """
+        Identifica a view pelos arrays de códigos (mesma ideia do fingerprint
+        de DataFrames em filters.core.count_index), distinta do original.
+        """
+        pointers = tuple((col, codes.__array_interface__['data'][0]) for col, codes in self._codes.items())
+        return ('normalized', len(self._source), pointers)
+
+    def __len__(self) -> int:
+        return len(self._source)
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._source.columns
+
+    def unique(self, column: str) -> List[Any]:
+        """
+        Valores únicos não nulos da coluna normalizada, na ordem de aparição.
+
+        Equivale a df_normalized[column].dropna().unique().tolist() sem
+        materializar a coluna: só os códigos distintos são traduzidos.
+
+        Args:
+            column: Nome da coluna
+
+        Returns:
+            Lista de valores (cacheada por coluna)
+        """
+        if column not in self._unique_cache:
+            if column in self._lookup:
+                first_codes = pd.unique(self._codes[column])
+                values = self._lookup[column][first_codes]
+                # Normalização pode unir valores distintos: deduplicar mantendo a ordem
+                self._unique_cache[column] = [val for val in dict.fromkeys(values) if val is not None]
+            else:
+                self._unique_cache[column] = self._source[column].dropna().unique().tolist()
+        return self._unique_cache[column]
+
+    def contains(self, column: str, value: Any) -> bool:
+        """
+        Verifica se um valor normalizado ocorre na coluna.
+
+        Args:
+            column: Nome da coluna
+            value: Valor já normalizado
+
+        Returns:
+            True se ao menos uma linha tem o valor
+        """
+        if column not in self._set_cache:
+            self._set_cache[column] = frozenset(self.unique(column))
+        return value in self._set_cache[column]
+
+    def originals(self, column: str, value: Any) -> List[Any]:
+        """
+        Valores originais cuja normalização resulta em `value`.
+
+        Args:
+            column: Nome da coluna de texto
+            value: Valor normalizado
+
+        Returns:
+            Lista de valores originais (vazia se o valor não ocorre)
+        """
+        if column not in self._lookup:
+            return [value] if self.contains(column, value) else []
+
+        matches = np.flatnonzero(self._lookup[column][:-1] == value)
+        if self._shared[column]:
+            categories = self._source[column].cat.categories
+            return categories[matches].tolist()
+        if len(matches) == 0:
+            return []
+        mask = np.isin(self._codes[column], matches)
+        return self._source[column][mask].dropna().unique().tolist()
+
+    def column(self, column: str) -> pd.Series:
+        """
+        Materializa uma coluna normalizada (mesmo resultado de normalize_column).
+
+        Colunas categóricas continuam categóricas (sem as categorias que não
+        ocorrem em nenhuma linha) e, quando a normalização não une categorias
+        nem há nulos, compartilham os códigos do original.
+
+        Args:
+            column: Nome da coluna
+
+        Returns:
+            Series com o índice do original
+        """
+        source = self._source[column]
+        if column not in self._lookup:
+            return source
+
+        codes = self._codes[column]
+        lookup = self._lookup[column]
+        if not isinstance(source.dtype, pd.CategoricalDtype):
+            return pd.Series(lookup[codes], index=source.index, name=column)
+
+        categories = lookup[:-1]
+        injective = not any(val is None for val in categories) and len(set(categories)) == len(categories)
+        if injective and not (codes == -1).any():
+            values = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories), validate=False)
+        else:
+            present = lookup[pd.unique(codes)]
+            new_categories = np.unique(np.array([val for val in present if val is not None], dtype=object))
+            index_of = dict(zip(new_categories, range(len(new_categories))))
+            mapping = np.array([index_of.get(val, -1) for val in lookup], dtype=np.int64)
+            values = pd.Categorical.from_codes(mapping[codes], categories=new_categories)
+        return pd.Series(values, index=source.index, name=column, copy=False)
+
+    def extended(self, df: pd.DataFrame, normalize_values: Callable[[List[Any]], List[Any]]) -> 'NormalizedView':
+        """
+        Nova view sobre df = dataset desta view + linhas acrescentadas ao final.
+
+        Só os valores que ainda não têm tradução passam por normalize_values:
+        categorias novas (que devem vir depois das existentes, mantendo os
+        códigos originais) ou valores distintos das linhas novas em colunas object.
+
+        Args:
+            df: DataFrame com as linhas desta view seguidas das novas
+            normalize_values: Normaliza uma lista de valores originais (ex: TextNormalizer.normalize_unique_values)
+
+        Returns:
+            NormalizedView sobre df (esta view continua válida sobre o dataset anterior)
+        """
+        view = NormalizedView(df, pd.DataFrame(index=df.index[:0]))
+        old_rows = len(self._source)
+
+        for col, old_lookup in self._lookup.items():
+            source = df[col]
+            if self._shared[col]:
+                codes = source.array.codes
+                categories = source.cat.categories
+                lookup = np.empty(len(categories) + 1, dtype=object)
+                lookup[:len(old_lookup) - 1] = old_lookup[:-1]
+                lookup[-1] = old_lookup[-1]
+
+                # Traduzir categorias que passam a ocorrer (novas ou não observadas antes)
+                present = pd.unique(codes[old_rows:])
+                pending = np.array([code for code in present if code >= 0 and lookup[code] is None], dtype=np.int64)
+                if len(pending):
+                    lookup[pending] = normalize_values(categories[pending].tolist())
+                if lookup[-1] is None and (present == -1).any():
+                    lookup[-1] = normalize_values([None])[0]
+            else:
+                # Códigos compactos: valores normalizados novos entram no final do lookup
+                new_codes, uniques = pd.factorize(source.iloc[old_rows:], use_na_sentinel=True)
+                normalized = normalize_values(list(uniques)) + normalize_values([None])
+                values = list(old_lookup[:-1])
+                index_of = {val: i for i, val in enumerate(values)}
+                mapping = np.empty(len(normalized), dtype=np.int64)
+                for i, val in enumerate(normalized):
+                    if val not in index_of:
+                        index_of[val] = len(values)
+                        values.append(val)
+                    mapping[i] = index_of[val]
+
+                lookup = np.empty(len(values) + 1, dtype=object)
+                lookup[:-1] = values
+                lookup[-1] = None
+                dtype = np.promote_types(self._codes[col].dtype, np.min_scalar_type(-len(lookup)))
+                codes = np.concatenate([self._codes[col].astype(dtype), mapping[new_codes].astype(dtype)])
+
+            view._codes[col] = codes
+            view._lookup[col] = lookup
+            view._shared[col] = self._shared[col]
+        return view
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materializa o DataFrame normalizado completo (uso em testes/depuração)"""
+        columns = {col: self.column(col) for col in self._source.columns}
+        return pd.DataFrame(columns, index=self._source.index, copy=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna colunas e memória própria da view (códigos compartilhados não contam)"""
+        lookup_bytes = sum(lookup.nbytes for lookup in self._lookup.values())
+        codes_bytes = sum(self._codes[col].nbytes for col, shared in self._shared.items() if not shared)
+        return {
+            'text_columns': len(self._lookup),
+            'shared_code_columns': sum(self._shared.values()),
+            'lookup_entries': sum(len(lookup) for lookup in self._lookup.values()),
+            'memory_mb': round((lookup_bytes + codes_bytes) / (1024 * 1024), 2),
+        }
+
+
+class DictionaryView:
+    """
+    View de validação de filtros sem DataFrame (ingestão em streaming).
+
+    Mesma interface usada pelos filtros que a NormalizedView (columns, unique,
+    contains, originals, fingerprint), mas construída só a partir do dicionário
+    de valores distintos coletado em utils.streaming_ingest.
+
+    Colunas truncadas (dicionário interrompido em MAX_DISTINCT_VALUES) têm
+    valores únicos incompletos: unique devolve só os valores coletados e
+    contains aceita qualquer valor.
+    """
+
+    def __init__(self, dictionary: pd.DataFrame, dimension_values: Dict[str, List[Any]],
+                 columns: List[str], rows: int, source_hash: str = "",
+                 truncated_columns: Optional[List[str]] = None):
+        """
+        Args:
+            dictionary: Colunas de texto como (column_name, value, normalized)
+            dimension_values: Valores distintos das dimensões que não são texto
+            columns: Colunas do dataset
+            rows: Número de linhas do dataset
+            source_hash: Hash do parquet (identifica a view)
+            truncated_columns: Colunas cujo dicionário não tem todos os valores
+        """
+        self._columns = pd.Index(columns)
+        self._rows = rows
+        self._source_hash = source_hash
+        self._truncated = frozenset(truncated_columns or [])
+        self._originals: Dict[str, np.ndarray] = {}
+        self._normalized: Dict[str, np.ndarray] = {}
+        self._dimension_values = {col: list(values) for col, values in dimension_values.items()}
+        self._unique_cache: Dict[str, List[Any]] = {}
+        self._set_cache: Dict[str, frozenset] = {}
+
+        for col, group in dictionary.groupby('column_name', sort=False):
+            self._originals[col] = group['value'].to_numpy(dtype=object)
+            self._normalized[col] = group['normalized'].to_numpy(dtype=object)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._columns
+
+    @property
+    def text_columns(self) -> List[str]:
+        return list(self._normalized.keys())
+
+    @property
+    def truncated_columns(self) -> List[str]:
+        return sorted(self._truncated)
+
+    @property
+    def fingerprint(self) -> Tuple:
+        return ('dictionary', self._rows, self._source_hash)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._columns
+
+    def unique(self, column: str) -> List[Any]:
+        """Valores únicos não nulos (normalizados para colunas de texto), na ordem de aparição (parciais em colunas truncadas)"""
+        if column not in self._unique_cache:
+            if column in self._normalized:
+                values = [val for val in dict.fromkeys(self._normalized[column]) if val is not None]
+            else:
+                values = self._dimension_values.get(column, [])
+            self._unique_cache[column] = values
+        return self._unique_cache[column]
+
+    def contains(self, column: str, value: Any) -> bool:
+        """Verifica se um valor (já normalizado) ocorre na coluna (sempre True em colunas truncadas)"""
+        if column in self._truncated:
+            return True
+        if column not in self._set_cache:
+            self._set_cache[column] = frozenset(self.unique(column))
+        return value in self._set_cache[column]
+
+    def originals(self, column: str, value: Any) -> List[Any]:
+        """Valores originais cuja normalização resulta em `value`"""
+        if column not in self._normalized:
+            return [value] if self.contains(column, value) else []
+        return [val for val in self._originals[column][self._normalized[column] == value] if val is not None]
+
+    def extended(self, values: Dict[str, List[Any]], normalize_values: Callable[[List[Any]], List[Any]],
+                 rows: int, source_hash: str) -> 'DictionaryView':
+        """
+        Nova view com os valores distintos de linhas acrescentadas ao dataset.
+
+        Só os valores de texto que ainda não estão no dicionário passam por normalize_values.
+
+        Args:
+            values: Valores distintos das linhas novas por coluna (None = a coluna tem nulos)
+            normalize_values: Normaliza uma lista de valores originais
+            rows: Número de linhas do dataset após o acréscimo
+            source_hash: Identifica o novo conteúdo
+
+        Returns:
+            DictionaryView (esta view continua válida sobre o dataset anterior)
+        """
+        dictionary = {'column_name': [], 'value': [], 'normalized': []}
+        dimension_values = {col: list(vals) for col, vals in self._dimension_values.items()}
+
+        for col in self._normalized:
+            known = set(self._originals[col])
+            new_values = [val for val in dict.fromkeys(values.get(col, [])) if val not in known]
+            originals = list(self._originals[col]) + new_values
+            normalized = list(self._normalized[col]) + (normalize_values(new_values) if new_values else [])
+            dictionary['column_name'].extend([col] * len(originals))
+            dictionary['value'].extend(originals)
+            dictionary['normalized'].extend(normalized)
+        for col, known_values in dimension_values.items():
+            known = set(known_values)
+            known_values.extend(val for val in dict.fromkeys(values.get(col, [])) if val is not None and val not in known)
+
+        return DictionaryView(pd.DataFrame(dictionary), dimension_values, list(self._columns), rows, source_hash,
+                              truncated_columns=list(self._truncated))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Mesmas chaves de NormalizedView.get_stats"""
+        lookup_bytes = sum(values.nbytes for values in self._originals.values())
+        lookup_bytes += sum(values.nbytes for values in self._normalized.values())
+        return {
+            'text_columns': len(self._normalized),
+            'shared_code_columns': 0,
+            'lookup_entries': sum(len(values) for values in self._normalized.values()),
+            'memory_mb': round(lookup_bytes / (1024 * 1024), 2),
+        }
+
+
+def truncated_columns(dataset: Any) -> List[str]:
+    """
+    Colunas de um DataFrame, NormalizedView ou DictionaryView cujos valores únicos estão incompletos.
+
+    Args:
+        dataset: pd.DataFrame, NormalizedView ou DictionaryView
+
+    Returns:
+        Lista de colunas (vazia para DataFrames e NormalizedViews)
+    """
+    if isinstance(dataset, pd.DataFrame):
+        return []
+    return dataset.truncated_columns
+
+
+def unique_values(dataset: Any, column: str) -> List[Any]:
+    """
+    Valores únicos não nulos de uma coluna de um DataFrame, NormalizedView ou DictionaryView.
+
+    Args:
+        dataset: pd.DataFrame, NormalizedView ou DictionaryView
+        column: Nome da coluna
+
+    Returns:
+        Lista de valores na ordem de aparição
+    """
+    if isinstance(dataset, pd.DataFrame):
+        return dataset[column].dropna().unique().tolist()
+    return dataset.unique(column)
@@ -0,0 +1,170 @@
+"""
+Parallel Queries - Execução concorrente das queries independentes de um passo do agente
+Quando o modelo emite várias chamadas run_query em uma mesma resposta (ex: Top-N,
+contagem e período de comparação), o Agno as executa uma após a outra na conexão
+da ferramenta. Antes disso, as queries somente-leitura (SELECT/WITH) do lote são
+executadas em paralelo, cada uma em um cursor DuckDB de um pool da ferramenta
+(DebugDuckDbTools.prefetch_queries). Cada run_query, ainda chamado na ordem do
+modelo, apenas consome o resultado já pronto, então last_result_df, sql_queries,
+o cache de resultados e os eventos das ferramentas ficam idênticos aos da
+execução sequencial.
+
+O tempo economizado por lote (soma das execuções individuais menos o tempo de
+parede do lote) vai para o span duckdb.parallel_batch e para
+debug_info["parallel_queries"].
+"""
+
+import inspect
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import duckdb
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.model_config import PARALLEL_QUERY_CONFIG
+
+
+# Ferramenta cujas chamadas de um mesmo passo são executadas em paralelo
+PARALLEL_TOOL = "run_query"
+
+
+def is_read_only(query: str) -> bool:
+    """Query que apenas lê dados (SELECT/WITH), segura para rodar fora de ordem"""
+    query_lower = query.strip().lower()
+    return query_lower.startswith('select') or query_lower.startswith('with')
+
+
+class CursorPool:
+    """
+    Cursores DuckDB reutilizáveis sobre a conexão de uma ferramenta.
+
+    Cursores compartilham catálogo e dados com a conexão de origem, mas cada um
+    executa uma query por vez: cada worker usa um cursor exclusivo, criado sob
+    demanda até max_size e devolvido ao pool ao final da query.
+    """
+
+    def __init__(self, connection: duckdb.DuckDBPyConnection, max_size: int):
+        self.connection = connection
+        self.max_size = max_size
+        self._idle: "queue.LifoQueue[duckdb.DuckDBPyConnection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.stats = {'cursors_created': 0, 'acquisitions': 0}
+
+    @contextmanager
+    def acquire(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Empresta um cursor (bloqueia enquanto os max_size cursores estão em uso)"""
+        cursor = None
+        try:
+            cursor = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.max_size:
+                    self._created += 1
+                    self.stats['cursors_created'] += 1
+                    cursor = self.connection.cursor()
+        if cursor is None:
+            cursor = self._idle.get()
+        with self._lock:
+            self.stats['acquisitions'] += 1
+        try:
+            yield cursor
+        finally:
+            self._idle.put(cursor)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'idle': self._idle.qsize(), 'max_size': self.max_size}
+
+
+# Workers compartilhados pelas ferramentas de todas as sessões do processo
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_query_executor() -> ThreadPoolExecutor:
+    """Retorna o pool de threads compartilhado para queries paralelas"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PARALLEL_QUERY_CONFIG["max_workers"],
+                                           thread_name_prefix="duckdb-query")
+        return _executor
+
+
+def reset_query_executor():
+    """Encerra o pool de threads (usado em testes)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _owning_toolkit(function: Any) -> Any:
+    """Instância da ferramenta dona do método (o Agno envolve o entrypoint com validate_call)"""
+    entrypoint = getattr(function, 'entrypoint', None)
+    if entrypoint is None:
+        return None
+    return getattr(inspect.unwrap(entrypoint), '__self__', None)
+
+
+def prefetch_tool_calls(function_calls: List[Any]) -> List[Any]:
+    """
+    Executa em paralelo as chamadas run_query de um passo do modelo.
+
+    As chamadas são agrupadas pela ferramenta dona (DebugDuckDbTools); grupos com
+    ao menos duas queries são pré-executados pela própria ferramenta.
+
+    Args:
+        function_calls: FunctionCalls do Agno emitidas em uma única resposta do modelo
+
+    Returns:
+        Ferramentas com resultados pré-executados (ver discard_prefetched)
+    """
+    if not PARALLEL_QUERY_CONFIG["enabled"]:
+        return []
+
+    batches: Dict[int, List[Any]] = {}
+    toolkits: Dict[int, Any] = {}
+    for function_call in function_calls:
+        function = getattr(function_call, 'function', None)
+        if getattr(function, 'name', None) != PARALLEL_TOOL:
+            continue
+        # Confirmação/execução externa (HITL): a chamada pode nem ser executada
+        if getattr(function, 'requires_confirmation', False) or getattr(function, 'external_execution', False):
+            continue
+        toolkit = _owning_toolkit(function)
+        query = (function_call.arguments or {}).get('query')
+        if not hasattr(toolkit, 'prefetch_queries') or not isinstance(query, str):
+            continue
+        toolkits[id(toolkit)] = toolkit
+        batches.setdefault(id(toolkit), []).append(query)
+
+    prefetched = []
+    for key, queries in batches.items():
+        if len(queries) > 1 and toolkits[key].prefetch_queries(queries):
+            prefetched.append(toolkits[key])
+    return prefetched
+
+
+class ParallelToolCallsMixin:
+    """
+    Mixin para modelos Agno: queries independentes de um mesmo passo rodam em paralelo.
+
+    Deve vir antes da classe do modelo na herança (ex: class M(ParallelToolCallsMixin, OpenAIChat)).
+    """
+
+    def run_function_calls(self, function_calls, *args, **kwargs):
+        toolkits = prefetch_tool_calls(function_calls)
+        try:
+            yield from super().run_function_calls(function_calls, *args, **kwargs)
+        finally:
+            # Resultados não consumidos (ex: limite de chamadas) não valem para passos seguintes
+            for toolkit in toolkits:
+                toolkit.discard_prefetched()
@@ -0,0 +1,245 @@
+"""
+Query Fingerprint - Identificação semântica de queries SQL
+Queries equivalentes (ordem de predicados, aliases, caixa de palavras-chave,
+parênteses redundantes) geram o mesmo fingerprint para o cache de resultados
+
+A query é convertida na AST do próprio parser do DuckDB (json_serialize_sql)
+e canonicalizada antes do hash:
+- posições no texto (query_location) são removidas
+- identificadores de colunas e tabelas ficam em minúsculas
+- filhos de AND/OR e listas de IN são ordenados; operandos de = e <> também
+- comparações "constante < coluna" viram "coluna > constante"
+- aliases de tabelas viram t0, t1... (removidos quando há uma única tabela)
+- aliases do SELECT externo são descartados (exceto os referenciados no WHERE,
+  GROUP BY, HAVING ou em outro item do SELECT); referências a eles no ORDER BY
+  viram posições. Aliases de CTEs e subqueries são mantidos
+
+Quando o parser não aceita a query (ex: DDL), o fingerprint cai para o
+texto com espaços colapsados, como no comportamento anterior.
+"""
+
+import hashlib
+import json
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import duckdb
+
+
+# Comparações comutativas e espelhamento de desigualdades
+COMMUTATIVE_COMPARISONS = {'COMPARE_EQUAL', 'COMPARE_NOTEQUAL', 'COMPARE_NOT_DISTINCT_FROM', 'COMPARE_DISTINCT_FROM'}
+MIRRORED_COMPARISONS = {
+    'COMPARE_LESSTHAN': 'COMPARE_GREATERTHAN',
+    'COMPARE_GREATERTHAN': 'COMPARE_LESSTHAN',
+    'COMPARE_LESSTHANOREQUALTO': 'COMPARE_GREATERTHANOREQUALTO',
+    'COMPARE_GREATERTHANOREQUALTO': 'COMPARE_LESSTHANOREQUALTO',
+}
+SORTABLE_CONJUNCTIONS = {'CONJUNCTION_AND', 'CONJUNCTION_OR'}
+SORTABLE_IN_LISTS = {'COMPARE_IN', 'COMPARE_NOT_IN'}
+
+_parser_connection: Optional[duckdb.DuckDBPyConnection] = None
+_parser_lock = threading.Lock()
+_stats = {'parsed': 0, 'fallbacks': 0}
+
+
+def _serialize(query: str) -> Optional[Dict[str, Any]]:
+    """Converte a query em AST JSON pelo parser do DuckDB (None se não for SELECT válido)"""
+    global _parser_connection
+    with _parser_lock:
+        if _parser_connection is None:
+            _parser_connection = duckdb.connect()
+        try:
+            serialized = _parser_connection.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0]
+        except duckdb.Error:
+            return None
+
+    ast = json.loads(serialized)
+    if ast.get('error'):
+        return None
+    return ast
+
+
+def _dump(node: Any) -> str:
+    """Serialização determinística usada para ordenar e para o hash"""
+    return json.dumps(node, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def _walk_scope(node: Any, visit, is_root: bool = True):
+    """Aplica visit a todos os dicts do escopo atual, sem entrar em SELECTs aninhados"""
+    if isinstance(node, dict):
+        if not is_root and node.get('type') == 'SELECT_NODE':
+            return
+        visit(node)
+        for value in node.values():
+            _walk_scope(value, visit, is_root=False)
+    elif isinstance(node, list):
+        for value in node:
+            _walk_scope(value, visit, is_root=False)
+
+
+def _collect_table_refs(from_table: Any, refs: list):
+    """Coleta tabelas e subqueries do FROM (na ordem em que aparecem)"""
+    if not isinstance(from_table, dict):
+        return
+    table_type = from_table.get('type')
+    if table_type == 'JOIN':
+        _collect_table_refs(from_table.get('left'), refs)
+        _collect_table_refs(from_table.get('right'), refs)
+    elif table_type in ('BASE_TABLE', 'SUBQUERY', 'TABLE_FUNCTION'):
+        refs.append(from_table)
+
+
+def _canonicalize_select(node: Dict[str, Any], outer: bool):
+    """
+    Normaliza aliases de tabelas e do SELECT de um SELECT_NODE.
+
+    Aliases do SELECT só são descartados no SELECT mais externo, onde apenas
+    nomeiam as colunas de saída; em CTEs e subqueries eles são referenciados
+    pela query de fora e mudam o significado dela.
+    """
+    # Aliases de tabelas
+    refs = []
+    _collect_table_refs(node.get('from_table'), refs)
+    qualifiers = {}
+    for i, ref in enumerate(refs):
+        names = {str(ref.get('alias') or '').lower(), str(ref.get('table_name') or '').lower()} - {''}
+        canonical = None if len(refs) == 1 else f"t{i}"
+        for name in names:
+            qualifiers[name] = canonical
+        ref['alias'] = canonical or ''
+
+    if qualifiers:
+        def rewrite_qualifier(expr):
+            if expr.get('class') == 'COLUMN_REF':
+                column_names = expr.get('column_names') or []
+                if len(column_names) >= 2 and str(column_names[0]).lower() in qualifiers:
+                    canonical = qualifiers[str(column_names[0]).lower()]
+                    expr['column_names'] = ([canonical] if canonical else []) + column_names[1:]
+        _walk_scope(node, rewrite_qualifier)
+
+    if not outer:
+        return
+
+    # Aliases do SELECT externo: descartados (nomes de saída são reaplicados no hit)
+    alias_positions = {}
+    for i, expr in enumerate(node.get('select_list') or []):
+        if isinstance(expr, dict) and expr.get('alias'):
+            alias_positions.setdefault(str(expr['alias']).lower(), i)
+
+    # ORDER BY resolve aliases do SELECT antes de colunas: trocar por posição
+    if alias_positions:
+        for modifier in node.get('modifiers') or []:
+            if modifier.get('type') != 'ORDER_MODIFIER':
+                continue
+            for order in modifier.get('orders') or []:
+                expr = order.get('expression') or {}
+                column_names = expr.get('column_names') or []
+                if expr.get('class') == 'COLUMN_REF' and len(column_names) == 1:
+                    position = alias_positions.get(str(column_names[0]).lower())
+                    if position is not None:
+                        order['expression'] = {'class': 'SELECT_POSITION', 'position': position}
+
+    # Aliases ainda referenciados no escopo (WHERE, GROUP BY, HAVING, outro item do SELECT) são mantidos
+    referenced = set()
+
+    def collect_reference(expr):
+        column_names = expr.get('column_names') or []
+        if expr.get('class') == 'COLUMN_REF' and len(column_names) == 1:
+            referenced.add(str(column_names[0]).lower())
+    _walk_scope(node, collect_reference)
+
+    for expr in node.get('select_list') or []:
+        if isinstance(expr, dict) and expr.get('alias') and str(expr['alias']).lower() not in referenced:
+            expr['alias'] = ''
+
+
+def _canonicalize(node: Any, outer: bool = False) -> Any:
+    """Canonicaliza recursivamente a AST (modifica e retorna o nó; outer = nó de um statement)"""
+    if isinstance(node, list):
+        return [_canonicalize(value) for value in node]
+    if not isinstance(node, dict):
+        return node
+
+    node.pop('query_location', None)
+    if node.get('type') == 'SELECT_NODE':
+        _canonicalize_select(node, outer)
+
+    for key, value in list(node.items()):
+        node[key] = _canonicalize(value)
+
+    node_class = node.get('class')
+    node_type = node.get('type') if isinstance(node.get('type'), str) else None
+
+    if node_class == 'COLUMN_REF':
+        node['column_names'] = [str(name).lower() for name in node.get('column_names') or []]
+    elif node_type == 'BASE_TABLE':
+        node['table_name'] = str(node.get('table_name') or '').lower()
+        node['schema_name'] = str(node.get('schema_name') or '').lower()
+
+    if node_type in SORTABLE_CONJUNCTIONS:
+        node['children'] = sorted(node.get('children') or [], key=_dump)
+    elif node_type in SORTABLE_IN_LISTS and node.get('children'):
+        children = node['children']
+        node['children'] = children[:1] + sorted(children[1:], key=_dump)
+    elif node_class == 'COMPARISON':
+        left, right = node.get('left'), node.get('right')
+        if node_type in COMMUTATIVE_COMPARISONS:
+            if _dump(left) > _dump(right):
+                node['left'], node['right'] = right, left
+        elif node_type in MIRRORED_COMPARISONS:
+            if isinstance(left, dict) and left.get('class') == 'CONSTANT' and \
+                    not (isinstance(right, dict) and right.get('class') == 'CONSTANT'):
+                node['left'], node['right'] = right, left
+                node['type'] = MIRRORED_COMPARISONS[node_type]
+
+    return node
+
+
+def canonicalize_sql(query: str) -> Optional[str]:
+    """
+    Retorna a forma canônica (JSON da AST normalizada) de uma query SELECT.
+
+    Args:
+        query: Query SQL
+
+    Returns:
+        String canônica ou None se a query não puder ser analisada
+    """
+    ast = _serialize(query)
+    if ast is None:
+        return None
+    statements = [statement.get('node') for statement in ast.get('statements') or []]
+    return _dump([_canonicalize(statement, outer=True) for statement in statements])
+
+
+@lru_cache(maxsize=2048)
+def fingerprint_sql(query: str) -> str:
+    """
+    Fingerprint semântico de uma query SQL (hash MD5 hexadecimal).
+
+    Args:
+        query: Query SQL
+
+    Returns:
+        Hash da forma canônica, ou do texto com espaços colapsados quando
+        a query não pode ser analisada
+    """
+    canonical = canonicalize_sql(query)
+    if canonical is None:
+        _stats['fallbacks'] += 1
+        canonical = "text:" + " ".join(query.split())
+    else:
+        _stats['parsed'] += 1
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+def get_fingerprint_stats() -> Dict[str, Any]:
+    """Retorna estatísticas do fingerprinting (queries analisadas, fallbacks, cache)"""
+    info = fingerprint_sql.cache_info()
+    return {
+        'parsed': _stats['parsed'],
+        'fallbacks': _stats['fallbacks'],
+        'memo_hits': info.hits,
+        'memo_size': info.currsize,
+    }
@@ -0,0 +1,509 @@
+"""
+Rollup Cubes - Agregações mensais pré-materializadas da hierarquia de dimensões
+Perguntas do agente são em sua maioria SUM/COUNT por mês × uma ou duas dimensões
+de COLUMN_HIERARCHY; em vez de varrer a tabela base a cada pergunta, essas
+queries são reescritas para o menor rollup que as responde com o mesmo resultado
+
+Rollups construídos (junto com a tabela dados_comerciais, ver utils.duckdb_pool):
+- um por nível de cada grupo da hierarquia (o nível e os níveis mais amplos acima dele)
+- um para cada par de grupos, no nível mais amplo de cada um
+- um apenas por mês (totais gerais)
+
+Cada rollup tem a coluna _mes (DATE_TRUNC('month', Data)), as dimensões, SUM de cada
+métrica (com o mesmo nome da coluna) e _n_registros (COUNT(*)). O catálogo dos rollups
+fica na tabela _rollup_catalog do próprio banco.
+
+A reescrita opera sobre a AST do parser do DuckDB e só acontece quando a query no
+rollup calcula a mesma agregação; qualquer construção fora das regras abaixo mantém
+a query na tabela base. Para métricas inteiras e DECIMAL o resultado é idêntico; para
+FLOAT/DOUBLE a soma dos subtotais muda a ordem das adições e pode diferir nos últimos
+dígitos (arredondamento de ponto flutuante, da mesma ordem que a variação entre
+execuções paralelas da própria tabela base):
+- SELECT simples sobre dados_comerciais (sem JOIN, CTE, subquery ou janela)
+- agregações SUM(métrica), COUNT(*), COUNT(constante), MIN/MAX e COUNT(DISTINCT) de dimensões
+- Data apenas via DATE_TRUNC/YEAR/MONTH/QUARTER/DATE_PART/STRFTIME em granularidade
+  de mês ou mais ampla, ou em limites de período alinhados ao mês
+  (Data >= início de mês, Data < início de mês e, quando Data tem granularidade
+  diária, Data <= fim de mês, Data > fim de mês e BETWEEN)
+"""
+
+import calendar
+import copy
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from itertools import combinations
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.agent_config import COLUMN_HIERARCHY
+from utils.query_fingerprint import MIRRORED_COMPARISONS
+
+
+BASE_TABLE = "dados_comerciais"
+CATALOG_TABLE = "_rollup_catalog"
+DATE_COLUMN = "Data"
+MONTH_COLUMN = "_mes"
+COUNT_COLUMN = "_n_registros"
+
+# Rollups que não reduzem a tabela base pelo menos à metade não compensam
+MAX_ROLLUP_RATIO = 0.5
+
+NUMERIC_TYPE_PATTERN = re.compile(r"^(TINYINT|SMALLINT|INTEGER|BIGINT|HUGEINT|UTINYINT|USMALLINT|UINTEGER|UBIGINT|FLOAT|DOUBLE|DECIMAL)")
+COARSE_DATE_PARTS = {'year', 'quarter', 'month'}
+DATE_PART_FUNCTIONS = {'year', 'month', 'quarter'}
+MONTH_FORMAT_DIRECTIVES = set('YymBb%')
+DUPLICATE_INSENSITIVE_AGGREGATES = {'min', 'max'}
+
+
+class _NotRoutable(Exception):
+    """A query não pode ser respondida por um rollup com o mesmo resultado"""
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _rollup_levels(columns: List[str]) -> List[List[str]]:
+    """Níveis a materializar a partir das colunas existentes na tabela base"""
+    groups = [[c for c in hierarchy if c in columns] for hierarchy in COLUMN_HIERARCHY.values()]
+    groups = [g for g in groups if g]
+
+    levels = [[]]
+    for group in groups:
+        levels.extend(group[i:] for i in range(len(group)))
+    for group_a, group_b in combinations(groups, 2):
+        levels.append([group_a[-1], group_b[-1]])
+    return levels
+
+
+def build_rollups(conn: duckdb.DuckDBPyConnection) -> Dict[str, Any]:
+    """
+    Materializa os rollups mensais e o catálogo no banco da conexão.
+
+    Deve ser chamado logo após a criação da tabela base (antes de abrir o
+    banco em modo somente-leitura). Sem a coluna Data nada é construído.
+
+    Args:
+        conn: Conexão com a tabela dados_comerciais
+
+    Returns:
+        Dict com número de rollups construídos e tempo de construção
+    """
+    start_time = time.perf_counter()
+    schema = {name: col_type for name, col_type in
+              conn.execute(f"SELECT column_name, data_type FROM information_schema.columns "
+                           f"WHERE table_name = '{BASE_TABLE}'").fetchall()}
+    if DATE_COLUMN not in schema:
+        return {'rollups': 0, 'seconds': 0.0}
+
+    dimensions = {c for hierarchy in COLUMN_HIERARCHY.values() for c in hierarchy}
+    metrics = [name for name, col_type in schema.items()
+               if NUMERIC_TYPE_PATTERN.match(col_type) and name not in dimensions and not name.startswith('Cod_')]
+
+    base_rows, date_is_day = conn.execute(
+        f"SELECT COUNT(*), COALESCE(bool_and({_quote(DATE_COLUMN)} = DATE_TRUNC('day', {_quote(DATE_COLUMN)})), true) "
+        f"FROM {BASE_TABLE}"
+    ).fetchone()
+
+    conn.execute(f"DROP TABLE IF EXISTS {CATALOG_TABLE}")
+    conn.execute(f"""
+        CREATE TABLE {CATALOG_TABLE} (
+            table_name VARCHAR, dimensions VARCHAR[], metrics VARCHAR[], rows BIGINT, date_is_day BOOLEAN
+        )
+    """)
+
+    built = 0
+    for i, level in enumerate(_rollup_levels(list(schema))):
+        table_name = f"_rollup_{i}"
+        conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+        conn.execute(f"CREATE TABLE {table_name} AS {_rollup_select(level, metrics)}")
+        rows = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        if level and rows > base_rows * MAX_ROLLUP_RATIO:
+            conn.execute(f"DROP TABLE {table_name}")
+            continue
+        conn.execute(f"INSERT INTO {CATALOG_TABLE} VALUES (?, ?, ?, ?, ?)",
+                     [table_name, level, metrics, rows, date_is_day])
+        built += 1
+
+    return {'rollups': built, 'seconds': round(time.perf_counter() - start_time, 3)}
+
+
+def _rollup_select(level: List[str], metrics: List[str], where: str = "") -> str:
+    """SELECT que agrega a tabela base no nível do rollup (colunas na ordem da tabela do rollup)"""
+    select_dims = "".join(f"{_quote(c)}, " for c in level)
+    select_metrics = "".join(f"SUM({_quote(m)}) AS {_quote(m)}, " for m in metrics)
+    return f"""
+        SELECT DATE_TRUNC('month', {_quote(DATE_COLUMN)}) AS {MONTH_COLUMN}, {select_dims}{select_metrics}
+               COUNT(*) AS {COUNT_COLUMN}
+        FROM {BASE_TABLE}
+        {where}
+        GROUP BY ALL
+    """
+
+
+def refresh_rollups(conn: duckdb.DuckDBPyConnection, start: datetime, end: datetime) -> Dict[str, Any]:
+    """
+    Recalcula nos rollups existentes apenas os meses em [start, end).
+
+    Usado após acrescentar linhas à tabela base (ver utils.incremental_refresh):
+    as linhas dos meses afetados são apagadas e reagregadas a partir da tabela
+    base; os demais meses não são relidos.
+
+    Args:
+        conn: Conexão com dados_comerciais e o catálogo dos rollups (escrita)
+        start: Início do primeiro mês afetado
+        end: Início do mês seguinte ao último afetado
+
+    Returns:
+        Dict com número de rollups atualizados e tempo
+    """
+    start_time = time.perf_counter()
+    try:
+        catalog = conn.execute(f"SELECT table_name, dimensions, metrics FROM {CATALOG_TABLE}").fetchall()
+    except duckdb.Error:
+        return {'rollups': 0, 'seconds': 0.0}
+
+    date_filter = f"WHERE {_quote(DATE_COLUMN)} >= ? AND {_quote(DATE_COLUMN)} < ?"
+    for table_name, dimensions, metrics in catalog:
+        conn.execute(f"DELETE FROM {table_name} WHERE {MONTH_COLUMN} >= ? AND {MONTH_COLUMN} < ?", [start, end])
+        conn.execute(f"INSERT INTO {table_name} {_rollup_select(dimensions, metrics, date_filter)}", [start, end])
+        rows = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        conn.execute(f"UPDATE {CATALOG_TABLE} SET rows = ? WHERE table_name = ?", [rows, table_name])
+
+    # Linhas novas com horário tornam a granularidade de Data mais fina que o dia
+    date_is_day = conn.execute(
+        f"SELECT COALESCE(bool_and({_quote(DATE_COLUMN)} = DATE_TRUNC('day', {_quote(DATE_COLUMN)})), true) "
+        f"FROM {BASE_TABLE} {date_filter}", [start, end]).fetchone()[0]
+    if not date_is_day:
+        conn.execute(f"UPDATE {CATALOG_TABLE} SET date_is_day = false")
+
+    return {'rollups': len(catalog), 'seconds': round(time.perf_counter() - start_time, 3)}
+
+
+class RollupRouter:
+    """
+    Reescreve queries agregadas para o menor rollup compatível.
+
+    Lê o catálogo do banco uma vez; sem catálogo (ex: conexões criadas fora do
+    pool) nenhuma query é reescrita.
+    """
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection):
+        self.conn = conn
+        self.rollups: List[Dict[str, Any]] = []
+        self.base_columns: set = set()
+        self.dimensions: set = set()
+        self.metrics: set = set()
+        self.aggregates: set = set()
+        self.date_is_day = False
+        self.stats = {'rewritten': 0, 'not_routable': 0}
+
+        try:
+            rows = conn.execute(f"SELECT table_name, dimensions, metrics, rows, date_is_day "
+                                f"FROM {CATALOG_TABLE} ORDER BY rows").fetchall()
+            self.base_columns = {name.lower() for (name,) in conn.execute(
+                f"SELECT column_name FROM information_schema.columns WHERE table_name = '{BASE_TABLE}'").fetchall()}
+            self.aggregates = {name for (name,) in conn.execute(
+                "SELECT DISTINCT function_name FROM duckdb_functions() WHERE function_type = 'aggregate'").fetchall()}
+        except duckdb.Error:
+            return
+
+        for table_name, dimensions, metrics, n_rows, date_is_day in rows:
+            self.rollups.append({
+                'table_name': table_name,
+                'dimensions': {d.lower() for d in dimensions},
+                'metrics': {m.lower() for m in metrics},
+                'rows': n_rows,
+            })
+            self.date_is_day = bool(date_is_day)
+            self.dimensions |= self.rollups[-1]['dimensions']
+            self.metrics |= self.rollups[-1]['metrics']
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rollups)
+
+    def rewrite(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Reescreve a query para um rollup, se possível.
+
+        Args:
+            query: Query SQL (um único statement)
+
+        Returns:
+            Dict com 'sql' reescrito e 'rollup' usado, ou None se a query deve
+            executar na tabela base
+        """
+        if not self.enabled or BASE_TABLE not in query.lower():
+            return None
+
+        try:
+            document = json.loads(self.conn.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0])
+            if document.get('error') or len(document.get('statements') or []) != 1:
+                raise _NotRoutable()
+
+            node = document['statements'][0]['node']
+            needed = self._rewrite_select(node)
+            rollup = next((r for r in self.rollups
+                           if needed['dimensions'] <= r['dimensions'] and needed['metrics'] <= r['metrics']), None)
+            if rollup is None:
+                raise _NotRoutable()
+
+            node['from_table']['table_name'] = rollup['table_name']
+            sql = self.conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(document)]).fetchone()[0]
+        except (_NotRoutable, duckdb.Error, KeyError, TypeError):
+            self.stats['not_routable'] += 1
+            return None
+
+        self.stats['rewritten'] += 1
+        return {'sql': sql, 'rollup': rollup['table_name'], 'rollup_rows': rollup['rows']}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de reescrita"""
+        stats = dict(self.stats)
+        stats['rollups'] = len(self.rollups)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Validação e reescrita da AST
+    # ------------------------------------------------------------------
+
+    def _rewrite_select(self, node: Dict[str, Any]) -> Dict[str, set]:
+        """Valida o SELECT_NODE e reescreve as expressões in-place"""
+        if node.get('type') != 'SELECT_NODE' or (node.get('cte_map') or {}).get('map'):
+            raise _NotRoutable()
+        from_table = node.get('from_table') or {}
+        if from_table.get('type') != 'BASE_TABLE' or str(from_table.get('table_name')).lower() != BASE_TABLE:
+            raise _NotRoutable()
+        if from_table.get('schema_name') not in ('', 'main') or from_table.get('sample') or from_table.get('at_clause'):
+            raise _NotRoutable()
+        if node.get('sample') or node.get('qualify'):
+            raise _NotRoutable()
+
+        # Referências qualificadas pelo nome da tabela continuam válidas após trocar a tabela
+        if not from_table.get('alias'):
+            from_table['alias'] = from_table['table_name']
+
+        self._aliases = {str(e.get('alias')).lower() for e in node.get('select_list') or [] if e.get('alias')}
+        if self._aliases & {MONTH_COLUMN, COUNT_COLUMN}:
+            raise _NotRoutable()
+        self._needed = {'dimensions': set(), 'metrics': set()}
+        self._has_aggregate = False
+
+        node['select_list'] = [self._rewrite_expr(e) for e in node['select_list']]
+        if node.get('where_clause'):
+            node['where_clause'] = self._rewrite_expr(node['where_clause'])
+        node['group_expressions'] = [self._rewrite_expr(e) for e in node.get('group_expressions') or []]
+        if node.get('having'):
+            node['having'] = self._rewrite_expr(node['having'])
+        for modifier in node.get('modifiers') or []:
+            for order in modifier.get('orders') or []:
+                order['expression'] = self._rewrite_expr(order['expression'])
+            if modifier.get('distinct_on_targets'):
+                modifier['distinct_on_targets'] = [self._rewrite_expr(e) for e in modifier['distinct_on_targets']]
+            for key in ('limit', 'offset'):
+                if modifier.get(key):
+                    modifier[key] = self._rewrite_expr(modifier[key])
+
+        # Sem agregação o resultado é por registro: só a tabela base responde
+        if not (self._has_aggregate or node['group_expressions'] or node.get('aggregate_handling') == 'FORCE_AGGREGATES'):
+            raise _NotRoutable()
+        return self._needed
+
+    def _rewrite_expr(self, expr: Any, in_sum: bool = False) -> Any:
+        """Reescreve uma expressão (levanta _NotRoutable se não for equivalente no rollup)"""
+        if not isinstance(expr, dict):
+            return expr
+        expr_class = expr.get('class')
+
+        if expr_class == 'COLUMN_REF':
+            return self._rewrite_column(expr, in_sum)
+        if expr_class == 'FUNCTION':
+            return self._rewrite_function(expr)
+        if expr_class == 'COMPARISON':
+            bound = self._rewrite_date_bound(expr)
+            if bound is not None:
+                return bound
+        if expr_class == 'BETWEEN' and self._is_date(expr.get('input')):
+            return self._rewrite_date_between(expr)
+        if expr_class not in ('COMPARISON', 'BETWEEN', 'CONSTANT', 'CONJUNCTION', 'OPERATOR', 'CASE', 'CAST'):
+            raise _NotRoutable()
+
+        for key, value in expr.items():
+            if isinstance(value, dict) and 'class' in value:
+                expr[key] = self._rewrite_expr(value)
+            elif isinstance(value, list):
+                expr[key] = [self._rewrite_case_check(v) if isinstance(v, dict) and 'when_expr' in v
+                             else self._rewrite_expr(v) for v in value]
+        return expr
+
+    def _rewrite_case_check(self, check: Dict[str, Any]) -> Dict[str, Any]:
+        check['when_expr'] = self._rewrite_expr(check['when_expr'])
+        check['then_expr'] = self._rewrite_expr(check['then_expr'])
+        return check
+
+    def _rewrite_column(self, expr: Dict[str, Any], in_sum: bool) -> Dict[str, Any]:
+        name = str((expr.get('column_names') or [''])[-1]).lower()
+        if name in self.dimensions:
+            self._needed['dimensions'].add(name)
+        elif in_sum and name in self.metrics:
+            self._needed['metrics'].add(name)
+        elif name not in self._aliases or name in self.base_columns:
+            # Data fora de uma função de mês, métricas fora de SUM, colunas sem rollup
+            raise _NotRoutable()
+        return expr
+
+    def _rewrite_function(self, expr: Dict[str, Any]) -> Dict[str, Any]:
+        name = str(expr.get('function_name')).lower()
+        children = expr.get('children') or []
+
+        if name in self.aggregates:
+            if expr.get('filter') or (expr.get('order_bys') or {}).get('orders') or len(children) > 1:
+                raise _NotRoutable()
+            self._has_aggregate = True
+
+            # Agregações insensíveis a duplicatas valem sobre as dimensões do rollup
+            if (name in DUPLICATE_INSENSITIVE_AGGREGATES or (name == 'count' and expr.get('distinct'))) and children:
+                expr['children'] = [self._rewrite_expr(children[0])]
+                return expr
+            if expr.get('distinct'):
+                raise _NotRoutable()
+            if name == 'sum' and children and children[0].get('class') == 'COLUMN_REF' and \
+                    str(children[0]['column_names'][-1]).lower() in self.metrics:
+                expr['children'] = [self._rewrite_column(children[0], in_sum=True)]
+                return expr
+            if name == 'count_star' or (name == 'count' and children and children[0].get('class') == 'CONSTANT'
+                                        and not children[0]['value'].get('is_null')):
+                return self._count_expression(expr)
+            raise _NotRoutable()
+
+        # Funções de data em granularidade de mês ou mais ampla
+        if name in ('date_trunc', 'datetrunc') and len(children) == 2 and self._is_date(children[1]):
+            part = self._constant_string(children[0])
+            if part == 'month':
+                return self._month_column(expr)
+            if part in COARSE_DATE_PARTS:
+                expr['children'] = [children[0], self._month_column()]
+                return expr
+            raise _NotRoutable()
+        if name in DATE_PART_FUNCTIONS and len(children) == 1 and self._is_date(children[0]):
+            expr['children'] = [self._month_column()]
+            return expr
+        if name in ('date_part', 'datepart') and len(children) == 2 and self._is_date(children[1]):
+            if self._constant_string(children[0]) not in COARSE_DATE_PARTS:
+                raise _NotRoutable()
+            expr['children'] = [children[0], self._month_column()]
+            return expr
+        if name == 'strftime' and len(children) == 2 and self._is_date(children[0]):
+            fmt = self._constant_string(children[1]) or ''
+            if not set(re.findall(r"%-?(.)", fmt)) <= MONTH_FORMAT_DIRECTIVES:
+                raise _NotRoutable()
+            expr['children'] = [self._month_column(), children[1]]
+            return expr
+
+        expr['children'] = [self._rewrite_expr(child) for child in children]
+        return expr
+
+    def _rewrite_date_bound(self, expr: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Data <op> constante alinhada ao mês → _mes <op> constante (None se não envolve Data)"""
+        left, right, op = expr.get('left'), expr.get('right'), expr.get('type')
+        if self._is_date(right) and op in MIRRORED_COMPARISONS:
+            left, right, op = right, left, MIRRORED_COMPARISONS[op]
+        if not self._is_date(left):
+            return None
+
+        value = self._date_constant(right)
+        if value is None:
+            raise _NotRoutable()
+        if op in ('COMPARE_GREATERTHANOREQUALTO', 'COMPARE_LESSTHAN') and self._is_month_start(value):
+            bound = value
+        elif op in ('COMPARE_LESSTHANOREQUALTO', 'COMPARE_GREATERTHAN') and self._is_month_end(value):
+            bound = value.replace(day=1)
+        else:
+            raise _NotRoutable()
+
+        expr['left'], expr['right'], expr['type'] = self._month_column(), self._set_date_constant(right, bound), op
+        return expr
+
+    def _rewrite_date_between(self, expr: Dict[str, Any]) -> Dict[str, Any]:
+        lower, upper = self._date_constant(expr.get('lower')), self._date_constant(expr.get('upper'))
+        if lower is None or upper is None or not self._is_month_start(lower) or not self._is_month_end(upper):
+            raise _NotRoutable()
+        expr['input'] = self._month_column(expr['input'])
+        expr['upper'] = self._set_date_constant(expr['upper'], upper.replace(day=1))
+        return expr
+
+    # ------------------------------------------------------------------
+    # Auxiliares da AST
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _is_date(expr: Any) -> bool:
+        return isinstance(expr, dict) and expr.get('class') == 'COLUMN_REF' and \
+            str((expr.get('column_names') or [''])[-1]).lower() == DATE_COLUMN.lower()
+
+    @staticmethod
+    def _constant_string(expr: Any) -> Optional[str]:
+        if isinstance(expr, dict) and expr.get('class') == 'CONSTANT' and isinstance(expr['value'].get('value'), str):
+            return expr['value']['value'].lower()
+        return None
+
+    @staticmethod
+    def _date_constant(expr: Any) -> Optional[datetime]:
+        """Valor de uma constante de data ('2024-01-01', DATE '...', CAST('...' AS TIMESTAMP))"""
+        if isinstance(expr, dict) and expr.get('class') == 'CAST' and not expr.get('try_cast'):
+            if str(expr['cast_type'].get('id')).upper() not in ('DATE', 'TIMESTAMP', 'TIMESTAMP_NS', 'TIMESTAMP_MS', 'TIMESTAMP_S'):
+                return None
+            expr = expr.get('child')
+        if not (isinstance(expr, dict) and expr.get('class') == 'CONSTANT'):
+            return None
+        value = expr['value'].get('value')
+        try:
+            return datetime.fromisoformat(value) if isinstance(value, str) else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _set_date_constant(expr: Dict[str, Any], value: datetime) -> Dict[str, Any]:
+        constant = expr['child'] if expr.get('class') == 'CAST' else expr
+        constant['value']['value'] = value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=' ')
+        return expr
+
+    @staticmethod
+    def _is_month_start(value: datetime) -> bool:
+        return value.day == 1 and value.time() == datetime.min.time()
+
+    def _is_month_end(self, value: datetime) -> bool:
+        # Data <= último dia do mês só equivale a _mes <= mês quando Data não tem hora
+        return self.date_is_day and value.time() == datetime.min.time() and \
+            value.day == calendar.monthrange(value.year, value.month)[1]
+
+    @staticmethod
+    def _month_column(original: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {'class': 'COLUMN_REF', 'type': 'COLUMN_REF',
+                'alias': (original or {}).get('alias', ''), 'column_names': [MONTH_COLUMN]}
+
+    def _count_expression(self, original: Dict[str, Any]) -> Dict[str, Any]:
+        """COUNT(*) → CAST(COALESCE(SUM(_n_registros), 0) AS BIGINT), mantendo tipo e zero sem linhas"""
+        template = _count_template(self.conn)
+        template['alias'] = original.get('alias', '')
+        return template
+
+
+_COUNT_TEMPLATE: Optional[Dict[str, Any]] = None
+
+
+def _count_template(conn: duckdb.DuckDBPyConnection) -> Dict[str, Any]:
+    """Expressão de COUNT(*) sobre o rollup, obtida do próprio parser"""
+    global _COUNT_TEMPLATE
+    if _COUNT_TEMPLATE is None:
+        serialized = conn.execute("SELECT json_serialize_sql(?)",
+                                  [f"SELECT CAST(COALESCE(SUM({COUNT_COLUMN}), 0) AS BIGINT)"]).fetchone()[0]
+        _COUNT_TEMPLATE = json.loads(serialized)['statements'][0]['node']['select_list'][0]
+    return copy.deepcopy(_COUNT_TEMPLATE)
@@ -4,30 +4,61 @@ Evita executar queries idênticas múltiplas vezes
 """
 
 import hashlib
+import os
+import sys
+import threading
 import time
-from typing import Optional, Any, Dict
+from collections import OrderedDict
+from typing import Optional, Any, Callable, Dict, Iterable, Union
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.query_fingerprint import fingerprint_sql
+
+
+CachedResult = Union[pd.DataFrame, pa.Table]
 
 
 class SQLResultCache:
     """
-    Cache para resultados de queries SQL.
-    Armazena DataFrames resultantes de queries para evitar re-execução.
+    Cache LRU para resultados de queries SQL.
+
+    Entradas ficam em um OrderedDict (acesso, inserção e despejo em O(1)) e são
+    despejadas pela menos recentemente usada até respeitar tanto o número
+    máximo de entradas quanto o orçamento total em bytes.
+
+    Resultados são armazenados de forma imutável: tabelas Arrow como estão e
+    DataFrames como uma cópia única com arrays somente-leitura. Leituras não
+    copiam dados - retornam a própria tabela Arrow ou uma view rasa do DataFrame.
     """
     
-    def __init__(self, max_size: int = 50, ttl_seconds: int = 1800):
+    def __init__(self, max_size: int = 50, ttl_seconds: int = 1800,
+                 max_bytes: int = 256 * 1024 * 1024):
         """
         Inicializa cache de resultados SQL.
         
         Args:
             max_size: Número máximo de queries em cache
             ttl_seconds: Tempo de vida em segundos (1800 = 30 minutos)
+            max_bytes: Orçamento total de memória dos resultados (256 MB)
         """
-        self.cache: Dict[str, Dict[str, Any]] = {}
+        self.cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self.max_size = max_size
+        self.max_bytes = max_bytes
         self.ttl_seconds = ttl_seconds
+        self.total_bytes = 0
         self.hits = 0
         self.misses = 0
+        self.evicted_entries = 0
+        self.evicted_bytes = 0
+        self.rejected_oversize = 0
+        self.invalidated_entries = 0
+        self.rejected_stale = 0
+        # Época dos dados: incrementada a cada alteração das tabelas (ver set)
+        self.data_epoch = 0
+        self._lock = threading.RLock()
     
     def _generate_query_hash(self, query: str, params: Optional[Dict] = None) -> str:
         """
@@ -40,8 +71,9 @@ class SQLResultCache:
         Returns:
             Hash da query
         """
-        # Normalizar query (remover espaços extras, lowercase para palavras-chave)
-        normalized_query = " ".join(query.split())
+        # Fingerprint semântico: queries equivalentes (ordem de predicados, aliases,
+        # caixa, parênteses) compartilham a mesma entrada
+        normalized_query = fingerprint_sql(query)
         
         # Incluir parâmetros se houver
         if params:
@@ -49,8 +81,42 @@ class SQLResultCache:
             normalized_query += json.dumps(params, sort_keys=True)
         
         return hashlib.md5(normalized_query.encode()).hexdigest()
-    
-    def get(self, query: str, params: Optional[Dict] = None) -> Optional[pd.DataFrame]:
+
+    @staticmethod
+    def _result_size(result: CachedResult) -> int:
+        """Tamanho em bytes do resultado (buffers Arrow ou memory_usage profundo)"""
+        if isinstance(result, pa.Table):
+            return int(result.nbytes)
+        return int(result.memory_usage(index=True, deep=True).sum())
+
+    @staticmethod
+    def _freeze(result: CachedResult) -> CachedResult:
+        """Cópia única do DataFrame com arrays somente-leitura (tabelas Arrow já são imutáveis)"""
+        if isinstance(result, pa.Table):
+            return result
+        # Cópia coluna a coluna: cada array numpy tem dono próprio e é travado
+        columns = {}
+        for i in range(result.shape[1]):
+            column = result.iloc[:, i]
+            if isinstance(column.values, np.ndarray):
+                values = column.to_numpy(copy=True)
+                values.flags.writeable = False
+            else:
+                values = column.array.copy()
+            columns[i] = values
+        frozen = pd.DataFrame(columns, index=result.index.copy(), copy=False)
+        frozen.columns = result.columns
+        return frozen
+
+    def _remove(self, query_hash: str, evicted: bool = False):
+        """Remove entrada atualizando a contabilidade de bytes"""
+        entry = self.cache.pop(query_hash)
+        self.total_bytes -= entry['bytes']
+        if evicted:
+            self.evicted_entries += 1
+            self.evicted_bytes += entry['bytes']
+
+    def get(self, query: str, params: Optional[Dict] = None) -> Optional[CachedResult]:
         """
         Recupera resultado da query do cache se existir.
         
@@ -59,52 +125,84 @@ class SQLResultCache:
             params: Parâmetros opcionais
         
         Returns:
-            DataFrame cacheado ou None se não encontrado/expirado
+            Tabela Arrow ou view rasa (somente-leitura) do DataFrame cacheado,
+            ou None se não encontrado/expirado
         """
         query_hash = self._generate_query_hash(query, params)
-        
-        if query_hash not in self.cache:
-            self.misses += 1
-            return None
-        
-        entry = self.cache[query_hash]
-        timestamp = entry.get('timestamp', 0)
-        
-        # Verificar se expirou
-        if time.time() - timestamp > self.ttl_seconds:
-            del self.cache[query_hash]
-            self.misses += 1
-            return None
-        
-        self.hits += 1
-        
-        # Retornar cópia do DataFrame para evitar modificações
-        result_df = entry.get('result')
-        return result_df.copy() if result_df is not None else None
+
+        with self._lock:
+            entry = self.cache.get(query_hash)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # Verificar se expirou
+            if time.time() - entry['timestamp'] > self.ttl_seconds:
+                self._remove(query_hash)
+                self.misses += 1
+                return None
+
+            # Acesso renova a recência (LRU)
+            self.cache.move_to_end(query_hash)
+            self.hits += 1
+            result = entry['result']
+
+        if isinstance(result, pd.DataFrame):
+            # View rasa: reatribuir colunas não afeta o cache e escritas in-place falham
+            return result.copy(deep=False)
+        return result
     
-    def set(self, query: str, result: pd.DataFrame, params: Optional[Dict] = None):
+    def contains(self, query: str, params: Optional[Dict] = None) -> bool:
+        """Indica se há entrada válida para a query (sem contar hit/miss nem renovar a recência)"""
+        query_hash = self._generate_query_hash(query, params)
+        with self._lock:
+            entry = self.cache.get(query_hash)
+            return entry is not None and time.time() - entry['timestamp'] <= self.ttl_seconds
+
+    def set(self, query: str, result: CachedResult, params: Optional[Dict] = None,
+            tables: Optional[Iterable[str]] = None, epoch: Optional[int] = None):
         """
         Armazena resultado de query no cache.
         
         Args:
             query: Query SQL
-            result: DataFrame resultado
+            result: DataFrame ou tabela Arrow resultado
             params: Parâmetros opcionais
+            tables: Tabelas lidas pela query (para invalidate_tables)
+            epoch: data_epoch lido antes de executar a query; se os dados mudaram
+                desde então, o resultado pode ser anterior à alteração e não é cacheado
         """
         query_hash = self._generate_query_hash(query, params)
-        
-        # Limpar cache se atingiu tamanho máximo (LRU simples)
-        if len(self.cache) >= self.max_size:
-            # Remover entrada mais antiga
-            oldest_key = min(self.cache.keys(), 
-                           key=lambda k: self.cache[k].get('timestamp', 0))
-            del self.cache[oldest_key]
-        
-        self.cache[query_hash] = {
-            'result': result.copy(),  # Armazenar cópia
-            'timestamp': time.time(),
-            'query_preview': query[:100]  # Para debug
-        }
+        size = self._result_size(result)
+
+        with self._lock:
+            if epoch is not None and epoch != self.data_epoch:
+                self.rejected_stale += 1
+                return
+
+            if query_hash in self.cache:
+                self._remove(query_hash)
+
+            # Resultado maior que o orçamento inteiro não é cacheado
+            if size > self.max_bytes:
+                self.rejected_oversize += 1
+                return
+
+            # Despejar entradas menos recentemente usadas até caber
+            while self.cache and (len(self.cache) >= self.max_size or
+                                  self.total_bytes + size > self.max_bytes):
+                oldest_key = next(iter(self.cache))
+                self._remove(oldest_key, evicted=True)
+
+            self.cache[query_hash] = {
+                'result': self._freeze(result),
+                'bytes': size,
+                'tables': frozenset(tables or ()),
+                'timestamp': time.time(),
+                'query': query,
+                'query_preview': query[:100]  # Para debug
+            }
+            self.total_bytes += size
     
     def invalidate(self, query: Optional[str] = None, params: Optional[Dict] = None):
         """
@@ -114,18 +212,49 @@ class SQLResultCache:
             query: Query específica (None = invalidar tudo)
             params: Parâmetros opcionais
         """
-        if query is None:
-            self.cache.clear()
-        else:
-            query_hash = self._generate_query_hash(query, params)
-            if query_hash in self.cache:
-                del self.cache[query_hash]
+        with self._lock:
+            if query is None:
+                self.cache.clear()
+                self.total_bytes = 0
+            else:
+                query_hash = self._generate_query_hash(query, params)
+                if query_hash in self.cache:
+                    self._remove(query_hash)
     
+    def invalidate_tables(self, *tables: str, keep: Optional[Callable[[str], bool]] = None) -> int:
+        """
+        Remove todas as entradas que leram alguma das tabelas informadas.
+
+        Args:
+            *tables: Nomes das tabelas reconstruídas/alteradas
+            keep: Predicado sobre o SQL da entrada; entradas para as quais retorna
+                True continuam válidas (ex: queries fora dos meses alterados)
+
+        Returns:
+            Número de entradas removidas
+        """
+        with self._lock:
+            # Queries iniciadas antes da alteração não gravam mais no cache
+            self.data_epoch += 1
+            stale = [k for k, v in self.cache.items() if v['tables'].intersection(tables)
+                     and not (keep is not None and keep(v['query']))]
+            for query_hash in stale:
+                self._remove(query_hash)
+            self.invalidated_entries += len(stale)
+            return len(stale)
+
     def clear(self):
         """Limpa todo o cache"""
-        self.cache.clear()
-        self.hits = 0
-        self.misses = 0
+        with self._lock:
+            self.cache.clear()
+            self.total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evicted_entries = 0
+            self.evicted_bytes = 0
+            self.rejected_oversize = 0
+            self.invalidated_entries = 0
+            self.rejected_stale = 0
     
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estatísticas do cache"""
@@ -135,6 +264,14 @@ class SQLResultCache:
         return {
             'size': len(self.cache),
             'max_size': self.max_size,
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'evicted_entries': self.evicted_entries,
+            'evicted_bytes': self.evicted_bytes,
+            'rejected_oversize': self.rejected_oversize,
+            'invalidated_entries': self.invalidated_entries,
+            'rejected_stale': self.rejected_stale,
+            'data_epoch': self.data_epoch,
             'hits': self.hits,
             'misses': self.misses,
             'hit_rate': round(hit_rate, 2),
@@ -148,17 +285,80 @@ class SQLResultCache:
             {
                 'hash': k,
                 'query_preview': v.get('query_preview', ''),
+                'bytes': v.get('bytes', 0),
                 'age_seconds': int(time.time() - v.get('timestamp', 0))
             }
-            for k, v in self.cache.items()
+            for k, v in list(self.cache.items())
         ]
 
 
-# Cache global para queries SQL
-_sql_cache = SQLResultCache(max_size=50, ttl_seconds=1800)
+# Cache global para queries SQL (compartilhado entre sessões do processo)
+_sql_cache = SQLResultCache(max_size=50, ttl_seconds=1800, max_bytes=256 * 1024 * 1024)
+
+# Versão de cada tabela: incrementada a cada reconstrução, entra na chave do cache
+_table_versions: Dict[str, int] = {}
+_table_versions_lock = threading.Lock()
+
+
+def get_table_versions() -> Dict[str, int]:
+    """Retorna cópia das versões atuais das tabelas registradas"""
+    with _table_versions_lock:
+        return dict(_table_versions)
+
+
+def bump_table_version(table: str) -> int:
+    """
+    Registra reconstrução de uma tabela: incrementa a versão e remove do cache
+    global todos os resultados que a leram.
+
+    Args:
+        table: Nome da tabela reconstruída
+
+    Returns:
+        Nova versão da tabela
+    """
+    with _table_versions_lock:
+        _table_versions[table] = _table_versions.get(table, 0) + 1
+        version = _table_versions[table]
+    _sql_cache.invalidate_tables(table)
+    return version
 
 
-def get_cached_query(query: str, params: Optional[Dict] = None) -> Optional[pd.DataFrame]:
+def get_data_epoch() -> int:
+    """
+    Época atual dos dados do cache global.
+
+    Deve ser lida antes de executar uma query e passada a cache_query_result:
+    se uma tabela for alterada durante a execução (bump_table_version,
+    invalidate_table_entries ou bump_data_epoch), o resultado não é cacheado.
+    """
+    with _sql_cache._lock:
+        return _sql_cache.data_epoch
+
+
+def bump_data_epoch() -> int:
+    """Registra uma alteração de dados sem invalidar entradas (ex: linhas acrescentadas ao banco)"""
+    with _sql_cache._lock:
+        _sql_cache.data_epoch += 1
+        return _sql_cache.data_epoch
+
+
+def invalidate_table_entries(table: str, keep: Callable[[str], bool]) -> int:
+    """
+    Alteração parcial de uma tabela (ex: linhas acrescentadas em alguns meses):
+    remove apenas os resultados que podem ter mudado, sem trocar a versão da tabela.
+
+    Args:
+        table: Nome da tabela alterada
+        keep: Retorna True para o SQL de entradas que continuam válidas
+
+    Returns:
+        Número de entradas removidas
+    """
+    return _sql_cache.invalidate_tables(table, keep=keep)
+
+
+def get_cached_query(query: str, params: Optional[Dict] = None) -> Optional[CachedResult]:
     """
     Wrapper para acessar cache SQL global.
     
@@ -167,21 +367,29 @@ def get_cached_query(query: str, params: Optional[Dict] = None) -> Optional[pd.D
         params: Parâmetros opcionais
     
     Returns:
-        DataFrame cacheado ou None
+        Resultado cacheado (Arrow ou view do DataFrame) ou None
     """
     return _sql_cache.get(query, params)
 
 
-def cache_query_result(query: str, result: pd.DataFrame, params: Optional[Dict] = None):
+def is_query_cached(query: str, params: Optional[Dict] = None) -> bool:
+    """Indica se a query tem resultado no cache SQL global (sem afetar as estatísticas)"""
+    return _sql_cache.contains(query, params)
+
+
+def cache_query_result(query: str, result: CachedResult, params: Optional[Dict] = None,
+                       tables: Optional[Iterable[str]] = None, epoch: Optional[int] = None):
     """
     Wrapper para armazenar resultado no cache SQL global.
     
     Args:
         query: Query SQL
-        result: DataFrame resultado
+        result: DataFrame ou tabela Arrow resultado
         params: Parâmetros opcionais
+        tables: Tabelas lidas pela query (invalidadas por bump_table_version)
+        epoch: get_data_epoch() lido antes da execução (None = não verificar)
     """
-    _sql_cache.set(query, result, params)
+    _sql_cache.set(query, result, params, tables, epoch)
 
 
 def get_sql_cache_stats() -> Dict[str, Any]:
@@ -0,0 +1,327 @@
+"""
+Streaming Ingest - Ingestão do parquet em lotes com memória limitada
+Para datasets maiores que a RAM dos nós da aplicação: em vez de materializar o
+DataFrame, o parquet é percorrido por row groups (ParquetFile.iter_batches) e
+cada lote contribui para os artefatos derivados:
+- dicionário de valores distintos das dimensões e colunas de texto, com a
+  normalização e a verificação de codificação aplicadas apenas aos valores novos
+- estatísticas calculadas em uma passada (linhas, min/max de Data, count/mean/
+  std/min/max das colunas numéricas)
+- primeiras linhas e dtypes do primeiro lote
+
+Nesse modo as consultas do agente vão para uma view do DuckDB sobre
+read_parquet (projeção e filtros empurrados para o scan, ver utils.duckdb_pool)
+e a validação de filtros usa uma DictionaryView sobre o dicionário.
+"""
+
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.model_config import DATA_CONFIG
+from text_normalizer import TextNormalizer, NORMALIZER_VERSION
+from utils.artifact_cache import (
+    ArtifactCache, DatasetArtifacts, compute_file_hash, clean_value,
+    ENCODING_NONE, ENCODING_FILLNA, ENCODING_CLEAN,
+)
+from utils.dataset_registry import DIMENSION_COLUMNS
+from utils.normalized_view import DictionaryView
+
+
+INGESTION_MEMORY = "memory"
+INGESTION_STREAMING = "streaming"
+
+# Acima disso o dicionário da coluna deixa de crescer (a validação de filtros é permissiva)
+MAX_DISTINCT_VALUES = 1_000_000
+# Sufixo da chave no ArtifactCache: o conteúdo difere dos artefatos do modo em memória
+STREAMING_KEY_SUFFIX = "_stream"
+
+
+def resolve_ingestion_mode(data_path: str, mode: Optional[str] = None) -> str:
+    """
+    Decide entre carga em memória e streaming para um parquet.
+
+    Args:
+        data_path: Caminho do parquet
+        mode: "memory", "streaming" ou "auto" (None = DATA_CONFIG["ingestion_mode"])
+
+    Returns:
+        INGESTION_MEMORY ou INGESTION_STREAMING ("auto" usa o número de linhas
+        dos metadados do parquet contra DATA_CONFIG["streaming_min_rows"])
+    """
+    mode = (mode or DATA_CONFIG.get("ingestion_mode", "auto")).lower()
+    if mode in (INGESTION_MEMORY, INGESTION_STREAMING):
+        return mode
+    try:
+        rows = pq.ParquetFile(data_path).metadata.num_rows
+    except (OSError, pa.ArrowException):
+        # Arquivo ausente/inválido: o erro aparece na carga, como antes
+        return INGESTION_MEMORY
+    return INGESTION_STREAMING if rows >= DATA_CONFIG.get("streaming_min_rows", 20_000_000) else INGESTION_MEMORY
+
+
+class StreamingArtifacts(DatasetArtifacts):
+    """
+    Artefatos do modo streaming: em vez de colunas normalizadas por linha,
+    normalized_columns é o dicionário (column_name, value, normalized) das
+    colunas de texto; os valores distintos das demais dimensões ficam nos
+    metadados ('dimension_values').
+    """
+
+    def build_normalized_view(self, df: Optional[pd.DataFrame] = None) -> DictionaryView:
+        """Monta a view de validação de filtros sobre o dicionário (não há DataFrame)"""
+        return DictionaryView(
+            self.normalized_columns,
+            self.metadata.get('dimension_values', {}),
+            columns=self.metadata['columns'],
+            rows=self.metadata['rows'],
+            source_hash=self.metadata['source_hash'],
+            truncated_columns=self.metadata.get('truncated_columns', []),
+        )
+
+    def release_columns(self):
+        """O dicionário é pequeno e a DictionaryView guarda os próprios arrays: nada a liberar"""
+
+
+class DatasetScanner:
+    """
+    Acumula os artefatos do dataset lote a lote (uma passada, memória de um lote).
+    """
+
+    def __init__(self, normalizer: Optional[TextNormalizer] = None):
+        self.normalizer = normalizer or TextNormalizer()
+        self.rows = 0
+        self.batches = 0
+        self.columns: List[str] = []
+        self.text_columns: Optional[List[str]] = None
+        self.head: Optional[pd.DataFrame] = None
+        self.min_date = None
+        self.max_date = None
+        # Valores distintos na ordem de aparição: coluna -> {original: normalizado (ou None)}
+        self._distinct: Dict[str, Dict[Any, Any]] = {}
+        self._truncated: set = set()
+        self._has_nulls: Dict[str, bool] = {}
+        self._needs_cleanup: Dict[str, bool] = {}
+        self._numeric: Dict[str, Dict[str, float]] = {}
+
+    def add_batch(self, batch: pa.RecordBatch):
+        """Processa um lote do parquet"""
+        if batch.num_rows == 0:
+            return
+        if self.text_columns is None:
+            self._init_from_first_batch(batch)
+
+        self.rows += batch.num_rows
+        self.batches += 1
+
+        for col in self.columns:
+            array = batch.column(batch.schema.get_field_index(col))
+            if col == 'Data' and pa.types.is_temporal(array.type):
+                self._update_dates(array)
+            if col in self.text_columns or col in DIMENSION_COLUMNS:
+                self._update_distinct(col, array)
+            if pa.types.is_integer(array.type) or pa.types.is_floating(array.type):
+                self._update_numeric(col, array)
+
+    def _init_from_first_batch(self, batch: pa.RecordBatch):
+        self.columns = batch.schema.names
+        self.head = batch.slice(0, 5).to_pandas()
+        # Mesma heurística do modo em memória, sobre uma amostra do primeiro lote
+        self.text_columns = self.normalizer.identify_text_columns(batch.slice(0, 1000).to_pandas())
+        for col in self.columns:
+            self._distinct[col] = {}
+
+    def _update_dates(self, array: pa.Array):
+        bounds = pc.min_max(array)
+        low, high = bounds['min'].as_py(), bounds['max'].as_py()
+        if low is not None and (self.min_date is None or low < self.min_date):
+            self.min_date = low
+        if high is not None and (self.max_date is None or high > self.max_date):
+            self.max_date = high
+
+    def _update_distinct(self, col: str, array: pa.Array):
+        if array.null_count:
+            self._has_nulls[col] = True
+        if col in self._truncated:
+            return
+
+        seen = self._distinct[col]
+        if array.null_count and col in self.text_columns and None not in seen:
+            # Como no modo em memória, o nulo normalizado ("") também é um valor da coluna
+            seen[None] = self.normalizer.normalize_text(None)
+
+        values = array.dictionary if pa.types.is_dictionary(array.type) else pc.unique(array.drop_null())
+        new_values = [val for val in values.to_pylist() if val is not None and val not in seen]
+        if not new_values:
+            return
+
+        if col in self.text_columns:
+            normalized = self.normalizer.normalize_unique_values(new_values)
+            if not self._needs_cleanup.get(col):
+                self._needs_cleanup[col] = any(clean_value(val) != val for val in new_values)
+        else:
+            normalized = [None] * len(new_values)
+        seen.update(zip(new_values, normalized))
+
+        if len(seen) > MAX_DISTINCT_VALUES:
+            self._truncated.add(col)
+
+    def _update_numeric(self, col: str, array: pa.Array):
+        valid = array.drop_null()
+        if len(valid) == 0:
+            return
+        values = pc.cast(valid, pa.float64())
+        bounds = pc.min_max(values)
+        stats = self._numeric.setdefault(col, {'count': 0, 'sum': 0.0, 'sumsq': 0.0,
+                                               'min': np.inf, 'max': -np.inf})
+        stats['count'] += len(values)
+        stats['sum'] += pc.sum(values).as_py()
+        stats['sumsq'] += pc.sum(pc.multiply(values, values)).as_py()
+        stats['min'] = min(stats['min'], bounds['min'].as_py())
+        stats['max'] = max(stats['max'], bounds['max'].as_py())
+
+    def _describe(self) -> str:
+        """Equivalente a df.describe() sem os quartis (que exigiriam os dados ordenados)"""
+        summary = {}
+        for col in self.columns:
+            stats = self._numeric.get(col)
+            if not stats:
+                continue
+            count = stats['count']
+            mean = stats['sum'] / count
+            variance = (stats['sumsq'] - count * mean * mean) / (count - 1) if count > 1 else np.nan
+            summary[col] = {'count': float(count), 'mean': mean, 'std': float(np.sqrt(max(variance, 0.0))),
+                            'min': stats['min'], 'max': stats['max']}
+        return pd.DataFrame(summary).to_string() if summary else ""
+
+    def _encoding_plan(self) -> Dict[str, str]:
+        plan = {}
+        for col in self.text_columns or []:
+            if self._needs_cleanup.get(col):
+                plan[col] = ENCODING_CLEAN
+            else:
+                plan[col] = ENCODING_FILLNA if self._has_nulls.get(col) else ENCODING_NONE
+        return plan
+
+    def finish(self, source_hash: str) -> StreamingArtifacts:
+        """
+        Consolida os lotes em artefatos.
+
+        Args:
+            source_hash: Hash do parquet de origem
+
+        Returns:
+            StreamingArtifacts
+        """
+        text_columns = self.text_columns or []
+        dictionary = pd.DataFrame({
+            'column_name': [col for col in text_columns for _ in self._distinct[col]],
+            'value': [None if val is None else str(val) for col in text_columns for val in self._distinct[col]],
+            'normalized': [norm for col in text_columns for norm in self._distinct[col].values()],
+        })
+
+        head = self.head if self.head is not None else pd.DataFrame(columns=self.columns)
+        head_normalized = head[text_columns].copy() if text_columns else None
+        for col in text_columns:
+            head_normalized[col] = self.normalizer.normalize_unique_values(head_normalized[col].tolist())
+
+        metadata = {
+            'source_hash': source_hash,
+            'normalizer_version': NORMALIZER_VERSION,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ingestion_mode': INGESTION_STREAMING,
+            'rows': self.rows,
+            'batches': self.batches,
+            'columns': list(self.columns),
+            'text_columns': text_columns,
+            'min_date': pd.Timestamp(self.min_date).isoformat() if self.min_date is not None else None,
+            'max_date': pd.Timestamp(self.max_date).isoformat() if self.max_date is not None else None,
+            'head': head.to_string(),
+            'head_normalized': head_normalized.to_string() if text_columns else "",
+            'describe': self._describe(),
+            'dtypes': head.dtypes.to_string(),
+            'encoding_plan': self._encoding_plan(),
+            'dimension_values': {
+                col: list(self._distinct[col])
+                for col in DIMENSION_COLUMNS if col in self._distinct and col not in text_columns
+            },
+            'truncated_columns': sorted(self._truncated),
+        }
+        return StreamingArtifacts(dictionary, metadata)
+
+
+def scan_parquet(data_path: str, source_hash: Optional[str] = None,
+                 normalizer: Optional[TextNormalizer] = None,
+                 batch_rows: Optional[int] = None) -> StreamingArtifacts:
+    """
+    Percorre o parquet em lotes e constrói os artefatos do modo streaming.
+
+    Colunas de dimensão em texto são lidas como dicionário, de modo que cada
+    lote traz os valores distintos prontos (sem uma string Python por linha).
+
+    Args:
+        data_path: Caminho do parquet
+        source_hash: Hash do parquet (None = calcular)
+        normalizer: Normalizador (None = nova instância)
+        batch_rows: Linhas por lote (None = DATA_CONFIG["streaming_batch_rows"])
+
+    Returns:
+        StreamingArtifacts
+    """
+    start_time = time.perf_counter()
+    source_hash = source_hash or compute_file_hash(data_path)
+    batch_rows = batch_rows or DATA_CONFIG.get("streaming_batch_rows", 500_000)
+
+    schema = pq.read_schema(data_path)
+    dictionary_columns = [col for col in DIMENSION_COLUMNS
+                          if col in schema.names and pa.types.is_string(schema.field(col).type)]
+    parquet = pq.ParquetFile(data_path, read_dictionary=dictionary_columns)
+
+    scanner = DatasetScanner(normalizer)
+    for batch in parquet.iter_batches(batch_size=batch_rows):
+        scanner.add_batch(batch)
+
+    artifacts = scanner.finish(source_hash)
+    artifacts.metadata['build_seconds'] = round(time.perf_counter() - start_time, 3)
+    return artifacts
+
+
+def load_or_scan_artifacts(data_path: str, normalizer: Optional[TextNormalizer] = None,
+                           batch_rows: Optional[int] = None) -> StreamingArtifacts:
+    """
+    Artefatos do modo streaming a partir do ArtifactCache ou de uma passada pelo parquet.
+
+    Args:
+        data_path: Caminho do parquet
+        normalizer: Normalizador opcional
+        batch_rows: Linhas por lote
+
+    Returns:
+        StreamingArtifacts (from_cache=True quando lidos do disco)
+    """
+    start_time = time.perf_counter()
+    cache = ArtifactCache()
+    source_hash = compute_file_hash(data_path)
+    key = cache.make_key(source_hash) + STREAMING_KEY_SUFFIX
+
+    cached = cache.load(key)
+    if cached is not None:
+        artifacts = StreamingArtifacts(cached.normalized_columns, cached.metadata, from_cache=True)
+    else:
+        artifacts = scan_parquet(data_path, source_hash, normalizer, batch_rows)
+        try:
+            cache.save(key, artifacts)
+        except OSError:
+            # Diretório sem permissão de escrita: seguir apenas em memória
+            pass
+
+    artifacts.metadata['ready_seconds'] = round(time.perf_counter() - start_time, 3)
+    return artifacts
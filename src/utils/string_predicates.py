@@ -0,0 +1,353 @@
+"""
+String Predicates - Comparações de texto sem LOWER() em tempo de query
+A normalização do DebugDuckDbTools transforma `coluna = 'Valor'` em
+`LOWER(coluna) = 'valor'`, o que obriga o DuckDB a calcular LOWER() em todas as
+linhas lidas e impede o uso dos zone maps da coluna
+
+No load do banco (junto com os rollups, ver utils.duckdb_pool) é materializado um
+dicionário com os valores distintos de cada coluna de texto e sua versão em
+minúsculas. Na execução, a AST do parser do DuckDB é percorrida uma única vez e
+cada predicado sobre LOWER(coluna) vira um IN sobre a coluna original:
+- LOWER(col) = 'sc'            → col IN ('SC', 'Sc')
+- LOWER(col) IN ('sc', 'pr')   → col IN ('SC', 'PR')
+- LOWER(col) LIKE '%joinville%' (ou ILIKE) → col IN (valores do dicionário que casam)
+
+O resultado é o mesmo da query original (o dicionário contém todos os valores não
+nulos da coluna e nulos continuam sem casar); predicados sem nenhum valor
+correspondente, com valores demais ou fora das regras acima ficam como estão.
+As reescritas são cacheadas pelo texto exato da query e pela versão da tabela
+(o SQL reescrito preserva aliases e nomes de saída da query que o gerou, então
+queries apenas equivalentes pelo fingerprint não compartilham reescritas).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.sql_cache import get_table_versions
+
+
+BASE_TABLE = "dados_comerciais"
+DICTIONARY_TABLE = "_string_dictionary"
+
+# Colunas com mais valores distintos que isso não entram no dicionário
+MAX_DICTIONARY_VALUES = 50_000
+# Predicados que casam com mais valores que isso continuam com LOWER()
+MAX_IN_VALUES = 1_000
+
+LOWER_FUNCTIONS = {'lower', 'lcase'}
+LIKE_OPERATORS = {'~~': 'LIKE', '~~*': 'ILIKE'}
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def build_string_dictionary(conn: duckdb.DuckDBPyConnection) -> Dict[str, Any]:
+    """
+    Materializa o dicionário de valores das colunas de texto no banco da conexão.
+
+    Deve ser chamado logo após a criação da tabela base (antes de abrir o
+    banco em modo somente-leitura).
+
+    Args:
+        conn: Conexão com a tabela dados_comerciais
+
+    Returns:
+        Dict com colunas e valores no dicionário e tempo de construção
+    """
+    start_time = time.perf_counter()
+    text_columns = [name for (name,) in conn.execute(
+        f"SELECT column_name FROM information_schema.columns "
+        f"WHERE table_name = '{BASE_TABLE}' AND data_type = 'VARCHAR'").fetchall()]
+
+    conn.execute(f"DROP TABLE IF EXISTS {DICTIONARY_TABLE}")
+    conn.execute(f"CREATE TABLE {DICTIONARY_TABLE} (column_name VARCHAR, value VARCHAR, value_lower VARCHAR)")
+
+    columns = 0
+    for column in text_columns:
+        distinct = conn.execute(f"SELECT COUNT(DISTINCT {_quote(column)}) FROM {BASE_TABLE}").fetchone()[0]
+        if distinct > MAX_DICTIONARY_VALUES:
+            continue
+        conn.execute(f"""
+            INSERT INTO {DICTIONARY_TABLE}
+            SELECT ?, value, LOWER(value)
+            FROM (SELECT DISTINCT {_quote(column)} AS value FROM {BASE_TABLE} WHERE {_quote(column)} IS NOT NULL)
+            ORDER BY value
+        """, [column])
+        columns += 1
+
+    values = conn.execute(f"SELECT COUNT(*) FROM {DICTIONARY_TABLE}").fetchone()[0]
+    return {'columns': columns, 'values': values, 'seconds': round(time.perf_counter() - start_time, 3)}
+
+
+def extend_string_dictionary(conn: duckdb.DuckDBPyConnection, delta_path: str) -> int:
+    """
+    Acrescenta ao dicionário os valores de texto de um parquet de linhas novas
+    que ainda não estão nele (atualização incremental, ver utils.incremental_refresh).
+
+    Apenas as colunas já presentes no dicionário são atualizadas; o limite de
+    MAX_DICTIONARY_VALUES vale só para a construção inicial.
+
+    Args:
+        conn: Conexão com o dicionário (escrita)
+        delta_path: Parquet com as linhas acrescentadas à tabela base
+
+    Returns:
+        Número de valores acrescentados
+    """
+    try:
+        columns = [name for (name,) in conn.execute(f"SELECT DISTINCT column_name FROM {DICTIONARY_TABLE}").fetchall()]
+    except duckdb.Error:
+        return 0
+    delta_columns = {name for (name,) in conn.execute(
+        "SELECT name FROM parquet_schema(?)", [delta_path]).fetchall()}
+
+    before = conn.execute(f"SELECT COUNT(*) FROM {DICTIONARY_TABLE}").fetchone()[0]
+    for column in columns:
+        if column not in delta_columns:
+            continue
+        conn.execute(f"""
+            INSERT INTO {DICTIONARY_TABLE}
+            SELECT ?, value, LOWER(value)
+            FROM (SELECT DISTINCT CAST({_quote(column)} AS VARCHAR) AS value FROM read_parquet(?)
+                  WHERE {_quote(column)} IS NOT NULL)
+            WHERE value NOT IN (SELECT value FROM {DICTIONARY_TABLE} WHERE column_name = ?)
+            ORDER BY value
+        """, [column, delta_path, column])
+    return conn.execute(f"SELECT COUNT(*) FROM {DICTIONARY_TABLE}").fetchone()[0] - before
+
+
+# Reescritas compartilhadas entre sessões: (dicionário, versão da tabela, SQL) -> reescrita
+_MAX_REWRITES = 1024
+_rewrites: "OrderedDict[Tuple, Optional[Dict[str, Any]]]" = OrderedDict()
+_rewrites_lock = threading.Lock()
+_rewrite_stats = {'hits': 0, 'misses': 0}
+
+
+class StringPredicateRewriter:
+    """
+    Reescreve comparações sobre LOWER(coluna) em IN sobre a coluna original.
+
+    Lê as colunas do dicionário uma vez; sem dicionário (ex: conexões criadas
+    fora do pool) nenhuma query é reescrita.
+    """
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection):
+        self.conn = conn
+        self.columns: Dict[str, str] = {}
+        self.signature: Optional[Tuple] = None
+        self.stats = {'rewritten': 0, 'predicates': 0, 'unchanged': 0}
+
+        try:
+            rows = conn.execute(f"SELECT DISTINCT column_name FROM {DICTIONARY_TABLE}").fetchall()
+            # Identifica o conteúdo do dicionário (bancos diferentes não compartilham reescritas)
+            self.signature = tuple(conn.execute(
+                f"SELECT COUNT(*), COALESCE(bit_xor(hash(column_name, value)), 0) FROM {DICTIONARY_TABLE}").fetchone())
+        except duckdb.Error:
+            return
+        self.columns = {name.lower(): name for (name,) in rows}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.columns)
+
+    def rewrite(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Reescreve os predicados de texto da query, se possível.
+
+        Args:
+            query: Query SQL (um único statement)
+
+        Returns:
+            Dict com 'sql' reescrito e 'predicates' substituídos, ou None se a
+            query deve executar como está
+        """
+        query_lower = query.lower()
+        if not self.enabled or BASE_TABLE not in query_lower or 'lower(' not in query_lower.replace(' ', ''):
+            return None
+
+        key = (self.signature, get_table_versions().get(BASE_TABLE, 0), query)
+        with _rewrites_lock:
+            if key in _rewrites:
+                _rewrites.move_to_end(key)
+                _rewrite_stats['hits'] += 1
+                return self._count(_rewrites[key])
+            _rewrite_stats['misses'] += 1
+
+        try:
+            result = self._rewrite(query)
+        except (duckdb.Error, KeyError, TypeError):
+            result = None
+
+        with _rewrites_lock:
+            _rewrites[key] = result
+            while len(_rewrites) > _MAX_REWRITES:
+                _rewrites.popitem(last=False)
+        return self._count(result)
+
+    def _count(self, result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if result is None:
+            self.stats['unchanged'] += 1
+        else:
+            self.stats['rewritten'] += 1
+            self.stats['predicates'] += len(result['predicates'])
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de reescrita"""
+        stats = dict(self.stats)
+        stats['columns'] = len(self.columns)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Reescrita da AST
+    # ------------------------------------------------------------------
+
+    def _rewrite(self, query: str) -> Optional[Dict[str, Any]]:
+        document = json.loads(self.conn.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0])
+        if document.get('error') or len(document.get('statements') or []) != 1:
+            return None
+
+        self._predicates: List[Dict[str, Any]] = []
+        self._walk(document['statements'][0]['node'])
+        if not self._predicates:
+            return None
+
+        sql = self.conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(document)]).fetchone()[0]
+        return {'sql': sql, 'predicates': self._predicates}
+
+    def _walk(self, node: Any):
+        """Visita todos os SELECT_NODEs (inclusive subqueries e CTEs)"""
+        if isinstance(node, dict):
+            if node.get('type') == 'SELECT_NODE':
+                self._rewrite_select(node)
+            for value in node.values():
+                self._walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                self._walk(value)
+
+    def _rewrite_select(self, node: Dict[str, Any]):
+        """Reescreve o WHERE de um SELECT que lê diretamente a tabela base"""
+        from_table = node.get('from_table') or {}
+        if from_table.get('type') != 'BASE_TABLE' or str(from_table.get('table_name')).lower() != BASE_TABLE:
+            return
+        if from_table.get('schema_name') not in ('', 'main') or not node.get('where_clause'):
+            return
+
+        self._qualifiers = {BASE_TABLE, str(from_table.get('alias') or '').lower()}
+        node['where_clause'] = self._rewrite_expr(node['where_clause'])
+
+    def _rewrite_expr(self, expr: Any) -> Any:
+        """Substitui predicados sobre LOWER(coluna) sem entrar em subqueries"""
+        if not isinstance(expr, dict) or expr.get('class') == 'SUBQUERY':
+            return expr
+
+        rewritten = self._rewrite_predicate(expr)
+        if rewritten is not None:
+            return rewritten
+
+        for key, value in expr.items():
+            if isinstance(value, dict):
+                expr[key] = self._rewrite_expr(value)
+            elif isinstance(value, list):
+                expr[key] = [self._rewrite_expr(v) for v in value]
+        return expr
+
+    def _rewrite_predicate(self, expr: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """IN equivalente ao predicado ou None se ele não é reescrito"""
+        expr_class = expr.get('class')
+        column, operator, patterns = None, None, []
+
+        if expr_class == 'COMPARISON' and expr.get('type') == 'COMPARE_EQUAL':
+            for side, other in ((expr.get('left'), expr.get('right')), (expr.get('right'), expr.get('left'))):
+                column, constant = self._lowered_column(side), self._constant_string(other)
+                if column is not None and constant is not None:
+                    operator, patterns = '=', [constant]
+                    break
+        elif expr_class == 'OPERATOR' and expr.get('type') == 'COMPARE_IN':
+            children = expr.get('children') or []
+            constants = [self._constant_string(child) for child in children[1:]]
+            column = self._lowered_column(children[0]) if children else None
+            if constants and None not in constants:
+                operator, patterns = 'IN', constants
+        elif expr_class == 'FUNCTION' and expr.get('function_name') in LIKE_OPERATORS and expr.get('is_operator'):
+            children = expr.get('children') or []
+            if len(children) == 2:
+                column, constant = self._lowered_column(children[0]), self._constant_string(children[1])
+                if constant is not None:
+                    operator, patterns = LIKE_OPERATORS[expr['function_name']], [constant]
+
+        if column is None or operator is None:
+            return None
+        column_ref, column_name = column
+
+        values = self._lookup(column_name, operator, patterns)
+        if not values or len(values) > MAX_IN_VALUES:
+            return None
+
+        self._predicates.append({'column': column_name, 'operator': operator, 'values': len(values)})
+        return {
+            'class': 'OPERATOR', 'type': 'COMPARE_IN', 'alias': expr.get('alias', ''),
+            'children': [column_ref] + [self._constant(value) for value in values],
+        }
+
+    def _lowered_column(self, expr: Any) -> Optional[Tuple[Dict[str, Any], str]]:
+        """(referência da coluna, nome no dicionário) para LOWER(coluna) de uma coluna do dicionário"""
+        if not (isinstance(expr, dict) and expr.get('class') == 'FUNCTION'
+                and str(expr.get('function_name')).lower() in LOWER_FUNCTIONS):
+            return None
+        if expr.get('schema') or expr.get('filter') or expr.get('distinct') or len(expr.get('children') or []) != 1:
+            return None
+
+        column_ref = expr['children'][0]
+        if column_ref.get('class') != 'COLUMN_REF':
+            return None
+        names = column_ref.get('column_names') or []
+        if len(names) == 2 and str(names[0]).lower() not in self._qualifiers or len(names) not in (1, 2):
+            return None
+        column_name = self.columns.get(str(names[-1]).lower())
+        return (column_ref, column_name) if column_name is not None else None
+
+    @staticmethod
+    def _constant_string(expr: Any) -> Optional[str]:
+        if isinstance(expr, dict) and expr.get('class') == 'CONSTANT' and isinstance(expr['value'].get('value'), str):
+            return expr['value']['value']
+        return None
+
+    @staticmethod
+    def _constant(value: str) -> Dict[str, Any]:
+        return {'class': 'CONSTANT', 'type': 'VALUE_CONSTANT', 'alias': '',
+                'value': {'type': {'id': 'VARCHAR', 'type_info': None}, 'is_null': False, 'value': value}}
+
+    def _lookup(self, column: str, operator: str, patterns: List[str]) -> List[str]:
+        """Valores originais da coluna cujo LOWER() satisfaz o predicado"""
+        if operator in ('=', 'IN'):
+            condition = f"value_lower IN ({', '.join('?' for _ in patterns)})"
+        else:
+            condition = f"value_lower {operator} ?"
+        rows = self.conn.execute(
+            f"SELECT value FROM {DICTIONARY_TABLE} WHERE column_name = ? AND {condition} ORDER BY value LIMIT ?",
+            [column, *patterns, MAX_IN_VALUES + 1]).fetchall()
+        return [value for (value,) in rows]
+
+
+def get_string_rewrite_stats() -> Dict[str, Any]:
+    """Retorna estatísticas do cache de reescritas compartilhado"""
+    with _rewrites_lock:
+        return {'entries': len(_rewrites), **_rewrite_stats}
+
+
+def clear_string_rewrites():
+    """Limpa o cache de reescritas (útil para testes)"""
+    with _rewrites_lock:
+        _rewrites.clear()
+        _rewrite_stats.update(hits=0, misses=0)
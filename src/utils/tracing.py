@@ -0,0 +1,198 @@
+"""
+Tracing - Spans de latência por turno do chat
+Um turno (_handle_user_input) abre um trace; cada etapa do pipeline (chamadas
+ao modelo, ferramentas, execução no DuckDB, extração/substituição de filtros,
+preparação e renderização de gráficos) abre um span dentro dele
+
+O span ativo fica em uma ContextVar, então spans aninhados encontram o pai sem
+que o trace seja passado entre as camadas; fora de um trace, span() não faz nada.
+O trace completo vai para debug_info["trace"] e é exportado em JSON-lines
+(uma linha por turno) para análise offline.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.model_config import TRACING_CONFIG
+
+
+def span_totals(spans: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Tempo total (ms) de cada nome de span, somando as ocorrências, do maior para o menor"""
+    totals: Dict[str, float] = {}
+    for record in spans:
+        totals[record['name']] = totals.get(record['name'], 0.0) + (record['duration_ms'] or 0.0)
+    return {name: round(total, 3) for name, total in sorted(totals.items(), key=lambda item: -item[1])}
+
+
+class TurnTrace:
+    """Spans de um turno, com início e duração em milissegundos relativos ao início do turno"""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def add_span(self, name: str, parent: Optional[int], attributes: Dict[str, Any]) -> Dict[str, Any]:
+        """Registra um span iniciado agora (duração preenchida ao final)"""
+        with self._lock:
+            record = {
+                'id': len(self.spans),
+                'parent': parent,
+                'name': name,
+                'start_ms': round(self.elapsed_ms(), 3),
+                'duration_ms': None,
+                'attributes': attributes,
+            }
+            self.spans.append(record)
+        return record
+
+    def totals_by_name(self) -> Dict[str, float]:
+        return span_totals(self.spans)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+            'spans': [dict(record) for record in self.spans],
+        }
+
+
+_current_trace: ContextVar[Optional[TurnTrace]] = ContextVar('current_trace', default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar('current_span', default=None)
+_export_lock = threading.Lock()
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[TurnTrace]:
+    """
+    Abre o trace de um turno (spans abertos dentro do bloco pertencem a ele).
+
+    Args:
+        name: Nome do turno (ex: 'chat_turn')
+        **attributes: Atributos do turno (sessão, tamanho da pergunta...)
+
+    Yields:
+        TurnTrace com os spans registrados
+    """
+    trace = TurnTrace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        trace.duration_ms = round(trace.elapsed_ms(), 3)
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, nest: bool = True, **attributes) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Mede um trecho dentro do trace ativo.
+
+    Atributos podem ser adicionados durante o bloco em record['attributes'];
+    exceções são registradas no span e propagadas.
+
+    Args:
+        name: Nome da etapa (ex: 'duckdb.execute', 'tool.run_query')
+        nest: Tornar o span o pai dos spans abertos no bloco. Use False em
+            blocos que envolvem yields de um gerador: o consumidor roda
+            entre os chunks e o gerador pode ser fechado em outro contexto
+        **attributes: Atributos iniciais do span
+
+    Yields:
+        Registro do span ou None se não há trace ativo
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    record = trace.add_span(name, _current_span.get(), attributes)
+    token = _current_span.set(record['id']) if nest else None
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        if token is not None:
+            _current_span.reset(token)
+
+
+def traced(name: str):
+    """Decorator que envolve a função em um span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_current_trace() -> Optional[TurnTrace]:
+    """Trace do turno em andamento (None fora de um turno)"""
+    return _current_trace.get()
+
+
+def trace_tool_call(function_name: str, function_call, arguments: Dict[str, Any]):
+    """Tool hook do agno: cada chamada de ferramenta do agente vira um span"""
+    with span(f"tool.{function_name}"):
+        return function_call(**arguments)
+
+
+def export_trace(trace: TurnTrace, path: Optional[str] = None) -> Optional[str]:
+    """
+    Acrescenta o trace ao arquivo JSON-lines de traces.
+
+    Args:
+        trace: Trace finalizado
+        path: Arquivo de destino (None = TRACING_CONFIG["export_path"])
+
+    Returns:
+        Caminho do arquivo ou None se a exportação está desligada ou falhou
+    """
+    path = path or TRACING_CONFIG.get("export_path")
+    if not path:
+        return None
+
+    line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with _export_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+    except OSError:
+        return None
+    return path
+
+
+def load_traces(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Lê os traces exportados (lista vazia se o arquivo não existe)"""
+    path = path or TRACING_CONFIG.get("export_path")
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,118 @@
+"""
+Universe Total - Total do universo filtrado de um ranking Top-N
+Um gráfico de ranking (GROUP BY ... ORDER BY ... LIMIT N) mostra só os N maiores
+grupos, mas os percentuais dos insights ("Top 5 = 62% do total") precisam do
+total de todos os grupos com o mesmo filtro. A query do total é montada sobre a
+AST do parser do DuckDB (json_serialize_sql/json_deserialize_sql): mesma
+agregação, mesmos FROM/WHERE/CTEs, sem GROUP BY, HAVING, ORDER BY e LIMIT.
+
+O texto gerado depende só de (agregação, FROM/WHERE), então rankings diferentes
+com o mesmo filtro e a mesma agregação produzem a mesma query do total, com o
+mesmo fingerprint no cache de resultados compartilhado (utils.sql_cache); na
+execução, o roteamento de rollups (utils.rollup_cubes) evita varrer a tabela base.
+Quando o ranking não foi truncado (menos linhas que o LIMIT) e a agregação é
+aditiva (SUM/COUNT sem DISTINCT), o total é a soma da própria coluna do
+resultado e nenhuma query é necessária.
+"""
+
+import copy
+import json
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+
+# Agregação usada quando o ranking tem mais de uma (mesma prioridade da extração anterior)
+AGGREGATE_PRIORITY = ['sum', 'count', 'count_star', 'avg', 'max', 'min']
+# Agregações cuja soma por grupo é a agregação sem grupos
+ADDITIVE_AGGREGATES = {'sum', 'count', 'count_star'}
+
+
+def _aggregates(expr: Any) -> List[Dict[str, Any]]:
+    """Chamadas de agregação da expressão (sem entrar em subqueries)"""
+    if isinstance(expr, list):
+        return [found for item in expr for found in _aggregates(item)]
+    if not isinstance(expr, dict) or expr.get('class') == 'SUBQUERY':
+        return []
+    if expr.get('class') == 'FUNCTION' and str(expr.get('function_name')).lower() in AGGREGATE_PRIORITY:
+        return [expr]
+    return [found for value in expr.values() for found in _aggregates(value)]
+
+
+def _limit(node: Dict[str, Any]) -> Optional[int]:
+    """Valor do LIMIT constante do SELECT (None sem LIMIT ou com OFFSET/LIMIT não constante)"""
+    for modifier in node.get('modifiers') or []:
+        if modifier.get('type') != 'LIMIT_MODIFIER':
+            continue
+        limit = modifier.get('limit')
+        if modifier.get('offset') is not None or not isinstance(limit, dict) or limit.get('class') != 'CONSTANT':
+            return None
+        try:
+            return int(limit['value'].get('value'))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def plan_universe_total(conn: duckdb.DuckDBPyConnection, query: str) -> Optional[Dict[str, Any]]:
+    """
+    Planeja o cálculo do total do universo de uma query de ranking.
+
+    Args:
+        conn: Conexão usada apenas para o parser (json_serialize_sql/json_deserialize_sql)
+        query: SQL do ranking (última query executada pela ferramenta DuckDB)
+
+    Returns:
+        Dict com 'sql' (query do total, coluna "total"), 'aggregate', 'column_index'
+        (posição da agregação no resultado do ranking, None se ela estiver dentro
+        de outra expressão), 'limit' e 'additive' (soma da coluna do ranking não
+        truncado = total), ou None se a query não é um ranking agregado com LIMIT
+    """
+    try:
+        document = json.loads(conn.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0])
+    except duckdb.Error:
+        return None
+    statements = document.get('statements') or []
+    if document.get('error') or len(statements) != 1:
+        return None
+
+    node = statements[0]['node']
+    # GROUP BY ALL não lista as expressões: o parser marca o SELECT com FORCE_AGGREGATES
+    grouped = (node.get('group_expressions') or node.get('group_sets')
+               or node.get('aggregate_handling') == 'FORCE_AGGREGATES')
+    if node.get('type') != 'SELECT_NODE' or not grouped:
+        return None
+    if node.get('qualify') is not None:
+        return None
+    limit = _limit(node)
+    if limit is None:
+        return None
+
+    candidates = [(AGGREGATE_PRIORITY.index(str(aggregate['function_name']).lower()), index, aggregate)
+                  for index, expr in enumerate(node.get('select_list') or [])
+                  for aggregate in _aggregates(expr)]
+    if not candidates:
+        return None
+    _, index, aggregate = min(candidates, key=lambda candidate: candidate[:2])
+    function_name = str(aggregate['function_name']).lower()
+    is_column = node['select_list'][index] is aggregate
+    # HAVING descarta grupos: a soma do ranking deixaria de ser o total filtrado pelo WHERE
+    additive = (is_column and function_name in ADDITIVE_AGGREGATES and not aggregate.get('distinct')
+                and node.get('having') is None)
+
+    total_expr = copy.deepcopy(aggregate)
+    total_expr['alias'] = 'total'
+    node.update(select_list=[total_expr], group_expressions=[], group_sets=[], having=None, modifiers=[],
+                aggregate_handling='STANDARD_HANDLING')
+    try:
+        sql = conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(document)]).fetchone()[0]
+    except duckdb.Error:
+        return None
+
+    return {
+        'sql': sql,
+        'aggregate': function_name,
+        'column_index': index if is_column else None,
+        'limit': limit,
+        'additive': additive,
+    }
@@ -0,0 +1,77 @@
+"""
+Fixtures compartilhadas pelos testes: tabela dados_comerciais sintética, parquets
+de entrada e a referência de debug usada pelas ferramentas
+"""
+
+import sys
+import os
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+class DebugRef:
+    """Papel do PrincipalAgent para as ferramentas: apenas o dicionário debug_info"""
+
+    def __init__(self):
+        self.debug_info = {}
+
+
+def criar_conexao(linhas=6):
+    """Conexão em memória com uma dados_comerciais pequena (Qtd_Vendida = i, UF alternando SC/PR)"""
+    conn = duckdb.connect()
+    conn.execute(f"""
+        CREATE TABLE dados_comerciais AS
+        SELECT i::BIGINT AS Qtd_Vendida,
+               i * 1.5 AS Valor_Vendido,
+               DATE '2024-01-01' + i::INTEGER AS Data,
+               CASE WHEN i % 2 = 0 THEN 'SC' ELSE 'PR' END AS UF_Cliente,
+               i % 7 AS Cod_Cliente
+        FROM range({linhas}) r(i)
+    """)
+    return conn
+
+
+def criar_tabela(conn, linhas=20_000):
+    """
+    Cria dados_comerciais com as dimensões da hierarquia: datas em ~2 anos,
+    variações de caixa ('SC'/'sc', 'Joinville'/'JOINVILLE'), nulos em
+    Municipio_Cliente e um Des_Cliente distinto por registro.
+    """
+    conn.execute(f"""
+        CREATE TABLE dados_comerciais AS
+        SELECT
+            DATE '2023-01-01' + (i % 700)::INTEGER AS Data,
+            ['SC', 'PR', 'RS', 'SP', 'sc'][1 + (i % 5)::INTEGER] AS UF_Cliente,
+            CASE WHEN i % 11 = 0 THEN NULL
+                 ELSE ['Joinville', 'JOINVILLE', 'Curitiba', 'Porto Alegre', 'Itajaí'][1 + (i % 5)::INTEGER] END AS Municipio_Cliente,
+            (i % 997)::VARCHAR AS Cod_Cliente,
+            (i % 6)::VARCHAR AS Cod_Segmento_Cliente,
+            ['Linha A', 'Linha B', 'Linha C'][1 + (i % 3)::INTEGER] AS Des_Linha_Produto,
+            (i % 31)::VARCHAR AS Cod_Vendedor,
+            (i % 4)::VARCHAR AS Cod_Regiao_Vendedor,
+            ((i * 7919) % 1000) / 10.0 AS Valor_Vendido,
+            (i % 13)::BIGINT AS Qtd_Vendida,
+            'cliente ' || i AS Des_Cliente
+        FROM range({linhas}) r(i)
+    """)
+
+
+def exportar_parquet(conn, path):
+    """Grava dados_comerciais da conexão em um parquet"""
+    conn.execute(f"COPY dados_comerciais TO '{path}' (FORMAT parquet)")
+
+
+def criar_parquet(path, df, row_group_size=None):
+    """
+    Grava um DataFrame de teste como parquet.
+
+    Returns:
+        DataFrame lido de volta do arquivo (tipos como a aplicação os carrega)
+    """
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=row_group_size)
+    return pd.read_parquet(path)
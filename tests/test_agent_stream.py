@@ -0,0 +1,118 @@
+"""
+Testes para a execução do agente em segundo plano com respostas parciais
+"""
+
+import sys
+import os
+import threading
+import pytest
+
+from agno.metrics import ToolCallMetrics
+from agno.models.response import ToolExecution
+from agno.run.agent import (RunContentEvent, RunErrorEvent, RunOutput,
+                            ToolCallCompletedEvent, ToolCallStartedEvent)
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.agent_stream import (BackgroundRun, is_run_active, iter_run_updates, wait_for_previous_run,
+                                CHART_TOOL, UPDATE_DONE, UPDATE_TOKEN, UPDATE_TOOL_COMPLETED, UPDATE_TOOL_STARTED)
+from utils.tracing import start_trace, span
+
+
+class AgenteFalso:
+    """Agente que emite os eventos de um run em streaming do Agno"""
+
+    def __init__(self, erro=False):
+        self.erro = erro
+        self.kwargs = None
+
+    def run(self, prompt, **kwargs):
+        self.kwargs = kwargs
+        yield ToolCallStartedEvent(tool=ToolExecution(tool_name='run_query'))
+        with span("tool.run_query"):
+            pass
+        yield ToolCallCompletedEvent(tool=ToolExecution(tool_name='run_query',
+                                                        metrics=ToolCallMetrics(duration=0.25)))
+        if self.erro:
+            yield RunErrorEvent(content="limite excedido")
+        yield RunContentEvent(content="## Vendas")
+        yield RunContentEvent(content=" por UF")
+        yield RunOutput(content="## Vendas por UF")
+
+
+class AgenteComGrafico:
+    """Agente cuja ferramenta de gráfico grava a visualização em debug_info"""
+
+    def __init__(self):
+        self.debug_info = {}
+        self.liberar = threading.Event()
+
+    def run(self, prompt, **kwargs):
+        self.debug_info['visualization_metadata'] = [{'type': 'bar_chart', 'prompt': prompt}]
+        yield ToolCallCompletedEvent(tool=ToolExecution(tool_name=CHART_TOOL))
+        self.liberar.wait(timeout=5)
+        # Depois do gráfico o run continua alterando debug_info
+        self.debug_info.clear()
+        yield RunOutput(content=prompt)
+
+
+class TestRunUpdates:
+    """Eventos do Agno traduzidos em atualizações para a interface"""
+
+    def test_ordem_dos_eventos(self):
+        agente = AgenteFalso()
+        updates = list(iter_run_updates(agente, "vendas por UF"))
+
+        assert [u.kind for u in updates] == [UPDATE_TOOL_STARTED, UPDATE_TOOL_COMPLETED,
+                                             UPDATE_TOKEN, UPDATE_TOKEN, UPDATE_DONE]
+        assert updates[0].text == "Executando SQL…"
+        assert updates[1].duration_ms == 250.0
+        assert "".join(u.text for u in updates if u.kind == UPDATE_TOKEN) == "## Vendas por UF"
+        assert updates[-1].response.content == "## Vendas por UF"
+        assert agente.kwargs == {'stream': True, 'stream_events': True, 'yield_run_output': True}
+
+    def test_background_no_trace_do_turno(self):
+        """Spans da thread entram no trace de quem iniciou o run"""
+        with start_trace("chat_turn") as trace:
+            run = BackgroundRun(AgenteFalso(), "x").start()
+            updates = [u for u in run.updates(poll_seconds=0.01) if u is not None]
+
+        assert updates[-1].kind == UPDATE_DONE
+        nomes = [record['name'] for record in trace.spans]
+        assert nomes == ["agent.run", "tool.run_query"]
+        atributos = trace.spans[0]['attributes']
+        assert atributos['streaming'] is True
+        assert atributos['tokens'] == 2 and atributos['tools'] == 1
+        assert atributos['first_tool_ms'] <= atributos['first_token_ms']
+
+    def test_erro_relancado(self):
+        run = BackgroundRun(AgenteFalso(erro=True), "x").start()
+        with pytest.raises(RuntimeError, match="limite excedido"):
+            list(run.updates(poll_seconds=0.01))
+
+    def test_visualizacao_no_update_da_ferramenta(self):
+        """A interface recebe o gráfico pelo update, sem ler debug_info durante o run"""
+        agente = AgenteComGrafico()
+        agente.liberar.set()
+        concluido = [u for u in iter_run_updates(agente, "x") if u.kind == UPDATE_TOOL_COMPLETED]
+
+        assert concluido[0].tool_name == CHART_TOOL
+        assert concluido[0].visualization == {'type': 'bar_chart', 'prompt': "x"}
+        assert agente.debug_info == {}
+
+    def test_um_run_por_agente(self):
+        """Run interrompido continua em execução: o próximo só começa quando ele termina"""
+        agente = AgenteComGrafico()
+        BackgroundRun(agente, "primeira").start()  # updates() nunca consumido (script interrompido)
+
+        assert is_run_active(agente)
+        assert not wait_for_previous_run(agente, timeout=0.05)
+
+        agente.liberar.set()
+        assert wait_for_previous_run(agente, timeout=5)
+        segundo = BackgroundRun(agente, "segunda").start()
+        updates = [u for u in segundo.updates(poll_seconds=0.01) if u is not None]
+
+        assert updates[-1].response.content == "segunda"
+        assert not is_run_active(agente)
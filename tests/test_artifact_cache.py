@@ -0,0 +1,138 @@
+"""
+Testes para o cache persistente de artefatos do dataset
+"""
+
+import sys
+import os
+import pandas as pd
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from text_normalizer import TextNormalizer
+from utils.artifact_cache import (
+    ArtifactCache, DatasetArtifacts, compute_file_hash, clean_text_column, plan_encoding_cleanup,
+    ENCODING_CLEAN, ENCODING_FILLNA, ENCODING_NONE,
+)
+from conftest import criar_parquet
+
+
+def _limpeza_valor_a_valor(series):
+    """Limpeza original de load_parquet_data (referência de semântica)"""
+    cleaned_values = []
+    for val in series.fillna(""):
+        if isinstance(val, bytes):
+            cleaned_values.append(val.decode("utf-8", errors="replace"))
+        else:
+            cleaned_values.append(str(val).encode("utf-8", errors="ignore").decode("utf-8"))
+    return cleaned_values
+
+
+DADOS = pd.DataFrame({
+    'Data': pd.to_datetime(['2024-01-15', '2024-03-01', '2024-06-30']),
+    'Municipio_Cliente': ['São Paulo', 'JOINVILLE', None],
+    'UF_Cliente': pd.Categorical(['SP', 'SC', 'SC']),
+    'Valor_Vendido': [10.0, 20.5, 3.0],
+})
+
+
+class TestArtifactCache:
+    """Testes de build, persistência e leitura dos artefatos"""
+
+    def test_build_e_reload(self, tmp_path):
+        """Segunda chamada lê do disco e produz o mesmo DataFrame normalizado"""
+        data_path = str(tmp_path / 'dados.parquet')
+        df = criar_parquet(data_path, DADOS)
+        cache = ArtifactCache(str(tmp_path / 'cache'))
+
+        built = cache.load_or_build(data_path, df)
+        cached = cache.load_or_build(data_path, df)
+
+        assert not built.from_cache
+        assert cached.from_cache
+        assert cached.text_columns == built.text_columns
+        assert cached.metadata['describe'] == df.describe().to_string()
+
+        esperado = TextNormalizer().normalize_dataframe(df, built.text_columns)
+        pd.testing.assert_frame_equal(cached.build_normalized_view(df).to_frame(), esperado)
+
+    def test_contexto_temporal_restaurado(self, tmp_path):
+        """Contexto temporal restaurado dos metadados é igual ao calculado do DataFrame"""
+        data_path = str(tmp_path / 'dados.parquet')
+        df = criar_parquet(data_path, DADOS)
+        artifacts = ArtifactCache(str(tmp_path / 'cache')).load_or_build(data_path, df)
+
+        restaurado = TextNormalizer()
+        artifacts.apply_dataset_context(restaurado)
+        calculado = TextNormalizer()
+        calculado.set_dataset_context(df)
+
+        assert restaurado.dataset_context == calculado.dataset_context
+
+    def test_chave_muda_com_conteudo(self, tmp_path):
+        """Alterar o parquet gera nova chave de cache"""
+        data_path = str(tmp_path / 'dados.parquet')
+        criar_parquet(data_path, DADOS)
+        hash_antes = compute_file_hash(data_path)
+
+        criar_parquet(data_path, pd.DataFrame({'Data': pd.to_datetime(['2024-01-01'])}))
+
+        assert compute_file_hash(data_path) != hash_antes
+
+    def test_hash_memorizado(self, tmp_path, monkeypatch):
+        """Arquivo inalterado não é relido para calcular o hash"""
+        data_path = str(tmp_path / 'dados.parquet')
+        criar_parquet(data_path, DADOS)
+        esperado = compute_file_hash(data_path)
+
+        monkeypatch.setattr('builtins.open', None)
+        assert compute_file_hash(data_path) == esperado
+
+    def test_chave_muda_com_schema_compacto(self):
+        assert ArtifactCache.make_key('a' * 64, compact=True) != ArtifactCache.make_key('a' * 64, compact=False)
+
+    def test_linhas_diferentes_reconstroi(self, tmp_path):
+        """Entrada com outro número de linhas não é servida como válida"""
+        data_path = str(tmp_path / 'dados.parquet')
+        df = criar_parquet(data_path, DADOS)
+        cache = ArtifactCache(str(tmp_path / 'cache'))
+        key = cache.make_key(compute_file_hash(data_path))
+        cache.save(key, cache.load_or_build(data_path, df.head(2)))
+
+        assert cache.load(key, index=df.index) is None
+        reconstruido = cache.load_or_build(data_path, df)
+        assert not reconstruido.from_cache
+        assert len(reconstruido.normalized_columns) == len(df)
+
+
+class TestLimpezaCodificacao:
+    """Limpeza de codificação vetorizada com a mesma semântica da limpeza valor a valor"""
+
+    def test_mesma_semantica_da_limpeza_original(self):
+        """Nulos, bytes inválidos, surrogates e tipos misturados"""
+        colunas = [
+            pd.Series(['São Paulo', 'ab\udc80c', None, 'São Paulo', float('nan')] * 3, dtype=object),
+            pd.Series([b'Jo\xe3o', b'ok', None, b'ok'], dtype=object),
+            pd.Series([1, 1.0, True, 'x', None], dtype=object),
+            pd.Series([None, None], dtype=object),
+        ]
+        for series in colunas:
+            assert clean_text_column(series).tolist() == _limpeza_valor_a_valor(series)
+
+    def test_plano_e_frame_limpo(self):
+        """Apenas colunas que mudariam são processadas, com tempo por coluna"""
+        df = pd.DataFrame({
+            'valida': ['a', 'b'],
+            'com_nulos': ['a', None],
+            'com_bytes': [b'a', 'b'],
+            'numero': [1.0, 2.0],
+        })
+        plan = plan_encoding_cleanup(df)
+        assert plan == {'valida': ENCODING_NONE, 'com_nulos': ENCODING_FILLNA, 'com_bytes': ENCODING_CLEAN}
+
+        df_clean, timings, errors = DatasetArtifacts(pd.DataFrame(), {'encoding_plan': plan}).build_clean_frame(df)
+
+        assert set(timings) == {'com_nulos', 'com_bytes'} and not errors
+        assert df_clean['com_nulos'].tolist() == ['a', '']
+        assert df_clean['com_bytes'].tolist() == ['a', 'b']
+        assert df_clean['numero'].tolist() == [1.0, 2.0]
@@ -0,0 +1,109 @@
+"""
+Testes para o índice de contagem de registros filtrados
+Compara com a contagem por máscaras pandas usada anteriormente na sidebar
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from filters.core.count_index import FilterCountIndex, UPPER_CASE_COLUMNS, EXACT_COLUMNS
+
+
+def _contagem_pandas(df, filter_context):
+    """Implementação de referência (máscaras encadeadas sobre o DataFrame)"""
+    filtered_df = df
+    if filter_context.get('Data_>='):
+        filtered_df = filtered_df[filtered_df['Data'] >= filter_context['Data_>=']]
+    if filter_context.get('Data_<'):
+        filtered_df = filtered_df[filtered_df['Data'] < filter_context['Data_<']]
+    if filter_context.get('Data'):
+        filtered_df = filtered_df[filtered_df['Data'] == filter_context['Data']]
+    for col in UPPER_CASE_COLUMNS:
+        values = filter_context.get(col)
+        if values:
+            if isinstance(values, list):
+                filtered_df = filtered_df[filtered_df[col].str.upper().isin([str(v).upper() for v in values])]
+            else:
+                filtered_df = filtered_df[filtered_df[col].str.upper() == str(values).upper()]
+    for col in EXACT_COLUMNS:
+        values = filter_context.get(col)
+        if values:
+            if isinstance(values, list):
+                filtered_df = filtered_df[filtered_df[col].isin(values)]
+            else:
+                filtered_df = filtered_df[filtered_df[col] == values]
+    return len(filtered_df)
+
+
+def _criar_dataset(linhas=5000, seed=7):
+    rng = np.random.default_rng(seed)
+    datas = pd.to_datetime('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, linhas), unit='D')
+    df = pd.DataFrame({
+        'Data': datas,
+        'UF_Cliente': rng.choice(np.array(['SC', 'PR', 'sp', None], dtype=object), linhas),
+        'Municipio_Cliente': rng.choice(np.array(['Joinville', 'JOINVILLE', 'Curitiba', 'São Paulo'], dtype=object), linhas),
+        'Des_Linha_Produto': rng.choice(np.array(['Linha A', 'Linha B'], dtype=object), linhas),
+        'Cod_Cliente': rng.integers(1, 300, linhas),
+        'Cod_Vendedor': rng.choice(np.array(['V1', 'V2', 'V3'], dtype=object), linhas),
+    })
+    df.loc[df.index[::97], 'Data'] = pd.NaT
+    return df
+
+
+CONTEXTOS = [
+    {},
+    {'Data_>=': '2023-06-01', 'Data_<': '2024-01-01'},
+    {'Data': '2023-03-15'},
+    {'UF_Cliente': 'sc'},
+    {'UF_Cliente': ['SC', 'sp'], 'Municipio_Cliente': 'joinville'},
+    {'Cod_Cliente': [5, 10, 15, 200], 'Data_>=': '2024-01-01'},
+    {'Cod_Cliente': 42, 'Cod_Vendedor': ['V1', 'V3']},
+    {'Des_Linha_Produto': 'LINHA A', 'Data_<': '2023-02-01', 'Cod_Vendedor': 'V2'},
+    {'Municipio_Cliente': 'inexistente'},
+    {'UF_Cliente': [], 'Cod_Cliente': None},
+]
+
+
+class TestFilterCountIndex:
+    """Testes de equivalência e cache do índice de contagem"""
+
+    def setup_method(self):
+        self.df = _criar_dataset()
+        self.index = FilterCountIndex(self.df)
+
+    def test_equivalencia_com_pandas(self):
+        """Contagens iguais às das máscaras pandas em todos os contextos"""
+        for contexto in CONTEXTOS:
+            assert self.index.count(contexto) == _contagem_pandas(self.df, contexto), contexto
+
+    def test_cache_por_contexto_normalizado(self):
+        """Listas em ordem diferente reaproveitam a mesma entrada do cache"""
+        self.index.count({'UF_Cliente': ['SC', 'PR']})
+        self.index.count({'UF_Cliente': ['PR', 'SC'], 'Cod_Cliente': []})
+
+        stats = self.index.get_stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+
+    def test_coluna_ausente_levanta_erro(self):
+        """Filtro em coluna inexistente levanta KeyError (sidebar retorna None)"""
+        try:
+            self.index.count({'Cod_Regiao_Vendedor': 'R1'})
+            assert False, "KeyError esperado"
+        except KeyError:
+            pass
+
+    def test_colunas_categoricas(self):
+        """Schema compacto (colunas categóricas) produz as mesmas contagens"""
+        df_compacto = self.df.copy()
+        for col in ('UF_Cliente', 'Municipio_Cliente', 'Des_Linha_Produto', 'Cod_Vendedor'):
+            df_compacto[col] = df_compacto[col].astype('category')
+        index = FilterCountIndex(df_compacto)
+
+        for contexto in CONTEXTOS:
+            assert index.count(contexto) == _contagem_pandas(self.df, contexto), contexto
@@ -0,0 +1,69 @@
+"""
+Testes para o schema compacto do DatasetRegistry
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.model_config import DATA_CONFIG
+from utils.dataset_registry import DatasetRegistry
+from conftest import criar_parquet
+
+
+def _dados(linhas=20_000):
+    i = np.arange(linhas)
+    return pd.DataFrame({
+        'Data': pd.Timestamp('2024-01-01') + pd.to_timedelta(i % 365, unit='D'),
+        'UF_Cliente': np.array(['SC', 'PR', 'RS', 'SP'], dtype=object)[i % 4],
+        'Municipio_Cliente': np.where(i % 50 == 0, None, np.array(['São Paulo', 'JOINVILLE', 'Curitiba'], dtype=object)[i % 3]),
+        'Cod_Cliente': (i % 997).astype(np.int64),
+        'Des_Cliente': [f'cliente {n}' for n in i],
+        'Valor_Vendido': (i % 1000) / 10.0,
+    })
+
+
+class TestSchemaCompacto:
+    """Frame compacto deve ter os mesmos valores com menos memória"""
+
+    def test_tipos_e_valores(self, tmp_path):
+        """Dimensões categóricas, inteiros reduzidos, floats e texto livre intactos"""
+        data_path = str(tmp_path / 'dados.parquet')
+        criar_parquet(data_path, _dados())
+
+        compacto = DatasetRegistry(data_path, compact=True).load()
+        original = DatasetRegistry(data_path, compact=False).load()
+
+        assert isinstance(compacto['UF_Cliente'].dtype, pd.CategoricalDtype)
+        assert isinstance(compacto['Municipio_Cliente'].dtype, pd.CategoricalDtype)
+        assert compacto['Cod_Cliente'].dtype == np.int16
+        assert compacto['Valor_Vendido'].dtype == np.float64
+        assert compacto['Des_Cliente'].dtype == object
+
+        for col in original.columns:
+            assert compacto[col].astype(original[col].dtype).equals(original[col]), col
+        # Cópias graváveis: memory_usage(deep=True) não aceita arrays object somente-leitura
+        assert compacto.copy().memory_usage(deep=True).sum() < original.copy().memory_usage(deep=True).sum() / 2
+
+    def test_views_compartilham_codigos(self, tmp_path, monkeypatch):
+        """View normalizada usa os códigos do original; a limpa preenche nulos"""
+        data_path = str(tmp_path / 'dados.parquet')
+        criar_parquet(data_path, _dados())
+        monkeypatch.setitem(DATA_CONFIG, 'artifact_cache_dir', str(tmp_path / 'cache'))
+        registry = DatasetRegistry(data_path, compact=True)
+
+        original = registry.get_view()
+        normalizado = registry.get_normalized_view()
+        limpo = registry.get_clean_view()
+
+        assert np.shares_memory(original['UF_Cliente'].cat.codes.values,
+                                normalizado.column('UF_Cliente').cat.codes.values)
+        assert sorted(normalizado.unique('UF_Cliente')) == ['pr', 'rs', 'sc', 'sp']
+        # Coluna com nulos: normalizado e limpo trocam nulo por ""
+        assert (normalizado.column('Municipio_Cliente') == '').sum() == original['Municipio_Cliente'].isna().sum()
+        assert (limpo['Municipio_Cliente'] == '').sum() == original['Municipio_Cliente'].isna().sum()
+        assert registry.get_stats()['schema']['UF_Cliente'] == 'category'
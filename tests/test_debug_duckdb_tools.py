@@ -0,0 +1,111 @@
+"""
+Testes para o DebugDuckDbTools
+Garante execução única por query e saída textual idêntica à do DuckDbTools original
+"""
+
+import sys
+import os
+from agno.tools.duckdb import DuckDbTools
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tools.debug_duckdb_tools import DebugDuckDbTools
+from utils.sql_cache import bump_table_version, clear_sql_cache
+from conftest import DebugRef, criar_conexao
+
+
+class TestExecucaoUnica:
+    """Testes do caminho de execução única"""
+
+    def setup_method(self):
+        self.conn = criar_conexao()
+        self.ref = DebugRef()
+        self.tool = DebugDuckDbTools(debug_info_ref=self.ref, connection=self.conn.cursor())
+        self.base = DuckDbTools(connection=self.conn.cursor())
+
+    def test_texto_igual_ao_duckdbtools(self):
+        """Saída textual é a mesma do DuckDbTools para a query normalizada"""
+        query = "SELECT UF_Cliente, SUM(Qtd_Vendida) AS qtd, MAX(Data) FROM dados_comerciais WHERE UF_Cliente = 'SC' GROUP BY 1"
+
+        result = self.tool.run_query(query)
+
+        assert result == self.base.run_query(self.tool._normalize_query_strings(query))
+
+    def test_dataframe_do_mesmo_resultado(self):
+        """last_result_df vem do mesmo resultado, com dtypes equivalentes a .df()"""
+        query = "SELECT UF_Cliente, SUM(Qtd_Vendida) AS qtd FROM dados_comerciais GROUP BY 1 ORDER BY 1"
+
+        self.tool.run_query(query)
+
+        esperado = self.conn.execute(query).df()
+        assert self.tool.last_result_df.to_dict('list') == esperado.to_dict('list')
+        assert list(self.tool.last_result_df.dtypes) == list(esperado.dtypes)
+        assert self.ref.debug_info['query_executions'] == {query: 1}
+
+    def test_erro_nao_quebra(self):
+        """Erros retornam a mensagem como texto e não geram DataFrame"""
+        result = self.tool.run_query("SELECT * FROM tabela_inexistente")
+
+        assert 'tabela_inexistente' in result
+        assert self.tool.last_result_df is None
+
+
+class TestCacheCompartilhado:
+    """Testes do cache de resultados compartilhado entre sessões"""
+
+    def setup_method(self):
+        clear_sql_cache()
+        bump_table_version('dados_comerciais')
+        self.conn = criar_conexao()
+
+    def _nova_sessao(self):
+        ref = DebugRef()
+        return DebugDuckDbTools(debug_info_ref=ref, connection=self.conn.cursor(), shared_cache=True), ref
+
+    def test_segunda_sessao_reaproveita_resultado(self):
+        """Mesma query (após normalização) em outra sessão não executa de novo"""
+        sessao_a, ref_a = self._nova_sessao()
+        sessao_b, ref_b = self._nova_sessao()
+
+        resultado_a = sessao_a.run_query("SELECT UF_Cliente, COUNT(*) FROM dados_comerciais WHERE UF_Cliente = 'SC' GROUP BY 1")
+        resultado_b = sessao_b.run_query("SELECT UF_Cliente, COUNT(*) FROM dados_comerciais WHERE UF_Cliente = 'sc' GROUP BY 1")
+
+        assert resultado_a == resultado_b
+        assert 'query_executions' not in ref_b.debug_info
+        assert ref_b.debug_info['cached_queries'][0]['cache_hit']
+        assert sessao_b.last_result_df.to_dict('list') == sessao_a.last_result_df.to_dict('list')
+
+    def test_query_equivalente_usa_nomes_da_query_atual(self):
+        """Hit por fingerprint reaplica os aliases da query que pediu o resultado"""
+        sessao_a, _ = self._nova_sessao()
+        sessao_b, ref_b = self._nova_sessao()
+
+        sessao_a.run_query("SELECT UF_Cliente AS uf, SUM(Valor_Vendido) AS total FROM dados_comerciais GROUP BY 1 ORDER BY total DESC")
+        resultado = sessao_b.run_query("select d.uf_cliente, sum(d.valor_vendido) as faturamento from dados_comerciais d group by 1 order by faturamento desc")
+
+        assert 'query_executions' not in ref_b.debug_info
+        assert resultado.splitlines()[0] == "UF_Cliente,faturamento"
+        assert list(sessao_b.last_result_df.columns) == ["UF_Cliente", "faturamento"]
+
+    def test_reconstrucao_invalida_resultados(self):
+        """bump_table_version descarta resultados da versão anterior"""
+        sessao, ref = self._nova_sessao()
+        query = "SELECT COUNT(*) AS n FROM dados_comerciais WHERE Qtd_Vendida > 1"
+
+        sessao.run_query(query)
+        self.conn.execute("INSERT INTO dados_comerciais (Qtd_Vendida, Valor_Vendido, Data, UF_Cliente) VALUES (10, 1.0, DATE '2024-02-01', 'SC')")
+        bump_table_version('dados_comerciais')
+
+        assert sessao.run_query(query).endswith('5')
+        assert ref.debug_info['query_executions'] == {query: 2}
+
+    def test_queries_volateis_nao_sao_cacheadas(self):
+        """Funções não determinísticas sempre executam"""
+        sessao, ref = self._nova_sessao()
+        query = "SELECT random() FROM dados_comerciais LIMIT 1"
+
+        sessao.run_query(query)
+        sessao.run_query(query)
+
+        assert ref.debug_info['query_executions'] == {query: 2}
@@ -0,0 +1,69 @@
+"""
+Testes para o banco DuckDB compartilhado entre sessões
+"""
+
+import sys
+import os
+import duckdb
+import pytest
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.duckdb_pool import DuckDBPool
+from conftest import criar_conexao, exportar_parquet
+
+
+def _criar_parquet(path, linhas=3):
+    exportar_parquet(criar_conexao(linhas), path)
+
+
+class TestDuckDBPool:
+    """Testes do pool persistido e em memória"""
+
+    def test_cursores_compartilham_tabela_somente_leitura(self, tmp_path):
+        """Cursores enxergam a mesma tabela e não podem alterá-la"""
+        data_path = str(tmp_path / 'dados.parquet')
+        _criar_parquet(data_path)
+        pool = DuckDBPool(data_path, str(tmp_path / 'dados.duckdb'))
+
+        cursor_a = pool.cursor()
+        cursor_b = pool.cursor()
+
+        assert cursor_a.execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 3
+        assert cursor_b.execute("SELECT SUM(Valor_Vendido) FROM dados_comerciais").fetchone()[0] == 4.5
+        with pytest.raises(duckdb.Error):
+            cursor_a.execute("DROP TABLE dados_comerciais")
+
+        stats = pool.get_stats()
+        assert stats['mode'] == 'persisted_read_only'
+        assert stats['cursors_served'] == 2
+        pool.close()
+
+    def test_reconstroi_quando_parquet_muda(self, tmp_path):
+        """Arquivo .duckdb é reaproveitado e só reconstruído se o parquet mudar"""
+        data_path = str(tmp_path / 'dados.parquet')
+        db_path = str(tmp_path / 'dados.duckdb')
+        _criar_parquet(data_path)
+        DuckDBPool(data_path, db_path).initialize().close()
+
+        reaberto = DuckDBPool(data_path, db_path)
+        reaberto.initialize()
+        assert not reaberto.stats['rebuilt']
+        reaberto.close()
+
+        _criar_parquet(data_path, linhas=5)
+        atualizado = DuckDBPool(data_path, db_path)
+        assert atualizado.cursor().execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 5
+        assert atualizado.stats['rebuilt']
+        atualizado.close()
+
+    def test_fallback_em_memoria(self, tmp_path):
+        """Sem caminho de arquivo, a tabela é materializada uma vez em memória"""
+        data_path = str(tmp_path / 'dados.parquet')
+        _criar_parquet(data_path)
+        pool = DuckDBPool(data_path)
+
+        assert pool.cursor().execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 3
+        assert pool.get_stats()['mode'] == 'shared_in_memory'
+        pool.close()
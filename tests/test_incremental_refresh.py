@@ -0,0 +1,284 @@
+"""
+Testes para o refresh incremental (parquet delta aplicado sem reconstruir o dataset)
+"""
+
+import sys
+import os
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.model_config import DATA_CONFIG
+from tools.debug_duckdb_tools import DebugDuckDbTools
+from text_normalizer import TextNormalizer
+from utils.artifact_cache import build_artifacts
+from utils.dataset_registry import get_dataset_registry, reset_dataset_registry
+from utils.duckdb_pool import DuckDBPool, get_duckdb_pool, reset_duckdb_pool
+from utils.incremental_refresh import refresh_with_delta, query_period
+from utils.rollup_cubes import CATALOG_TABLE, _rollup_select
+from utils.sql_cache import (cache_query_result, get_cached_query, clear_sql_cache, get_data_epoch,
+                              invalidate_table_entries)
+from filters.core.count_index import SQLFilterCounter
+from conftest import DebugRef, criar_parquet
+
+
+def _frame(datas, municipios, valores):
+    return pd.DataFrame({
+        'Data': pd.to_datetime(datas),
+        'Municipio_Cliente': municipios,
+        'UF_Cliente': ['SC'] * len(datas),
+        'Cod_Cliente': list(range(10, 10 + len(datas))),
+        'Valor_Vendido': valores,
+    })
+
+
+BASE = _frame(['2024-01-05', '2024-01-20', '2024-02-10', '2024-03-15', '2024-03-31'],
+              ['Joinville', 'Blumenau', 'JOINVILLE', None, 'Blumenau'],
+              [10.0, 20.0, 30.0, 40.0, 50.0])
+DELTA = _frame(['2024-03-31', '2024-04-02', '2024-04-30'],
+               ['Criciúma', 'Joinville', None],
+               [1.0, 2.0, 3.0])
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    """Parquet base + delta e singletons limpos"""
+    base_path = str(tmp_path / 'dados.parquet')
+    delta_path = str(tmp_path / 'delta_2024_04.parquet')
+    criar_parquet(base_path, BASE)
+    criar_parquet(delta_path, DELTA)
+    monkeypatch.setitem(DATA_CONFIG, 'artifact_cache_dir', str(tmp_path / 'cache'))
+    reset_dataset_registry()
+    reset_duckdb_pool()
+    clear_sql_cache()
+    yield base_path, delta_path, tmp_path
+    reset_dataset_registry()
+    reset_duckdb_pool()
+    clear_sql_cache()
+
+
+def _linhas(cursor, sql):
+    return sorted(cursor.execute(sql).fetchall(), key=repr)
+
+
+class TestQueryPeriod:
+    """Período de Data lido por uma query cacheada"""
+
+    def test_limites(self):
+        conn = duckdb.connect()
+        assert query_period(conn, "SELECT SUM(Valor_Vendido) FROM dados_comerciais "
+                                  "WHERE Data >= '2024-01-01' AND Data < '2024-03-01'") == \
+            (datetime(2024, 1, 1), datetime(2024, 3, 1))
+        assert query_period(conn, "SELECT COUNT(*) FROM dados_comerciais WHERE YEAR(Data) = 2023 AND UF_Cliente = 'SC'") == \
+            (datetime(2023, 1, 1), datetime(2024, 1, 1))
+        assert query_period(conn, "SELECT * FROM dados_comerciais WHERE Data BETWEEN '2024-01-01' AND '2024-01-31'")[1] == \
+            pd.Timestamp('2024-02-01')
+        # OR, subquery e ausência de filtro: período aberto
+        assert query_period(conn, "SELECT * FROM dados_comerciais WHERE Data < '2024-01-01' OR UF_Cliente = 'SC'") == (None, None)
+        assert query_period(conn, "SELECT * FROM dados_comerciais WHERE Data < '2024-01-01' AND Cod_Cliente IN "
+                                  "(SELECT Cod_Cliente FROM dados_comerciais)") == (None, None)
+        assert query_period(conn, "SELECT SUM(Valor_Vendido) FROM dados_comerciais") == (None, None)
+
+
+class TestRefreshIncremental:
+    """Delta aplicado ao banco, ao dataset, ao normalizador e aos caches"""
+
+    def test_modo_memoria(self, ambiente):
+        base_path, delta_path, tmp_path = ambiente
+        registry = get_dataset_registry(base_path)
+        registry.get_artifacts()
+        cursor = get_duckdb_pool(base_path).cursor()
+        counter = SQLFilterCounter(get_duckdb_pool(base_path).cursor())
+        normalizer = TextNormalizer()
+        registry.get_artifacts().apply_dataset_context(normalizer)
+        assert normalizer.dataset_context['last_month'] == '2024-03'
+
+        antiga = "SELECT SUM(Valor_Vendido) FROM dados_comerciais WHERE Data < '2024-03-01'"
+        total = "SELECT SUM(Valor_Vendido) FROM dados_comerciais"
+        for query in (antiga, total):
+            cache_query_result(query, pa.table({'total': cursor.execute(query).fetchone()}),
+                               {'dados_comerciais': 1}, tables=['dados_comerciais'])
+        assert counter.count({'Data_<': '2024-02-01'}) == 2
+        assert counter.count({}) == 5
+
+        resultado = refresh_with_delta(delta_path, base_path, normalizers=[normalizer], counters=[counter])
+
+        assert resultado['months'] == ['2024-03-01', '2024-04-01']
+        assert resultado['cache_entries_invalidated'] == 1
+        assert get_cached_query(antiga, {'dados_comerciais': 1}) is not None
+        assert get_cached_query(total, {'dados_comerciais': 1}) is None
+        assert resultado['counts_invalidated'] == 1
+        assert counter.count({}) == 8
+
+        # Banco: linhas, rollups e dicionário iguais aos de uma reconstrução completa
+        assert cursor.execute(total).fetchone()[0] == 156.0
+        completo_path = str(tmp_path / 'completo.parquet')
+        criar_parquet(completo_path, pd.concat([BASE, DELTA], ignore_index=True))
+        completo = DuckDBPool(completo_path).cursor()
+        catalogo = cursor.execute(f"SELECT table_name, dimensions, metrics, rows FROM {CATALOG_TABLE}").fetchall()
+        assert catalogo
+        for tabela, dimensoes, metricas, linhas in catalogo:
+            esperado = _linhas(completo, _rollup_select(dimensoes, metricas))
+            assert _linhas(cursor, f"SELECT * FROM {tabela}") == esperado
+            assert linhas == len(esperado)
+        dicionario = "SELECT * FROM _string_dictionary ORDER BY column_name, value"
+        assert cursor.execute(dicionario).fetchall() == completo.execute(dicionario).fetchall()
+
+        # Dataset: frame e view normalizada equivalentes ao build completo
+        df = registry.get_view()
+        assert len(df) == 8
+        esperada = build_artifacts(df, 'x').build_normalized_view(df)
+        view = registry.get_normalized_view()
+        for col in view.text_columns:
+            assert sorted(view.unique(col)) == sorted(esperada.unique(col))
+            assert view.column(col).astype(object).tolist() == esperada.column(col).astype(object).tolist()
+        assert sorted(view.originals('Municipio_Cliente', 'joinville')) == ['JOINVILLE', 'Joinville']
+        assert registry.get_clean_view()['Municipio_Cliente'].isna().sum() == 0
+
+        # Contexto temporal: normalizadores existentes e novos
+        assert normalizer.dataset_context['last_month'] == '2024-04'
+        assert registry.get_summary()['max_date'] == pd.Timestamp('2024-04-30')
+
+    def test_cache_descartado_antes_do_delta_visivel(self, ambiente, monkeypatch):
+        """Nenhuma leitura do cache entre o append e o descarte serve o total anterior"""
+        base_path, delta_path, _ = ambiente
+        get_dataset_registry(base_path).get_artifacts()
+        pool = get_duckdb_pool(base_path)
+        cursor = pool.cursor()
+        total = "SELECT SUM(Valor_Vendido) FROM dados_comerciais"
+        cache_query_result(total, pa.table({'total': cursor.execute(total).fetchone()}),
+                           {'dados_comerciais': 1}, tables=['dados_comerciais'])
+
+        append_delta = pool.append_delta
+        servidos = []
+
+        def append_e_le(*args, **kwargs):
+            resultado = append_delta(*args, **kwargs)
+            servidos.append(get_cached_query(total, {'dados_comerciais': 1}))
+            return resultado
+
+        monkeypatch.setattr(pool, 'append_delta', append_e_le)
+        refresh_with_delta(delta_path, base_path)
+
+        assert servidos == [None]
+
+    def test_modo_streaming(self, ambiente, monkeypatch):
+        base_path, delta_path, _ = ambiente
+        monkeypatch.setitem(DATA_CONFIG, 'ingestion_mode', 'streaming')
+        registry = get_dataset_registry(base_path)
+        cursor = get_duckdb_pool(base_path).cursor()
+        assert not registry.get_normalized_view().contains('Municipio_Cliente', 'criciuma')
+
+        resultado = refresh_with_delta(delta_path, base_path)
+
+        assert resultado['dataset']['rows'] == 8
+        assert cursor.execute("SELECT COUNT(*), SUM(Valor_Vendido) FROM dados_comerciais").fetchone() == (8, 156.0)
+        view = registry.get_normalized_view()
+        assert view.contains('Municipio_Cliente', 'criciuma')
+        assert view.originals('Municipio_Cliente', 'criciuma') == ['Criciúma']
+        assert view.unique('Cod_Cliente') == [10, 11, 12, 13, 14]
+        assert len(view) == 8
+
+    def test_modo_persistido_mantem_cursores(self, ambiente):
+        """Delta aplicado a uma cópia do arquivo: cursores e sessões existentes continuam funcionando"""
+        base_path, delta_path, tmp_path = ambiente
+        db_path = str(tmp_path / 'dados.duckdb')
+        pool = DuckDBPool(base_path, db_path)
+        cursor = pool.cursor()
+        ref = DebugRef()
+        tool = DebugDuckDbTools(debug_info_ref=ref, connection=pool.cursor(), shared_cache=True)
+        total = "SELECT SUM(Valor_Vendido) AS total FROM dados_comerciais"
+        assert tool.run_query(total).splitlines()[1] == '150.0'
+        # Query iniciada antes do delta (época capturada) não grava no cache depois dele
+        epoca = get_data_epoch()
+
+        pool.append_delta(delta_path, datetime(2024, 3, 1), datetime(2024, 5, 1))
+        cache_query_result("SELECT 1 FROM dados_comerciais", pa.table({'x': [1]}),
+                           {'dados_comerciais': 1}, tables=['dados_comerciais'], epoch=epoca)
+
+        assert pool.get_stats()['generation'] == 1
+        assert cursor.execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 8
+        invalidate_table_entries('dados_comerciais', keep=lambda query: False)
+        assert tool.run_query(total).splitlines()[1] == '156.0'
+        assert get_cached_query("SELECT 1 FROM dados_comerciais", {'dados_comerciais': 1}) is None
+        # Arquivo base continua correspondendo ao parquet: reaberto sem reconstrução
+        pool.close()
+        reaberto = DuckDBPool(base_path, db_path)
+        assert reaberto.cursor().execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 5
+        assert not reaberto.stats['rebuilt']
+        assert not any('.delta-' in name for name in os.listdir(tmp_path))
+        reaberto.close()
+
+    def test_modo_persistido_remove_copia_anterior(self, ambiente):
+        """Cópia de uma generation é removida quando os cursores migram para a seguinte"""
+        base_path, delta_path, tmp_path = ambiente
+        maio_path = str(tmp_path / 'delta_2024_05.parquet')
+        criar_parquet(maio_path, _frame(['2024-05-10'], ['Joinville'], [4.0]))
+        pool = DuckDBPool(base_path, str(tmp_path / 'dados.duckdb'))
+        cursor = pool.cursor()
+        parado = pool.cursor()
+        assert cursor.execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 5
+        parado.execute("SELECT 1")
+
+        def copias():
+            return sorted(name for name in os.listdir(tmp_path) if '.delta-' in name and not name.endswith('.wal'))
+
+        pool.append_delta(delta_path, datetime(2024, 3, 1), datetime(2024, 5, 1))
+        assert cursor.execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 8
+        pool.append_delta(maio_path, datetime(2024, 5, 1), datetime(2024, 6, 1))
+        assert cursor.execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 9
+
+        # Cursor parado na generation 0 mantém só o arquivo base aberto; a cópia 1 já saiu
+        assert copias() == [f"dados.duckdb.delta-{os.getpid()}-2"]
+        assert pool.get_stats()['retired_open'] == 1
+        assert pool.get_stats()['last_delta_copy_mb'] is not None
+        assert parado.execute("SELECT COUNT(*) FROM dados_comerciais").fetchone()[0] == 9
+        assert pool.get_stats()['retired_open'] == 0
+
+        pool.close()
+        assert copias() == []
+
+
+class TestRefreshDaInterface:
+    """Delta aplicado pelo data_loaders: dados da interface e agentes vivos atualizados"""
+
+    def test_valor_do_delta_valida_e_conta(self, ambiente, monkeypatch):
+        from utils import data_loaders
+        from filters.core.count_index import count_filtered_records
+        from filters.core.manager import get_json_filter_manager
+
+        base_path, delta_path, tmp_path = ambiente
+        monkeypatch.setitem(DATA_CONFIG, 'data_path', base_path)
+        monkeypatch.setitem(DATA_CONFIG, 'duckdb_path', str(tmp_path / 'dados.duckdb'))
+        data_loaders.load_parquet_data.clear()
+
+        class Agente:
+            def __init__(self):
+                registry = get_dataset_registry(base_path)
+                self.normalizer = TextNormalizer()
+                registry.get_artifacts().apply_dataset_context(self.normalizer)
+                self.df_normalized = registry.get_normalized_view()
+
+        agente = Agente()
+        data_loaders.register_live_agent(agente)
+        df, _ = data_loaders.load_parquet_data()
+        abril = {'Data_>=': '2024-04-01', 'Data_<': '2024-05-01'}
+        assert count_filtered_records(df, abril) == 0
+        assert 'criciuma' not in get_json_filter_manager(agente.df_normalized).validar_valores(
+            'Municipio_Cliente', ['criciuma'], 'regiao')
+
+        resultado = data_loaders.refresh_dataset_with_delta(delta_path)
+
+        assert resultado['agents_updated'] == 1
+        df, _ = data_loaders.load_parquet_data()
+        assert count_filtered_records(df, abril) == 2
+        assert get_json_filter_manager(agente.df_normalized).validar_valores(
+            'Municipio_Cliente', ['criciuma'], 'regiao') == ['criciuma']
+        assert agente.normalizer.dataset_context['last_month'] == '2024-04'
+        data_loaders.load_parquet_data.clear()
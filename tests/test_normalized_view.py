@@ -0,0 +1,67 @@
+"""
+Testes para a NormalizedView (texto normalizado como lookup sobre o dicionário original)
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from text_normalizer import TextNormalizer
+from utils.normalized_view import NormalizedView, unique_values
+from filters.core.manager import JSONFilterManager
+
+
+def _criar_dataset():
+    return pd.DataFrame({
+        'UF_Cliente': pd.Categorical(['SC', 'PR', 'SC', 'SP', 'RS', 'PR']),
+        'Municipio_Cliente': pd.Categorical(['JOINVILLE', 'Curitiba', 'Joinville', None, 'São Paulo', 'curitiba'],
+                                            categories=['Curitiba', 'JOINVILLE', 'Joinville', 'Nunca', 'São Paulo', 'curitiba']),
+        'Des_Cliente': ['Cliente Ã', None, 'cliente ã', 'Outro', 'Outro', 'Terceiro'],
+        'Valor_Vendido': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+    })
+
+
+def _criar_view(df):
+    normalizer = TextNormalizer()
+    text_columns = ['UF_Cliente', 'Municipio_Cliente', 'Des_Cliente']
+    normalized_columns = pd.DataFrame(
+        {col: normalizer.normalize_column(df[col].astype('category')) for col in text_columns})
+    return NormalizedView(df, normalized_columns)
+
+
+class TestNormalizedView:
+    """Operações da view devem equivaler às do DataFrame normalizado materializado"""
+
+    def setup_method(self):
+        self.df = _criar_dataset()
+        self.view = _criar_view(self.df)
+        self.esperado = TextNormalizer().normalize_dataframe(self.df, self.view.text_columns)
+
+    def test_valores_unicos_na_ordem_de_aparicao(self):
+        """unique() é igual a dropna().unique() do frame normalizado, inclusive na ordem"""
+        for col in self.df.columns:
+            assert self.view.unique(col) == self.esperado[col].dropna().unique().tolist(), col
+            assert unique_values(self.view, col) == unique_values(self.esperado, col)
+
+    def test_pertinencia_e_valores_originais(self):
+        """contains() usa o dicionário e originals() volta para os valores do dataset"""
+        assert self.view.contains('Municipio_Cliente', 'joinville')
+        assert not self.view.contains('Municipio_Cliente', 'nunca')
+        assert sorted(self.view.originals('Municipio_Cliente', 'joinville')) == ['JOINVILLE', 'Joinville']
+        assert sorted(self.view.originals('Des_Cliente', 'cliente a')) == ['Cliente Ã', 'cliente ã']
+        assert self.view.originals('UF_Cliente', 'xx') == []
+
+    def test_materializacao_e_codigos_compartilhados(self):
+        """to_frame() reproduz normalize_dataframe; colunas injetivas reutilizam os códigos"""
+        # Categorias sem nenhuma linha ('Nunca') não entram no dicionário da view
+        pd.testing.assert_frame_equal(self.view.to_frame(), self.esperado, check_categorical=False)
+        assert np.shares_memory(self.view.column('UF_Cliente').cat.codes.values, self.df['UF_Cliente'].cat.codes.values)
+        assert self.view.get_stats()['shared_code_columns'] == 2
+
+    def test_gerenciador_de_filtros_aceita_view(self):
+        """JSONFilterManager gera as mesmas listas de valores válidos a partir da view"""
+        assert JSONFilterManager(self.view).valores_validos == JSONFilterManager(self.esperado).valores_validos
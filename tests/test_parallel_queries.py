@@ -0,0 +1,82 @@
+"""
+Testes para a execução paralela das queries independentes de um passo do agente
+"""
+
+import sys
+import os
+from agno.tools.function import FunctionCall
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tools.debug_duckdb_tools import DebugDuckDbTools
+from utils.parallel_queries import prefetch_tool_calls
+from utils.tracing import start_trace
+from conftest import DebugRef, criar_conexao
+
+
+QUERIES = [
+    "SELECT UF_Cliente, SUM(Valor_Vendido) AS total FROM dados_comerciais GROUP BY 1 ORDER BY total DESC",
+    "SELECT COUNT(*) AS linhas FROM dados_comerciais WHERE UF_Cliente = 'SC'",
+    "SELECT YEAR(Data) AS ano, SUM(Qtd_Vendida) AS qtd FROM dados_comerciais GROUP BY ano ORDER BY ano",
+]
+
+
+def _chamadas(tool, queries):
+    return [FunctionCall(function=tool.functions['run_query'], arguments={'query': query}) for query in queries]
+
+
+class TestLoteParalelo:
+    """Pré-execução paralela com o mesmo resultado da execução sequencial"""
+
+    def setup_method(self):
+        self.conn = criar_conexao(linhas=400)
+
+    def test_igual_ao_sequencial(self):
+        sequencial = DebugDuckDbTools(debug_info_ref=DebugRef(), connection=self.conn.cursor())
+        esperado = [sequencial.run_query(query) for query in QUERIES]
+
+        ref = DebugRef()
+        paralelo = DebugDuckDbTools(debug_info_ref=ref, connection=self.conn.cursor())
+        with start_trace("chat_turn") as trace:
+            assert prefetch_tool_calls(_chamadas(paralelo, QUERIES)) == [paralelo]
+            resultados = [paralelo.run_query(query) for query in QUERIES]
+
+        assert resultados == esperado
+        # last_result_df/last_query seguem a ordem das chamadas do modelo
+        assert paralelo.last_query == sequencial.last_query
+        assert paralelo.last_result_df.to_dict('list') == sequencial.last_result_df.to_dict('list')
+        assert ref.debug_info['sql_queries'] == sequencial.debug_info_ref.debug_info['sql_queries']
+        assert ref.debug_info['query_executions'] == sequencial.debug_info_ref.debug_info['query_executions']
+        assert paralelo._prefetched == {}
+
+        lote, = ref.debug_info['parallel_queries']
+        assert lote['queries'] == 3 and lote['saved_ms'] >= 0
+        spans = {record['name']: record for record in trace.spans}
+        execucoes = [record for record in trace.spans if record['name'] == 'duckdb.execute']
+        assert len(execucoes) == 3
+        assert all(record['parent'] == spans['duckdb.parallel_batch']['id'] for record in execucoes)
+
+    def test_fora_do_lote(self):
+        """Comandos, queries repetidas e passos com uma query seguem o caminho sequencial"""
+        tool = DebugDuckDbTools(debug_info_ref=DebugRef(), connection=self.conn.cursor())
+
+        assert prefetch_tool_calls(_chamadas(tool, QUERIES[:1])) == []
+        assert prefetch_tool_calls(_chamadas(tool, [QUERIES[0], QUERIES[0]])) == []
+        assert prefetch_tool_calls(_chamadas(tool, [QUERIES[0], "CREATE TABLE x AS SELECT 1"])) == []
+        assert tool._prefetched == {}
+        assert 'parallel_queries' not in tool.debug_info_ref.debug_info
+
+    def test_lote_com_comando_e_tabela_temporaria(self):
+        """Comando no lote impede a antecipação; erro no cursor do pool não vira resultado"""
+        tool = DebugDuckDbTools(debug_info_ref=DebugRef(), connection=self.conn.cursor())
+
+        assert prefetch_tool_calls(_chamadas(tool, ["CREATE TEMP TABLE t AS SELECT 1 AS x", *QUERIES])) == []
+        assert tool._prefetched == {}
+
+        tool.run_query("CREATE TEMP TABLE t AS SELECT 1 AS x")
+        temporaria = "SELECT x FROM t"
+        assert prefetch_tool_calls(_chamadas(tool, [temporaria, QUERIES[0]])) == [tool]
+        # Tabela temporária só existe na conexão da sessão: executada de novo nela
+        assert list(tool._prefetched) == [QUERIES[0]]
+        assert tool.run_query(temporaria).splitlines() == ['x', '1']
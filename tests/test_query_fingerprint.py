@@ -0,0 +1,64 @@
+"""
+Testes para o fingerprint semântico de queries SQL
+"""
+
+import sys
+import os
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.query_fingerprint import fingerprint_sql
+
+
+EQUIVALENTES = [
+    ("SELECT * FROM dados_comerciais WHERE UF_Cliente = 'sc' AND Data >= '2024-01-01'",
+     "select * from dados_comerciais where (data >= '2024-01-01') and ('sc' = uf_cliente)"),
+    ("SELECT d.Cod_Cliente, SUM(d.Valor_Vendido) AS total FROM dados_comerciais d GROUP BY 1 ORDER BY total DESC LIMIT 10",
+     "SELECT Cod_Cliente, SUM(Valor_Vendido) AS faturamento FROM dados_comerciais GROUP BY 1 ORDER BY faturamento DESC LIMIT 10"),
+    ("SELECT * FROM dados_comerciais WHERE 0 < Valor_Vendido",
+     "SELECT * FROM dados_comerciais WHERE Valor_Vendido > 0"),
+    ("SELECT * FROM dados_comerciais WHERE UF_Cliente IN ('sc', 'pr')",
+     "SELECT * FROM dados_comerciais WHERE UF_Cliente IN ('pr', 'sc')"),
+]
+
+DIFERENTES = [
+    ("SELECT * FROM dados_comerciais WHERE Valor_Vendido > 0",
+     "SELECT * FROM dados_comerciais WHERE Valor_Vendido > 1"),
+    ("SELECT Valor_Vendido - Qtd_Vendida FROM dados_comerciais",
+     "SELECT Qtd_Vendida - Valor_Vendido FROM dados_comerciais"),
+    ("SELECT UF_Cliente FROM dados_comerciais ORDER BY UF_Cliente",
+     "SELECT UF_Cliente FROM dados_comerciais ORDER BY UF_Cliente DESC"),
+    ("SELECT * FROM dados_comerciais WHERE UF_Cliente = 'sc'",
+     "SELECT * FROM dados_comerciais WHERE UF_Cliente = 'SC'"),
+    # Alias referenciado no ORDER BY vs coluna com o mesmo nome do alias de outra query
+    ("SELECT SUM(Valor_Vendido) AS v FROM dados_comerciais GROUP BY UF_Cliente ORDER BY v",
+     "SELECT SUM(Valor_Vendido) AS w FROM dados_comerciais GROUP BY UF_Cliente ORDER BY v"),
+    # Aliases trocados em CTE, subquery e HAVING mudam o resultado
+    ("WITH s AS (SELECT Valor_Vendido AS p, Qtd_Vendida AS q FROM dados_comerciais) SELECT SUM(p) FROM s",
+     "WITH s AS (SELECT Valor_Vendido AS q, Qtd_Vendida AS p FROM dados_comerciais) SELECT SUM(p) FROM s"),
+    ("SELECT SUM(p) FROM (SELECT Valor_Vendido AS p, Qtd_Vendida AS q FROM dados_comerciais)",
+     "SELECT SUM(p) FROM (SELECT Valor_Vendido AS q, Qtd_Vendida AS p FROM dados_comerciais)"),
+    ("SELECT SUM(Valor_Vendido) AS p, SUM(Qtd_Vendida) AS q FROM dados_comerciais GROUP BY UF_Cliente HAVING p > 10",
+     "SELECT SUM(Valor_Vendido) AS q, SUM(Qtd_Vendida) AS p FROM dados_comerciais GROUP BY UF_Cliente HAVING p > 10"),
+]
+
+
+class TestFingerprintSQL:
+    """Testes de equivalência e distinção de fingerprints"""
+
+    def test_queries_equivalentes(self):
+        """Ordem de predicados, aliases, caixa e parênteses não alteram o fingerprint"""
+        for query_a, query_b in EQUIVALENTES:
+            assert fingerprint_sql(query_a) == fingerprint_sql(query_b), (query_a, query_b)
+
+    def test_queries_diferentes(self):
+        """Literais, ordem de operandos não comutativos e direção de ORDER BY importam"""
+        for query_a, query_b in DIFERENTES:
+            assert fingerprint_sql(query_a) != fingerprint_sql(query_b), (query_a, query_b)
+
+    def test_fallback_para_texto(self):
+        """Statements fora do parser caem para o texto com espaços colapsados"""
+        query = "CREATE TABLE x AS SELECT 1"
+        assert fingerprint_sql(query) == fingerprint_sql("CREATE   TABLE x AS\nSELECT 1")
+        assert fingerprint_sql(query) != fingerprint_sql("create table x as select 1")
@@ -0,0 +1,130 @@
+"""
+Testes para os rollups mensais da hierarquia de dimensões
+Toda query reescrita deve retornar exatamente o resultado da tabela base
+"""
+
+import sys
+import os
+import math
+import duckdb
+import pytest
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.rollup_cubes import build_rollups, RollupRouter
+from utils.duckdb_pool import DuckDBPool
+from tools.debug_duckdb_tools import DebugDuckDbTools
+from conftest import DebugRef, criar_tabela, exportar_parquet
+
+
+ROTEAVEIS = [
+    "SELECT UF_Cliente, SUM(Valor_Vendido) AS total FROM dados_comerciais GROUP BY UF_Cliente ORDER BY total DESC",
+    "SELECT DATE_TRUNC('month', Data) AS mes_ano, SUM(Valor_Vendido) AS total_vendas FROM dados_comerciais "
+    "WHERE Data BETWEEN '2023-01-01' AND '2023-06-30' GROUP BY 1 ORDER BY 1",
+    "SELECT EXTRACT(YEAR FROM Data) AS ano, COUNT(*) FROM dados_comerciais GROUP BY ano ORDER BY ano",
+    "SELECT COUNT(*) AS n FROM dados_comerciais WHERE LOWER(UF_Cliente) = 'sc' AND Data >= '2023-03-01' AND Data < '2023-05-01'",
+    "SELECT UF_Cliente, Des_Linha_Produto, SUM(Qtd_Vendida) FROM dados_comerciais GROUP BY 1, 2 HAVING COUNT(*) > 10 ORDER BY 1, 2",
+    "SELECT strftime(Data, '%Y-%m') AS m, SUM(Qtd_Vendida) FROM dados_comerciais "
+    "WHERE dados_comerciais.UF_Cliente IN ('SC', 'PR') GROUP BY m ORDER BY m",
+    "SELECT d.Cod_Vendedor, COUNT(DISTINCT d.Cod_Regiao_Vendedor), MAX(DATE_TRUNC('month', d.Data)) "
+    "FROM dados_comerciais d GROUP BY ALL ORDER BY 1",
+    "SELECT SUM(Valor_Vendido), COUNT(*) FROM dados_comerciais WHERE Data > '2030-12-31'",
+    "SELECT Cod_Segmento_Cliente, YEAR(Data), QUARTER(Data), SUM(Valor_Vendido) / COUNT(*) AS ticket "
+    "FROM dados_comerciais WHERE Data <= '2023-09-30' GROUP BY 1, 2, 3 ORDER BY 1, 2, 3",
+]
+
+NAO_ROTEAVEIS = [
+    "SELECT AVG(Valor_Vendido) FROM dados_comerciais",
+    "SELECT COUNT(Valor_Vendido) FROM dados_comerciais",
+    "SELECT UF_Cliente, SUM(Valor_Vendido) FROM dados_comerciais WHERE Data >= '2023-03-15' GROUP BY 1",
+    "SELECT * FROM dados_comerciais LIMIT 3",
+    "SELECT Municipio_Cliente, Des_Linha_Produto, COUNT(*) FROM dados_comerciais GROUP BY 1, 2",
+    "SELECT Des_Cliente, COUNT(*) FROM dados_comerciais GROUP BY 1",
+    "SELECT UF_Cliente, SUM(Valor_Vendido) FROM dados_comerciais WHERE Valor_Vendido > 10 GROUP BY 1",
+    "SELECT UF_Cliente, SUM(Valor_Vendido) OVER () FROM dados_comerciais",
+    "SELECT Data, COUNT(*) FROM dados_comerciais GROUP BY 1",
+]
+
+
+def _mesmo_resultado(esperado, obtido):
+    if len(esperado) != len(obtido):
+        return False
+    for linha_a, linha_b in zip(esperado, obtido):
+        for a, b in zip(linha_a, linha_b):
+            if isinstance(a, float) and isinstance(b, float):
+                if not math.isclose(a, b, rel_tol=1e-9):
+                    return False
+            elif a != b:
+                return False
+    return True
+
+
+@pytest.fixture(scope='module')
+def conexao():
+    conn = duckdb.connect()
+    criar_tabela(conn)
+    build_rollups(conn)
+    yield conn
+    conn.close()
+
+
+class TestRollupRouter:
+    """Correção da reescrita: rollup e tabela base devem concordar"""
+
+    @pytest.mark.parametrize('query', ROTEAVEIS)
+    def test_rollup_igual_a_tabela_base(self, conexao, query):
+        """Query reescrita retorna as mesmas linhas e tipos da tabela base"""
+        rewrite = RollupRouter(conexao).rewrite(query)
+
+        assert rewrite is not None, query
+        assert f"FROM {rewrite['rollup']} " in rewrite['sql']
+        assert conexao.sql(rewrite['sql']).types == conexao.sql(query).types
+        assert _mesmo_resultado(conexao.execute(query).fetchall(), conexao.execute(rewrite['sql']).fetchall())
+
+    @pytest.mark.parametrize('query', NAO_ROTEAVEIS)
+    def test_queries_nao_equivalentes_ficam_na_base(self, conexao, query):
+        """Métricas fora de SUM, limites fora do mês e colunas sem rollup não são reescritos"""
+        assert RollupRouter(conexao).rewrite(query) is None
+
+    def test_escolhe_menor_rollup(self, conexao):
+        """Entre os rollups que contêm as dimensões, o de menos linhas é usado"""
+        router = RollupRouter(conexao)
+        rewrite = router.rewrite("SELECT UF_Cliente, COUNT(*) FROM dados_comerciais GROUP BY 1")
+
+        candidatos = [r for r in router.rollups if 'uf_cliente' in r['dimensions']]
+        assert rewrite['rollup_rows'] == min(r['rows'] for r in candidatos)
+
+    def test_sem_catalogo_nao_reescreve(self):
+        """Conexões sem rollups executam sempre na tabela base"""
+        conn = duckdb.connect()
+        criar_tabela(conn, linhas=10)
+
+        assert RollupRouter(conn).rewrite("SELECT COUNT(*) FROM dados_comerciais") is None
+
+
+class TestRollupsNoPool:
+    """Rollups construídos junto com o banco compartilhado"""
+
+    def test_debug_tools_responde_pelo_rollup(self, tmp_path):
+        """run_query usa o rollup e devolve o mesmo texto/DataFrame da tabela base"""
+        conn = duckdb.connect()
+        criar_tabela(conn, linhas=5_000)
+        data_path = str(tmp_path / 'dados.parquet')
+        exportar_parquet(conn, data_path)
+
+        pool = DuckDBPool(data_path, str(tmp_path / 'dados.duckdb'))
+        cursor = pool.cursor()
+        assert pool.get_stats()['rollups'] > 0
+
+        ref = DebugRef()
+        tool = DebugDuckDbTools(debug_info_ref=ref, connection=cursor)
+        query = "SELECT UF_Cliente, COUNT(*), SUM(Valor_Vendido) FROM dados_comerciais GROUP BY 1 ORDER BY 1"
+        resultado = tool.run_query(query)
+
+        esperado = cursor.execute(query).df()
+        assert ref.debug_info['rollup_rewrites'][0]['query'] == query
+        assert resultado.splitlines()[0] == ",".join(esperado.columns)
+        assert list(tool.last_result_df.columns) == list(esperado.columns)
+        assert tool.last_result_df['count_star()'].tolist() == esperado['count_star()'].tolist()
+        pool.close()
@@ -0,0 +1,89 @@
+"""
+Testes para o cache LRU de resultados SQL
+"""
+
+import sys
+import os
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.sql_cache import SQLResultCache
+
+
+def _resultado(linhas):
+    return pd.DataFrame({'valor': [float(i) for i in range(linhas)]})
+
+
+class TestSQLResultCache:
+    """Testes de recência, orçamento em bytes e imutabilidade"""
+
+    def test_leitura_renova_recencia(self):
+        """Entrada lida recentemente sobrevive ao despejo (LRU, não FIFO)"""
+        cache = SQLResultCache(max_size=2)
+        cache.set("SELECT 1", _resultado(1))
+        cache.set("SELECT 2", _resultado(1))
+
+        cache.get("SELECT 1")
+        cache.set("SELECT 3", _resultado(1))
+
+        assert cache.get("SELECT 1") is not None
+        assert cache.get("SELECT 2") is None
+        assert cache.get_stats()['evicted_entries'] == 1
+
+    def test_despejo_por_bytes(self):
+        """Orçamento total em bytes é respeitado e bytes despejados são reportados"""
+        tamanho = SQLResultCache._result_size(_resultado(1000))
+        cache = SQLResultCache(max_size=50, max_bytes=int(tamanho * 2.5))
+
+        for i in range(4):
+            cache.set(f"SELECT {i}", _resultado(1000))
+
+        stats = cache.get_stats()
+        assert stats['size'] == 2
+        assert stats['bytes'] <= stats['max_bytes']
+        assert stats['evicted_bytes'] == 2 * tamanho
+
+    def test_resultado_maior_que_orcamento_nao_e_cacheado(self):
+        """Resultado maior que o orçamento inteiro não derruba as demais entradas"""
+        cache = SQLResultCache(max_bytes=1024)
+        cache.set("SELECT pequeno", _resultado(1))
+        cache.set("SELECT grande", _resultado(10_000))
+
+        assert cache.get("SELECT pequeno") is not None
+        assert cache.get("SELECT grande") is None
+        assert cache.get_stats()['rejected_oversize'] == 1
+
+    def test_resultado_anterior_a_alteracao_nao_e_cacheado(self):
+        """Query iniciada antes de uma invalidação não grava o resultado antigo"""
+        cache = SQLResultCache()
+        epoca = cache.data_epoch
+        cache.set("SELECT antiga", _resultado(1), tables=['dados_comerciais'], epoch=epoca)
+        cache.invalidate_tables('dados_comerciais', keep=lambda query: True)
+
+        cache.set("SELECT em_andamento", _resultado(1), tables=['dados_comerciais'], epoch=epoca)
+        cache.set("SELECT nova", _resultado(1), tables=['dados_comerciais'], epoch=cache.data_epoch)
+
+        assert cache.get("SELECT antiga") is not None
+        assert cache.get("SELECT em_andamento") is None
+        assert cache.get("SELECT nova") is not None
+        assert cache.get_stats()['rejected_stale'] == 1
+
+    def test_hits_nao_copiam_e_sao_imutaveis(self):
+        """DataFrames retornam views somente-leitura; Arrow retorna a própria tabela"""
+        cache = SQLResultCache()
+        original = _resultado(3)
+        cache.set("SELECT df", original)
+        original.loc[0, 'valor'] = 99.0  # Alterar o original não afeta o cache
+
+        hit = cache.get("SELECT df")
+        assert hit['valor'].tolist() == [0.0, 1.0, 2.0]
+        with pytest.raises(ValueError):
+            hit['valor'].values[0] = 5.0
+
+        tabela = pa.table({'valor': [1, 2]})
+        cache.set("SELECT arrow", tabela)
+        assert cache.get("SELECT arrow") is tabela
@@ -0,0 +1,40 @@
+"""
+Testes para o cache de extrações do SQLFilterExtractor
+"""
+
+import sys
+import os
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from filters.core.extractor import SQLFilterExtractor, clear_extraction_cache, get_extraction_cache_stats
+
+
+QUERY = ("SELECT Cod_Cliente, SUM(Valor_Vendido) FROM dados_comerciais "
+         "WHERE LOWER(UF_Cliente) = 'sc' AND Data >= '2024-01-01' AND Data < '2024-04-01' GROUP BY 1")
+
+
+class TestCacheDeExtracao:
+    """Extrações repetidas vêm do LRU sem compartilhar estado mutável"""
+
+    def setup_method(self):
+        clear_extraction_cache()
+
+    def test_query_repetida_usa_cache(self):
+        """Mesma query (após colapsar espaços) é extraída uma única vez"""
+        primeira = SQLFilterExtractor().extract_filters_from_sql(QUERY)
+        segunda = SQLFilterExtractor().extract_filters_from_sql(QUERY.replace(' WHERE ', '\n  WHERE '))
+
+        assert primeira == segunda
+        assert primeira['regiao'] == {'UF_Cliente': 'SC'}
+        assert primeira['periodo'] == {'inicio': {'mes': '01', 'ano': '2024'}, 'fim': {'mes': '03', 'ano': '2024'}}
+        assert get_extraction_cache_stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+
+    def test_resultado_nao_altera_cache(self):
+        """Modificar o resultado retornado (ex: no merge de várias queries) não afeta o cache"""
+        extractor = SQLFilterExtractor()
+        resultado = extractor.extract_filters_from_sql(QUERY)
+        resultado['regiao']['UF_Cliente'] = 'PR'
+
+        assert extractor.extract_filters_from_sql(QUERY)['regiao'] == {'UF_Cliente': 'SC'}
@@ -0,0 +1,137 @@
+"""
+Testes para a ingestão em streaming (lotes do parquet, sem DataFrame em memória)
+"""
+
+import sys
+import os
+import pandas as pd
+import pytest
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.model_config import DATA_CONFIG
+from utils.artifact_cache import ArtifactCache
+from utils.dataset_registry import DatasetRegistry
+from utils.duckdb_pool import DuckDBPool
+from utils import streaming_ingest
+from utils.streaming_ingest import scan_parquet, resolve_ingestion_mode, INGESTION_MEMORY, INGESTION_STREAMING
+from filters.core.count_index import SQLFilterCounter, count_filtered_records
+from filters.core.manager import JSONFilterManager
+from conftest import criar_parquet
+
+
+# 3 row groups de 2 linhas, com um valor que só aparece no último
+DADOS = pd.DataFrame({
+    'Data': pd.to_datetime(['2024-01-15', '2024-02-01', '2024-03-10', '2024-04-01', '2024-05-20', '2024-06-30']),
+    'Municipio_Cliente': ['São Paulo', 'JOINVILLE', 'São Paulo', None, 'Joinville', 'Criciúma'],
+    'UF_Cliente': ['SP', 'SC', 'SP', 'SC', 'SC', 'SC'],
+    'Cod_Cliente': [10, 11, 10, 12, 11, 13],
+    'Valor_Vendido': [10.0, 20.5, 3.0, 1.5, 7.0, 2.0],
+})
+
+
+def _criar_parquet(path):
+    return criar_parquet(path, DADOS, row_group_size=2)
+
+
+class TestScanParquet:
+    """Artefatos acumulados lote a lote equivalem aos do modo em memória"""
+
+    def test_metadados_e_dicionario(self, tmp_path):
+        data_path = str(tmp_path / 'dados.parquet')
+        df = _criar_parquet(data_path)
+        memoria = ArtifactCache(str(tmp_path / 'cache')).load_or_build(data_path, df)
+
+        artifacts = scan_parquet(data_path, batch_rows=2)
+
+        metadata = artifacts.metadata
+        assert metadata['rows'] == 6
+        assert metadata['batches'] == 3
+        assert metadata['min_date'] == memoria.metadata['min_date']
+        assert metadata['max_date'] == memoria.metadata['max_date']
+        assert artifacts.text_columns == memoria.text_columns
+        assert metadata['encoding_plan']['Municipio_Cliente'] == memoria.metadata['encoding_plan']['Municipio_Cliente']
+        assert metadata['dimension_values']['Cod_Cliente'] == [10, 11, 12, 13]
+        assert "20.5" in metadata['describe']
+
+        view = artifacts.build_normalized_view()
+        esperada = memoria.build_normalized_view(df)
+        for col in artifacts.text_columns:
+            assert view.unique(col) == esperada.unique(col)
+        assert sorted(view.originals('Municipio_Cliente', 'joinville')) == ['JOINVILLE', 'Joinville']
+        assert view.contains('Municipio_Cliente', 'criciuma')
+        assert view.unique('Cod_Cliente') == [10, 11, 12, 13]
+        assert len(view) == 6
+
+    def test_coluna_truncada_aceita_qualquer_valor(self, tmp_path, monkeypatch):
+        """Dicionário interrompido em MAX_DISTINCT_VALUES não rejeita valores do restante do parquet"""
+        data_path = str(tmp_path / 'dados.parquet')
+        _criar_parquet(data_path)
+        monkeypatch.setattr(streaming_ingest, 'MAX_DISTINCT_VALUES', 2)
+
+        artifacts = scan_parquet(data_path, batch_rows=2)
+        view = artifacts.build_normalized_view()
+
+        assert 'Municipio_Cliente' in artifacts.metadata['truncated_columns']
+        assert view.truncated_columns == artifacts.metadata['truncated_columns']
+        assert 'florianopolis' not in view.unique('Municipio_Cliente')
+        assert view.contains('Municipio_Cliente', 'florianopolis')
+        assert not view.contains('UF_Cliente', 'rs')
+        # Extensão incremental mantém a coluna truncada
+        assert view.extended({}, lambda values: values, 7, 'x').contains('Municipio_Cliente', 'florianopolis')
+        # Filtros não validam a coluna truncada contra a lista parcial
+        manager = JSONFilterManager(view)
+        assert 'Municipio_Cliente' not in manager.valores_validos
+        assert manager.validar_valores('Municipio_Cliente', ['Florianópolis'], 'regiao') == ['Florianópolis']
+
+    def test_modo_auto_por_numero_de_linhas(self, tmp_path, monkeypatch):
+        data_path = str(tmp_path / 'dados.parquet')
+        _criar_parquet(data_path)
+
+        monkeypatch.setitem(DATA_CONFIG, 'streaming_min_rows', 5)
+        assert resolve_ingestion_mode(data_path, 'auto') == INGESTION_STREAMING
+        monkeypatch.setitem(DATA_CONFIG, 'streaming_min_rows', 100)
+        assert resolve_ingestion_mode(data_path, 'auto') == INGESTION_MEMORY
+        assert resolve_ingestion_mode(str(tmp_path / 'ausente.parquet'), 'auto') == INGESTION_MEMORY
+
+
+class TestRegistroStreaming:
+    """Registro e banco sem materializar o DataFrame"""
+
+    def test_registro_sem_dataframe(self, tmp_path, monkeypatch):
+        data_path = str(tmp_path / 'dados.parquet')
+        _criar_parquet(data_path)
+        monkeypatch.setitem(DATA_CONFIG, 'artifact_cache_dir', str(tmp_path / 'cache'))
+
+        registry = DatasetRegistry(data_path, ingestion_mode='streaming')
+        summary = registry.get_summary()
+
+        assert summary['rows'] == 6
+        assert summary['max_date'] == pd.Timestamp('2024-06-30')
+        assert registry.get_normalized_view().contains('UF_Cliente', 'sc')
+        assert not registry.is_loaded
+        with pytest.raises(RuntimeError):
+            registry.get_view()
+
+        # Segunda instância lê os artefatos do cache em disco
+        assert DatasetRegistry(data_path, ingestion_mode='streaming').get_artifacts().from_cache
+
+    def test_view_sobre_parquet_e_contagem(self, tmp_path):
+        data_path = str(tmp_path / 'dados.parquet')
+        df = _criar_parquet(data_path)
+        pool = DuckDBPool(data_path, str(tmp_path / 'dados.duckdb'), streaming=True)
+        cursor = pool.cursor()
+
+        tipo = cursor.execute("SELECT table_type FROM information_schema.tables "
+                              "WHERE table_name = 'dados_comerciais'").fetchone()[0]
+        assert tipo == 'VIEW'
+        assert pool.get_stats()['relation'] == 'view'
+        assert cursor.execute("SELECT SUM(Valor_Vendido) FROM dados_comerciais").fetchone()[0] == 44.0
+
+        counter = SQLFilterCounter(pool.cursor())
+        for contexto in ({}, {'UF_Cliente': 'sc'}, {'Municipio_Cliente': ['joinville'], 'Data_>=': '2024-03-01'},
+                         {'Cod_Cliente': 11, 'Data_<': '2024-05-01'}):
+            assert count_filtered_records(counter, contexto) == count_filtered_records(df, contexto)
+        assert counter.get_stats()['misses'] == 4
+        pool.close()
@@ -0,0 +1,126 @@
+"""
+Testes para a reescrita de comparações sobre LOWER(coluna) em IN sobre os valores originais
+Toda query reescrita deve retornar exatamente o resultado da query original
+"""
+
+import sys
+import os
+import duckdb
+import pytest
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import utils.string_predicates as string_predicates
+from utils.string_predicates import (
+    build_string_dictionary, StringPredicateRewriter, clear_string_rewrites, get_string_rewrite_stats
+)
+from utils.duckdb_pool import DuckDBPool
+from tools.debug_duckdb_tools import DebugDuckDbTools
+from conftest import DebugRef, criar_tabela, exportar_parquet
+
+
+REESCRITAS = [
+    "SELECT COUNT(*) FROM dados_comerciais WHERE LOWER(UF_Cliente) = 'sc'",
+    "SELECT Des_Linha_Produto, SUM(Valor_Vendido) FROM dados_comerciais d "
+    "WHERE 'joinville' = lower(d.Municipio_Cliente) OR LOWER(UF_Cliente) IN ('pr', 'xx') GROUP BY 1 ORDER BY 1",
+    "SELECT Municipio_Cliente, COUNT(*) FROM dados_comerciais WHERE LOWER(Municipio_Cliente) LIKE '%i%' GROUP BY 1 ORDER BY 1",
+    "SELECT COUNT(*) FROM dados_comerciais WHERE LOWER(UF_Cliente) ILIKE 'S%' "
+    "AND Cod_Cliente IN (SELECT Cod_Cliente FROM dados_comerciais WHERE LOWER(Municipio_Cliente) = 'itajaí')",
+]
+
+NAO_REESCRITAS = [
+    "SELECT COUNT(*) FROM dados_comerciais WHERE LOWER(UF_Cliente) = 'zz'",
+    "SELECT COUNT(*) FROM dados_comerciais WHERE UF_Cliente = 'SC'",
+    "SELECT COUNT(*) FROM dados_comerciais WHERE LOWER(Des_Cliente) = 'x'",
+    "SELECT LOWER(UF_Cliente) FROM dados_comerciais GROUP BY 1",
+]
+
+
+@pytest.fixture(scope='module')
+def conexao():
+    conn = duckdb.connect()
+    criar_tabela(conn)
+    # Des_Cliente (um valor por registro) fica fora do dicionário
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(string_predicates, 'MAX_DICTIONARY_VALUES', 1_000)
+        build_string_dictionary(conn)
+    yield conn
+    conn.close()
+
+
+class TestStringPredicateRewriter:
+    """Correção da reescrita: IN sobre os valores originais equivale a LOWER()"""
+
+    def setup_method(self):
+        clear_string_rewrites()
+
+    @pytest.mark.parametrize('query', REESCRITAS)
+    def test_reescrita_igual_a_query_original(self, conexao, query):
+        """Query reescrita não usa LOWER() e retorna as mesmas linhas"""
+        rewrite = StringPredicateRewriter(conexao).rewrite(query)
+
+        assert rewrite is not None, query
+        assert 'lower(' not in rewrite['sql'].lower()
+        assert conexao.execute(query).fetchall() == conexao.execute(rewrite['sql']).fetchall()
+
+    @pytest.mark.parametrize('query', NAO_REESCRITAS)
+    def test_predicados_sem_equivalente_ficam_como_estao(self, conexao, query):
+        """Sem valores correspondentes, sem LOWER() ou coluna fora do dicionário: nada muda"""
+        assert StringPredicateRewriter(conexao).rewrite(query) is None
+
+    def test_reescrita_cacheada_pelo_sql(self, conexao):
+        """A mesma query reaproveita a reescrita (o parser roda uma vez)"""
+        rewriter = StringPredicateRewriter(conexao)
+        query = "SELECT COUNT(*) FROM dados_comerciais WHERE LOWER(UF_Cliente) = 'sc'"
+        primeira = rewriter.rewrite(query)
+
+        assert rewriter.rewrite(query) == primeira
+        assert get_string_rewrite_stats()['hits'] == 1
+
+    def test_aliases_trocados_nao_compartilham_reescrita(self, conexao):
+        """Query com aliases trocados executa a própria reescrita, não a da anterior"""
+        rewriter = StringPredicateRewriter(conexao)
+        rewriter.rewrite("SELECT MAX(p) FROM (SELECT Valor_Vendido AS p, 1.0 AS q FROM dados_comerciais "
+                         "WHERE LOWER(UF_Cliente) = 'sc')")
+        query = ("SELECT MAX(p) FROM (SELECT Valor_Vendido AS q, 1.0 AS p FROM dados_comerciais "
+                 "WHERE LOWER(UF_Cliente) = 'sc')")
+        rewrite = rewriter.rewrite(query)
+
+        assert conexao.execute(rewrite['sql']).fetchall() == conexao.execute(query).fetchall() == [(1.0,)]
+        assert get_string_rewrite_stats()['hits'] == 0
+
+    def test_sem_dicionario_nao_reescreve(self):
+        """Conexões sem dicionário executam a query original"""
+        conn = duckdb.connect()
+        criar_tabela(conn, linhas=10)
+
+        assert StringPredicateRewriter(conn).rewrite("SELECT COUNT(*) FROM dados_comerciais WHERE LOWER(UF_Cliente) = 'sc'") is None
+
+
+class TestReescritaNoPool:
+    """Dicionário construído junto com o banco compartilhado"""
+
+    def test_debug_tools_executa_sem_lower(self, tmp_path):
+        """run_query mantém o SQL normalizado no debug e devolve o resultado da query original"""
+        conn = duckdb.connect()
+        criar_tabela(conn, linhas=5_000)
+        data_path = str(tmp_path / 'dados.parquet')
+        exportar_parquet(conn, data_path)
+
+        pool = DuckDBPool(data_path, str(tmp_path / 'dados.duckdb'))
+        cursor = pool.cursor()
+        assert pool.get_stats()['string_dictionary_columns'] > 0
+
+        ref = DebugRef()
+        tool = DebugDuckDbTools(debug_info_ref=ref, connection=cursor)
+        query = "SELECT Municipio_Cliente, COUNT(*) FROM dados_comerciais WHERE UF_Cliente = 'SC' GROUP BY 1 ORDER BY 1"
+        resultado = tool.run_query(query)
+
+        normalizada = "SELECT Municipio_Cliente, COUNT(*) FROM dados_comerciais WHERE LOWER(UF_Cliente) = 'sc' GROUP BY 1 ORDER BY 1"
+        esperado = cursor.execute(normalizada).df()
+        assert ref.debug_info['sql_queries'] == [normalizada]
+        assert ref.debug_info['string_predicate_rewrites'][0]['predicates'][0]['column'] == 'UF_Cliente'
+        assert resultado.splitlines()[0] == ",".join(esperado.columns)
+        assert tool.last_result_df['count_star()'].tolist() == esperado['count_star()'].tolist()
+        pool.close()
@@ -0,0 +1,88 @@
+"""
+Testes para a normalização em lote do TextNormalizer
+Garante que o caminho vetorizado produz exatamente o mesmo resultado de normalize_text
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from text_normalizer import TextNormalizer
+
+
+VALORES_TESTE = [
+    'São Paulo', 'SAO PAULO', '  Joinville  ', 'JOINVILLE', 'Florianópolis',
+    'Itajaí\tSC', 'linha   PREMIUM', None, np.nan, '', 'Ação', 'ÁGUA  DOCE',
+    'São Paulo', '19114', 'Chapecó', 'Ñandú', 'Curitiba\n',
+]
+
+
+class TestNormalizacaoEmLote:
+    """Testes de equivalência entre o caminho vetorizado e o per-célula"""
+
+    def setup_method(self):
+        self.normalizer = TextNormalizer()
+
+    def _esperado(self, values):
+        return [self.normalizer.normalize_text(v) for v in values]
+
+    def test_normalize_column_object(self):
+        """Coluna object produz o mesmo resultado de apply(normalize_text)"""
+        series = pd.Series(VALORES_TESTE * 3, name='Municipio_Cliente')
+
+        result = self.normalizer.normalize_column(series)
+
+        assert result.tolist() == series.apply(self.normalizer.normalize_text).tolist()
+        assert result.name == 'Municipio_Cliente'
+        assert result.index.equals(series.index)
+
+    def test_normalize_column_preserva_indice(self):
+        """Índice não sequencial é preservado"""
+        series = pd.Series(['A', 'b', None], index=[10, 5, 7])
+
+        result = self.normalizer.normalize_column(series)
+
+        assert result.to_dict() == {10: 'a', 5: 'b', 7: ''}
+
+    def test_normalize_column_categorica(self):
+        """Coluna categórica continua categórica e une categorias equivalentes"""
+        series = pd.Series(VALORES_TESTE, dtype='category')
+
+        result = self.normalizer.normalize_column(series)
+
+        assert isinstance(result.dtype, pd.CategoricalDtype)
+        assert result.astype(object).tolist() == self._esperado(VALORES_TESTE)
+        # 'São Paulo' e 'SAO PAULO' viram a mesma categoria
+        assert list(result.cat.categories).count('sao paulo') == 1
+
+    def test_normalize_column_valores_nao_string(self):
+        """Valores numéricos em colunas object são convertidos como em normalize_text"""
+        values = [19114, 'Cliente 1', 3.5, None]
+        series = pd.Series(values, dtype=object)
+
+        assert self.normalizer.normalize_column(series).tolist() == self._esperado(values)
+
+    def test_normalize_arrow_array(self):
+        """Array Arrow (string e dictionary) produz o mesmo resultado"""
+        values = [v if isinstance(v, str) else None for v in VALORES_TESTE]
+        array = pa.array(values, type=pa.string())
+
+        assert self.normalizer.normalize_arrow_array(array).to_pylist() == self._esperado(values)
+
+        chunked = pa.chunked_array([array.dictionary_encode()])
+        assert self.normalizer.normalize_arrow_array(chunked).to_pylist() == self._esperado(values)
+
+    def test_normalize_dataframe_nao_altera_original(self):
+        """normalize_dataframe não modifica o DataFrame de entrada"""
+        df = pd.DataFrame({'UF_Cliente': ['SC', 'Sp'], 'Valor_Vendido': [1.0, 2.0]})
+
+        result = self.normalizer.normalize_dataframe(df, ['UF_Cliente'])
+
+        assert df['UF_Cliente'].tolist() == ['SC', 'Sp']
+        assert result['UF_Cliente'].tolist() == ['sc', 'sp']
+        assert result['Valor_Vendido'].tolist() == [1.0, 2.0]
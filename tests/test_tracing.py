@@ -0,0 +1,117 @@
+"""
+Testes para o tracing de latência por turno
+"""
+
+import sys
+import os
+import contextvars
+import duckdb
+import pytest
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.tracing import start_trace, span, traced, get_current_trace, export_trace, load_traces, span_totals
+from tools.debug_duckdb_tools import DebugDuckDbTools
+
+
+class TestSpans:
+    """Spans aninhados pelo contexto, sem passar o trace entre as camadas"""
+
+    def test_aninhamento_e_duracao(self):
+        """Spans abertos dentro de outro registram o pai e a duração"""
+        @traced("etapa.interna")
+        def interna():
+            return 42
+
+        with start_trace("chat_turn", prompt_chars=10) as trace:
+            with span("agent.run") as externo:
+                assert interna() == 42
+            with span("filters.extract", queries=2):
+                pass
+
+        nomes = [record['name'] for record in trace.spans]
+        assert nomes == ["agent.run", "etapa.interna", "filters.extract"]
+        assert trace.spans[1]['parent'] == externo['id']
+        assert trace.spans[2]['parent'] is None
+        assert trace.spans[2]['attributes'] == {'queries': 2}
+        assert all(record['duration_ms'] is not None for record in trace.spans)
+        assert trace.duration_ms >= trace.spans[0]['duration_ms']
+        assert get_current_trace() is None
+
+    def test_fora_de_trace_nao_registra(self):
+        """Sem trace ativo span() não faz nada"""
+        with span("solto") as record:
+            assert record is None
+
+    def test_erro_registrado_e_propagado(self):
+        """Exceções ficam no span e continuam subindo"""
+        with start_trace("chat_turn") as trace:
+            with pytest.raises(ValueError):
+                with span("visualization.prepare"):
+                    raise ValueError("falha")
+
+        assert trace.spans[0]['error'] == 'ValueError'
+        assert trace.spans[0]['duration_ms'] is not None
+
+    def test_gerador_sem_aninhamento(self):
+        """Span de um gerador não vira pai dos spans do consumidor entre os chunks"""
+        def gerador():
+            with span("llm.invoke_stream", nest=False):
+                yield 1
+                yield 2
+
+        with start_trace("chat_turn") as trace:
+            with span("agent.run") as externo:
+                for _ in gerador():
+                    with span("stream.render"):
+                        pass
+
+        stream, *renders = [record for record in trace.spans if record['name'] != 'agent.run']
+        assert stream['name'] == 'llm.invoke_stream' and stream['duration_ms'] is not None
+        assert all(record['parent'] == externo['id'] for record in [stream, *renders])
+
+    def test_gerador_fechado_em_outro_contexto(self):
+        """Fechar o gerador fora do contexto em que ele iniciou não falha"""
+        def gerador():
+            with span("llm.invoke_stream", nest=False):
+                yield 1
+                yield 2
+
+        with start_trace("chat_turn") as trace:
+            chunks = gerador()
+            contextvars.copy_context().run(next, chunks)
+            chunks.close()
+
+        assert trace.spans[0]['duration_ms'] is not None
+
+    def test_exportacao_jsonl(self, tmp_path):
+        """Cada turno vira uma linha do arquivo de traces"""
+        path = str(tmp_path / 'traces' / 'turns.jsonl')
+        for _ in range(2):
+            with start_trace("chat_turn") as trace:
+                with span("agent.run"):
+                    pass
+            assert export_trace(trace, path) == path
+
+        traces = load_traces(path)
+        assert len(traces) == 2
+        assert traces[1]['trace_id'] == trace.trace_id
+        assert list(span_totals(traces[0]['spans'])) == ["agent.run"]
+
+
+class TestSpansDuckDb:
+    """run_query registra as etapas de execução no trace do turno"""
+
+    def test_execucao_dentro_do_turno(self):
+        """Reescrita e execução aparecem como spans com atributos"""
+        conn = duckdb.connect()
+        conn.execute("CREATE TABLE dados_comerciais AS SELECT 'SC' AS UF_Cliente, 1 AS Qtd_Vendida")
+        tool = DebugDuckDbTools(connection=conn)
+
+        with start_trace("chat_turn") as trace:
+            tool.run_query("SELECT UF_Cliente, SUM(Qtd_Vendida) FROM dados_comerciais GROUP BY 1")
+
+        spans = {record['name']: record for record in trace.spans}
+        assert spans['duckdb.rewrite']['attributes']['rollup'] is None
+        assert spans['duckdb.execute']['attributes']['rows'] == 1
@@ -0,0 +1,91 @@
+"""
+Testes para o total do universo de rankings Top-N (uma varredura por gráfico)
+"""
+
+import sys
+import os
+import duckdb
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tools.debug_duckdb_tools import DebugDuckDbTools
+from tools.visualization_tools import VisualizationTools
+from utils.sql_cache import bump_table_version, clear_sql_cache
+from utils.universe_total import plan_universe_total
+from conftest import DebugRef, criar_conexao
+
+
+class TestPlano:
+    """Query do total montada pela AST do ranking"""
+
+    def setup_method(self):
+        self.conn = duckdb.connect()
+
+    def test_mesmo_filtro_sem_grupos(self):
+        plano = plan_universe_total(self.conn, "SELECT Cod_Cliente, SUM(Valor_Vendido) AS total FROM dados_comerciais "
+                                               "WHERE LOWER(UF_Cliente) = 'sc' GROUP BY 1 ORDER BY total DESC LIMIT 5")
+        assert plano['sql'] == "SELECT sum(Valor_Vendido) AS total FROM dados_comerciais WHERE (lower(UF_Cliente) = 'sc')"
+        assert (plano['column_index'], plano['limit'], plano['additive']) == (1, 5, True)
+
+        # Mesmo filtro e agregação em outro ranking: mesma query do total
+        outro = plan_universe_total(self.conn, "SELECT UF_Cliente, sum(Valor_Vendido) FROM dados_comerciais "
+                                               "WHERE lower(UF_Cliente) = 'sc' GROUP BY UF_Cliente LIMIT 3")
+        assert outro['sql'] == plano['sql']
+
+    def test_group_by_all(self):
+        plano = plan_universe_total(self.conn, "SELECT UF_Cliente, SUM(Valor_Vendido) AS t FROM dados_comerciais "
+                                               "GROUP BY ALL ORDER BY t DESC LIMIT 5")
+        assert plano['sql'] == "SELECT sum(Valor_Vendido) AS total FROM dados_comerciais"
+        assert (plano['column_index'], plano['limit'], plano['additive']) == (1, 5, True)
+
+    def test_nao_aditivos_e_nao_rankings(self):
+        distinto = plan_universe_total(self.conn, "SELECT UF_Cliente, COUNT(DISTINCT Cod_Cliente) AS n "
+                                                  "FROM dados_comerciais GROUP BY 1 ORDER BY n DESC LIMIT 3")
+        assert distinto['additive'] is False
+        assert plan_universe_total(self.conn, "SELECT UF_Cliente, SUM(Valor_Vendido) FROM dados_comerciais "
+                                              "GROUP BY 1 HAVING SUM(Valor_Vendido) > 10 LIMIT 3")['additive'] is False
+        assert plan_universe_total(self.conn, "SELECT UF_Cliente, SUM(Valor_Vendido) FROM dados_comerciais GROUP BY 1") is None
+        assert plan_universe_total(self.conn, "SELECT * FROM dados_comerciais LIMIT 3") is None
+
+
+class TestTotalUniverso:
+    """Total servido pelo próprio ranking ou pelo cache compartilhado"""
+
+    def setup_method(self):
+        clear_sql_cache()
+        bump_table_version('dados_comerciais')
+        self.conn = criar_conexao(linhas=100)
+
+    def _sessao(self):
+        ref = DebugRef()
+        duckdb_tool = DebugDuckDbTools(debug_info_ref=ref, connection=self.conn.cursor(), shared_cache=True)
+        viz = VisualizationTools(debug_info_ref=ref)
+        viz.duckdb_tool_ref = duckdb_tool
+        return duckdb_tool, viz, ref
+
+    def test_ranking_truncado_usa_cache(self):
+        esperado = self.conn.execute("SELECT SUM(Valor_Vendido) FROM dados_comerciais WHERE UF_Cliente = 'SC'").fetchone()[0]
+        sessao_a, viz_a, ref_a = self._sessao()
+        sessao_b, viz_b, ref_b = self._sessao()
+
+        sessao_a.run_query("SELECT Cod_Cliente, SUM(Valor_Vendido) AS total FROM dados_comerciais "
+                           "WHERE UF_Cliente = 'SC' GROUP BY 1 ORDER BY total DESC LIMIT 3")
+        assert viz_a._calcular_total_universo() == esperado
+        # Total não vira resultado do agente
+        assert len(sessao_a.last_result_df) == 3
+        assert len(ref_a.debug_info['sql_queries']) == 1
+
+        # Outro ranking, mesmo filtro e agregação: só a query principal executa
+        sessao_b.run_query("SELECT Cod_Cliente, SUM(Valor_Vendido) AS vendas FROM dados_comerciais "
+                           "WHERE UF_Cliente = 'sc' GROUP BY Cod_Cliente ORDER BY vendas LIMIT 2")
+        assert viz_b._calcular_total_universo() == esperado
+        assert sum(ref_b.debug_info['query_executions'].values()) == 1
+
+    def test_ranking_completo_sem_query(self):
+        sessao, viz, ref = self._sessao()
+        sessao.run_query("SELECT UF_Cliente, SUM(Valor_Vendido) AS total FROM dados_comerciais "
+                         "GROUP BY 1 ORDER BY total DESC LIMIT 10")
+
+        assert viz._calcular_total_universo() == self.conn.execute("SELECT SUM(Valor_Vendido) FROM dados_comerciais").fetchone()[0]
+        assert sum(ref.debug_info['query_executions'].values()) == 1
@@ -0,0 +1,104 @@
+"""
+Testes para o índice de valores válidos e o registro de JSONFilterManager
+"""
+
+import sys
+import os
+import random
+import threading
+import time
+import pandas as pd
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from filters.core.value_index import ValueIndex
+from filters.core.manager import (
+    JSONFilterManager, get_json_filter_manager, get_json_filter_manager_stats,
+    reset_json_filter_manager, clear_json_filter_managers,
+)
+
+
+def _busca_parcial_linear(valores, valor):
+    """Varredura original de validar_valores (referência de semântica)"""
+    matches = [v for v in valores if valor.upper() in v.upper() or v.upper() in valor.upper()]
+    return matches[0] if matches else None
+
+
+class TestValueIndex:
+    """Equivalência com a varredura linear e novos modos de match"""
+
+    def test_substring_igual_a_varredura_linear(self):
+        """match_substring devolve o mesmo primeiro match da varredura original"""
+        rng = random.Random(7)
+        alfabeto = 'abcsãoéJ '
+        valores = list(dict.fromkeys(''.join(rng.choice(alfabeto) for _ in range(rng.randint(1, 8)))
+                                     for _ in range(400)))
+        indice = ValueIndex(valores)
+
+        consultas = valores[:50] + [''.join(rng.choice(alfabeto) for _ in range(rng.randint(0, 12))) for _ in range(300)]
+        for consulta in consultas:
+            assert indice.match_substring(consulta) == _busca_parcial_linear(valores, consulta), consulta
+
+    def test_chave_normalizada_e_aproximado(self):
+        """Acentos/caixa resolvem pela chave; erros de digitação pela similaridade de trigramas"""
+        indice = ValueIndex(['JOINVILLE', 'São Paulo', 'Florianópolis', 'Curitiba'])
+
+        assert indice.match_key('sao  paulo') == 'São Paulo'
+        assert indice.match('florianopolis') == 'Florianópolis'
+        assert indice.match_approximate('Curitibq') == 'Curitiba'
+        assert indice.match_approximate('Manaus') is None
+
+
+class TestValidarValores:
+    """validar_valores sobre o índice"""
+
+    def setup_method(self):
+        municipios = [f'Municipio {n:05d}' for n in range(5000)] + ['São José', 'Joinville']
+        self.manager = JSONFilterManager(pd.DataFrame({'Municipio_Cliente': municipios}))
+
+    def test_semantica_preservada(self):
+        """Exatos primeiro; sem exatos, um match por valor"""
+        assert self.manager.validar_valores('Municipio_Cliente', ['Joinville', 'Inexistente'], 'regiao') == ['Joinville']
+        assert self.manager.validar_valores('Municipio_Cliente', ['sao jose', 'joinvile'], 'regiao') == ['São José', 'Joinville']
+        assert self.manager.validar_valores('Municipio_Cliente', ['Manaus'], 'regiao') == []
+
+    def test_validacao_rapida(self):
+        """Validar um município contra milhares de valores fica abaixo de 1 ms"""
+        self.manager.validar_valores('Municipio_Cliente', ['joinvile'], 'regiao')
+        inicio = time.perf_counter()
+        for _ in range(100):
+            self.manager.validar_valores('Municipio_Cliente', ['joinvile'], 'regiao')
+        assert (time.perf_counter() - inicio) / 100 < 0.001
+
+
+class TestRegistroDeGerenciadores:
+    """get_json_filter_manager compartilha gerenciador e índices por fingerprint do dataset"""
+
+    def setup_method(self):
+        clear_json_filter_managers()
+        self.df = pd.DataFrame({'UF_Cliente': pd.Categorical(['SC', 'PR', 'SC']), 'Valor_Vendido': [1.0, 2.0, 3.0]})
+
+    def test_views_rasas_reusam_o_mesmo_gerenciador(self):
+        """Views do mesmo dataset (inclusive em threads) não reconstroem os índices"""
+        gerenciadores = []
+        threads = [threading.Thread(target=lambda: gerenciadores.append(get_json_filter_manager(self.df.copy(deep=False))))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(g) for g in gerenciadores}) == 1
+        stats = get_json_filter_manager_stats()
+        assert stats['builds'] == 1 and stats['hits'] == 7
+
+    def test_dataset_diferente_gera_novo_gerenciador(self):
+        """Outro dataset tem outro fingerprint; reset limpa filtros sem reconstruir"""
+        gerenciador = get_json_filter_manager(self.df)
+        gerenciador.filtros_persistentes['regiao']['UF_Cliente'] = ['SC']
+
+        assert get_json_filter_manager(self.df.copy()) is not gerenciador
+        reset_json_filter_manager()
+        assert get_json_filter_manager(self.df).filtros_persistentes['regiao']['UF_Cliente'] == []
+        assert get_json_filter_manager_stats()['builds'] == 2